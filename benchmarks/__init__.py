@@ -0,0 +1,5 @@
+"""
+LinBot 性能基准测试模块
+各基准脚本以插件包的子模块方式运行，例如在 data/plugins 目录下执行：
+python -m astrbot_plugin_linbot.benchmarks.import_time
+"""
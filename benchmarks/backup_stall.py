@@ -0,0 +1,148 @@
+"""
+在线备份写入阻塞基准
+多个线程持续存款时执行一次在线备份，对比备份前和备份期间的写入延迟，
+并输出备份耗时、分步复制的重新开始次数和最长一步的耗时（写入最多被阻塞的时长）
+
+读连接池为 0 时数据库为普通日志模式，备份每一步持有读锁，期间写入无法提交；
+单个数据库开启读连接池时为 WAL 模式，备份只持有读快照，写入不受影响
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.populate --users 100000 --output /tmp/linbot_100k.db
+python -m astrbot_plugin_linbot.benchmarks.backup_stall --db /tmp/linbot_100k.db --read-pool 0,4 --save /tmp/backup.json
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p95_ms", "max_ms"]
+
+# 参与测试的用户数（从有现金的用户中抽取）
+SAMPLE_USERS = 500
+
+
+def _sample_users(db_path: str, seed: int) -> List[Tuple[str, str]]:
+    conn = sqlite3.connect(db_path)
+    try:
+        users = conn.execute("SELECT user_id, username FROM users WHERE money >= 1000").fetchall()
+    finally:
+        conn.close()
+    if not users:
+        raise ValueError("数据库中至少需要1个现金不少于1000的用户")
+    return random.Random(seed).sample(users, min(SAMPLE_USERS, len(users)))
+
+
+def run_pool(db_path: str, readers: int, users: List[Tuple[str, str]], threads: int, seconds: float,
+             pause: float, work_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    在数据库副本上测量备份前和备份期间的写入延迟
+    
+    Returns:
+        {"pool=<n>/idle": 延迟统计, "pool=<n>/backup": 延迟统计和备份结果}
+    """
+    from ..game.backup import DatabaseBackup
+    from ..game.bank import BankManager
+    from ..game.storage import SqliteStore
+    from ..perf import Histogram
+    
+    copy = os.path.join(work_dir, "user.db")
+    shutil.copyfile(db_path, copy)
+    store = SqliteStore(copy, readers)
+    bank = BankManager(copy, {}, store=store)
+    backup = DatabaseBackup(copy, os.path.join(work_dir, "backups"), keep=1)
+    
+    phase = {"histogram": Histogram()}
+    stop = threading.Event()
+    
+    def writer(index: int):
+        rng = random.Random(index)
+        while not stop.is_set():
+            user_id, username = rng.choice(users)
+            start = time.perf_counter()
+            bank.deposit(user_id, username, 10)
+            phase["histogram"].record((time.perf_counter() - start) * 1000)
+            time.sleep(pause)
+    
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        time.sleep(seconds)
+        idle = phase["histogram"].snapshot()
+        phase["histogram"] = Histogram()
+        result = backup.backup()
+        during = phase["histogram"].snapshot()
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        store.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir, exist_ok=True)
+    
+    during.update({key: result[key] for key in ("seconds", "pages", "restarts", "max_step_ms", "size")})
+    return {f"pool={readers}/idle": idle, f"pool={readers}/backup": during}
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    from .populate import populate
+    
+    parser = argparse.ArgumentParser(description="LinBot 在线备份写入阻塞基准")
+    parser.add_argument("--db", help="合成用户数据库（只读），不指定时临时生成")
+    parser.add_argument("--users", type=int, default=20000, help="临时生成数据库的用户数")
+    parser.add_argument("--read-pool", default="0,4", help="读连接池大小，逗号分隔（0 为普通日志模式）")
+    parser.add_argument("--threads", type=int, default=4, help="写入线程数")
+    parser.add_argument("--seconds", type=float, default=3, help="备份前测量写入延迟的时长（秒）")
+    parser.add_argument("--pause", type=float, default=0.005, help="每个线程两次写入之间的间隔（秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    pools = [int(size) for size in args.read_pool.split(",") if size.strip()]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "population.db")
+            result = populate(db_path, args.users, seed=args.seed, progress=True)
+            print(f"🔧 已临时生成 {args.users} 用户的数据库，耗时 {result['seconds']} 秒")
+        elif not os.path.exists(db_path):
+            parser.error(f"{db_path} 不存在，请先运行 benchmarks.populate 生成")
+        
+        users = _sample_users(db_path, args.seed)
+        print(f"🔧 {args.threads} 个线程持续存款，每次间隔 {args.pause * 1000:g} 毫秒\n")
+        
+        results = {}
+        for readers in pools:
+            work_dir = os.path.join(tmp, f"pool{readers}")
+            os.makedirs(work_dir)
+            results.update(run_pool(db_path, readers, users, args.threads, args.seconds, args.pause, work_dir))
+            idle, during = results[f"pool={readers}/idle"], results[f"pool={readers}/backup"]
+            print(f"读连接池 {readers:<2} | 备份前 p95 {idle['p95_ms']:>7.2f} max {idle['max_ms']:>7.2f} | "
+                  f"备份中 p95 {during['p95_ms']:>7.2f} max {during['max_ms']:>7.2f} ms | "
+                  f"备份 {during['seconds']:.2f}s {during['pages']}页 重新开始 {during['restarts']}次 "
+                  f"最长一步 {during['max_step_ms']:.1f}ms")
+    
+    params = {"db": os.path.basename(args.db) if args.db else f"临时生成 {args.users} 用户",
+              "threads": args.threads, "seconds": args.seconds, "pause": args.pause, "read_pool": pools}
+    if args.save:
+        save_baseline(args.save, "backup_stall", results, params)
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+基准结果的 JSON 基线文件
+各基准脚本通过 --save 保存本次结果，通过 --compare 与已保存的基线对比
+"""
+
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+
+def save_baseline(path: str, name: str, results: Dict[str, Dict[str, Any]],
+                  params: Optional[Dict[str, Any]] = None) -> None:
+    """
+    保存基线文件
+    
+    Args:
+        path: 文件路径
+        name: 基准名称
+        results: {用例: {指标: 数值}}
+        params: 本次运行的参数（用户数、迭代次数等）
+    """
+    data = {
+        "benchmark": name,
+        "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params or {},
+        "results": results
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    """读取基线文件"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+            metrics: List[str], threshold: float = 10.0) -> List[Dict[str, Any]]:
+    """
+    对比本次结果与基线（指标均为越小越好）
+    
+    Args:
+        results: 本次结果
+        baseline: load_baseline 返回的基线
+        metrics: 参与对比的指标
+        threshold: 变化超过该百分比时标记为变快或变慢
+    
+    Returns:
+        每个用例每个指标一行：{case, metric, baseline, current, change_pct, status}
+    """
+    rows = []
+    old_results = baseline.get("results", {})
+    for case, values in results.items():
+        old_values = old_results.get(case)
+        if old_values is None:
+            continue
+        for metric in metrics:
+            if metric not in values or metric not in old_values:
+                continue
+            old, new = old_values[metric], values[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            if change > threshold:
+                status = "slower"
+            elif change < -threshold:
+                status = "faster"
+            else:
+                status = "same"
+            rows.append({"case": case, "metric": metric, "baseline": old, "current": new,
+                         "change_pct": round(change, 1), "status": status})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any]) -> int:
+    """
+    输出对比结果
+    
+    Returns:
+        变慢的指标数
+    """
+    icons = {"slower": "🔴", "faster": "🟢", "same": "⚪"}
+    print(f"\n📊 与基线对比（{baseline.get('created_at', '未知时间')}，{baseline.get('params', {})}）")
+    for row in rows:
+        print(f"{icons[row['status']]} {row['case']:<44} {row['metric']:<12} "
+              f"{row['baseline']:>12} -> {row['current']:>12} ({row['change_pct']:+.1f}%)")
+    
+    slower = sum(1 for row in rows if row["status"] == "slower")
+    faster = sum(1 for row in rows if row["status"] == "faster")
+    print(f"\n变慢 {slower} 项，变快 {faster} 项，共 {len(rows)} 项")
+    return slower
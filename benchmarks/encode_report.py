@@ -0,0 +1,98 @@
+"""
+图片编码基准
+绘制帮助、排行榜、服务器监控、CPU图表四类样例图片，对比各编码方式的耗时和体积，
+并给出共享编码器在当前默认设置下的选择
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+from typing import Dict, Any, Callable
+
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_samples() -> Dict[str, Any]:
+    """绘制四类样例图片"""
+    from ..game.phb.ranking_manager import RankingManager
+    from ..helps.helps import PluginHelpGenerator
+    from ..server.monitor import ServerMonitor
+    from .samples import sample_cpu, sample_plugins, sample_ranking
+    
+    help_generator = PluginHelpGenerator(context=None, plugin_dir=PLUGIN_DIR, prefix="/")
+    ranking_manager = RankingManager(db_path="", plugin_dir=PLUGIN_DIR)
+    monitor = ServerMonitor()
+    
+    cpu_data, timestamps = sample_cpu(30)
+    
+    return {
+        "help": help_generator.render_help_image(sample_plugins(20)),
+        "ranking": ranking_manager.render_ranking_image(sample_ranking(10)),
+        "monitor": monitor.render_monitor_image(monitor.get_system_info()),
+        "chart": monitor.render_cpu_chart(cpu_data, timestamps, 30),
+    }
+
+
+def _strategies() -> Dict[str, Callable[[Any], bytes]]:
+    """各编码方式"""
+    from PIL import Image
+    
+    def save(image, fmt, **params):
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **params)
+        return buffer.getvalue()
+    
+    def palette(image):
+        return image.convert("RGB").quantize(colors=256, method=Image.Quantize.FASTOCTREE,
+                                             dither=Image.Dither.NONE)
+    
+    return {
+        "png (旧)": lambda im: save(im.convert("RGB"), "PNG"),
+        "png optimize": lambda im: save(im.convert("RGB"), "PNG", optimize=True),
+        "png 调色板": lambda im: save(palette(im), "PNG"),
+        "png 调色板 optimize": lambda im: save(palette(im), "PNG", optimize=True),
+        "webp 无损": lambda im: save(im.convert("RGB"), "WEBP", lossless=True),
+        "webp q80": lambda im: save(im.convert("RGB"), "WEBP", quality=80, method=4),
+        "jpeg q80": lambda im: save(im.convert("RGB"), "JPEG", quality=80, optimize=True),
+    }
+
+
+def _time_ms(func: Callable[[], Any], repeat: int):
+    """多次执行取中位耗时，返回 (耗时, 最后一次结果)"""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    from ..render.encoder import ImageEncoder
+    
+    parser = argparse.ArgumentParser(description="LinBot 图片编码基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每种编码方式的重复次数")
+    args = parser.parse_args()
+    
+    samples = build_samples()
+    strategies = _strategies()
+    encoder = ImageEncoder(palette=True)
+    
+    for kind, image in samples.items():
+        print(f"\n🖼️ {kind}（{image.size[0]}x{image.size[1]}）")
+        for name, strategy in strategies.items():
+            ms, data = _time_ms(lambda: strategy(image), args.repeat)
+            print(f"   {name:<20} {ms:8.2f} ms  {len(data) / 1024:8.1f} KB")
+        
+        _time_ms(lambda: encoder.encode(image, kind, flat=kind == "ranking"), args.repeat)
+    
+    print("\n📊 共享编码器（默认设置，调色板只用于排行榜）：")
+    for kind, s in encoder.stats().items():
+        print(f"   {kind:<8} 平均 {s['avg_ms']:7.2f} ms  {s['avg_kb']:8.1f} KB  {s['formats']}")
+
+
+if __name__ == "__main__":
+    main()
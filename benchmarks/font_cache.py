@@ -0,0 +1,110 @@
+"""
+字体缓存基准
+对比旧方式（每次渲染都调用 ImageFont.truetype）与共享字体注册表的加载耗时和进程内存
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, Any
+
+
+# 一次请求中各渲染器需要的字号（与各渲染器保持一致）
+MONITOR_SIZES = [24, 16, 12]
+RANKING_AVATAR_SIZES = [25] * 10  # 每行一个头像占位符，共10行
+
+
+def _rss_bytes() -> int:
+    """当前进程常驻内存"""
+    import psutil
+    return psutil.Process().memory_info().rss
+
+
+def run_legacy(font_path: str, requests: int) -> Dict[str, Any]:
+    """旧方式：每次请求重新加载全部字体"""
+    from PIL import ImageFont
+    
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    keep = []
+    for _ in range(requests):
+        # 监控图片每次加载3个字号，排行榜每个头像加载1次
+        fonts = [ImageFont.truetype(font_path, size) for size in MONITOR_SIZES + RANKING_AVATAR_SIZES]
+        keep = fonts  # 仅保留最近一次请求的字体对象，与旧代码的生命周期一致
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": "legacy",
+        "requests": requests,
+        "total_ms": round(elapsed * 1000, 2),
+        "per_request_ms": round(elapsed * 1000 / requests, 3),
+        "rss_delta_kb": (_rss_bytes() - rss_before) // 1024,
+        "live_fonts": len(keep)
+    }
+
+
+def run_registry(font_path: str, requests: int) -> Dict[str, Any]:
+    """新方式：共享字体注册表"""
+    from ..render.fonts import FontRegistry
+    
+    registry = FontRegistry([font_path])
+    # 与旧方式一样在计时前导入 PIL 并确认字体文件可用
+    registry.font_path
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    for _ in range(requests):
+        for size in MONITOR_SIZES + RANKING_AVATAR_SIZES:
+            registry.get_font(size)
+    elapsed = time.perf_counter() - start
+    stats = registry.stats()
+    return {
+        "mode": "registry",
+        "requests": requests,
+        "total_ms": round(elapsed * 1000, 2),
+        "per_request_ms": round(elapsed * 1000 / requests, 3),
+        "rss_delta_kb": (_rss_bytes() - rss_before) // 1024,
+        "live_fonts": len(stats["cached_sizes"]),
+        "hits": stats["hits"],
+        "misses": stats["misses"]
+    }
+
+
+def main():
+    from ..render.fonts import DEFAULT_FONT_CANDIDATES
+    
+    parser = argparse.ArgumentParser(description="LinBot 字体缓存基准")
+    parser.add_argument("--font", default=DEFAULT_FONT_CANDIDATES[0], help="字体文件路径")
+    parser.add_argument("--requests", type=int, default=200, help="模拟的渲染请求数")
+    parser.add_argument("--mode", choices=["legacy", "registry"], help="内部使用：只运行单个模式")
+    args = parser.parse_args()
+    
+    if args.mode:
+        runner = run_legacy if args.mode == "legacy" else run_registry
+        print(json.dumps(runner(args.font, args.requests)))
+        return
+    
+    # 每种模式在独立子进程中运行，保证内存数据互不干扰
+    results = []
+    for mode in ("legacy", "registry"):
+        proc = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--mode", mode,
+             "--font", args.font, "--requests", str(args.requests)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"❌ {mode} 运行失败:\n{proc.stderr}")
+            return
+        results.append(json.loads(proc.stdout))
+    
+    for r in results:
+        print(f"{r['mode']:>8}: 总耗时 {r['total_ms']:>9.2f} ms | 单次请求 {r['per_request_ms']:>7.3f} ms | "
+              f"RSS增量 {r['rss_delta_kb']:>6} KB | 存活字体 {r['live_fonts']}")
+    
+    legacy, registry = results
+    if registry["total_ms"] > 0:
+        print(f"\n⚡ 加速比: {legacy['total_ms'] / registry['total_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
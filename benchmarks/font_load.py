@@ -0,0 +1,107 @@
+"""
+字体加载基准
+对比完整字体与子集字体的加载耗时、首次绘制耗时和进程内存
+子集字体不存在时会先在临时目录中构建一份
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any
+
+
+# 各渲染器使用的全部字号（帮助、排行榜、服务器监控、排行榜头像）
+RENDER_SIZES = [12, 14, 16, 18, 20, 24, 25, 28, 32]
+
+# 典型界面文本，用于触发字形加载
+SAMPLE_TEXT = "💰 金币排行榜 更新时间: 2025-01-01 12:00 第1名 连续签到7天 CPU使用率 内存信息 帮助 打工 银行 抢劫"
+
+
+def _rss_bytes() -> int:
+    """当前进程常驻内存"""
+    import psutil
+    return psutil.Process().memory_info().rss
+
+
+def run_single(font_path: str) -> Dict[str, Any]:
+    """加载全部字号并绘制一次样例文本"""
+    from PIL import Image, ImageDraw, ImageFont
+    
+    rss_before = _rss_bytes()
+    
+    start = time.perf_counter()
+    fonts = [ImageFont.truetype(font_path, size) for size in RENDER_SIZES]
+    load_seconds = time.perf_counter() - start
+    
+    image = Image.new('RGB', (1200, 60), 'white')
+    draw = ImageDraw.Draw(image)
+    start = time.perf_counter()
+    for font in fonts:
+        draw.text((0, 0), SAMPLE_TEXT, fill='black', font=font)
+    draw_seconds = time.perf_counter() - start
+    
+    return {
+        "font": font_path,
+        "file_kb": os.path.getsize(font_path) // 1024,
+        "load_ms": round(load_seconds * 1000, 2),
+        "first_draw_ms": round(draw_seconds * 1000, 2),
+        "rss_delta_kb": (_rss_bytes() - rss_before) // 1024
+    }
+
+
+def _measure(font_path: str) -> Dict[str, Any]:
+    """在独立子进程中测量，保证内存数据互不干扰"""
+    proc = subprocess.run(
+        [sys.executable, "-m", __spec__.name, "--single", font_path],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout)
+
+
+def main():
+    from ..render.fonts import DEFAULT_FONT_CANDIDATES, DEFAULT_SUBSET_PATH
+    from ..render.subset import build_subset, collect_ui_chars, common_chars
+    
+    parser = argparse.ArgumentParser(description="LinBot 字体加载基准")
+    parser.add_argument("--font", default=DEFAULT_FONT_CANDIDATES[0], help="完整字体路径")
+    parser.add_argument("--subset", default=DEFAULT_SUBSET_PATH, help="子集字体路径，不存在时临时构建")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最小值")
+    parser.add_argument("--single", help="内部使用：只测量单个字体文件")
+    args = parser.parse_args()
+    
+    if args.single:
+        print(json.dumps(run_single(args.single)))
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        subset_path = args.subset
+        if not os.path.exists(subset_path):
+            subset_path = os.path.join(tmp, "subset.ttf")
+            result = build_subset(args.font, subset_path, collect_ui_chars() | common_chars())
+            print(f"🔧 已临时构建子集字体：{result['chars']} 字，耗时 {result['seconds']} 秒")
+        
+        results = []
+        for label, path in (("完整字体", args.font), ("子集字体", subset_path)):
+            runs = [_measure(path) for _ in range(max(1, args.repeat))]
+            best = {key: min(r[key] for r in runs) for key in ("load_ms", "first_draw_ms", "rss_delta_kb")}
+            best.update(label=label, file_kb=runs[0]["file_kb"])
+            results.append(best)
+    
+    for r in results:
+        print(f"{r['label']}: 文件 {r['file_kb']:>6} KB | 加载 {r['load_ms']:>7.2f} ms | "
+              f"首次绘制 {r['first_draw_ms']:>7.2f} ms | RSS增量 {r['rss_delta_kb']:>6} KB")
+    
+    full, subset = results
+    if subset["load_ms"] > 0:
+        print(f"\n⚡ 加载加速比: {full['load_ms'] / subset['load_ms']:.1f}x，"
+              f"RSS 减少 {full['rss_delta_kb'] - subset['rss_delta_kb']} KB")
+
+
+if __name__ == "__main__":
+    main()
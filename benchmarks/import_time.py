@@ -0,0 +1,116 @@
+"""
+插件导入耗时基准
+使用 python -X importtime 在全新子进程中导入插件入口，统计总耗时和最慢的模块
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = os.path.basename(PLUGIN_DIR)
+
+
+def _run_importtime(code: str, cwd: str) -> subprocess.CompletedProcess:
+    """在全新解释器中执行代码并收集 -X importtime 输出"""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True
+    )
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出为模块列表"""
+    modules = []
+    for line in stderr.splitlines():
+        # 格式: import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_part, cumulative_part, name = line[len("import time:"):].split("|", 2)
+            self_us, cumulative_us = int(self_part), int(cumulative_part)
+        except ValueError:
+            continue
+        modules.append({
+            "self_us": self_us,
+            "cumulative_us": cumulative_us,
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2
+        })
+    return modules
+
+
+def measure_import(module: str, cwd: str, startup: frozenset = frozenset()) -> Dict[str, Any]:
+    """
+    在子进程中导入模块并解析 -X importtime 输出
+    
+    Args:
+        module: 要导入的模块名
+        cwd: 子进程工作目录（插件包所在的上级目录）
+        startup: 解释器启动阶段已导入的模块名，不计入插件耗时
+        
+    Returns:
+        包含总耗时（微秒）和各模块累计耗时的字典
+    """
+    proc = _run_importtime(f"import {module}", cwd)
+    modules = [m for m in _parse_importtime(proc.stderr) if m["name"] not in startup]
+    
+    # 顶层模块的累计时间之和即整体导入耗时
+    total_us = sum(m["cumulative_us"] for m in modules if m["depth"] == 0)
+    
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode != 0 and proc.stderr.strip() else "",
+        "total_us": total_us,
+        "modules": modules
+    }
+
+
+def format_report(results: List[Dict[str, Any]], top: int) -> str:
+    """格式化导入耗时报告"""
+    lines = []
+    for result in results:
+        if not result["ok"]:
+            lines.append(f"❌ {result['module']}: 导入失败 - {result['error']}")
+            continue
+        
+        lines.append(f"📦 {result['module']}: {result['total_us'] / 1000:.1f} ms")
+        slowest = sorted(result["modules"], key=lambda m: m["cumulative_us"], reverse=True)[:top]
+        for m in slowest:
+            lines.append(f"   {m['cumulative_us'] / 1000:8.1f} ms  {m['name']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinBot 插件导入耗时基准")
+    parser.add_argument("--module", action="append",
+                        help="要测量的模块（可多次指定），默认测量插件入口及各子模块")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最小值")
+    parser.add_argument("--top", type=int, default=10, help="显示最慢的模块数")
+    args = parser.parse_args()
+    
+    modules = args.module or [
+        f"{PACKAGE_NAME}.main",
+        f"{PACKAGE_NAME}.helps",
+        f"{PACKAGE_NAME}.server",
+        f"{PACKAGE_NAME}.game.phb",
+    ]
+    cwd = os.path.dirname(PLUGIN_DIR)
+    
+    startup = frozenset(m["name"] for m in _parse_importtime(_run_importtime("pass", cwd).stderr))
+    
+    results = []
+    for module in modules:
+        runs = [measure_import(module, cwd, startup) for _ in range(max(1, args.repeat))]
+        ok_runs = [r for r in runs if r["ok"]]
+        results.append(min(ok_runs, key=lambda r: r["total_us"]) if ok_runs else runs[0])
+    
+    print(format_report(results, args.top))
+
+
+if __name__ == "__main__":
+    main()
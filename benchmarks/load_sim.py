@@ -0,0 +1,417 @@
+"""
+群聊负载模拟器
+用伪造的 Context 和消息事件实例化 LinBotPlugin，按指令配比模拟大量用户并发发送
+签到/打工/银行/抢劫/排行榜/我的信息，逐级提高请求速率，统计吞吐量、延迟分位数、
+错误率、数据库锁冲突率和事件循环延迟，找出延迟开始失控的速率
+
+模拟用户都在同一个群中、以远超正常频率的速率发送指令，默认关闭指令限流和重复消息去重
+以测量处理能力；加 --guards 按插件默认设置开启，观察限流丢弃的请求数
+
+请求按泊松过程到达（开环），延迟从请求到达开始计算，包含排队等待的时间
+
+需要在已安装 AstrBot 的环境中运行（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.load_sim --db /tmp/linbot_100k.db --rates 20,50,100,200
+
+对比读连接池开启和关闭时只读指令的吞吐（--read-pool 0 为每次操作打开新连接）：
+python -m astrbot_plugin_linbot.benchmarks.load_sim --db /tmp/linbot_100k.db --read-pool 8 --threads 8 \
+    --mix 签到信息=20,我的信息=20,排行榜=20,打工统计=20,抢劫统计=10,打工=10 --rates 200,400,800
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# 指令 -> 处理函数
+HANDLERS = {
+    "签到": "checkin_command",
+    "打工": "work_command",
+    "银行": "bank_command",
+    "抢劫": "robbery_command",
+    "排行榜": "ranking_command",
+    "我的信息": "user_info_command",
+    "签到信息": "checkin_info_command",
+    "打工统计": "work_stats_command",
+    "抢劫统计": "robbery_command"
+}
+
+# 默认指令配比
+DEFAULT_MIX = {
+    "签到": 15,
+    "打工": 25,
+    "银行": 20,
+    "抢劫": 10,
+    "排行榜": 10,
+    "我的信息": 20
+}
+
+# 回复中出现这些文本视为数据库锁冲突或处理失败
+LOCK_MARKERS = ("database is locked", "database table is locked")
+ERROR_MARKERS = ("暂时不可用", "请稍后再试")
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+class FakeContext:
+    """最小化的 AstrBot Context"""
+    
+    def __init__(self, prefix: str = "/"):
+        self._config = {"wake_prefix": [prefix]}
+    
+    def get_config(self) -> Dict[str, Any]:
+        return self._config
+    
+    def get_all_stars(self) -> list:
+        return []
+
+
+class FakeEvent:
+    """最小化的 AstrMessageEvent，回复以 (类型, 内容) 元组返回"""
+    
+    def __init__(self, message_str: str, user_id: str, username: str, group_id: str = "load_sim"):
+        self.message_str = message_str
+        self._user_id = user_id
+        self._username = username
+        self._group_id = group_id
+    
+    def get_sender_id(self) -> str:
+        return self._user_id
+    
+    def get_sender_name(self) -> str:
+        return self._username
+    
+    def get_group_id(self) -> str:
+        return self._group_id
+    
+    def get_platform_name(self) -> str:
+        return "load_sim"
+    
+    def plain_result(self, text: str) -> Tuple[str, Any]:
+        return ("plain", text)
+    
+    def image_result(self, path: str) -> Tuple[str, Any]:
+        return ("image", path)
+    
+    def chain_result(self, chain: list) -> Tuple[str, Any]:
+        return ("chain", chain)
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析指令配比，如 "签到=1,打工=2" """
+    mix = {}
+    for item in text.split(","):
+        command, _, weight = item.partition("=")
+        command = command.strip()
+        if command not in HANDLERS:
+            raise ValueError(f"未知指令: {command}，可选: {'/'.join(HANDLERS)}")
+        mix[command] = float(weight or 1)
+    return mix
+
+
+class _Workload:
+    """按配比生成指令文本"""
+    
+    def __init__(self, users: List[Tuple[str, str]], mix: Dict[str, float], seed: int):
+        self.users = users
+        self.rng = random.Random(seed)
+        self._commands = list(mix)
+        self._weights = [mix[c] for c in self._commands]
+    
+    def next(self) -> Tuple[str, str, Tuple[str, str]]:
+        """
+        生成一条指令
+        
+        Returns:
+            (指令, 消息文本, (用户ID, 用户名))
+        """
+        rng = self.rng
+        command = rng.choices(self._commands, self._weights)[0]
+        user = rng.choice(self.users)
+        if command == "打工":
+            text = "打工 " + rng.choice(["搬砖", "送外卖", "便利店员"])
+        elif command == "银行":
+            text = rng.choice(["银行", f"银行 存款 {rng.randint(10, 200)}", f"银行 取款 {rng.randint(10, 100)}"])
+        elif command == "抢劫":
+            text = ("抢劫 " + rng.choice(self.users)[1]) if rng.random() < 0.8 else "抢劫 目标"
+        elif command == "排行榜":
+            text = rng.choice(["排行榜", "排行榜 资产", "排行榜 等级"])
+        elif command == "抢劫统计":
+            text = "抢劫"
+        else:
+            text = command
+        return command, text, user
+
+
+class _StepStats:
+    """单个速率档位的统计"""
+    
+    def __init__(self):
+        from ..perf import Histogram
+        
+        self.latency = Histogram()
+        self.commands = {command: Histogram() for command in HANDLERS}
+        self.completed = 0
+        self.errors = 0
+        self.locks = 0
+        self.shed = 0
+    
+    def record(self, command: str, latency_ms: float, outcome: str) -> None:
+        self.latency.record(latency_ms)
+        self.commands[command].record(latency_ms)
+        self.completed += 1
+        if outcome == "lock":
+            self.locks += 1
+        elif outcome == "error":
+            self.errors += 1
+
+
+def _classify(result: Any) -> str:
+    """根据回复判断处理结果"""
+    if isinstance(result, tuple) and result[0] == "plain":
+        text = str(result[1])
+        if any(marker in text for marker in LOCK_MARKERS):
+            return "lock"
+        if any(marker in text for marker in ERROR_MARKERS):
+            return "error"
+    return "ok"
+
+
+async def _send(plugin: Any, command: str, text: str, user: Tuple[str, str],
+                arrival: float, stats: _StepStats) -> None:
+    """发送一条指令并等待处理完成"""
+    loop = asyncio.get_running_loop()
+    outcome = "ok"
+    try:
+        async for result in getattr(plugin, HANDLERS[command])(FakeEvent(text, *user)):
+            result_outcome = _classify(result)
+            if result_outcome != "ok":
+                outcome = result_outcome
+    except Exception:
+        outcome = "error"
+    stats.record(command, (loop.time() - arrival) * 1000, outcome)
+
+
+async def run_step(plugin: Any, workload: _Workload, rate: float, seconds: float,
+                   max_inflight: int) -> Dict[str, Any]:
+    """
+    以固定速率运行一个档位
+    
+    Args:
+        plugin: LinBotPlugin 实例
+        workload: 指令生成器
+        rate: 每秒请求数
+        seconds: 持续时间
+        max_inflight: 同时处理中的请求上限，超出的请求直接丢弃
+    
+    Returns:
+        本档位统计
+    """
+    from ..guard import get_rate_limiter
+    from ..perf import get_metrics
+    
+    loop = asyncio.get_running_loop()
+    metrics = get_metrics()
+    metrics.clear()
+    limiter = get_rate_limiter()
+    limiter.clear()
+    
+    stats = _StepStats()
+    inflight = set()
+    start = loop.time()
+    arrival = start
+    while True:
+        arrival += workload.rng.expovariate(rate)
+        if arrival >= start + seconds:
+            break
+        # 落后于计划时也让出一次事件循环，避免只创建任务不执行
+        await asyncio.sleep(max(0.0, arrival - loop.time()))
+        
+        if len(inflight) >= max_inflight:
+            stats.shed += 1
+            continue
+        command, text, user = workload.next()
+        task = asyncio.create_task(_send(plugin, command, text, user, arrival, stats))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    
+    if inflight:
+        await asyncio.gather(*inflight)
+    elapsed = loop.time() - start
+    
+    latency = stats.latency.snapshot()
+    completed = max(1, stats.completed)
+    return dict(
+        latency,
+        rate=rate,
+        seconds=round(elapsed, 2),
+        throughput=round(stats.completed / elapsed, 1) if elapsed > 0 else 0.0,
+        error_pct=round(stats.errors * 100 / completed, 2),
+        lock_pct=round(stats.locks * 100 / completed, 2),
+        shed=stats.shed,
+        limited=sum(c["limited"] for c in limiter.snapshot()["classes"].values()),
+        loop_lag=metrics.loop_lag.snapshot(),
+        commands={command: h.snapshot() for command, h in stats.commands.items() if h.count},
+        phases=metrics.snapshot()["commands"]
+    )
+
+
+def _load_users(db_path: str, count: int, seed: int) -> List[Tuple[str, str]]:
+    """从数据库中随机挑选模拟用户"""
+    conn = sqlite3.connect(db_path)
+    try:
+        users = conn.execute("SELECT user_id, username FROM users").fetchall()
+    finally:
+        conn.close()
+    if len(users) > count:
+        users = random.Random(seed).sample(users, count)
+    return users
+
+
+def _plugin_class(db_path: str) -> type:
+    """
+    使用测试副本的插件类
+    插件启动时会在数据库上建立统计表和索引，并启动定时汇总和定时备份，
+    这些都要在构造前指向副本，插件自带的 game/user.db 和数据目录不会被打开
+    """
+    from ..main import LinBotPlugin
+    
+    class SimulatedPlugin(LinBotPlugin):
+        DATA_DIR = os.path.join(os.path.dirname(db_path), "plugin_data")
+        GAME_DB = db_path
+    
+    return SimulatedPlugin
+
+
+def _print_step(r: Dict[str, Any], slo_ms: float) -> None:
+    lag = r["loop_lag"]
+    ok = "✅" if r["throughput"] >= r["rate"] * 0.9 and r["p95_ms"] <= slo_ms else "❌"
+    print(f"{ok} {r['rate']:>7.1f}/s | 吞吐 {r['throughput']:>7.1f}/s | p50 {r['p50_ms']:>8.1f} | "
+          f"p95 {r['p95_ms']:>8.1f} | p99 {r['p99_ms']:>8.1f} ms | 错误 {r['error_pct']:>5.2f}% | "
+          f"锁冲突 {r['lock_pct']:>5.2f}% | 丢弃 {r['shed']:>4} | 限流 {r.get('limited', 0):>5} | 循环延迟 p99 {lag['p99_ms']:.1f} / max {lag['max_ms']:.1f} ms")
+
+
+def _print_commands(r: Dict[str, Any]) -> None:
+    print(f"\n📋 各指令耗时（速率 {r['rate']}/s，毫秒）")
+    for command, latency in sorted(r["commands"].items()):
+        phases = r["phases"].get(command, {})
+        blocking = phases.get("blocking", {}).get("p95_ms", 0)
+        db = phases.get("db", {}).get("p95_ms", 0)
+        render = phases.get("render", {}).get("p95_ms", 0)
+        print(f"  {command:<6} {latency['count']:>6}次 | p50 {latency['p50_ms']:>8.1f} | p95 {latency['p95_ms']:>8.1f} | "
+              f"阻塞p95 {blocking:>7.1f} | 数据库p95 {db:>7.1f} | 渲染p95 {render:>7.1f}")
+
+
+async def simulate(db_path: str, rates: List[float], seconds: float, users: int, mix: Dict[str, float],
+                   max_inflight: int, seed: int, lag_interval: float, slo_ms: float,
+                   config: Optional[Dict[str, Any]] = None, threads: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    逐级运行各速率档位
+    
+    Args:
+        threads: 执行数据库操作的线程数，为空时使用 asyncio 默认线程池
+    
+    Returns:
+        {"<速率>/s": 统计}
+    """
+    from ..perf import get_loop_probe
+    
+    if threads:
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(threads))
+    
+    plugin = _plugin_class(db_path)(FakeContext(), config or {})
+    # 统计表、索引和目标表在后台准备，准备完成后再施加负载
+    await asyncio.to_thread(plugin.database_ready.wait)
+    
+    probe = get_loop_probe()
+    probe.interval = lag_interval
+    probe.ensure_started()
+    
+    workload = _Workload(_load_users(db_path, users, seed), mix, seed)
+    results = {}
+    try:
+        for rate in rates:
+            r = await run_step(plugin, workload, rate, seconds, max_inflight)
+            results[f"{rate:g}/s"] = r
+            _print_step(r, slo_ms)
+    finally:
+        probe.stop()
+        await plugin.terminate()
+    
+    if results:
+        _print_commands(list(results.values())[-1])
+    
+    sustained = [r["rate"] for r in results.values()
+                 if r["throughput"] >= r["rate"] * 0.9 and r["p95_ms"] <= slo_ms and r["lock_pct"] < 1]
+    print(f"\n🚀 满足 p95 ≤ {slo_ms:g}ms 的最高速率：{max(sustained):g}/s" if sustained
+          else f"\n⚠️ 所有档位均未满足 p95 ≤ {slo_ms:g}ms")
+    return results
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    from .populate import populate
+    
+    parser = argparse.ArgumentParser(description="LinBot 群聊负载模拟器")
+    parser.add_argument("--db", help="合成用户数据库（使用副本，不会被修改），不指定时临时生成")
+    parser.add_argument("--population", type=int, default=10000, help="临时生成数据库的用户数")
+    parser.add_argument("--users", type=int, default=2000, help="参与模拟的用户数")
+    parser.add_argument("--rates", default="10,25,50,100,200", help="逐级运行的每秒请求数，逗号分隔")
+    parser.add_argument("--seconds", type=float, default=10, help="每个档位的持续时间（秒）")
+    parser.add_argument("--mix", help="指令配比，如 签到=15,打工=25,银行=20,抢劫=10,排行榜=10,我的信息=20")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="同时处理中的请求上限")
+    parser.add_argument("--slo-ms", type=float, default=500, help="判定可持续的 p95 延迟上限（毫秒）")
+    parser.add_argument("--lag-interval", type=float, default=0.05, help="事件循环延迟探针间隔（秒）")
+    parser.add_argument("--guards", action="store_true", help="开启指令限流和重复消息去重（插件默认设置）")
+    parser.add_argument("--read-pool", type=int, help="每个分片的读连接池大小（0 为不使用连接池），不指定时按插件默认设置")
+    parser.add_argument("--threads", type=int, help="执行数据库操作的线程数，不指定时使用 asyncio 默认线程池")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    if importlib.util.find_spec("astrbot") is None:
+        parser.error("负载模拟需要驱动真实的插件处理函数，请在已安装 AstrBot 的环境中运行")
+    
+    rates = [float(rate) for rate in args.rates.split(",") if rate.strip()]
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    settings = {} if args.guards else {"rate_limit_enabled": False, "duplicate_window_seconds": 0}
+    if args.read_pool is not None:
+        settings["read_pool_size"] = args.read_pool
+    config = {"performance_settings": settings} if settings else None
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "user.db")
+        if args.db:
+            if not os.path.exists(args.db):
+                parser.error(f"{args.db} 不存在，请先运行 benchmarks.populate 生成")
+            shutil.copyfile(args.db, db_path)
+        else:
+            result = populate(db_path, args.population, seed=args.seed)
+            print(f"🔧 已临时生成 {args.population} 用户的数据库，耗时 {result['seconds']} 秒")
+        print(f"👥 模拟用户 {args.users} 人，配比 {mix}，每档 {args.seconds:g} 秒\n")
+        
+        results = asyncio.run(simulate(db_path, rates, args.seconds, args.users, mix, args.max_inflight,
+                                       args.seed, args.lag_interval, args.slo_ms, config, args.threads))
+    
+    params = {"db": os.path.basename(args.db) if args.db else f"临时生成 {args.population} 用户",
+              "users": args.users, "seconds": args.seconds, "mix": mix, "seed": args.seed,
+              "guards": args.guards, "read_pool": args.read_pool, "threads": args.threads}
+    if args.save:
+        save_baseline(args.save, "load_sim", results, params)
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+
+
+if __name__ == "__main__":
+    main()
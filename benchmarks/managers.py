@@ -0,0 +1,224 @@
+"""
+游戏管理器基准
+在合成用户数据库的副本上逐个调用六个管理器的全部公开方法，统计每次调用的耗时分布
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.populate --users 100000 --output /tmp/linbot_100k.db
+python -m astrbot_plugin_linbot.benchmarks.managers --db /tmp/linbot_100k.db --save /tmp/managers.json
+python -m astrbot_plugin_linbot.benchmarks.managers --db /tmp/linbot_100k.db --compare /tmp/managers.json
+
+同一组用例也以 pytest-benchmark 用例的形式提供（tests/test_manager_benchmarks.py），
+可以用 --benchmark-autosave / --benchmark-compare 保存和对比基线
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Dict, Any, List, Callable, Tuple
+
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p50_ms", "p95_ms", "mean_ms"]
+
+# 全表操作的迭代次数上限
+FULL_TABLE_ITERATIONS = 3
+
+# 图片生成的迭代次数上限
+RENDER_ITERATIONS = 20
+
+
+class _Users:
+    """从数据库中随机挑选用户"""
+    
+    def __init__(self, db_path: str, seed: int):
+        conn = sqlite3.connect(db_path)
+        try:
+            self._users = conn.execute("SELECT user_id, username FROM users").fetchall()
+        finally:
+            conn.close()
+        if len(self._users) < 2:
+            raise ValueError("数据库中至少需要2个用户")
+        self.rng = random.Random(seed)
+    
+    def one(self) -> Tuple[str, str]:
+        return self.rng.choice(self._users)
+    
+    def two(self) -> Tuple[Tuple[str, str], Tuple[str, str]]:
+        first, second = self.rng.sample(self._users, 2)
+        return first, second
+
+
+def build_cases(db_path: str, plugin_dir: str, users: _Users) -> List[Tuple[str, Callable, int]]:
+    """
+    构造基准用例
+    
+    Returns:
+        [(用例名, 无参调用, 迭代次数上限)]，迭代次数上限为 0 表示不限
+    """
+    from ..game.bank import BankManager
+    from ..game.gzrw import WorkManager
+    from ..game.mybag import UserInfoManager
+    from ..game.phb import RankingManager
+    from ..game.qiandao import CheckinManager
+    from ..game.qiangjie import RobberyManager
+    
+    checkin = CheckinManager(db_path)
+    work = WorkManager(db_path, {})
+    bank = BankManager(db_path, {})
+    robbery = RobberyManager(db_path, {})
+    ranking = RankingManager(db_path, plugin_dir)
+    user_info = UserInfoManager(db_path)
+    
+    def with_user(method: Callable, *extra: Any, name: bool = True) -> Callable:
+        def call():
+            user_id, username = users.one()
+            return method(user_id, username, *extra) if name else method(user_id, *extra)
+        return call
+    
+    def transfer():
+        (from_id, from_name), (to_id, to_name) = users.two()
+        return bank.transfer(from_id, to_id, from_name, to_name, 100)
+    
+    def rob():
+        (robber_id, robber_name), (victim_id, victim_name) = users.two()
+        return robbery.rob_user(robber_id, robber_name, victim_id, victim_name)
+    
+    money_ranking = ranking.get_ranking_data("money", 10)
+    
+    cases = [
+        ("CheckinManager.daily_checkin", with_user(checkin.daily_checkin), 0),
+        ("CheckinManager.get_checkin_info", with_user(checkin.get_checkin_info), 0),
+        ("CheckinManager.get_checkin_ranking", lambda: checkin.get_checkin_ranking(10), 0),
+        ("WorkManager.get_available_jobs", with_user(work.get_available_jobs), 0),
+        ("WorkManager.work", with_user(work.work, "搬砖"), 0),
+        ("WorkManager.get_work_statistics", with_user(work.get_work_statistics, name=False), 0),
+        ("BankManager.deposit", with_user(bank.deposit, 100), 0),
+        ("BankManager.withdraw", with_user(bank.withdraw, 100), 0),
+        ("BankManager.get_bank_info", with_user(bank.get_bank_info), 0),
+        ("BankManager.transfer", transfer, 0),
+        ("RobberyManager.rob_user", rob, 0),
+        ("RobberyManager.get_robbery_stats", with_user(robbery.get_robbery_stats, name=False), 0),
+        ("RobberyManager.get_robbery_targets", with_user(robbery.get_robbery_targets, 10, name=False), 0),
+    ]
+    for ranking_type in ranking.ranking_types:
+        cases.append((f"RankingManager.get_ranking_data[{ranking_type}]",
+                      lambda t=ranking_type: ranking.get_ranking_data(t, 10), 0))
+    cases += [
+        ("RankingManager.get_user_ranking_info", with_user(ranking.get_user_ranking_info, "money", name=False), 0),
+        ("RankingManager.generate_ranking_image", lambda: ranking.generate_ranking_image(money_ranking),
+         RENDER_ITERATIONS),
+        ("UserInfoManager.get_user_basic_info", with_user(user_info.get_user_basic_info), 0),
+        ("UserInfoManager.get_user_statistics", with_user(user_info.get_user_statistics, name=False), 0),
+        ("UserInfoManager.get_user_ranking", with_user(user_info.get_user_ranking, name=False), 0),
+        ("UserInfoManager.get_recent_activities", with_user(user_info.get_recent_activities, name=False), 0),
+        ("UserInfoManager.get_comprehensive_info", with_user(user_info.get_comprehensive_info), 0),
+        # 全表更新放在最后，避免影响其他用例的数据
+        ("BankManager.apply_daily_interest", bank.apply_daily_interest, FULL_TABLE_ITERATIONS),
+    ]
+    return cases
+
+
+def run_case(call: Callable, iterations: int, warmup: int) -> Dict[str, Any]:
+    """
+    执行单个用例
+    
+    Returns:
+        耗时统计（毫秒）、吞吐量和被业务规则拒绝（冷却、余额不足等）的次数
+    """
+    from ..perf import Histogram
+    
+    for _ in range(warmup):
+        call()
+    
+    histogram = Histogram()
+    rejected = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        result = call()
+        histogram.record((time.perf_counter() - call_start) * 1000)
+        if isinstance(result, dict) and ("error" in result or result.get("success") is False):
+            rejected += 1
+    total = time.perf_counter() - start
+    
+    stats = histogram.snapshot()
+    stats["ops_per_sec"] = round(iterations / total, 1) if total > 0 else 0.0
+    stats["rejected"] = rejected
+    return stats
+
+
+def run(db_path: str, iterations: int, warmup: int, seed: int, only: str = "") -> Dict[str, Dict[str, Any]]:
+    """
+    在数据库副本上执行全部用例
+    
+    Args:
+        db_path: 合成用户数据库（不会被修改）
+        iterations: 每个用例的迭代次数
+        warmup: 预热次数
+        seed: 挑选用户的随机种子
+        only: 只执行名称包含该字符串的用例
+    
+    Returns:
+        {用例名: 统计}
+    """
+    plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work_db = os.path.join(tmp, "user.db")
+        shutil.copyfile(db_path, work_db)
+        
+        users = _Users(work_db, seed)
+        for name, call, limit in build_cases(work_db, plugin_dir, users):
+            if only and only not in name:
+                continue
+            count = min(iterations, limit) if limit else iterations
+            results[name] = run_case(call, count, min(warmup, count))
+            r = results[name]
+            print(f"{name:<46} {r['count']:>5}次 | p50 {r['p50_ms']:>8.3f} | p95 {r['p95_ms']:>8.3f} | "
+                  f"max {r['max_ms']:>8.3f} ms | {r['ops_per_sec']:>8.1f} ops/s | 拒绝 {r['rejected']}")
+    return results
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    from .populate import populate
+    
+    parser = argparse.ArgumentParser(description="LinBot 游戏管理器基准")
+    parser.add_argument("--db", help="合成用户数据库，不指定时临时生成")
+    parser.add_argument("--users", type=int, default=10000, help="临时生成数据库的用户数")
+    parser.add_argument("--iterations", type=int, default=200, help="每个用例的迭代次数")
+    parser.add_argument("--warmup", type=int, default=5, help="预热次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--only", default="", help="只执行名称包含该字符串的用例")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "population.db")
+            result = populate(db_path, args.users, seed=args.seed)
+            print(f"🔧 已临时生成 {args.users} 用户的数据库，耗时 {result['seconds']} 秒\n")
+        elif not os.path.exists(db_path):
+            parser.error(f"{db_path} 不存在，请先运行 benchmarks.populate 生成")
+        
+        results = run(db_path, args.iterations, args.warmup, args.seed, args.only)
+    
+    params = {"db": os.path.basename(args.db) if args.db else f"临时生成 {args.users} 用户",
+              "iterations": args.iterations, "seed": args.seed}
+    if args.save:
+        save_baseline(args.save, "managers", results, params)
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+服务器监控图片延迟基准
+模拟 /服务器 指令的完整流程：采集系统信息 -> 绘制 -> 编码，
+对比每次从零绘制（清空模板缓存）与复用静态层模板的各阶段耗时
+"""
+
+import argparse
+import statistics
+import time
+from typing import Dict, Any, List
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """计算百分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(requests: int, collect_runs: int) -> Dict[str, Any]:
+    """
+    执行基准
+    
+    Args:
+        requests: 绘制请求数
+        collect_runs: 采集系统信息的次数（每次包含1秒CPU采样）
+        
+    Returns:
+        各阶段耗时（毫秒）
+    """
+    from ..render.encoder import get_encoder
+    from ..server.monitor import ServerMonitor
+    
+    monitor = ServerMonitor()
+    
+    collect_ms = []
+    for _ in range(max(1, collect_runs)):
+        start = time.perf_counter()
+        info = monitor.get_system_info()
+        collect_ms.append((time.perf_counter() - start) * 1000)
+    
+    # 预热字体缓存，只比较绘制本身
+    monitor.render_monitor_image(info)
+    
+    scratch_ms, template_ms, encode_ms = [], [], []
+    for _ in range(requests):
+        # 清空模板缓存，等同于每次从零绘制整张图片
+        monitor._templates.clear()
+        start = time.perf_counter()
+        monitor.render_monitor_image(info)
+        scratch_ms.append((time.perf_counter() - start) * 1000)
+    
+    for _ in range(requests):
+        start = time.perf_counter()
+        img = monitor.render_monitor_image(info)
+        template_ms.append((time.perf_counter() - start) * 1000)
+        
+        start = time.perf_counter()
+        get_encoder().encode(img, "monitor")
+        encode_ms.append((time.perf_counter() - start) * 1000)
+    
+    return {
+        "collect": statistics.median(collect_ms),
+        "scratch_p50": statistics.median(scratch_ms),
+        "scratch_p95": _percentile(scratch_ms, 95),
+        "template_p50": statistics.median(template_ms),
+        "template_p95": _percentile(template_ms, 95),
+        "encode_p50": statistics.median(encode_ms),
+        "encode_p95": _percentile(encode_ms, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinBot 服务器监控图片延迟基准")
+    parser.add_argument("--requests", type=int, default=50, help="绘制请求数")
+    parser.add_argument("--collect-runs", type=int, default=1, help="采集系统信息的次数")
+    args = parser.parse_args()
+    
+    r = run(args.requests, args.collect_runs)
+    
+    print(f"📊 /服务器 图片延迟（{args.requests} 次绘制）")
+    print(f"• 采集系统信息：{r['collect']:8.1f} ms")
+    print(f"• 绘制（从零绘制）：p50 {r['scratch_p50']:.2f} ms | p95 {r['scratch_p95']:.2f} ms")
+    print(f"• 绘制（复用模板）：p50 {r['template_p50']:.2f} ms | p95 {r['template_p95']:.2f} ms")
+    print(f"• 编码：p50 {r['encode_p50']:.2f} ms | p95 {r['encode_p95']:.2f} ms")
+    print(f"• 端到端：从零绘制 {r['collect'] + r['scratch_p50'] + r['encode_p50']:.1f} ms | "
+          f"复用模板 {r['collect'] + r['template_p50'] + r['encode_p50']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+合成用户数据库生成器
+按给定用户数生成结构与线上一致的 user.db，并按用户活跃度生成成比例的
+打工、银行、签到、抢劫历史记录，作为各项性能改动的固定基线数据
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.populate --users 100000 --output /tmp/linbot_100k.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional, List
+
+
+# 每个用户的平均历史记录数，实际数量按用户活跃度浮动
+DEFAULT_HISTORY = {
+    "work": 20,
+    "checkin": 12,
+    "bank": 6,
+    "robbery": 3
+}
+
+MAX_USERS = 1_000_000
+
+# 用户ID起始值（模拟QQ号）
+USER_ID_BASE = 10_000_000
+
+_SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+_GIVEN = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华玉萍红娥玲芬燕彬斌宇浩凯健俊帆帅旭宁龙林欣怡佳琪梓涵子轩晨阳雨萱一诺"
+_NICKNAMES = ["Alice", "Bob", "小明", "阿强", "喵喵", "Neko", "Kevin", "🐱咪咪", "夜猫子", "Lucky"]
+
+
+def user_id_for(index: int) -> str:
+    """第 index 个合成用户的ID"""
+    return str(USER_ID_BASE + index)
+
+
+def _username(rng: random.Random) -> str:
+    """随机用户名（中文姓名为主，少量英文和表情昵称）"""
+    if rng.random() < 0.1:
+        return f"{rng.choice(_NICKNAMES)}{rng.randint(1, 9999)}"
+    return rng.choice(_SURNAMES) + "".join(rng.choice(_GIVEN) for _ in range(rng.randint(1, 2)))
+
+
+def _timestamp(day: date, rng: random.Random) -> str:
+    """某天内的随机时间（与 CURRENT_TIMESTAMP 格式一致）"""
+    moment = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(0, 86399))
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class _UserGenerator:
+    """生成单个用户的主表行和历史记录"""
+    
+    def __init__(self, users: int, days: int, history: Dict[str, float], seed: int):
+        from ..game.gzrw.work_manager import WorkManager
+        from ..game.qiandao.checkin_manager import CheckinManager
+        from ..game.qiangjie.robbery_manager import RobberyManager
+        
+        # 复用各管理器的配置，保证工作、奖励、抢劫金额与线上规则一致
+        self._work = WorkManager(":memory:")
+        self._checkin = CheckinManager(":memory:")
+        self._robbery = RobberyManager(":memory:")
+        
+        self.users = users
+        self.days = days
+        self.history = history
+        self.rng = random.Random(seed)
+        self.today = date.today()
+    
+    def _count(self, table: str, activity: float) -> int:
+        """按活跃度计算某类记录数"""
+        mean = self.history.get(table, 0) * activity
+        return int(mean + self.rng.random())
+    
+    def generate(self, index: int, rows: Dict[str, List[tuple]]) -> None:
+        """
+        生成一个用户，追加到 rows 中
+        
+        Args:
+            index: 用户序号
+            rows: 各表待插入的行
+        """
+        rng = self.rng
+        user_id = user_id_for(index)
+        # 活跃度呈长尾分布（均值约为1）：大部分用户偶尔玩，少数用户非常活跃
+        activity = min((rng.paretovariate(1.5) - 1) / 2, 8.0)
+        
+        first_day = self.today - timedelta(days=self.days)
+        
+        # 签到：随机挑选不重复的日期，连续天数按日期顺序计算
+        checkin_days = sorted(rng.sample(range(self.days), min(self.days, self._count("checkin", activity))))
+        streak = 0
+        previous = None
+        last_checkin = None
+        earned = 0
+        for offset in checkin_days:
+            streak = streak + 1 if previous is not None and offset == previous + 1 else 1
+            previous = offset
+            day = first_day + timedelta(days=offset)
+            bonus = max((b for d, b in self._checkin.consecutive_bonus.items() if streak >= d), default=0)
+            reward = self._checkin.base_reward + bonus + rng.randint(*self._checkin.random_bonus_range)
+            earned += reward
+            last_checkin = day.isoformat()
+            rows["checkin"].append((user_id, last_checkin, reward, streak, _timestamp(day, rng)))
+        # 最后一次签到不是昨天时连续签到已中断
+        if previous is None or previous < self.days - 1:
+            streak = 0
+        
+        # 打工：按经验逐步解锁更高等级的工作
+        exp = 0
+        last_work_time = None
+        work_times = sorted(_timestamp(first_day + timedelta(days=rng.randrange(self.days)), rng)
+                            for _ in range(self._count("work", activity)))
+        for work_time in work_times:
+            level = self._work._calculate_level(exp)
+            jobs = [(name, job) for name, job in self._work.jobs.items() if job["level_required"] <= level]
+            name, job = rng.choice(jobs)
+            base_salary = rng.randint(*job["salary_range"])
+            bonus = rng.randint(0, base_salary // 5)
+            earned += base_salary + bonus
+            exp += job["exp_reward"]
+            last_work_time = work_time
+            rows["work"].append((user_id, name, base_salary, bonus, base_salary + bonus, work_time))
+        
+        # 银行：存取款按时间顺序串联余额
+        bank_money = 0
+        bank_times = sorted(_timestamp(first_day + timedelta(days=rng.randrange(self.days)), rng)
+                            for _ in range(self._count("bank", activity)))
+        for created_at in bank_times:
+            if bank_money > 0 and rng.random() < 0.35:
+                amount = rng.randint(1, bank_money)
+                rows["bank"].append((user_id, "withdraw", amount, bank_money, bank_money - amount, created_at))
+                bank_money -= amount
+            else:
+                amount = rng.randint(10, max(10, earned // 3 or 10))
+                rows["bank"].append((user_id, "deposit", amount, bank_money, bank_money + amount, created_at))
+                bank_money += amount
+        
+        # 抢劫：随机挑选其他用户作为目标
+        for _ in range(self._count("robbery", activity) if self.users > 1 else 0):
+            victim = rng.randrange(self.users - 1)
+            victim = victim + 1 if victim >= index else victim
+            day = first_day + timedelta(days=rng.randrange(self.days))
+            if rng.random() < self._robbery.success_rate:
+                amount = rng.randint(self._robbery.min_amount, self._robbery.max_amount)
+                rows["robbery"].append((user_id, user_id_for(victim), amount, True,
+                                        f"成功抢劫{amount}金币", _timestamp(day, rng)))
+            else:
+                amount = self._robbery.failure_penalty
+                rows["robbery"].append((user_id, user_id_for(victim), amount, False,
+                                        f"抢劫失败，被扣除{amount}金币", _timestamp(day, rng)))
+        
+        money = max(0, int(earned * rng.uniform(0.05, 0.6)) - bank_money // 2)
+        created_at = _timestamp(first_day, rng)
+        rows["users"].append((
+            user_id, _username(rng), money, bank_money, earned,
+            self._work._calculate_level(exp), exp,
+            last_checkin, streak, len(checkin_days),
+            last_work_time, created_at, created_at
+        ))
+
+
+_INSERTS = {
+    "users": '''
+        INSERT INTO users (user_id, username, money, bank_money, total_earned, level, exp,
+                           last_checkin, checkin_streak, total_checkin, last_work_time,
+                           created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    "work": '''
+        INSERT INTO work_records (user_id, work_type, base_salary, bonus, total_earned, work_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "checkin": '''
+        INSERT INTO checkin_records (user_id, checkin_date, reward_money, consecutive_days, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    "bank": '''
+        INSERT INTO bank_transactions (user_id, transaction_type, amount, balance_before, balance_after, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "robbery": '''
+        INSERT INTO robbery_records (robber_id, victim_id, amount, success, result_message, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+}
+
+
+def populate(db_path: str, users: int, days: int = 60, history: Optional[Dict[str, float]] = None,
+             seed: int = 42, batch: int = 5000, progress: bool = False) -> Dict[str, Any]:
+    """
+    生成合成用户数据库
+    
+    Args:
+        db_path: 输出文件路径（不能已存在）
+        users: 用户数
+        days: 历史记录覆盖的天数（截止到昨天）
+        history: 每用户各类记录的平均数量，默认 DEFAULT_HISTORY
+        seed: 随机种子，相同参数生成相同的数据
+        batch: 每批插入的用户数
+        progress: 是否输出进度
+    
+    Returns:
+        各表行数和耗时
+    """
+    from ..game.activity import ensure_activity_indexes
+    from ..game.init_db import init_database
+    from ..game.qiangjie.targets import ensure_rob_targets
+    from ..game.rollup import ensure_rollup_tables
+    from ..game.stats import rebuild_user_stats
+    from ..game.user_search import ensure_user_search
+    
+    if not 1 <= users <= MAX_USERS:
+        raise ValueError(f"用户数需在 1-{MAX_USERS} 之间")
+    if os.path.exists(db_path):
+        raise FileExistsError(f"文件已存在: {db_path}")
+    
+    start = time.perf_counter()
+    init_database(db_path, verbose=False)
+    
+    generator = _UserGenerator(users, max(1, days), dict(DEFAULT_HISTORY, **(history or {})), seed)
+    counts = {table: 0 for table in _INSERTS}
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_rollup_tables(conn)
+        
+        # 生成期间关闭日志和同步，完成后恢复默认
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        
+        for batch_start in range(0, users, batch):
+            rows = {table: [] for table in _INSERTS}
+            for index in range(batch_start, min(users, batch_start + batch)):
+                generator.generate(index, rows)
+            
+            for table, sql in _INSERTS.items():
+                conn.executemany(sql, rows[table])
+                counts[table] += len(rows[table])
+            conn.commit()
+            
+            if progress:
+                done = min(users, batch_start + batch)
+                print(f"\r⏳ {done}/{users} 用户 ({done * 100 // users}%)", end="", flush=True)
+        
+        if progress:
+            print()
+        conn.execute("PRAGMA journal_mode = DELETE")
+        
+        # 统计表的触发器在批量插入后才创建，一次性从历史记录累计
+        rebuild_user_stats(conn)
+        ensure_activity_indexes(conn)
+        ensure_user_search(conn)
+        ensure_rob_targets(conn, generator._robbery.protection_amount)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    
+    return {
+        "db_path": db_path,
+        "rows": counts,
+        "seconds": round(time.perf_counter() - start, 2),
+        "size_mb": round(os.path.getsize(db_path) / 1024 / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinBot 合成用户数据库生成器")
+    parser.add_argument("--users", type=int, default=10000, help=f"用户数（最多 {MAX_USERS}）")
+    parser.add_argument("--output", help="输出文件路径，默认为临时目录下的 linbot_users_<用户数>.db")
+    parser.add_argument("--days", type=int, default=60, help="历史记录覆盖的天数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--batch", type=int, default=5000, help="每批插入的用户数")
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的输出文件")
+    for table, mean in DEFAULT_HISTORY.items():
+        parser.add_argument(f"--{table}", type=float, default=mean, help=f"每用户平均{table}记录数")
+    args = parser.parse_args()
+    
+    output = args.output or os.path.join(tempfile.gettempdir(), f"linbot_users_{args.users}.db")
+    if os.path.exists(output):
+        if not args.force:
+            parser.error(f"{output} 已存在，使用 --force 覆盖")
+        os.remove(output)
+    
+    result = populate(output, args.users, args.days,
+                      {table: getattr(args, table) for table in DEFAULT_HISTORY},
+                      args.seed, args.batch, progress=True)
+    
+    print(f"✅ 已生成 {result['db_path']}（{result['size_mb']} MB，耗时 {result['seconds']} 秒）")
+    for table, count in result["rows"].items():
+        print(f"   {table:<8} {count:>10} 行")
+
+
+if __name__ == "__main__":
+    main()
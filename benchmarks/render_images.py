@@ -0,0 +1,172 @@
+"""
+图片渲染基准
+测量帮助（5/50/200 个插件）、排行榜（10/50/100 行）、服务器监控和 CPU 图表的
+生成耗时（绘制 + 编码）、Python 内存分配峰值（tracemalloc）和输出字节数，
+结果可保存为 JSON 基线文件并在之后的运行中对比
+
+tracemalloc 只统计 Python 分配器的内存，Pillow 的像素缓冲区不在其中，
+因此同时记录图片尺寸和未压缩像素数据大小作为参考
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.render_images --save /tmp/render.json
+python -m astrbot_plugin_linbot.benchmarks.render_images --compare /tmp/render.json
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Dict, Any, List, Callable, Tuple
+
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HELP_SIZES = (5, 50, 200)
+RANKING_SIZES = (10, 50, 100)
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p50_ms", "peak_kb", "bytes"]
+
+
+def build_cases(loop: asyncio.AbstractEventLoop) -> List[Tuple[str, Callable[[], bytes], Callable[[], Any]]]:
+    """
+    构造基准用例
+    
+    Returns:
+        [(用例名, 生成图片字节的调用, 只绘制不编码的调用)]
+    """
+    from ..game.phb.ranking_manager import RankingManager
+    from ..helps.helps import PluginHelpGenerator
+    from ..render.encoder import get_encoder
+    from ..server.monitor import ServerMonitor
+    from .samples import sample_cpu, sample_plugins, sample_ranking
+    
+    help_generator = PluginHelpGenerator(context=None, plugin_dir=PLUGIN_DIR, prefix="/")
+    ranking_manager = RankingManager(db_path="", plugin_dir=PLUGIN_DIR)
+    monitor = ServerMonitor()
+    
+    cases = []
+    for count in HELP_SIZES:
+        plugins = sample_plugins(count)
+        cases.append((f"help[{count}]",
+                      lambda p=plugins: loop.run_until_complete(help_generator.generate_help_image(p)),
+                      lambda p=plugins: help_generator.render_help_image(p)))
+    
+    for count in RANKING_SIZES:
+        data = sample_ranking(count)
+        cases.append((f"ranking[{count}]",
+                      lambda d=data: ranking_manager.generate_ranking_image(d),
+                      lambda d=data: ranking_manager.render_ranking_image(d)))
+    
+    # 系统信息只采集一次，只测量绘制和编码
+    info = monitor.get_system_info()
+    cases.append(("monitor", lambda: monitor.generate_monitor_image(info),
+                  lambda: monitor.render_monitor_image(info)))
+    
+    # generate_cpu_chart 包含实时采样（默认30秒），这里使用固定样例数据，测量与其相同的绘制和编码步骤
+    cpu_data, timestamps = sample_cpu(30)
+    cases.append(("chart",
+                  lambda: get_encoder().encode(monitor.render_cpu_chart(cpu_data, timestamps, 30), "chart"),
+                  lambda: monitor.render_cpu_chart(cpu_data, timestamps, 30)))
+    return cases
+
+
+def run_case(generate: Callable[[], bytes], render: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    执行单个用例
+    
+    Args:
+        generate: 生成图片字节
+        render: 只绘制，用于获取图片尺寸
+        repeat: 计时次数
+    
+    Returns:
+        首次耗时、耗时分位数、内存峰值和输出大小
+    """
+    # 首次调用包含字体加载、模板构建等一次性开销
+    start = time.perf_counter()
+    data = generate()
+    first_ms = (time.perf_counter() - start) * 1000
+    if not data:
+        raise RuntimeError("图片生成失败")
+    
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = generate()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    
+    # tracemalloc 会拖慢执行，单独运行一次测量内存峰值
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        generate()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    width, height = render().size
+    return {
+        "first_ms": round(first_ms, 2),
+        "p50_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[min(len(times) - 1, round(0.95 * len(times)) - 1)], 2),
+        "max_ms": round(times[-1], 2),
+        "peak_kb": round(peak / 1024, 1),
+        "bytes": len(data),
+        "size": f"{width}x{height}",
+        "raw_kb": round(width * height * 3 / 1024, 1)
+    }
+
+
+def run(repeat: int, only: str = "") -> Dict[str, Dict[str, Any]]:
+    """
+    执行全部用例
+    
+    Args:
+        repeat: 每个用例的计时次数
+        only: 只执行名称包含该字符串的用例
+    
+    Returns:
+        {用例名: 统计}
+    """
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for name, generate, render in build_cases(loop):
+            if only and only not in name:
+                continue
+            results[name] = r = run_case(generate, render, max(1, repeat))
+            print(f"{name:<14} {r['size']:>10} | 首次 {r['first_ms']:>8.1f} | p50 {r['p50_ms']:>8.1f} | "
+                  f"p95 {r['p95_ms']:>8.1f} ms | 峰值 {r['peak_kb']:>8.1f} KB | 像素 {r['raw_kb']:>8.1f} KB | "
+                  f"输出 {r['bytes'] / 1024:>7.1f} KB")
+    finally:
+        loop.close()
+    return results
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    
+    parser = argparse.ArgumentParser(description="LinBot 图片渲染基准")
+    parser.add_argument("--repeat", type=int, default=10, help="每个用例的计时次数")
+    parser.add_argument("--only", default="", help="只执行名称包含该字符串的用例")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    results = run(args.repeat, args.only)
+    
+    if args.save:
+        save_baseline(args.save, "render_images", results, {"repeat": args.repeat})
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+
+
+if __name__ == "__main__":
+    main()
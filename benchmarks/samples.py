@@ -0,0 +1,50 @@
+"""
+渲染基准共用的样例数据（插件列表、排行榜、CPU采样）
+数据由固定种子生成，保证多次运行之间可比
+"""
+
+import random
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+
+def sample_plugins(count: int, commands: int = 6) -> List[Dict[str, Any]]:
+    """生成样例插件列表"""
+    return [
+        {
+            'name': f"示例插件{i}",
+            'description': f"这是第{i}个示例插件的功能描述",
+            'version': '1.0.0',
+            'author': 'bench',
+            'commands': [f"/指令{i}_{j}" for j in range(commands)]
+        }
+        for i in range(count)
+    ]
+
+
+def sample_ranking(count: int) -> Dict[str, Any]:
+    """生成样例排行榜数据"""
+    rng = random.Random(42)
+    data = []
+    for i in range(1, count + 1):
+        value = rng.randint(1000, 1000000)
+        data.append({
+            'rank': i, 'user_id': str(10000 + i), 'username': f"玩家{i:03d}",
+            'value': value, 'display_value': f"{value:,} 金币",
+            'money': value, 'bank_money': 0, 'level': rng.randint(1, 30), 'total_checkin': rng.randint(1, 300)
+        })
+    return {
+        'ranking_type': 'money',
+        'config': {"name": "💰 金钱排行榜", "field": "money", "desc": "现金排名"},
+        'data': data,
+        'total_users': count * 10,
+        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def sample_cpu(duration: int = 30) -> Tuple[List[float], List[str]]:
+    """生成样例CPU采样（使用率列表, 时间戳列表）"""
+    rng = random.Random(42)
+    cpu_data = [rng.uniform(5, 80) for _ in range(duration)]
+    timestamps = [f"12:{i // 60:02d}:{i % 60:02d}" for i in range(duration)]
+    return cpu_data, timestamps
@@ -0,0 +1,214 @@
+"""
+分片写入吞吐基准
+把同一个合成用户数据库分别迁移为 1、4、8 个分片，多个线程并发执行会写入数据库的操作
+（存款、取款、转账、抢劫），统计每种分片数下的写入吞吐量和延迟分位数
+
+每个分片文件有独立的写锁，单文件时所有写入排队提交；转账和抢劫的双方可能在不同分片，
+此时一次提交同时锁住两个分片
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.populate --users 100000 --output /tmp/linbot_100k.db
+python -m astrbot_plugin_linbot.benchmarks.shard_writes --db /tmp/linbot_100k.db --shards 1,4,8 --save /tmp/shards.json
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p50_ms", "p95_ms"]
+
+# 默认操作配比
+DEFAULT_MIX = {"deposit": 35, "withdraw": 35, "transfer": 15, "robbery": 15}
+
+# 参与测试的用户数（从有现金的用户中抽取）
+SAMPLE_USERS = 2000
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """解析操作配比，如 "deposit=1,transfer=1" """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知操作: {name}，可选: {'/'.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def _sample_users(db_path: str, seed: int) -> List[Tuple[str, str]]:
+    """抽取现金较多的用户"""
+    conn = sqlite3.connect(db_path)
+    try:
+        users = conn.execute("SELECT user_id, username FROM users WHERE money >= 1000").fetchall()
+    finally:
+        conn.close()
+    if len(users) < 2:
+        raise ValueError("数据库中至少需要2个现金不少于1000的用户")
+    rng = random.Random(seed)
+    return rng.sample(users, min(SAMPLE_USERS, len(users)))
+
+
+def run_shards(db_path: str, users: List[Tuple[str, str]], threads: int, ops: int,
+               mix: Dict[str, int], seed: int) -> Dict[str, Any]:
+    """
+    在已分片的数据库上并发执行写入操作
+    
+    Args:
+        db_path: 0 号分片路径
+        users: 参与测试的用户
+        threads: 写入线程数
+        ops: 每个线程的操作数
+        mix: 操作配比
+        seed: 随机种子
+    
+    Returns:
+        吞吐量、延迟分位数和失败数
+    """
+    from ..game.bank import BankManager
+    from ..game.qiangjie import RobberyManager
+    from ..perf import Histogram
+    
+    # 取消抢劫冷却和等级限制，每次抢劫都会写入
+    config = {"game_system_settings": {"robbery_cooldown_hours": 0, "robbery_level_requirement": 1}}
+    bank = BankManager(db_path, config)
+    robbery = RobberyManager(db_path, config)
+    
+    operations = {
+        "deposit": lambda rng, a, b: bank.deposit(a[0], a[1], rng.randint(10, 100)),
+        "withdraw": lambda rng, a, b: bank.withdraw(a[0], a[1], rng.randint(10, 100)),
+        "transfer": lambda rng, a, b: bank.transfer(a[0], b[0], a[1], b[1], rng.randint(10, 100)),
+        "robbery": lambda rng, a, b: robbery.rob_user(a[0], a[1], b[0], b[1]),
+    }
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    
+    histogram = Histogram()
+    lock = threading.Lock()
+    counts = {"succeeded": 0, "rejected": 0, "errors": 0}
+    
+    def worker(index: int) -> None:
+        rng = random.Random(seed + index)
+        latencies = []
+        local_counts = dict.fromkeys(counts, 0)
+        for _ in range(ops):
+            name = rng.choices(names, weights)[0]
+            first, second = rng.sample(users, 2)
+            start = time.perf_counter()
+            try:
+                result = operations[name](rng, first, second)
+            except sqlite3.Error:
+                result = {"error": True}
+            latencies.append((time.perf_counter() - start) * 1000)
+            
+            # 余额不足等业务拒绝不算错误，数据库锁超时等异常在管理器中转为失败消息
+            if result.get("error") or "失败：" in str(result.get("message", "")):
+                local_counts["errors"] += 1
+            elif result.get("success"):
+                local_counts["succeeded"] += 1
+            else:
+                local_counts["rejected"] += 1
+        with lock:
+            for ms in latencies:
+                histogram.record(ms)
+            for key, value in local_counts.items():
+                counts[key] += value
+    
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+    
+    stats = histogram.snapshot()
+    stats.update(counts)
+    stats["seconds"] = round(seconds, 2)
+    stats["ops_per_s"] = round(threads * ops / seconds, 1)
+    return stats
+
+
+def run(db_path: str, shard_counts: List[int], threads: int, ops: int, mix: Dict[str, int],
+        seed: int, work_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    按每种分片数复制数据库、迁移并执行写入
+    
+    Returns:
+        {用例名: 统计}
+    """
+    from ..game.shards import migrate_shards
+    
+    users = _sample_users(db_path, seed)
+    results = {}
+    for count in shard_counts:
+        directory = os.path.join(work_dir, f"shards{count}")
+        os.makedirs(directory)
+        copy = os.path.join(directory, "user.db")
+        shutil.copyfile(db_path, copy)
+        
+        # 1 个分片也经过迁移，各用例的索引和统计表状态相同
+        migration = migrate_shards(copy, count)
+        name = f"shards={count}"
+        results[name] = r = run_shards(copy, users, threads, ops, mix, seed)
+        r["migrate_seconds"] = migration["seconds"]
+        print(f"{name:<10} 迁移 {migration['seconds']:>6.2f}s | {r['ops_per_s']:>8.1f} 次/秒 | "
+              f"p50 {r['p50_ms']:>8.2f} | p95 {r['p95_ms']:>8.2f} | max {r['max_ms']:>8.2f} ms | "
+              f"成功 {r['succeeded']} 拒绝 {r['rejected']} 错误 {r['errors']}")
+        shutil.rmtree(directory)
+    return results
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    from .populate import populate
+    
+    parser = argparse.ArgumentParser(description="LinBot 分片写入吞吐基准")
+    parser.add_argument("--db", help="合成用户数据库（只读），不指定时临时生成")
+    parser.add_argument("--users", type=int, default=20000, help="临时生成数据库的用户数")
+    parser.add_argument("--shards", default="1,4,8", help="分片数，逗号分隔")
+    parser.add_argument("--threads", type=int, default=8, help="写入线程数")
+    parser.add_argument("--ops", type=int, default=300, help="每个线程的操作数")
+    parser.add_argument("--mix", help="操作配比，如 deposit=35,withdraw=35,transfer=15,robbery=15")
+    parser.add_argument("--dir", help="分片文件所在目录（默认系统临时目录，应与实际部署在同类磁盘上）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    shard_counts = [int(count) for count in args.shards.split(",") if count.strip()]
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "population.db")
+            result = populate(db_path, args.users, seed=args.seed, progress=True)
+            print(f"🔧 已临时生成 {args.users} 用户的数据库，耗时 {result['seconds']} 秒")
+        elif not os.path.exists(db_path):
+            parser.error(f"{db_path} 不存在，请先运行 benchmarks.populate 生成")
+        
+        print(f"🔧 {args.threads} 个线程，每个线程 {args.ops} 次写入，配比 {mix}\n")
+        results = run(db_path, shard_counts, args.threads, args.ops, mix, args.seed, tmp)
+    
+    params = {"db": os.path.basename(args.db) if args.db else f"临时生成 {args.users} 用户",
+              "threads": args.threads, "ops": args.ops, "shards": shard_counts, "mix": mix, "seed": args.seed}
+    if args.save:
+        save_baseline(args.save, "shard_writes", results, params)
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+
+
+if __name__ == "__main__":
+    main()
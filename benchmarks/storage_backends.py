@@ -0,0 +1,299 @@
+"""
+存储引擎对比基准
+在同一个合成用户数据库上分别用 SQLite 存储和内存存储（从数据库载入）执行同一串随机操作
+（签到、打工、存取款、转账、抢劫、各类查询），逐次比较两种存储返回的结果，
+最后比较涉及用户的数据和累计统计，并统计每种操作在两种存储下的耗时
+
+两种存储在每次操作前使用相同的随机种子，结果应完全一致；时间、翻页位置、
+一页活动记录的先后、抽取的抢劫目标、排行榜中排序键相同的用户先后和同名用户中选中哪一个不参与比较
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.populate --users 100000 --output /tmp/linbot_100k.db
+python -m astrbot_plugin_linbot.benchmarks.storage_backends --db /tmp/linbot_100k.db --save /tmp/storage.json
+python -m astrbot_plugin_linbot.benchmarks.storage_backends --db /tmp/linbot_100k.db --compare /tmp/storage.json
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Dict, Any, List, Callable, Tuple
+
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p50_ms", "p95_ms"]
+
+# 参与测试的用户数
+SAMPLE_USERS = 500
+
+# 取消冷却、等级和次数限制，每次操作都会执行到写入
+CONFIG = {"game_system_settings": {
+    "work_cooldown_multiplier": 0, "daily_work_limit": 1000000,
+    "robbery_cooldown_hours": 0, "robbery_level_requirement": 1
+}}
+
+# 默认操作配比
+DEFAULT_MIX = {
+    "checkin": 10, "work": 10, "deposit": 10, "withdraw": 10, "transfer": 5, "robbery": 5,
+    "checkin_info": 5, "work_stats": 5, "bank_info": 5, "robbery_stats": 5, "robbery_targets": 3,
+    "user_info": 5, "user_stats": 5, "user_ranking": 5, "activity": 5, "find_user": 3,
+    "ranking": 3, "checkin_ranking": 2
+}
+
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2})?")
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """解析操作配比，如 "deposit=1,transfer=1" """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知操作: {name}，可选: {'/'.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def prepare(db_path: str) -> None:
+    """建立插件启动时维护的统计表、索引和全文索引"""
+    from ..game.activity import ensure_activity_indexes
+    from ..game.db import connect
+    from ..game.stats import ensure_user_stats
+    from ..game.user_search import ensure_user_search
+    
+    ensure_user_stats(db_path)
+    conn = connect(db_path)
+    try:
+        ensure_activity_indexes(conn)
+        ensure_user_search(conn)
+    finally:
+        conn.close()
+
+
+def _sample_users(db_path: str, seed: int) -> List[Tuple[str, str]]:
+    conn = sqlite3.connect(db_path)
+    try:
+        users = conn.execute("SELECT user_id, username FROM users").fetchall()
+    finally:
+        conn.close()
+    if len(users) < 2:
+        raise ValueError("数据库中至少需要2个用户")
+    rng = random.Random(seed)
+    return rng.sample(users, min(SAMPLE_USERS, len(users)))
+
+
+def build_operations(store, plugin_dir: str) -> Dict[str, Callable]:
+    """
+    在指定存储上构造管理器和操作
+    
+    Returns:
+        {操作名: fn(rng, (user_id, username), (user_id, username))}
+    """
+    from ..game.bank import BankManager
+    from ..game.gzrw import WorkManager
+    from ..game.mybag import UserInfoManager
+    from ..game.phb import RankingManager
+    from ..game.qiandao import CheckinManager
+    from ..game.qiangjie import RobberyManager
+    
+    checkin = CheckinManager("", store=store)
+    work = WorkManager("", CONFIG, store=store)
+    bank = BankManager("", CONFIG, store=store)
+    robbery = RobberyManager("", CONFIG, store=store)
+    ranking = RankingManager("", plugin_dir, store=store)
+    user_info = UserInfoManager("", store=store)
+    ranking_types = list(ranking.ranking_types)
+    
+    return {
+        "checkin": lambda rng, a, b: checkin.daily_checkin(*a),
+        "work": lambda rng, a, b: work.work(*a, rng.choice(list(work.jobs))),
+        "deposit": lambda rng, a, b: bank.deposit(*a, rng.randint(10, 200)),
+        "withdraw": lambda rng, a, b: bank.withdraw(*a, rng.randint(10, 200)),
+        "transfer": lambda rng, a, b: bank.transfer(a[0], b[0], a[1], b[1], rng.randint(10, 200)),
+        "robbery": lambda rng, a, b: robbery.rob_user(*a, *b),
+        "checkin_info": lambda rng, a, b: checkin.get_checkin_info(*a),
+        "work_stats": lambda rng, a, b: work.get_work_statistics(a[0]),
+        "bank_info": lambda rng, a, b: bank.get_bank_info(*a),
+        "robbery_stats": lambda rng, a, b: robbery.get_robbery_stats(a[0]),
+        "robbery_targets": lambda rng, a, b: robbery.get_robbery_targets(a[0], 10),
+        "user_info": lambda rng, a, b: user_info.get_user_basic_info(*a),
+        "user_stats": lambda rng, a, b: user_info.get_user_statistics(a[0]),
+        "user_ranking": lambda rng, a, b: user_info.get_user_ranking(a[0]),
+        "activity": lambda rng, a, b: user_info.get_activity_page(a[0], 10),
+        "find_user": lambda rng, a, b: user_info.find_user_by_name(b[1][:rng.randint(1, len(b[1]))]),
+        "ranking": lambda rng, a, b: ranking.get_ranking_data(rng.choice(ranking_types), 10),
+        "checkin_ranking": lambda rng, a, b: checkin.get_checkin_ranking(10),
+    }
+
+
+def normalize(name: str, result: Any) -> Any:
+    """去掉两种存储之间允许不同的部分（时间、翻页位置、随机目标、并列和同名用户的先后）"""
+    if name == "robbery_targets" and isinstance(result, dict) and "targets" in result:
+        result = dict(result, targets=len(result["targets"]))
+    elif name == "ranking" and isinstance(result, dict) and "data" in result:
+        result = dict(result, data=[(item["rank"], item["value"]) for item in result["data"]])
+    elif name == "checkin_ranking" and isinstance(result, list):
+        result = [row[1:] for row in result]
+    elif name == "find_user" and isinstance(result, dict):
+        result = {key: value for key, value in result.items() if key != "user_id"}
+    elif name == "activity" and isinstance(result, dict):
+        # 两种存储的同一次写入可能落在相邻的两秒，时间相近的记录先后可能不同
+        activities = sorted(result.get("activities", []), key=repr)
+        result = dict(result, activities=activities, next_cursor=result.get("next_cursor") is not None)
+    return _strip(result)
+
+
+def _strip(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip(item) for key, item in value.items()
+                if key not in ("update_time", "cooldown_remaining", "cooldown_end")}
+    if isinstance(value, (list, tuple)):
+        return [_strip(item) for item in value]
+    if isinstance(value, str):
+        return _TIMESTAMP.sub("<time>", value)
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def final_state(store, user_ids: List[str]) -> Dict[str, Any]:
+    """涉及用户的数据（不含时间）和累计统计"""
+    state = {}
+    for user_id in user_ids:
+        with store.read(user_id) as session:
+            user = session.get_user(user_id)
+            if user is None:
+                continue
+            state[user_id] = (
+                {key: value for key, value in user.items() if key not in ("created_at", "updated_at", "last_work_time")},
+                session.user_stats(user_id),
+                sorted(session.work_by_type(user_id))
+            )
+    return state
+
+
+def run(db_path: str, ops: int, mix: Dict[str, int], seed: int, work_dir: str,
+        readers: int = 0) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    在数据库副本上分别用两种存储执行同一串操作
+    
+    Args:
+        readers: SQLite 存储的读连接池大小（0 为不使用连接池）
+    
+    Returns:
+        ({存储/操作: 耗时统计}, 不一致的描述)
+    """
+    from ..game.storage import MemoryStore, SqliteStore
+    from ..perf import Histogram
+    
+    plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    users = _sample_users(db_path, seed)
+    
+    copy = os.path.join(work_dir, "user.db")
+    shutil.copyfile(db_path, copy)
+    prepare(copy)
+    
+    # 内存存储在写入前从同一个副本载入
+    start = time.perf_counter()
+    memory = MemoryStore.load(copy)
+    print(f"🔧 内存存储载入耗时 {time.perf_counter() - start:.2f} 秒")
+    stores = {"sqlite": SqliteStore(copy, readers), "memory": memory}
+    
+    operations = {backend: build_operations(store, plugin_dir) for backend, store in stores.items()}
+    histograms = {backend: {name: Histogram() for name in mix} for backend in stores}
+    mismatches = []
+    
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = random.Random(seed)
+    touched = set()
+    for index in range(ops):
+        name = plan.choices(names, weights)[0]
+        first, second = plan.sample(users, 2)
+        touched.update((first[0], second[0]))
+        
+        results = {}
+        for backend in stores:
+            # 管理器内部使用全局 random（签到奖励、工资、抢劫结果），每次操作前重置
+            random.seed(seed * 1000003 + index)
+            rng = random.Random(index)
+            call_start = time.perf_counter()
+            results[backend] = operations[backend][name](rng, first, second)
+            histograms[backend][name].record((time.perf_counter() - call_start) * 1000)
+        
+        expected, actual = (normalize(name, results[backend]) for backend in stores)
+        if expected != actual:
+            mismatches.append(f"#{index} {name} {first[0]}/{second[0]}:\n  sqlite: {expected}\n  memory: {actual}")
+    
+    touched = sorted(touched)
+    expected, actual = (final_state(store, touched) for store in stores.values())
+    stores["sqlite"].close()
+    for user_id in touched:
+        if expected.get(user_id) != actual.get(user_id):
+            mismatches.append(f"最终状态 {user_id}:\n  sqlite: {expected.get(user_id)}\n  memory: {actual.get(user_id)}")
+    
+    results = {}
+    for name in names:
+        row = []
+        for backend in stores:
+            results[f"{backend}/{name}"] = r = histograms[backend][name].snapshot()
+            row.append(f"{backend} p50 {r['p50_ms']:>8.3f} p95 {r['p95_ms']:>8.3f}")
+        print(f"{name:<16} {histograms['sqlite'][name].count:>5}次 | " + " | ".join(row) + " ms")
+    return results, mismatches
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    from .populate import populate
+    
+    parser = argparse.ArgumentParser(description="LinBot 存储引擎对比基准")
+    parser.add_argument("--db", help="合成用户数据库（只读），不指定时临时生成")
+    parser.add_argument("--users", type=int, default=10000, help="临时生成数据库的用户数")
+    parser.add_argument("--ops", type=int, default=3000, help="操作次数")
+    parser.add_argument("--mix", help="操作配比，如 deposit=1,transfer=1")
+    parser.add_argument("--read-pool", type=int, default=4, help="SQLite 存储的读连接池大小（0 为不使用连接池）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "population.db")
+            result = populate(db_path, args.users, seed=args.seed, progress=True)
+            print(f"🔧 已临时生成 {args.users} 用户的数据库，耗时 {result['seconds']} 秒")
+        elif not os.path.exists(db_path):
+            parser.error(f"{db_path} 不存在，请先运行 benchmarks.populate 生成")
+        
+        results, mismatches = run(db_path, args.ops, mix, args.seed, tmp, args.read_pool)
+    
+    if mismatches:
+        print(f"\n❌ 两种存储的结果有 {len(mismatches)} 处不一致：")
+        for mismatch in mismatches[:10]:
+            print(mismatch)
+    else:
+        print(f"\n✅ {args.ops} 次操作和最终数据在两种存储下一致")
+    
+    params = {"db": os.path.basename(args.db) if args.db else f"临时生成 {args.users} 用户",
+              "ops": args.ops, "mix": mix, "seed": args.seed, "read_pool": args.read_pool}
+    if args.save:
+        save_baseline(args.save, "storage_backends", results, params)
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
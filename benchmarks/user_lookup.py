@@ -0,0 +1,163 @@
+"""
+用户名查找基准
+在合成用户数据库上对比原先的查找方式（无索引的精确匹配 + LIKE '%名称%' 全表扫描）
+与 user_search 的查找（用户名索引 + FTS5 trigram 全文索引）
+
+查询按类型分组：完整用户名、前缀、2字子串、3字及以上子串、不存在的名称
+原先的方式在百万用户下每次查找需要数百毫秒，默认对其只执行少量迭代
+
+示例（在 data/plugins 目录下执行）：
+python -m astrbot_plugin_linbot.benchmarks.populate --users 1000000 --work 0 --checkin 0 --bank 0 --robbery 0 --output /tmp/linbot_1m.db
+python -m astrbot_plugin_linbot.benchmarks.user_lookup --db /tmp/linbot_1m.db --save /tmp/lookup.json
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, Any, List, Callable
+
+
+# 参与基线对比的指标
+COMPARE_METRICS = ["p50_ms", "p95_ms"]
+
+# 生成用户名查询的样本数
+QUERY_SAMPLES = 200
+
+
+def build_queries(conn, seed: int) -> Dict[str, List[str]]:
+    """从数据库中随机抽取用户名并生成各类查询"""
+    rng = random.Random(seed)
+    total = conn.execute("SELECT MAX(rowid) FROM users").fetchone()[0] or 0
+    names = []
+    while len(names) < QUERY_SAMPLES and total:
+        row = conn.execute("SELECT username FROM users WHERE rowid = ?", (rng.randint(1, total),)).fetchone()
+        if row and len(row[0]) >= 2:
+            names.append(row[0])
+    if not names:
+        raise ValueError("数据库中没有可用的用户名")
+    
+    def substring(name: str, length: int) -> str:
+        start = rng.randint(0, len(name) - length)
+        return name[start:start + length]
+    
+    return {
+        "exact": names,
+        "prefix": [name[:1] for name in names],
+        "substring2": [substring(name, 2) for name in names],
+        "substring3": [substring(name, 3) for name in names if len(name) >= 3] or names,
+        "missing": [f"不存在的用户{rng.randint(1, 10 ** 9)}" for _ in names]
+    }
+
+
+def legacy_lookup(conn, name: str) -> List[tuple]:
+    """原先 _find_user_by_name 的查询（强制不使用用户名索引）"""
+    row = conn.execute("SELECT user_id, username FROM users NOT INDEXED WHERE username = ?", (name,)).fetchone()
+    if row:
+        return [row]
+    return conn.execute("SELECT user_id, username FROM users NOT INDEXED WHERE username LIKE ?",
+                        (f"%{name}%",)).fetchall()
+
+
+def run_case(lookup: Callable[[str], Any], queries: List[str], iterations: int) -> Dict[str, Any]:
+    """对一组查询循环执行 iterations 次查找"""
+    from ..perf import Histogram
+    
+    histogram = Histogram()
+    found = 0
+    for i in range(iterations):
+        start = time.perf_counter()
+        result = lookup(queries[i % len(queries)])
+        histogram.record((time.perf_counter() - start) * 1000)
+        found += bool(result)
+    stats = histogram.snapshot()
+    stats["found"] = found
+    return stats
+
+
+def run(db_path: str, iterations: int, legacy_iterations: int, seed: int) -> Dict[str, Dict[str, Any]]:
+    """
+    执行全部用例
+    
+    Args:
+        db_path: 合成用户数据库（只读）
+        iterations: 新查找方式每类查询的次数
+        legacy_iterations: 原先查找方式每类查询的次数，0 表示跳过
+        seed: 抽取用户名的随机种子
+    
+    Returns:
+        {用例名: 统计}
+    """
+    from ..game.db import connect
+    from ..game.user_search import ensure_user_search, find_users
+    
+    conn = connect(db_path)
+    try:
+        start = time.perf_counter()
+        if not ensure_user_search(conn):
+            raise RuntimeError("当前 SQLite 不支持 FTS5 trigram")
+        print(f"🔧 索引准备耗时 {time.perf_counter() - start:.2f} 秒，"
+              f"用户数 {conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]}\n")
+        
+        queries = build_queries(conn, seed)
+        results = {}
+        for kind, names in queries.items():
+            cases = [("search", lambda name: find_users(conn, name), iterations)]
+            if legacy_iterations:
+                cases.append(("legacy", lambda name: legacy_lookup(conn, name), legacy_iterations))
+            for method, lookup, count in cases:
+                name = f"{method}[{kind}]"
+                results[name] = r = run_case(lookup, names, count)
+                print(f"{name:<22} {r['count']:>5}次 | p50 {r['p50_ms']:>9.3f} | p95 {r['p95_ms']:>9.3f} | "
+                      f"max {r['max_ms']:>9.3f} ms | 找到 {r['found']}")
+    finally:
+        conn.close()
+    return results
+
+
+def main():
+    from .baseline import compare, load_baseline, print_comparison, save_baseline
+    from .populate import DEFAULT_HISTORY, populate
+    
+    parser = argparse.ArgumentParser(description="LinBot 用户名查找基准")
+    parser.add_argument("--db", help="合成用户数据库，不指定时临时生成（只含用户表数据）")
+    parser.add_argument("--users", type=int, default=1_000_000, help="临时生成数据库的用户数")
+    parser.add_argument("--iterations", type=int, default=500, help="每类查询的次数")
+    parser.add_argument("--legacy-iterations", type=int, default=5, help="原先查找方式每类查询的次数，0 为跳过")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--save", help="保存结果为基线文件")
+    parser.add_argument("--compare", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时判定变化的百分比")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "population.db")
+            result = populate(db_path, args.users, history={table: 0 for table in DEFAULT_HISTORY},
+                              seed=args.seed, progress=True)
+            print(f"🔧 已临时生成 {args.users} 用户的数据库，耗时 {result['seconds']} 秒")
+        elif not os.path.exists(db_path):
+            parser.error(f"{db_path} 不存在，请先运行 benchmarks.populate 生成")
+        else:
+            # 在副本上建立索引，不修改原数据库
+            copy = os.path.join(tmp, "user.db")
+            shutil.copyfile(db_path, copy)
+            db_path = copy
+        
+        results = run(db_path, args.iterations, args.legacy_iterations, args.seed)
+    
+    params = {"db": os.path.basename(args.db) if args.db else f"临时生成 {args.users} 用户",
+              "iterations": args.iterations, "seed": args.seed}
+    if args.save:
+        save_baseline(args.save, "user_lookup", results, params)
+        print(f"\n💾 基线已保存到 {args.save}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print_comparison(compare(results, baseline, COMPARE_METRICS, args.threshold), baseline)
+
+
+if __name__ == "__main__":
+    main()
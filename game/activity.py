@@ -0,0 +1,146 @@
+"""
+活动记录 - 合并签到、打工、银行、抢劫、被抢五类记录的时间线
+每类记录按 (用户, 时间) 索引倒序读取，用堆归并成一条时间线，
+翻页使用上一页最后一条记录的位置（键集分页），每页的开销与历史记录总量无关
+"""
+
+import heapq
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+
+# (类型, 表, 用户列, 时间列, 查询列)
+# 查询列依次为 动作、金额、附加信息、对方用户ID，类型的顺序同时作为同一时间记录的排序依据
+_SOURCES = [
+    ("work", "work_records", "user_id", "work_time", "t.work_type, t.total_earned, NULL, NULL"),
+    ("bank", "bank_transactions", "user_id", "created_at", "t.transaction_type, t.amount, NULL, NULL"),
+    ("checkin", "checkin_records", "user_id", "created_at", "t.checkin_date, t.reward_money, t.consecutive_days, NULL"),
+    ("robbery", "robbery_records", "robber_id", "created_at", "t.success, t.amount, u.username, t.victim_id"),
+    ("robbed", "robbery_records", "victim_id", "created_at", "t.success, t.amount, u.username, t.robber_id"),
+]
+
+# 活动类型，下标为类型序号
+ACTIVITY_TYPES = tuple(source[0] for source in _SOURCES)
+
+# 抢劫记录关联对方用户名（对方在其他分片时关联不到，由调用方按用户ID查找）
+_JOINS = {
+    "robbery": "LEFT JOIN users u ON u.user_id = t.victim_id",
+    "robbed": "LEFT JOIN users u ON u.user_id = t.robber_id",
+}
+
+ACTIVITY_INDEXES = '''
+CREATE INDEX IF NOT EXISTS idx_work_records_user_time ON work_records(user_id, work_time);
+CREATE INDEX IF NOT EXISTS idx_bank_transactions_user_time ON bank_transactions(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_checkin_records_user_time ON checkin_records(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_robbery_records_robber_time ON robbery_records(robber_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_robbery_records_victim_time ON robbery_records(victim_id, created_at);
+'''
+
+
+def ensure_activity_indexes(conn) -> None:
+    """创建按 (用户, 时间) 的索引（已存在时跳过）"""
+    conn.executescript(ACTIVITY_INDEXES)
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    """解析翻页位置（时间|类型序号|记录id），无效时从头开始"""
+    if not cursor:
+        return None
+    try:
+        ts, rank, row_id = cursor.rsplit("|", 2)
+        return ts, int(rank), int(row_id)
+    except ValueError:
+        return None
+
+
+def _source_rows(db_cursor, rank: int, user_id: str, after: Optional[Tuple[str, int, int]], limit: int):
+    """按时间倒序读取一类记录中位于翻页位置之后的至多 limit 条"""
+    kind, table, user_column, ts_column, columns = _SOURCES[rank]
+    sql = f"SELECT t.{ts_column}, t.id, {columns} FROM {table} t {_JOINS.get(kind, '')} WHERE t.{user_column} = ?"
+    params: List[Any] = [user_id]
+    
+    # 时间线按 (时间, 类型序号, id) 倒序，同一时间内序号小的类型排在后面
+    if after is not None:
+        ts, after_rank, after_id = after
+        if rank < after_rank:
+            sql += f" AND t.{ts_column} <= ?"
+            params.append(ts)
+        elif rank == after_rank:
+            sql += f" AND (t.{ts_column}, t.id) < (?, ?)"
+            params.extend((ts, after_id))
+        else:
+            sql += f" AND t.{ts_column} < ?"
+            params.append(ts)
+    
+    sql += f" ORDER BY t.{ts_column} DESC, t.id DESC LIMIT ?"
+    params.append(limit)
+    
+    db_cursor.execute(sql, params)
+    for ts, row_id, action, amount, extra, peer in db_cursor.fetchall():
+        yield ts, rank, row_id, action, amount, extra, peer
+
+
+def activity_page(conn, user_id: str, limit: int = 10, cursor: Optional[str] = None,
+                  usernames: Optional[Callable[[List[str]], Dict[str, str]]] = None) -> Dict[str, Any]:
+    """
+    读取一页活动记录
+    
+    Args:
+        conn: 数据库连接
+        user_id: 用户ID
+        limit: 每页条数
+        cursor: 上一页返回的 next_cursor，为空时从最新记录开始
+        usernames: 按用户ID批量查找用户名的函数，用于当前数据库中没有的抢劫对方
+    
+    Returns:
+        {'activities': [...], 'next_cursor': 下一页位置（没有更多时为 None）}
+    """
+    after = parse_cursor(cursor)
+    
+    # 每类最多取 limit + 1 条，多出的一条用于判断是否还有下一页
+    sources = [_source_rows(conn.cursor(), rank, user_id, after, limit + 1) for rank in range(len(_SOURCES))]
+    merged = heapq.merge(*sources, key=lambda row: row[:3], reverse=True)
+    return build_page(merged, limit, usernames)
+
+
+def build_page(rows: Iterable[tuple], limit: int,
+               usernames: Optional[Callable[[List[str]], Dict[str, str]]] = None) -> Dict[str, Any]:
+    """
+    把按时间线倒序排列的记录整理为一页
+    
+    Args:
+        rows: (时间, 类型序号, 记录id, 动作, 金额, 附加信息, 对方用户ID)，只读取前 limit + 1 条
+        limit: 每页条数
+        usernames: 按用户ID批量查找附加信息中缺少的抢劫对方用户名
+    
+    Returns:
+        {'activities': [...], 'next_cursor': 下一页位置（没有更多时为 None）}
+    """
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) > limit:
+            break
+    
+    has_more = len(page) > limit
+    page = page[:limit]
+    
+    missing = [row[6] for row in page if row[6] is not None and row[5] is None]
+    names = usernames(missing) if missing and usernames else {}
+    
+    activities = []
+    for ts, rank, row_id, action, amount, extra, peer in page:
+        activity = {'type': ACTIVITY_TYPES[rank], 'action': action, 'amount': amount, 'timestamp': ts}
+        if activity['type'] == 'checkin':
+            activity['date'] = action
+            activity['extra'] = f"连续{extra}天"
+        elif activity['type'] in ('robbery', 'robbed'):
+            activity['action'] = bool(action)
+            activity['extra'] = extra or names.get(peer) or "未知用户"
+        activities.append(activity)
+    
+    next_cursor = None
+    if has_more and page:
+        ts, rank, row_id = page[-1][:3]
+        next_cursor = f"{ts}|{rank}|{row_id}"
+    
+    return {'activities': activities, 'next_cursor': next_cursor}
@@ -0,0 +1,322 @@
+"""
+在线备份 - 用 SQLite 备份接口（Connection.backup）把 user.db 及其他分片复制为快照，机器人运行时也可以执行
+- 每次只复制少量页，两步之间释放源库的读锁并短暂暂停，写入最多被阻塞一步的时间
+- 每次备份的全部分片压缩为一个 zip 快照，按时间命名，只保留最近的若干个
+- 恢复时同样用备份接口把快照写回数据库文件，恢复前自动备份一次当前数据；
+  传入存储时恢复期间暂停它的全部读写，指令不会读到或写入只恢复了一部分分片的数据
+
+复制过程中源库被其他连接修改时 SQLite 会从头重新复制；重新开始次数过多时改为一次复制完剩余部分
+（WAL 模式下一次复制只持有读快照，不阻塞写入）
+
+分片逐个复制，快照中各分片的时间点相差一次复制的耗时
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zipfile
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Tuple
+
+from .db import connect
+from .shards import get_shard_router
+
+
+logger = logging.getLogger("astrbot")
+
+DEFAULT_INTERVAL_HOURS = 24
+DEFAULT_KEEP = 7
+
+# 每步复制的页数（默认页大小 4KB 时为 1MB）和两步之间的暂停（秒）
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.005
+
+# 复制被写入打断、从头开始的次数超过此值后一次复制完
+MAX_RESTARTS = 3
+
+# 源库正被写入锁定时重试的间隔（秒）
+BUSY_RETRY = 0.05
+
+# 插件启动后首次备份的延迟（秒）
+FIRST_RUN_DELAY = 300
+
+SNAPSHOT_PREFIX = "linbot-"
+SNAPSHOT_SUFFIX = ".zip"
+
+
+class _TooManyRestarts(Exception):
+    """分步复制反复被写入打断"""
+
+
+def copy_database(source_path: str, target_path: str, pages: int = PAGES_PER_STEP,
+                  pause: float = STEP_PAUSE) -> Dict[str, Any]:
+    """
+    用备份接口分步复制数据库
+    
+    Args:
+        source_path: 源数据库
+        target_path: 目标数据库（已存在时被覆盖）
+        pages: 每步复制的页数，-1 为一次复制完
+        pause: 两步之间的暂停（秒）
+    
+    Returns:
+        {'pages': 总页数, 'steps': 步数, 'restarts': 重新开始次数,
+         'max_step_ms': 最长一步的耗时（写入最多被阻塞的时长）, 'seconds': 耗时}
+    """
+    start = time.perf_counter()
+    state = {"pages": 0, "steps": 0, "restarts": 0, "max_step": 0.0, "remaining": None}
+    last = start
+    
+    def progress(status, remaining, total):
+        nonlocal last
+        state["max_step"] = max(state["max_step"], time.perf_counter() - last)
+        state["steps"] += 1
+        state["pages"] = total
+        # 复制成功的一步后剩余页数没有减少，说明源库被修改、从头重新复制了
+        if status == sqlite3.SQLITE_OK and state["remaining"] is not None and remaining >= state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        if status == sqlite3.SQLITE_OK:
+            state["remaining"] = remaining
+        if remaining and pause > 0:
+            time.sleep(pause)
+        last = time.perf_counter()
+    
+    source = connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=BUSY_RETRY)
+        except _TooManyRestarts:
+            last = time.perf_counter()
+            source.backup(target, sleep=BUSY_RETRY)
+            state["max_step"] = max(state["max_step"], time.perf_counter() - last)
+            state["steps"] += 1
+    finally:
+        target.close()
+        source.close()
+    
+    return {
+        "pages": state["pages"],
+        "steps": state["steps"],
+        "restarts": state["restarts"],
+        "max_step_ms": round(state["max_step"] * 1000, 2),
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+class DatabaseBackup:
+    """游戏数据库的定时在线备份"""
+    
+    def __init__(self, db_path: str, backup_dir: str, interval_hours: int = DEFAULT_INTERVAL_HOURS,
+                 keep: int = DEFAULT_KEEP):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.interval_hours = interval_hours
+        self.keep = keep
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        # 备份和恢复不能同时进行
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.interval_hours > 0
+    
+    def configure(self, settings: Optional[Dict[str, Any]]) -> None:
+        """按性能设置修改备份间隔和保留份数"""
+        self.interval_hours, self.keep = backup_settings_from(settings)
+    
+    # ---- 快照 ----
+    
+    def snapshots(self) -> List[Dict[str, Any]]:
+        """现有快照，按时间从新到旧 [{'name', 'size', 'created'}]"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        items = []
+        for name in os.listdir(self.backup_dir):
+            if not (name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)):
+                continue
+            stat = os.stat(os.path.join(self.backup_dir, name))
+            items.append({
+                "name": name,
+                "size": stat.st_size,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime))
+            })
+        items.sort(key=lambda item: item["name"], reverse=True)
+        return items
+    
+    def _snapshot_path(self, label: str = "") -> str:
+        base = SNAPSHOT_PREFIX + time.strftime("%Y%m%d-%H%M%S") + (f"-{label}" if label else "")
+        path = os.path.join(self.backup_dir, base + SNAPSHOT_SUFFIX)
+        counter = 1
+        while os.path.exists(path):
+            counter += 1
+            path = os.path.join(self.backup_dir, f"{base}-{counter}{SNAPSHOT_SUFFIX}")
+        return path
+    
+    def backup(self, label: str = "") -> Dict[str, Any]:
+        """
+        立即备份全部分片
+        
+        Args:
+            label: 附加在快照名称后的说明
+        
+        Returns:
+            {'name': 快照名称, 'size': 压缩后字节数, 'files': 分片数, 'pages': 总页数,
+             'restarts': 重新开始次数, 'max_step_ms': 写入最多被阻塞的时长, 'seconds': 耗时, 'removed': 轮换删除的快照}
+        """
+        with self._lock:
+            return self._backup(label)
+    
+    def _backup(self, label: str, rotate: bool = True) -> Dict[str, Any]:
+        start = time.perf_counter()
+        os.makedirs(self.backup_dir, exist_ok=True)
+        path = self._snapshot_path(label)
+        work_dir = path + ".tmp"
+        os.makedirs(work_dir, exist_ok=True)
+        
+        pages = restarts = 0
+        max_step_ms = 0.0
+        try:
+            files = []
+            for source in get_shard_router(self.db_path).paths:
+                target = os.path.join(work_dir, os.path.basename(source))
+                result = copy_database(source, target)
+                pages += result["pages"]
+                restarts += result["restarts"]
+                max_step_ms = max(max_step_ms, result["max_step_ms"])
+                files.append(target)
+            
+            # 先写入临时文件，压缩完成后再改名，中断时不会留下不完整的快照
+            partial = path + ".partial"
+            with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for file in files:
+                    archive.write(file, os.path.basename(file))
+            os.replace(partial, path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        removed = self._rotate() if rotate else []
+        self.last_result = result = {
+            "name": os.path.basename(path),
+            "size": os.path.getsize(path),
+            "files": len(files),
+            "pages": pages,
+            "restarts": restarts,
+            "max_step_ms": max_step_ms,
+            "seconds": round(time.perf_counter() - start, 2),
+            "removed": removed,
+            "finished_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        return result
+    
+    def _rotate(self) -> List[str]:
+        """只保留最近的 keep 个快照"""
+        if self.keep <= 0:
+            return []
+        removed = []
+        for item in self.snapshots()[self.keep:]:
+            os.remove(os.path.join(self.backup_dir, item["name"]))
+            removed.append(item["name"])
+        return removed
+    
+    def restore(self, name: str, store=None) -> Dict[str, Any]:
+        """
+        从快照恢复全部分片（恢复前先备份当前数据）
+        快照的分片数必须与当前一致
+        
+        Args:
+            name: 快照名称
+            store: 正在使用数据库的 SqliteStore，恢复前备份和逐个替换分片期间暂停它的读写；
+                不传时只保证单个分片文件原子替换，应在机器人空闲时执行
+        
+        Returns:
+            {'name': 快照名称, 'files': 分片数, 'before': 恢复前的备份名称, 'seconds': 耗时}
+        """
+        name = os.path.basename(name)
+        if not name.endswith(SNAPSHOT_SUFFIX):
+            name += SNAPSHOT_SUFFIX
+        path = os.path.join(self.backup_dir, name)
+        if not os.path.isfile(path):
+            raise ValueError(f"快照 {name} 不存在")
+        
+        with self._lock:
+            start = time.perf_counter()
+            targets = get_shard_router(self.db_path).paths
+            with zipfile.ZipFile(path) as archive:
+                members = set(archive.namelist())
+                expected = {os.path.basename(target) for target in targets}
+                if members != expected:
+                    raise ValueError(f"快照包含 {len(members)} 个分片文件，与当前的 {len(targets)} 个分片不一致")
+                
+                work_dir = path + ".restore"
+                os.makedirs(work_dir, exist_ok=True)
+                try:
+                    sources = [archive.extract(os.path.basename(target), work_dir) for target in targets]
+                    with store.pause() if store is not None else nullcontext():
+                        # 恢复前的备份不参与本次轮换，避免删掉正在恢复的快照
+                        before = self._backup("before-restore", rotate=False)["name"]
+                        for source, target in zip(sources, targets):
+                            # 一次复制完，其他连接不会读到只恢复了一部分的数据库
+                            copy_database(source, target, pages=-1)
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+        
+        return {
+            "name": name,
+            "files": len(targets),
+            "before": before,
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+    
+    # ---- 定时备份 ----
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def ensure_started(self) -> None:
+        """在当前事件循环中启动定时备份（已启动或没有运行中的事件循环时忽略）"""
+        if self.running:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        try:
+            await asyncio.sleep(FIRST_RUN_DELAY)
+            while True:
+                if self.enabled:
+                    try:
+                        result = await asyncio.to_thread(self.backup)
+                        logger.info(f"数据库备份完成: {result['name']}，耗时 {result['seconds']} 秒，"
+                                    f"写入最长阻塞 {result['max_step_ms']} 毫秒")
+                    except Exception as e:
+                        logger.error(f"数据库备份失败: {e}")
+                # 间隔在每轮结束时读取，修改配置后从下一轮开始生效；未开启时每小时检查一次
+                await asyncio.sleep((self.interval_hours if self.enabled else 1) * 3600)
+        except asyncio.CancelledError:
+            pass
+    
+    def stop(self) -> None:
+        """停止定时备份"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def backup_settings_from(settings: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    """从性能设置中读取 (备份间隔小时数, 保留份数)，间隔为 0 时不定时备份"""
+    settings = settings or {}
+    interval = max(0, min(int(settings.get("backup_interval_hours", DEFAULT_INTERVAL_HOURS)), 24 * 30))
+    keep = max(1, min(int(settings.get("backup_keep", DEFAULT_KEEP)), 365))
+    return interval, keep
@@ -3,17 +3,18 @@
 提供存款、取款、利息计算、交易记录等功能
 """
 
-import sqlite3
-import os
-from datetime import datetime, date, timedelta
-from typing import Dict, Any, Optional, List, Tuple
+from datetime import date
+from typing import Dict, Any, Optional, Tuple
+
+from ..storage import GameStore, get_store
 
 
 class BankManager:
     """银行管理器"""
     
-    def __init__(self, db_path: str, config: Dict[str, Any] = None):
+    def __init__(self, db_path: str, config: Dict[str, Any] = None, store: Optional[GameStore] = None):
         self.db_path = db_path
+        self.store = store or get_store(db_path)
         self.config = config or {}
         
         # 从配置获取参数
@@ -28,24 +29,6 @@ class BankManager:
         self.interest_rate = game_settings.get('bank_interest_rate', 0.1) / 100  # 转换为小数
         self.vip_threshold = game_settings.get('vip_threshold', 10000)     # VIP用户门槛
         self.vip_interest_rate = game_settings.get('bank_vip_interest_rate', 0.15) / 100  # 转换为小数
-        
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
-    
-    def _ensure_user_exists(self, user_id: str, username: str) -> None:
-        """确保用户存在于数据库中"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (user_id, username)
-                VALUES (?, ?)
-            ''', (user_id, username))
-            conn.commit()
-        finally:
-            conn.close()
     
     def deposit(self, user_id: str, username: str, amount: int) -> Dict[str, Any]:
         """
@@ -55,65 +38,51 @@ class BankManager:
             user_id: 用户ID
             username: 用户名
             amount: 存款金额
-            
+        
         Returns:
             存款结果
         """
-        self._ensure_user_exists(user_id, username)
-        
         # 验证存款金额
         if amount < self.min_deposit:
+            self.store.ensure_user(user_id, username)
             return {
                 "success": False,
                 "message": f"存款金额不能少于 {self.min_deposit} 金币"
             }
         
         if amount > self.max_deposit:
+            self.store.ensure_user(user_id, username)
             return {
                 "success": False,
                 "message": f"单次存款不能超过 {self.max_deposit} 金币"
             }
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 获取用户当前信息
-            cursor.execute('''
-                SELECT money, bank_money FROM users WHERE user_id = ?
-            ''', (user_id,))
-            
-            user_data = cursor.fetchone()
-            if not user_data:
-                return {"success": False, "message": "用户数据错误"}
-            
-            current_money, current_bank_money = user_data
-            
-            # 检查现金是否足够
-            if current_money < amount:
-                return {
-                    "success": False,
-                    "message": f"现金不足！当前现金：{current_money} 金币，需要：{amount} 金币"
-                }
-            
-            # 更新用户资金
-            new_money = current_money - amount
-            new_bank_money = current_bank_money + amount
-            
-            cursor.execute('''
-                UPDATE users 
-                SET money = ?, bank_money = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (new_money, new_bank_money, user_id))
-            
-            # 记录交易
-            cursor.execute('''
-                INSERT INTO bank_transactions 
-                (user_id, transaction_type, amount, balance_before, balance_after)
-                VALUES (?, 'deposit', ?, ?, ?)
-            ''', (user_id, amount, current_bank_money, new_bank_money))
-            
-            conn.commit()
+            with self.store.write(user_id) as session:
+                session.ensure_user(user_id, username)
+                
+                # 获取用户当前信息
+                user = session.get_user(user_id)
+                if not user:
+                    return {"success": False, "message": "用户数据错误"}
+                
+                current_money, current_bank_money = user['money'], user['bank_money']
+                
+                # 检查现金是否足够
+                if current_money < amount:
+                    return {
+                        "success": False,
+                        "message": f"现金不足！当前现金：{current_money} 金币，需要：{amount} 金币"
+                    }
+                
+                # 更新用户资金
+                new_money = current_money - amount
+                new_bank_money = current_bank_money + amount
+                
+                session.update_user(user_id, {"money": new_money, "bank_money": new_bank_money})
+                
+                # 记录交易
+                session.add_transaction(user_id, 'deposit', amount, current_bank_money, new_bank_money)
             
             return {
                 "success": True,
@@ -123,15 +92,12 @@ class BankManager:
                 "new_bank_money": new_bank_money,
                 "total_assets": new_money + new_bank_money
             }
-            
+        
         except Exception as e:
-            conn.rollback()
             return {
                 "success": False,
                 "message": f"存款失败：{str(e)}"
             }
-        finally:
-            conn.close()
     
     def withdraw(self, user_id: str, username: str, amount: int) -> Dict[str, Any]:
         """
@@ -141,82 +107,61 @@ class BankManager:
             user_id: 用户ID
             username: 用户名
             amount: 取款金额
-            
+        
         Returns:
             取款结果
         """
-        self._ensure_user_exists(user_id, username)
-        
         # 验证取款金额
         if amount < self.min_withdraw:
+            self.store.ensure_user(user_id, username)
             return {
                 "success": False,
                 "message": f"取款金额不能少于 {self.min_withdraw} 金币"
             }
         
         if amount > self.max_withdraw:
+            self.store.ensure_user(user_id, username)
             return {
                 "success": False,
                 "message": f"单次取款不能超过 {self.max_withdraw} 金币"
             }
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 检查每日取款限额
-            today = date.today()
-            cursor.execute('''
-                SELECT SUM(amount) FROM bank_transactions 
-                WHERE user_id = ? AND transaction_type = 'withdraw' 
-                AND date(created_at) = ?
-            ''', (user_id, today))
-            
-            today_withdraw = cursor.fetchone()[0] or 0
-            
-            if today_withdraw + amount > self.daily_withdraw_limit:
-                remaining = self.daily_withdraw_limit - today_withdraw
-                return {
-                    "success": False,
-                    "message": f"超过每日取款限额！今日已取款：{today_withdraw}，剩余额度：{remaining}"
-                }
-            
-            # 获取用户当前信息
-            cursor.execute('''
-                SELECT money, bank_money FROM users WHERE user_id = ?
-            ''', (user_id,))
-            
-            user_data = cursor.fetchone()
-            if not user_data:
-                return {"success": False, "message": "用户数据错误"}
-            
-            current_money, current_bank_money = user_data
-            
-            # 检查银行余额是否足够
-            if current_bank_money < amount:
-                return {
-                    "success": False,
-                    "message": f"银行余额不足！当前余额：{current_bank_money} 金币，需要：{amount} 金币"
-                }
-            
-            # 更新用户资金
-            new_money = current_money + amount
-            new_bank_money = current_bank_money - amount
-            
-            cursor.execute('''
-                UPDATE users 
-                SET money = ?, bank_money = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (new_money, new_bank_money, user_id))
-            
-            # 记录交易
-            cursor.execute('''
-                INSERT INTO bank_transactions 
-                (user_id, transaction_type, amount, balance_before, balance_after)
-                VALUES (?, 'withdraw', ?, ?, ?)
-            ''', (user_id, amount, current_bank_money, new_bank_money))
-            
-            conn.commit()
+            with self.store.write(user_id) as session:
+                session.ensure_user(user_id, username)
+                
+                # 检查每日取款限额
+                today_withdraw = session.transaction_sum(user_id, 'withdraw', date.today())
+                
+                if today_withdraw + amount > self.daily_withdraw_limit:
+                    remaining = self.daily_withdraw_limit - today_withdraw
+                    return {
+                        "success": False,
+                        "message": f"超过每日取款限额！今日已取款：{today_withdraw}，剩余额度：{remaining}"
+                    }
+                
+                # 获取用户当前信息
+                user = session.get_user(user_id)
+                if not user:
+                    return {"success": False, "message": "用户数据错误"}
+                
+                current_money, current_bank_money = user['money'], user['bank_money']
+                
+                # 检查银行余额是否足够
+                if current_bank_money < amount:
+                    return {
+                        "success": False,
+                        "message": f"银行余额不足！当前余额：{current_bank_money} 金币，需要：{amount} 金币"
+                    }
+                
+                # 更新用户资金
+                new_money = current_money + amount
+                new_bank_money = current_bank_money - amount
+                
+                session.update_user(user_id, {"money": new_money, "bank_money": new_bank_money})
+                
+                # 记录交易
+                session.add_transaction(user_id, 'withdraw', amount, current_bank_money, new_bank_money)
             
             return {
                 "success": True,
@@ -228,15 +173,12 @@ class BankManager:
                 "today_withdraw": today_withdraw + amount,
                 "remaining_limit": self.daily_withdraw_limit - today_withdraw - amount
             }
-            
+        
         except Exception as e:
-            conn.rollback()
             return {
                 "success": False,
                 "message": f"取款失败：{str(e)}"
             }
-        finally:
-            conn.close()
     
     def get_bank_info(self, user_id: str, username: str) -> Dict[str, Any]:
         """
@@ -245,22 +187,25 @@ class BankManager:
         Returns:
             银行信息
         """
-        self._ensure_user_exists(user_id, username)
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 获取用户基本信息
-            cursor.execute('''
-                SELECT money, bank_money, username FROM users WHERE user_id = ?
-            ''', (user_id,))
+            self.store.ensure_user(user_id, username)
             
-            user_data = cursor.fetchone()
-            if not user_data:
-                return {"error": "用户数据不存在"}
+            with self.store.read(user_id) as session:
+                # 获取用户基本信息
+                user = session.get_user(user_id)
+                if not user:
+                    return {"error": "用户数据不存在"}
+                
+                # 获取今日取款额度
+                today_withdraw = session.transaction_sum(user_id, 'withdraw', date.today())
+                
+                # 获取银行统计（用户统计表）
+                stats = session.user_stats(user_id)
+                
+                # 获取最近交易记录
+                recent_transactions = session.recent_transactions(user_id, 5)
             
-            money, bank_money, username = user_data
+            money, bank_money, username = user['money'], user['bank_money'], user['username']
             total_assets = money + bank_money
             
             # 判断是否为VIP用户
@@ -270,39 +215,8 @@ class BankManager:
             # 计算每日利息
             daily_interest = int(bank_money * current_interest_rate)
             
-            # 获取今日取款额度
-            today = date.today()
-            cursor.execute('''
-                SELECT SUM(amount) FROM bank_transactions 
-                WHERE user_id = ? AND transaction_type = 'withdraw' 
-                AND date(created_at) = ?
-            ''', (user_id, today))
-            
-            today_withdraw = cursor.fetchone()[0] or 0
             remaining_withdraw = self.daily_withdraw_limit - today_withdraw
             
-            # 获取银行统计
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_transactions,
-                    SUM(CASE WHEN transaction_type = 'deposit' THEN amount ELSE 0 END) as total_deposits,
-                    SUM(CASE WHEN transaction_type = 'withdraw' THEN amount ELSE 0 END) as total_withdraws
-                FROM bank_transactions WHERE user_id = ?
-            ''', (user_id,))
-            
-            stats = cursor.fetchone()
-            
-            # 获取最近交易记录
-            cursor.execute('''
-                SELECT transaction_type, amount, created_at
-                FROM bank_transactions 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT 5
-            ''', (user_id,))
-            
-            recent_transactions = cursor.fetchall()
-            
             return {
                 "username": username,
                 "money": money,
@@ -322,17 +236,15 @@ class BankManager:
                     "max_withdraw": self.max_withdraw
                 },
                 "stats": {
-                    "total_transactions": stats[0],
-                    "total_deposits": stats[1] or 0,
-                    "total_withdraws": stats[2] or 0
+                    "total_transactions": stats["bank_transactions"],
+                    "total_deposits": stats["bank_deposits"],
+                    "total_withdraws": stats["bank_withdraws"]
                 },
                 "recent_transactions": recent_transactions
             }
-            
+        
         except Exception as e:
             return {"error": f"获取银行信息失败：{str(e)}"}
-        finally:
-            conn.close()
     
     def transfer(self, from_user_id: str, to_user_id: str, from_username: str, 
                 to_username: str, amount: int) -> Dict[str, Any]:
@@ -345,7 +257,7 @@ class BankManager:
             from_username: 转出用户名
             to_username: 转入用户名
             amount: 转账金额
-            
+        
         Returns:
             转账结果
         """
@@ -364,67 +276,36 @@ class BankManager:
                 "message": f"单次转账不能超过 {self.max_deposit} 金币"
             }
         
-        self._ensure_user_exists(from_user_id, from_username)
-        self._ensure_user_exists(to_user_id, to_username)
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 获取转出用户信息
-            cursor.execute('''
-                SELECT bank_money FROM users WHERE user_id = ?
-            ''', (from_user_id,))
-            
-            from_user = cursor.fetchone()
-            if not from_user or from_user[0] < amount:
-                return {
-                    "success": False,
-                    "message": f"银行余额不足！当前余额：{from_user[0] if from_user else 0} 金币"
-                }
-            
-            # 获取转入用户信息
-            cursor.execute('''
-                SELECT bank_money FROM users WHERE user_id = ?
-            ''', (to_user_id,))
-            
-            to_user = cursor.fetchone()
-            if not to_user:
-                return {"success": False, "message": "转入用户不存在"}
-            
-            # 执行转账
-            new_from_balance = from_user[0] - amount
-            new_to_balance = to_user[0] + amount
-            
-            # 更新转出用户
-            cursor.execute('''
-                UPDATE users 
-                SET bank_money = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (new_from_balance, from_user_id))
-            
-            # 更新转入用户
-            cursor.execute('''
-                UPDATE users 
-                SET bank_money = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (new_to_balance, to_user_id))
-            
-            # 记录转出交易
-            cursor.execute('''
-                INSERT INTO bank_transactions 
-                (user_id, transaction_type, amount, balance_before, balance_after)
-                VALUES (?, 'transfer_out', ?, ?, ?)
-            ''', (from_user_id, amount, from_user[0], new_from_balance))
-            
-            # 记录转入交易
-            cursor.execute('''
-                INSERT INTO bank_transactions 
-                (user_id, transaction_type, amount, balance_before, balance_after)
-                VALUES (?, 'transfer_in', ?, ?, ?)
-            ''', (to_user_id, amount, to_user[0], new_to_balance))
-            
-            conn.commit()
+            # 双方的修改在同一个写事务中提交
+            with self.store.write(from_user_id, to_user_id) as session:
+                session.ensure_user(from_user_id, from_username)
+                session.ensure_user(to_user_id, to_username)
+                
+                # 获取转出用户信息
+                from_user = session.get_user(from_user_id)
+                from_balance = from_user['bank_money'] if from_user else 0
+                if not from_user or from_balance < amount:
+                    return {
+                        "success": False,
+                        "message": f"银行余额不足！当前余额：{from_balance} 金币"
+                    }
+                
+                # 获取转入用户信息
+                to_user = session.get_user(to_user_id)
+                if not to_user:
+                    return {"success": False, "message": "转入用户不存在"}
+                
+                # 执行转账
+                new_from_balance = from_balance - amount
+                new_to_balance = to_user['bank_money'] + amount
+                
+                session.update_user(from_user_id, {"bank_money": new_from_balance})
+                session.update_user(to_user_id, {"bank_money": new_to_balance})
+                
+                # 记录转出、转入交易
+                session.add_transaction(from_user_id, 'transfer_out', amount, from_balance, new_from_balance)
+                session.add_transaction(to_user_id, 'transfer_in', amount, to_user['bank_money'], new_to_balance)
             
             return {
                 "success": True,
@@ -434,15 +315,12 @@ class BankManager:
                 "new_from_balance": new_from_balance,
                 "new_to_balance": new_to_balance
             }
-            
+        
         except Exception as e:
-            conn.rollback()
             return {
                 "success": False,
                 "message": f"转账失败：{str(e)}"
             }
-        finally:
-            conn.close()
     
     def apply_daily_interest(self) -> Dict[str, Any]:
         """
@@ -451,20 +329,43 @@ class BankManager:
         Returns:
             利息应用结果
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        total_interest = 0
+        processed_users = 0
         
         try:
-            # 获取所有有存款的用户
-            cursor.execute('''
-                SELECT user_id, bank_money FROM users WHERE bank_money > 0
-            ''')
-            
-            users = cursor.fetchall()
-            total_interest = 0
-            processed_users = 0
+            # 每个分区在各自的事务中结算
+            for partition in self.store.partitions():
+                interest, processed = self._apply_partition_interest(partition)
+                total_interest += interest
+                processed_users += processed
             
-            for user_id, bank_money in users:
+            return {
+                "success": True,
+                "processed_users": processed_users,
+                "total_interest": total_interest
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"应用利息失败：{str(e)}",
+                "processed_users": processed_users,
+                "total_interest": total_interest
+            }
+    
+    def _apply_partition_interest(self, partition: Any) -> Tuple[int, int]:
+        """
+        为一个分区中有存款的用户结算利息
+        
+        Returns:
+            (利息总额, 处理的用户数)
+        """
+        total_interest = 0
+        processed_users = 0
+        
+        with self.store.write_partition(partition) as session:
+            # 获取所有有存款的用户
+            for user_id, bank_money in session.bank_balances():
                 # 判断用户类型和利率
                 is_vip = bank_money >= self.vip_threshold
                 rate = self.vip_interest_rate if is_vip else self.interest_rate
@@ -475,36 +376,11 @@ class BankManager:
                 if interest > 0:
                     new_bank_money = bank_money + interest
                     
-                    # 更新用户银行余额
-                    cursor.execute('''
-                        UPDATE users 
-                        SET bank_money = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE user_id = ?
-                    ''', (new_bank_money, user_id))
-                    
-                    # 记录利息交易
-                    cursor.execute('''
-                        INSERT INTO bank_transactions 
-                        (user_id, transaction_type, amount, balance_before, balance_after)
-                        VALUES (?, 'interest', ?, ?, ?)
-                    ''', (user_id, interest, bank_money, new_bank_money))
+                    # 更新用户银行余额并记录利息交易
+                    session.update_user(user_id, {"bank_money": new_bank_money})
+                    session.add_transaction(user_id, 'interest', interest, bank_money, new_bank_money)
                     
                     total_interest += interest
                     processed_users += 1
-            
-            conn.commit()
-            
-            return {
-                "success": True,
-                "processed_users": processed_users,
-                "total_interest": total_interest
-            }
-            
-        except Exception as e:
-            conn.rollback()
-            return {
-                "success": False,
-                "message": f"应用利息失败：{str(e)}"
-            }
-        finally:
-            conn.close()
\ No newline at end of file
+        
+        return total_interest, processed_users
@@ -0,0 +1,286 @@
+"""
+数据库连接层 - 所有管理器通过 connect() 获取 SQLite 连接
+连接和游标在执行语句、读取结果、提交时计时，耗时累加到当前指令的性能指标中，
+并按归一化语句汇总到 SQL 语句分析器
+开启读连接池时（ConnectionPool），只读查询使用池中的只读连接，写事务使用唯一的写连接
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from ..perf.metrics import record_db
+from ..perf.sql import get_sql_profiler
+
+
+logger = logging.getLogger("astrbot")
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    计时游标
+    执行语句和读取结果的耗时都计入该语句，累计超过阈值时记录慢查询
+    """
+    
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+    _slow_logged = False
+    
+    def _after_execute(self, sql, params, seconds: float, executions: int = 1) -> None:
+        """执行语句后记录耗时"""
+        record_db(seconds)
+        
+        profiler = get_sql_profiler()
+        if not profiler.enabled:
+            return
+        
+        self._sql, self._params = sql, params
+        self._elapsed = seconds
+        self._slow_logged = False
+        
+        # 查询语句的行数在读取结果时统计，写入语句记录影响的行数
+        rows = self.rowcount if self.description is None and self.rowcount > 0 else 0
+        profiler.record(sql, seconds, rows=rows, executions=executions)
+        self._check_slow(profiler)
+    
+    def _after_fetch(self, seconds: float, rows: int) -> None:
+        """读取结果后记录耗时和行数"""
+        record_db(seconds)
+        
+        profiler = get_sql_profiler()
+        if not profiler.enabled or self._sql is None:
+            return
+        
+        self._elapsed += seconds
+        profiler.record(self._sql, seconds, rows=rows, executions=0, elapsed=self._elapsed)
+        self._check_slow(profiler)
+    
+    def _check_slow(self, profiler) -> None:
+        """累计耗时超过阈值时记录一次慢查询"""
+        if not self._slow_logged and profiler.is_slow(self._elapsed):
+            self._slow_logged = True
+            profiler.log_slow(self.connection, self._sql, self._params, self._elapsed)
+    
+    def execute(self, sql, parameters=(), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._after_execute(sql, parameters, time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters, /):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # 批量语句不附带执行计划
+            self._after_execute(sql, None, time.perf_counter() - start)
+    
+    def executescript(self, sql_script, /):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_db(time.perf_counter() - start)
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = None
+        try:
+            row = super().fetchone()
+            return row
+        finally:
+            self._after_fetch(time.perf_counter() - start, 0 if row is None else 1)
+    
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchmany(*args, **kwargs)
+            return rows
+        finally:
+            self._after_fetch(time.perf_counter() - start, len(rows))
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchall()
+            return rows
+        finally:
+            self._after_fetch(time.perf_counter() - start, len(rows))
+
+
+class TimedConnection(sqlite3.Connection):
+    """计时连接，cursor() 和 execute() 均返回计时游标"""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+    
+    def executemany(self, *args, **kwargs):
+        return self.cursor().executemany(*args, **kwargs)
+    
+    def executescript(self, *args, **kwargs):
+        return self.cursor().executescript(*args, **kwargs)
+    
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_db(time.perf_counter() - start)
+    
+    def rollback(self):
+        start = time.perf_counter()
+        try:
+            return super().rollback()
+        finally:
+            record_db(time.perf_counter() - start)
+
+
+def connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    """
+    打开数据库连接
+    
+    Args:
+        db_path: 数据库文件路径
+        kwargs: 传给 sqlite3.connect 的其他参数
+    
+    Returns:
+        计时连接
+    """
+    start = time.perf_counter()
+    try:
+        return sqlite3.connect(db_path, factory=TimedConnection, **kwargs)
+    finally:
+        record_db(time.perf_counter() - start)
+
+
+def use_rollback_journal(db_path: str) -> bool:
+    """
+    把 WAL 模式的数据库改回普通日志模式（合并 WAL 文件）
+    跨文件的事务（ATTACH 另一个分片后提交）只有在各文件都使用回滚日志时才由 SQLite 的主日志保证原子提交
+    
+    Returns:
+        是否为普通日志模式（其他连接仍在使用数据库、无法切换时为 False）
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+            return True
+        return conn.execute("PRAGMA journal_mode = DELETE").fetchone()[0].lower() != "wal"
+    except sqlite3.OperationalError as e:
+        logger.warning(f"{db_path} 无法切换为普通日志模式: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+class ConnectionPool:
+    """
+    一个数据库文件的连接池：多个只读连接 + 一个写连接
+    单个数据库文件切换为 WAL 模式，读连接（PRAGMA query_only）读取已提交的快照，不等待写事务；
+    分片数据库（wal=False）保持普通日志模式，跨分片事务仍原子提交，读连接只省去每次打开连接的开销
+    写连接只有一个，由锁保证同一时刻只有一个线程在写，写事务之间在进程内排队而不是在 SQLite 的忙等待中重试
+    
+    读连接用完后放回池中（最多保留 readers 个），池中没有空闲连接时临时打开一个，用完即关闭，
+    嵌套读取（持有读连接时再查询其他分片）不会互相等待
+    """
+    
+    def __init__(self, db_path: str, readers: int, wal: bool = True):
+        self.db_path = db_path
+        self.wal = wal
+        self.readers = max(1, int(readers))
+        self.write_lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+        self._idle_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._closed = False
+        # 打开过的读连接数、用完后因池已满而关闭的读连接数
+        self.opened = 0
+        self.overflow = 0
+        
+        if not wal:
+            use_rollback_journal(db_path)
+            return
+        conn = connect(db_path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+    
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+    
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """借出一个只读连接"""
+        with self._idle_lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self.opened += 1
+        if conn is None:
+            conn = self._open_reader()
+        
+        broken = False
+        try:
+            yield conn
+        except sqlite3.Error:
+            broken = True
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._idle_lock:
+                keep = not broken and not self._closed and len(self._idle) < self.readers
+                if keep:
+                    self._idle.append(conn)
+                else:
+                    self.overflow += 1
+            if not keep:
+                conn.close()
+    
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """独占写连接（持有 write_lock 期间）"""
+        with self.write_lock:
+            if self._writer is None:
+                self._writer = connect(self.db_path, check_same_thread=False)
+            conn = self._writer
+            try:
+                yield conn
+            except BaseException:
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                except sqlite3.Error:
+                    # 连接已不可用，下次使用时重新打开
+                    conn.close()
+                    self._writer = None
+                raise
+    
+    def stats(self) -> Dict[str, int]:
+        with self._idle_lock:
+            return {"readers": self.readers, "idle": len(self._idle),
+                    "opened": self.opened, "overflow": self.overflow}
+    
+    def close(self) -> None:
+        """关闭全部连接（最后一个连接关闭时 SQLite 把 WAL 合并回数据库文件）"""
+        with self._idle_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        with self.write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
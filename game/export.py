@@ -0,0 +1,360 @@
+"""
+数据导出与导入 - 把用户表和全部记录表以 JSONL 或 CSV 流式导出到目录，或从这样的目录导入
+- 每张表一个文件（users.jsonl、work_records.csv 等），CSV 首行为列名，空值写为空字符串
+- 导出用 fetchmany 分批读取、导入用 executemany 分批写入，内存占用与表大小无关
+- 记录表不导出自增 id（各分片的 id 互不相关），导入时重新分配；抢劫记录只导出抢劫者分片中的一份
+- 导入按 user_id 写入所在分片；用户表和按天汇总表按主键 upsert（ON CONFLICT DO UPDATE，已有行原地更新，
+  保留 rowid 并触发目标表、全文索引的 UPDATE 触发器；INSERT OR REPLACE 删除旧行时不会触发 DELETE 触发器），
+  记录表追加
+- CSV 中的空字符串只在可为 NULL 的列中读作 NULL，NOT NULL 列的空文本原样导入
+- 导入进度和数据在同一事务中保存到各分片的 import_progress 表，中断后重新执行同一导入从断点继续，
+  已完成的文件不会重复导入
+
+导入按天汇总表后统计表不会由触发器更新，导入结束时对这些分片重建统计表
+
+示例（在 data/plugins 目录下执行；导入到正在使用的数据库前先备份）：
+python -m astrbot_plugin_linbot.game.export --db astrbot_plugin_linbot/game/user.db --export /tmp/linbot_export
+python -m astrbot_plugin_linbot.game.export --db /tmp/new/user.db --import /tmp/linbot_export
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .db import connect
+from .shards import OWNED_TABLES, shard_index
+
+
+logger = logging.getLogger("astrbot")
+
+# 导出和导入的表（按此顺序），抢劫记录按抢劫者和被抢者写入双方的分片
+EXPORT_TABLES = (*OWNED_TABLES, "robbery_records")
+
+# 按主键 upsert 的表（其余表追加写入）
+_KEYED_TABLES = ("users", "work_daily", "bank_daily", "checkin_daily", "robbery_daily")
+
+FORMATS = ("jsonl", "csv")
+
+# 每批读取和写入的行数
+BATCH_ROWS = 5000
+
+_PROGRESS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS import_progress (
+    source TEXT PRIMARY KEY,
+    line INTEGER NOT NULL
+)
+'''
+
+
+def _columns(conn, table: str) -> List[str]:
+    """导出和导入的列（不含自增 id）"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall() if row[1] != "id"]
+
+
+def _primary_key(conn, table: str) -> List[str]:
+    """主键列（按主键中的顺序）"""
+    rows = [row for row in conn.execute(f"PRAGMA table_info({table})").fetchall() if row[5]]
+    return [row[1] for row in sorted(rows, key=lambda row: row[5])]
+
+
+def _nullable(conn, table: str) -> List[str]:
+    """可为 NULL 的列（主键列除外）"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall() if not row[3] and not row[5]]
+
+
+def _insert_sql(table: str, columns: List[str], keys: Optional[List[str]]) -> str:
+    """写入语句；keys 不为空时按主键 upsert，只更新文件中出现的列"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    if not keys:
+        return sql
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column not in keys)
+    return f"{sql} ON CONFLICT ({', '.join(keys)}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+
+
+def _has_id(conn, table: str) -> bool:
+    return any(row[1] == "id" for row in conn.execute(f"PRAGMA table_info({table})").fetchall())
+
+
+def _has_table(conn, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+# ---- 导出 ----
+
+def _write_rows(handle, fmt: str, columns: List[str]):
+    """返回逐批写入行的函数"""
+    if fmt == "csv":
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        return lambda rows: writer.writerows(["" if value is None else value for value in row] for row in rows)
+    
+    def write(rows):
+        handle.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+    return write
+
+
+def export_data(store, directory: str, fmt: str = "jsonl") -> Dict[str, Any]:
+    """
+    把全部分片的用户表和记录表导出到目录
+    各表分别读取，导出期间仍有写入时表与表之间的时间点不完全一致
+    
+    Args:
+        store: SqliteStore
+        directory: 输出目录（不存在时创建，同名文件被覆盖）
+        fmt: jsonl 或 csv
+    
+    Returns:
+        {'rows': {表: 行数}, 'seconds': 耗时, 'directory': 目录}
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"未知格式 {fmt}（可选: {'/'.join(FORMATS)}）")
+    
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    router = store.router
+    rows: Dict[str, int] = {}
+    
+    for table in EXPORT_TABLES:
+        with store.read_partition(router.paths[0]) as session:
+            if not _has_table(session.conn, table):
+                continue
+            columns = _columns(session.conn, table)
+            order = " ORDER BY id" if _has_id(session.conn, table) else ""
+        robber = columns.index("robber_id") if table == "robbery_records" else None
+        
+        path = os.path.join(directory, f"{table}.{fmt}")
+        partial = path + ".partial"
+        count = 0
+        with open(partial, "w", encoding="utf-8", newline="") as handle:
+            write = _write_rows(handle, fmt, columns)
+            for index, shard in enumerate(router.paths):
+                with store.read_partition(shard) as session:
+                    cursor = session.conn.execute(f"SELECT {', '.join(columns)} FROM {table}{order}")
+                    while True:
+                        batch = cursor.fetchmany(BATCH_ROWS)
+                        if not batch:
+                            break
+                        if robber is not None and router.sharded:
+                            # 跨分片的抢劫记录在双方分片各有一份，只导出抢劫者分片中的
+                            batch = [row for row in batch if shard_index(row[robber], router.count) == index]
+                        write(batch)
+                        count += len(batch)
+        os.replace(partial, path)
+        rows[table] = count
+    
+    return {"rows": rows, "seconds": round(time.perf_counter() - start, 2), "directory": directory}
+
+
+# ---- 导入 ----
+
+def _find_file(directory: str, table: str) -> Optional[Tuple[str, str]]:
+    for fmt in FORMATS:
+        path = os.path.join(directory, f"{table}.{fmt}")
+        if os.path.isfile(path):
+            return path, fmt
+    return None
+
+
+def _read_rows(path: str, fmt: str, allowed: List[str],
+               nullable: Optional[List[str]] = None) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    逐行读取文件
+    
+    Args:
+        path: 文件路径
+        fmt: jsonl 或 csv
+        allowed: 数据库表的列
+        nullable: 可为 NULL 的列，CSV 中这些列的空字符串读作 NULL
+    
+    Returns:
+        (列名, 按列名顺序的行)
+    """
+    handle = open(path, encoding="utf-8", newline="")
+    
+    if fmt == "csv":
+        reader = csv.reader(handle)
+        columns = next(reader, [])
+        empty_is_null = [column in (nullable or ()) for column in columns]
+        
+        def rows():
+            with handle:
+                for row in reader:
+                    yield tuple(None if value == "" and null else value for value, null in zip(row, empty_is_null))
+    else:
+        first = handle.readline()
+        columns = list(json.loads(first)) if first.strip() else []
+        
+        def rows():
+            with handle:
+                line = first
+                while line:
+                    if line.strip():
+                        item = json.loads(line)
+                        yield tuple(item.get(column) for column in columns)
+                    line = handle.readline()
+    
+    if not columns:
+        handle.close()
+        return [], iter(())
+    
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        handle.close()
+        raise ValueError(f"{os.path.basename(path)} 中有数据库没有的列: {', '.join(unknown)}")
+    return columns, rows()
+
+
+def import_data(store, directory: str) -> Dict[str, Any]:
+    """
+    从目录导入用户表和记录表（目录中没有的表跳过），可以在中断后重新执行以继续
+    
+    Args:
+        store: SqliteStore
+        directory: export_data 导出的目录
+    
+    Returns:
+        {'rows': {表: 本次写入的行数}, 'skipped': {表: 之前已导入而跳过的行数}, 'seconds': 耗时, 'rows_per_second': 速率}
+    """
+    from .stats import rebuild_user_stats
+    
+    start = time.perf_counter()
+    router = store.router
+    for shard in router.paths:
+        with store.write_partition(shard) as session:
+            session.conn.execute(_PROGRESS_SCHEMA)
+    
+    written: Dict[str, int] = {}
+    skipped: Dict[str, int] = {}
+    rebuild = set()
+    
+    for table in EXPORT_TABLES:
+        found = _find_file(directory, table)
+        if found is None:
+            continue
+        path, fmt = found
+        
+        with store.read_partition(router.paths[0]) as session:
+            if not _has_table(session.conn, table):
+                logger.warning(f"数据库中没有 {table} 表，跳过 {os.path.basename(path)}")
+                continue
+            allowed = _columns(session.conn, table)
+            nullable = _nullable(session.conn, table)
+            keys = _primary_key(session.conn, table) if table in _KEYED_TABLES else None
+        columns, rows = _read_rows(path, fmt, allowed, nullable)
+        if not columns:
+            continue
+        
+        # 同一文件（按文件名和大小识别）在每个分片中已提交到的行号
+        source = f"{table}:{os.path.basename(path)}:{os.path.getsize(path)}"
+        done = []
+        for shard in router.paths:
+            with store.read_partition(shard) as session:
+                row = session.conn.execute("SELECT line FROM import_progress WHERE source = ?", (source,)).fetchone()
+                done.append(row[0] if row else 0)
+        
+        owner = [columns.index(OWNED_TABLES.get(table, "robber_id"))]
+        if table == "robbery_records":
+            owner.append(columns.index("victim_id"))
+        insert = _insert_sql(table, columns, keys)
+        
+        written[table] = skipped[table] = 0
+        line = 0
+        batches: Dict[int, List[tuple]] = {}
+        pending = 0
+        
+        def flush(last_line: int):
+            # 每个分片的数据和进度在同一事务中提交
+            for index, batch in batches.items():
+                with store.write_partition(router.paths[index]) as session:
+                    session.conn.executemany(insert, batch)
+                    session.conn.execute(
+                        "INSERT OR REPLACE INTO import_progress (source, line) VALUES (?, ?)", (source, last_line)
+                    )
+                written[table] += len(batch)
+                if table in _KEYED_TABLES and table != "users":
+                    rebuild.add(index)
+            batches.clear()
+        
+        for row in rows:
+            line += 1
+            targets = {shard_index(row[position], router.count) for position in owner}
+            for index in targets:
+                if line <= done[index]:
+                    skipped[table] += 1
+                    continue
+                batches.setdefault(index, []).append(row)
+                pending += 1
+            if pending >= BATCH_ROWS:
+                flush(line)
+                pending = 0
+        flush(line)
+    
+    # 汇总表没有维护统计的触发器，导入后从历史记录重建
+    for index in sorted(rebuild):
+        conn = connect(router.paths[index])
+        try:
+            if _has_table(conn, "user_stats"):
+                rebuild_user_stats(conn)
+        finally:
+            conn.close()
+    
+    seconds = time.perf_counter() - start
+    total = sum(written.values())
+    return {
+        "rows": written,
+        "skipped": skipped,
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(total / seconds) if seconds > 0 else total
+    }
+
+
+def main():
+    from .init_db import init_database
+    from .rollup import ensure_rollup_tables
+    from .storage import get_store
+    
+    parser = argparse.ArgumentParser(description="LinBot 数据导出与导入")
+    parser.add_argument("--db", required=True, help="user.db 路径")
+    parser.add_argument("--export", metavar="DIR", help="导出到目录")
+    parser.add_argument("--import", dest="import_dir", metavar="DIR", help="从目录导入（中断后重新执行可继续）")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl", help="导出格式")
+    args = parser.parse_args()
+    
+    if bool(args.export) == bool(args.import_dir):
+        parser.error("需要指定 --export 或 --import 之一")
+    
+    if args.export:
+        if not os.path.exists(args.db):
+            parser.error(f"{args.db} 不存在")
+        result = export_data(get_store(args.db), args.export, args.format)
+        for table, count in result["rows"].items():
+            print(f"  {table}: {count} 行")
+        print(f"✅ 已导出到 {args.export}，耗时 {result['seconds']} 秒")
+        return
+    
+    # 新数据库先建表；统计表、索引和全文索引在插件启动时建立
+    if not os.path.exists(args.db):
+        init_database(args.db, verbose=False)
+    conn = connect(args.db)
+    try:
+        ensure_rollup_tables(conn)
+    finally:
+        conn.close()
+    
+    result = import_data(get_store(args.db), args.import_dir)
+    for table, count in result["rows"].items():
+        line = f"  {table}: {count} 行"
+        if result["skipped"][table]:
+            line += f"（跳过已导入的 {result['skipped'][table]} 行）"
+        print(line)
+    print(f"✅ 导入完成，耗时 {result['seconds']} 秒，{result['rows_per_second']} 行/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,19 @@
 提供多种工作选择、工资计算、工作限制等功能
 """
 
-import sqlite3
-import os
 import random
 from datetime import datetime, date, timedelta
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List
+
+from ..storage import GameStore, NOW, get_store
 
 
 class WorkManager:
     """打工管理器"""
     
-    def __init__(self, db_path: str, config: Dict[str, Any] = None):
+    def __init__(self, db_path: str, config: Dict[str, Any] = None, store: Optional[GameStore] = None):
         self.db_path = db_path
+        self.store = store or get_store(db_path)
         self.config = config or {}
         
         # 从配置获取参数
@@ -101,24 +102,6 @@ class WorkManager:
         
         # 工作限制
         self.daily_work_limit = 10  # 每日最多工作次数
-        
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
-    
-    def _ensure_user_exists(self, user_id: str, username: str) -> None:
-        """确保用户存在于数据库中"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (user_id, username)
-                VALUES (?, ?)
-            ''', (user_id, username))
-            conn.commit()
-        finally:
-            conn.close()
     
     def get_available_jobs(self, user_id: str, username: str) -> List[Dict[str, Any]]:
         """
@@ -127,33 +110,19 @@ class WorkManager:
         Returns:
             可用工作列表
         """
-        self._ensure_user_exists(user_id, username)
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 获取用户等级
-            cursor.execute('SELECT level FROM users WHERE user_id = ?', (user_id,))
-            user_data = cursor.fetchone()
-            user_level = user_data[0] if user_data else 1
-            
-            # 获取今日工作次数
-            today = date.today()
-            cursor.execute('''
-                SELECT COUNT(*) FROM work_records 
-                WHERE user_id = ? AND date(work_time) = ?
-            ''', (user_id, today))
-            today_work_count = cursor.fetchone()[0]
+            self.store.ensure_user(user_id, username)
             
-            # 获取最后工作时间
-            cursor.execute('''
-                SELECT work_type, work_time FROM work_records 
-                WHERE user_id = ? 
-                ORDER BY work_time DESC 
-                LIMIT 10
-            ''', (user_id,))
-            recent_works = cursor.fetchall()
+            with self.store.read(user_id) as session:
+                # 获取用户等级
+                user = session.get_user(user_id)
+                user_level = user['level'] if user else 1
+                
+                # 获取今日工作次数
+                today_work_count = session.work_today(user_id, date.today())[0]
+                
+                # 获取最后工作时间
+                recent_works = session.recent_works(user_id, 10)
             
             available_jobs = []
             
@@ -166,7 +135,7 @@ class WorkManager:
                 can_work = True
                 cooldown_end = None
                 
-                for work_type, work_time in recent_works:
+                for work_type, _, work_time in recent_works:
                     if work_type == job_name:
                         last_work = datetime.strptime(work_time, '%Y-%m-%d %H:%M:%S')
                         # 应用冷却时间倍数
@@ -191,11 +160,9 @@ class WorkManager:
                 "daily_limit": self.daily_work_limit,
                 "can_work_today": today_work_count < self.daily_work_limit
             }
-            
+        
         except Exception as e:
             return {"error": f"获取工作列表失败：{str(e)}"}
-        finally:
-            conn.close()
     
     def work(self, user_id: str, username: str, job_name: str) -> Dict[str, Any]:
         """
@@ -205,14 +172,13 @@ class WorkManager:
             user_id: 用户ID
             username: 用户名
             job_name: 工作名称
-            
+        
         Returns:
             工作结果
         """
-        self._ensure_user_exists(user_id, username)
-        
         # 检查工作是否存在
         if job_name not in self.jobs:
+            self.store.ensure_user(user_id, username)
             return {
                 "success": False,
                 "message": f"工作 '{job_name}' 不存在"
@@ -220,91 +186,67 @@ class WorkManager:
         
         job_config = self.jobs[job_name]
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 获取用户信息
-            cursor.execute('''
-                SELECT money, level, exp, work_count_today, last_work_time
-                FROM users WHERE user_id = ?
-            ''', (user_id,))
-            
-            user_data = cursor.fetchone()
-            if not user_data:
-                return {"success": False, "message": "用户数据错误"}
-            
-            money, level, exp, work_count_today, last_work_time = user_data
-            
-            # 检查等级要求
-            if level < job_config["level_required"]:
-                return {
-                    "success": False,
-                    "message": f"等级不足！需要等级 {job_config['level_required']}，当前等级 {level}"
-                }
-            
-            # 检查今日工作次数
-            today = date.today()
-            cursor.execute('''
-                SELECT COUNT(*) FROM work_records 
-                WHERE user_id = ? AND date(work_time) = ?
-            ''', (user_id, today))
-            today_count = cursor.fetchone()[0]
-            
-            if today_count >= self.daily_work_limit:
-                return {
-                    "success": False,
-                    "message": f"今日工作次数已达上限（{self.daily_work_limit}次）"
-                }
-            
-            # 检查工作冷却时间
-            cursor.execute('''
-                SELECT work_time FROM work_records 
-                WHERE user_id = ? AND work_type = ?
-                ORDER BY work_time DESC 
-                LIMIT 1
-            ''', (user_id, job_name))
-            
-            last_work = cursor.fetchone()
-            if last_work:
-                last_work_time = datetime.strptime(last_work[0], '%Y-%m-%d %H:%M:%S')
-                # 应用冷却时间倍数
-                actual_cooldown_hours = job_config["cooldown_hours"] * self.cooldown_multiplier
-                cooldown_end = last_work_time + timedelta(hours=actual_cooldown_hours)
+            with self.store.write(user_id) as session:
+                session.ensure_user(user_id, username)
+                
+                # 获取用户信息
+                user = session.get_user(user_id)
+                if not user:
+                    return {"success": False, "message": "用户数据错误"}
                 
-                if datetime.now() < cooldown_end:
-                    remaining = cooldown_end - datetime.now()
-                    remaining_minutes = int(remaining.total_seconds() / 60)
+                level = user['level']
+                
+                # 检查等级要求
+                if level < job_config["level_required"]:
                     return {
                         "success": False,
-                        "message": f"工作冷却中，还需等待 {remaining_minutes} 分钟"
+                        "message": f"等级不足！需要等级 {job_config['level_required']}，当前等级 {level}"
                     }
-            
-            # 计算工资和奖励
-            salary_result = self._calculate_salary(job_config, level)
-            
-            # 更新用户信息
-            new_money = money + salary_result["total_earned"]
-            new_exp = exp + salary_result["exp_reward"]
-            new_level = self._calculate_level(new_exp)
-            
-            cursor.execute('''
-                UPDATE users 
-                SET money = ?, exp = ?, level = ?, last_work_time = CURRENT_TIMESTAMP,
-                    total_earned = total_earned + ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (new_money, new_exp, new_level, salary_result["total_earned"], user_id))
-            
-            # 记录工作
-            cursor.execute('''
-                INSERT INTO work_records 
-                (user_id, work_type, base_salary, bonus, total_earned)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, job_name, salary_result["base_salary"], 
-                  salary_result["level_bonus"] + salary_result["luck_bonus"], 
-                  salary_result["total_earned"]))
-            
-            conn.commit()
+                
+                # 检查今日工作次数
+                today_count = session.work_today(user_id, date.today())[0]
+                
+                if today_count >= self.daily_work_limit:
+                    return {
+                        "success": False,
+                        "message": f"今日工作次数已达上限（{self.daily_work_limit}次）"
+                    }
+                
+                # 检查工作冷却时间
+                last_work = session.last_work_time(user_id, job_name)
+                if last_work:
+                    last_work_time = datetime.strptime(last_work, '%Y-%m-%d %H:%M:%S')
+                    # 应用冷却时间倍数
+                    actual_cooldown_hours = job_config["cooldown_hours"] * self.cooldown_multiplier
+                    cooldown_end = last_work_time + timedelta(hours=actual_cooldown_hours)
+                    
+                    if datetime.now() < cooldown_end:
+                        remaining = cooldown_end - datetime.now()
+                        remaining_minutes = int(remaining.total_seconds() / 60)
+                        return {
+                            "success": False,
+                            "message": f"工作冷却中，还需等待 {remaining_minutes} 分钟"
+                        }
+                
+                # 计算工资和奖励
+                salary_result = self._calculate_salary(job_config, level)
+                
+                # 更新用户信息
+                new_money = user['money'] + salary_result["total_earned"]
+                new_exp = user['exp'] + salary_result["exp_reward"]
+                new_level = self._calculate_level(new_exp)
+                
+                session.update_user(
+                    user_id,
+                    {"money": new_money, "exp": new_exp, "level": new_level, "last_work_time": NOW},
+                    {"total_earned": salary_result["total_earned"]}
+                )
+                
+                # 记录工作
+                session.add_work(user_id, job_name, salary_result["base_salary"],
+                                 salary_result["level_bonus"] + salary_result["luck_bonus"],
+                                 salary_result["total_earned"])
             
             # 检查是否升级
             level_up = new_level > level
@@ -319,15 +261,12 @@ class WorkManager:
                 "level_up": level_up,
                 "today_work_count": today_count + 1
             }
-            
+        
         except Exception as e:
-            conn.rollback()
             return {
                 "success": False,
                 "message": f"工作失败：{str(e)}"
             }
-        finally:
-            conn.close()
     
     def _calculate_salary(self, job_config: Dict[str, Any], user_level: int) -> Dict[str, Any]:
         """
@@ -336,7 +275,7 @@ class WorkManager:
         Args:
             job_config: 工作配置
             user_level: 用户等级
-            
+        
         Returns:
             工资计算结果
         """
@@ -374,7 +313,7 @@ class WorkManager:
         
         Args:
             exp: 经验值
-            
+        
         Returns:
             等级
         """
@@ -394,7 +333,7 @@ class WorkManager:
         
         Args:
             exp: 当前经验值
-            
+        
         Returns:
             等级信息字典
         """
@@ -449,76 +388,35 @@ class WorkManager:
         Returns:
             工作统计信息
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 总体统计
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_works,
-                    SUM(total_earned) as total_income,
-                    AVG(total_earned) as avg_income
-                FROM work_records WHERE user_id = ?
-            ''', (user_id,))
-            
-            overall_stats = cursor.fetchone()
-            
-            # 今日统计
-            today = date.today()
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as today_works,
-                    SUM(total_earned) as today_income
-                FROM work_records 
-                WHERE user_id = ? AND date(work_time) = ?
-            ''', (user_id, today))
-            
-            today_stats = cursor.fetchone()
-            
-            # 工作类型统计
-            cursor.execute('''
-                SELECT 
-                    work_type,
-                    COUNT(*) as count,
-                    SUM(total_earned) as total_income,
-                    AVG(total_earned) as avg_income,
-                    MAX(total_earned) as max_income
-                FROM work_records 
-                WHERE user_id = ? 
-                GROUP BY work_type
-                ORDER BY total_income DESC
-            ''', (user_id,))
-            
-            job_stats = cursor.fetchall()
-            
-            # 最近工作记录
-            cursor.execute('''
-                SELECT work_type, total_earned, work_time
-                FROM work_records 
-                WHERE user_id = ? 
-                ORDER BY work_time DESC 
-                LIMIT 5
-            ''', (user_id,))
-            
-            recent_works = cursor.fetchall()
+            with self.store.read(user_id) as session:
+                # 总体统计（用户统计表）
+                stats = session.user_stats(user_id)
+                total_works, total_income = stats["works"], stats["work_income"]
+                
+                # 今日统计
+                today_works, today_income = session.work_today(user_id, date.today())
+                
+                # 工作类型统计
+                job_stats = session.work_by_type(user_id, order_by="income")
+                
+                # 最近工作记录
+                recent_works = session.recent_works(user_id, 5)
             
             return {
                 "overall": {
-                    "total_works": overall_stats[0] or 0,
-                    "total_income": overall_stats[1] or 0,
-                    "avg_income": round(overall_stats[2] or 0, 1)
+                    "total_works": total_works,
+                    "total_income": total_income,
+                    "avg_income": round(total_income / total_works, 1) if total_works else 0
                 },
                 "today": {
-                    "works": today_stats[0] or 0,
-                    "income": today_stats[1] or 0,
-                    "remaining": self.daily_work_limit - (today_stats[0] or 0)
+                    "works": today_works,
+                    "income": today_income,
+                    "remaining": self.daily_work_limit - today_works
                 },
                 "job_stats": job_stats,
                 "recent_works": recent_works
             }
-            
+        
         except Exception as e:
-            return {"error": f"获取统计信息失败：{str(e)}"}
-        finally:
-            conn.close()
\ No newline at end of file
+            return {"error": f"获取统计信息失败：{str(e)}"}
\ No newline at end of file
@@ -7,9 +7,15 @@
 import sqlite3
 import os
 
-def init_database():
-    """初始化游戏数据库"""
-    db_path = os.path.join(os.path.dirname(__file__), 'user.db')
+def init_database(db_path: str = None, verbose: bool = True):
+    """
+    初始化游戏数据库
+    
+    Args:
+        db_path: 数据库文件路径，默认为本目录下的 user.db
+        verbose: 是否输出建表信息
+    """
+    db_path = db_path or os.path.join(os.path.dirname(__file__), 'user.db')
     
     # 连接数据库
     conn = sqlite3.connect(db_path)
@@ -120,15 +126,16 @@ def init_database():
         
         # 提交更改
         conn.commit()
-        print("数据库初始化完成！")
-        print("已创建以下表:")
-        print("- users: 用户主表")
-        print("- bank_transactions: 银行交易记录")
-        print("- work_records: 打工记录")
-        print("- checkin_records: 签到记录")
-        print("- robbery_records: 抢劫记录")
-        print("- user_items: 用户物品")
-        
+        if verbose:
+            print("数据库初始化完成！")
+            print("已创建以下表:")
+            print("- users: 用户主表")
+            print("- bank_transactions: 银行交易记录")
+            print("- work_records: 打工记录")
+            print("- checkin_records: 签到记录")
+            print("- robbery_records: 抢劫记录")
+            print("- user_items: 用户物品")
+    
     except Exception as e:
         print(f"数据库初始化失败: {e}")
         conn.rollback()
@@ -3,35 +3,18 @@
 提供用户个人信息、财富统计、游戏记录等功能
 """
 
-import sqlite3
-import os
-from datetime import datetime, date, timedelta
-from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from ..storage import GameStore, get_store
 
 
 class UserInfoManager:
     """用户信息管理器"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, store: Optional[GameStore] = None):
         self.db_path = db_path
-    
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
-    
-    def _ensure_user_exists(self, user_id: str, username: str) -> None:
-        """确保用户存在于数据库中"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (user_id, username)
-                VALUES (?, ?)
-            ''', (user_id, username))
-            conn.commit()
-        finally:
-            conn.close()
+        self.store = store or get_store(db_path)
     
     def get_user_basic_info(self, user_id: str, username: str) -> Dict[str, Any]:
         """
@@ -40,25 +23,17 @@ class UserInfoManager:
         Returns:
             Dict包含用户基本信息
         """
-        self._ensure_user_exists(user_id, username)
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
+            self.store.ensure_user(user_id, username)
+            
             # 获取用户基本信息
-            cursor.execute('''
-                SELECT username, money, bank_money, total_earned, level, exp,
-                       checkin_streak, total_checkin, created_at, updated_at
-                FROM users WHERE user_id = ?
-            ''', (user_id,))
+            with self.store.read(user_id) as session:
+                user = session.get_user(user_id)
             
-            user_data = cursor.fetchone()
-            if not user_data:
+            if not user:
                 return {'error': '用户数据不存在'}
             
-            (username, money, bank_money, total_earned, level, exp,
-             checkin_streak, total_checkin, created_at, updated_at) = user_data
+            money, bank_money, created_at = user['money'], user['bank_money'], user['created_at']
             
             # 计算总资产
             total_assets = money + bank_money
@@ -71,24 +46,22 @@ class UserInfoManager:
                 days_registered = 1
             
             return {
-                'username': username,
+                'username': user['username'],
                 'money': money,
                 'bank_money': bank_money,
                 'total_assets': total_assets,
-                'total_earned': total_earned,
-                'level': level,
-                'exp': exp,
-                'checkin_streak': checkin_streak,
-                'total_checkin': total_checkin,
+                'total_earned': user['total_earned'],
+                'level': user['level'],
+                'exp': user['exp'],
+                'checkin_streak': user['checkin_streak'],
+                'total_checkin': user['total_checkin'],
                 'days_registered': days_registered,
                 'created_at': created_at,
-                'updated_at': updated_at
+                'updated_at': user['updated_at']
             }
-            
+        
         except Exception as e:
             return {'error': f'获取用户信息失败：{str(e)}'}
-        finally:
-            conn.close()
     
     def get_user_statistics(self, user_id: str) -> Dict[str, Any]:
         """
@@ -97,100 +70,51 @@ class UserInfoManager:
         Returns:
             Dict包含各种统计数据
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
             stats = {}
             
-            # 银行交易统计
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_transactions,
-                    SUM(CASE WHEN transaction_type = 'deposit' THEN amount ELSE 0 END) as total_deposits,
-                    SUM(CASE WHEN transaction_type = 'withdraw' THEN amount ELSE 0 END) as total_withdraws
-                FROM bank_transactions WHERE user_id = ?
-            ''', (user_id,))
+            # 累计统计只需读取一行，按工作类型的统计读取该用户的几行
+            with self.store.read(user_id) as session:
+                totals = session.user_stats(user_id)
+                work_data = session.work_by_type(user_id, order_by="count")
             
-            bank_stats = cursor.fetchone()
+            # 银行交易统计
             stats['bank'] = {
-                'total_transactions': bank_stats[0] or 0,
-                'total_deposits': bank_stats[1] or 0,
-                'total_withdraws': bank_stats[2] or 0
+                'total_transactions': totals['bank_transactions'],
+                'total_deposits': totals['bank_deposits'],
+                'total_withdraws': totals['bank_withdraws']
             }
             
             # 打工统计
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_works,
-                    SUM(total_earned) as total_work_income,
-                    AVG(total_earned) as avg_work_income,
-                    work_type
-                FROM work_records 
-                WHERE user_id = ? 
-                GROUP BY work_type
-                ORDER BY COUNT(*) DESC
-            ''', (user_id,))
-            
-            work_data = cursor.fetchall()
             stats['work'] = {
-                'total_works': sum(row[0] for row in work_data),
-                'total_income': sum(row[1] for row in work_data),
-                'work_types': [(row[3], row[0], row[1]) for row in work_data]  # (类型, 次数, 收入)
+                'total_works': totals['works'],
+                'total_income': totals['work_income'],
+                'work_types': [(row[0], row[1], row[2]) for row in work_data]  # (类型, 次数, 收入)
             }
             
-            # 抢劫统计（作为抢劫者）
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_robberies,
-                    SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_robberies,
-                    SUM(CASE WHEN success = 1 THEN amount ELSE 0 END) as total_robbed
-                FROM robbery_records WHERE robber_id = ?
-            ''', (user_id,))
-            
-            rob_stats = cursor.fetchone()
-            
-            # 被抢统计（作为受害者）
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as times_robbed,
-                    SUM(CASE WHEN success = 1 THEN amount ELSE 0 END) as total_lost
-                FROM robbery_records WHERE victim_id = ?
-            ''', (user_id,))
-            
-            robbed_stats = cursor.fetchone()
-            
+            # 抢劫统计（作为抢劫者 / 作为受害者）
+            robberies = totals['robberies']
+            successful_robberies = totals['rob_successes']
             stats['robbery'] = {
-                'robberies_initiated': rob_stats[0] or 0,
-                'successful_robberies': rob_stats[1] or 0,
-                'total_robbed': rob_stats[2] or 0,
-                'times_robbed': robbed_stats[0] or 0,
-                'total_lost': robbed_stats[1] or 0,
-                'rob_success_rate': round((rob_stats[1] or 0) / max(rob_stats[0] or 1, 1) * 100, 1)
+                'robberies_initiated': robberies,
+                'successful_robberies': successful_robberies,
+                'total_robbed': totals['rob_amount'],
+                'times_robbed': totals['times_robbed'],
+                'total_lost': totals['robbed_amount'],
+                'rob_success_rate': round(successful_robberies / max(robberies, 1) * 100, 1)
             }
             
             # 物品统计
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_items,
-                    SUM(quantity) as total_quantity,
-                    SUM(value * quantity) as total_item_value
-                FROM user_items WHERE user_id = ?
-            ''', (user_id,))
-            
-            item_stats = cursor.fetchone()
             stats['items'] = {
-                'total_items': item_stats[0] or 0,
-                'total_quantity': item_stats[1] or 0,
-                'total_value': item_stats[2] or 0
+                'total_items': totals['items'],
+                'total_quantity': totals['item_quantity'],
+                'total_value': totals['item_value']
             }
             
             return stats
-            
+        
         except Exception as e:
             return {'error': f'获取统计信息失败：{str(e)}'}
-        finally:
-            conn.close()
     
     def get_user_ranking(self, user_id: str) -> Dict[str, Any]:
         """
@@ -199,51 +123,48 @@ class UserInfoManager:
         Returns:
             Dict包含各种排名信息
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            rankings = {}
-            
-            # 金钱排名
-            cursor.execute('''
-                SELECT COUNT(*) + 1 as rank
-                FROM users 
-                WHERE money > (SELECT money FROM users WHERE user_id = ?)
-            ''', (user_id,))
-            rankings['money_rank'] = cursor.fetchone()[0]
-            
-            # 总资产排名
-            cursor.execute('''
-                SELECT COUNT(*) + 1 as rank
-                FROM users 
-                WHERE (money + bank_money) > (
-                    SELECT money + bank_money FROM users WHERE user_id = ?
-                )
-            ''', (user_id,))
-            rankings['assets_rank'] = cursor.fetchone()[0]
-            
-            # 签到排名
-            cursor.execute('''
-                SELECT COUNT(*) + 1 as rank
-                FROM users 
-                WHERE checkin_streak > (SELECT checkin_streak FROM users WHERE user_id = ?)
-                   OR (checkin_streak = (SELECT checkin_streak FROM users WHERE user_id = ?) 
-                       AND total_checkin > (SELECT total_checkin FROM users WHERE user_id = ?))
-            ''', (user_id, user_id, user_id))
-            rankings['checkin_rank'] = cursor.fetchone()[0]
-            
-            # 获取总用户数
-            cursor.execute('SELECT COUNT(*) FROM users WHERE money > 0 OR total_checkin > 0')
-            total_users = cursor.fetchone()[0]
-            rankings['total_users'] = total_users
-            
-            return rankings
+            with self.store.read(user_id) as session:
+                user = session.get_user(user_id)
             
+            # 排名 = 排在前面的人数 + 1（金钱、总资产、签到）
+            return {
+                'money_rank': self.store.count_above("money", user) + 1,
+                'assets_rank': self.store.count_above("assets", user) + 1,
+                'checkin_rank': self.store.count_above("streak", user) + 1,
+                'total_users': self.store.active_users()
+            }
+        
         except Exception as e:
             return {'error': f'获取排名信息失败：{str(e)}'}
-        finally:
-            conn.close()
+    
+    def find_user_by_name(self, name: str) -> Dict[str, Any]:
+        """
+        根据用户名查找用户（精确匹配优先，其次是前缀和包含匹配）
+        
+        Args:
+            name: 用户名或其中一部分
+        
+        Returns:
+            Dict包含 success；找到唯一用户时包含 user_id 和 username，否则包含提示信息
+        """
+        try:
+            matches = self.store.find_users(name, limit=6)
+        
+        except Exception as e:
+            return {"success": False, "message": f"❌ 查找用户失败：{str(e)}"}
+        
+        if not matches:
+            return {"success": False, "message": f"❌ 未找到用户：{name}"}
+        
+        if matches[0][1] == name.strip() or len(matches) == 1:
+            return {"success": True, "user_id": matches[0][0], "username": matches[0][1]}
+        
+        usernames = [username for _, username in matches[:5]]
+        return {
+            "success": False,
+            "message": f"❌ 找到多个匹配用户，请输入更精确的用户名：\n" + "\n".join([f"• {username}" for username in usernames])
+        }
     
     def get_recent_activities(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -252,61 +173,29 @@ class UserInfoManager:
         Args:
             user_id: 用户ID
             limit: 返回记录数限制
-            
+        
         Returns:
             活动记录列表
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        return self.get_activity_page(user_id, limit).get('activities', [])
+    
+    def get_activity_page(self, user_id: str, limit: int = 10, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按页获取用户活动记录（签到、打工、银行、抢劫、被抢）
+        
+        Args:
+            user_id: 用户ID
+            limit: 每页条数
+            cursor: 上一页返回的翻页位置，为空时从最新记录开始
         
+        Returns:
+            Dict包含活动记录列表和下一页位置
+        """
         try:
-            activities = []
-            
-            # 签到记录
-            cursor.execute('''
-                SELECT 'checkin' as type, checkin_date as date, reward_money as amount, 
-                       consecutive_days as extra, created_at
-                FROM checkin_records 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (user_id, limit // 2))
-            
-            for row in cursor.fetchall():
-                activities.append({
-                    'type': row[0],
-                    'date': row[1],
-                    'amount': row[2],
-                    'extra': f"连续{row[3]}天",
-                    'timestamp': row[4]
-                })
-            
-            # 银行交易记录
-            cursor.execute('''
-                SELECT 'bank' as type, transaction_type, amount, created_at
-                FROM bank_transactions 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (user_id, limit // 2))
-            
-            for row in cursor.fetchall():
-                activities.append({
-                    'type': row[0],
-                    'action': row[1],
-                    'amount': row[2],
-                    'timestamp': row[3]
-                })
-            
-            # 按时间排序
-            activities.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            return activities[:limit]
-            
+            return self.store.activity_page(user_id, limit, cursor)
+        
         except Exception as e:
-            return []
-        finally:
-            conn.close()
+            return {'activities': [], 'next_cursor': None, 'error': f'获取活动记录失败：{str(e)}'}
     
     def _get_level_info(self, exp: int) -> Dict[str, int]:
         """
@@ -314,7 +203,7 @@ class UserInfoManager:
         
         Args:
             exp: 当前经验值
-            
+        
         Returns:
             等级信息字典
         """
@@ -3,27 +3,30 @@
 提供多种排行榜查询、图片生成、数据统计等功能
 """
 
-import sqlite3
-import os
-import requests
+from __future__ import annotations
+
 import hashlib
-from datetime import datetime, date
-from typing import Dict, Any, Optional, List, Tuple
-from PIL import Image, ImageDraw, ImageFont
-import io
+from datetime import datetime
+from typing import Dict, Any, Optional, TYPE_CHECKING
+
+from ...perf import measure_render
+from ...render.encoder import get_encoder
+from ...render.fonts import get_font_registry
+from ..storage import GameStore, RANKINGS, get_store, ranking_value
+
+if TYPE_CHECKING:
+    # PIL 仅在生成排行榜图片时导入，纯数据查询无需加载
+    from PIL import Image, ImageDraw
 
 
 class RankingManager:
     """排行榜管理器"""
     
-    def __init__(self, db_path: str, plugin_dir: str):
+    def __init__(self, db_path: str, plugin_dir: str, store: Optional[GameStore] = None):
         self.db_path = db_path
+        self.store = store or get_store(db_path)
         self.plugin_dir = plugin_dir
         
-        # 数据目录
-        self.data_dir = os.path.join("data", "plugins_data", "linbot", "rankings")
-        os.makedirs(self.data_dir, exist_ok=True)
-        
         # 排行榜配置
         self.ranking_types = {
             "money": {"name": "💰 金钱排行榜", "field": "money", "desc": "现金排名"},
@@ -56,37 +59,33 @@ class RankingManager:
             'rank_circle_size': 40
         }
         
-        # 字体配置
-        self.fonts = self._load_fonts()
+        # 字体配置（首次绘制时再加载）
+        self._fonts = None
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+    @property
+    def fonts(self) -> Dict[str, Any]:
+        """字体配置（懒加载）"""
+        if self._fonts is None:
+            self._fonts = self._load_fonts()
+        return self._fonts
+    
+    # 字体名称 -> 字号
+    FONT_SIZES = {
+        'title': 32,
+        'subtitle': 18,
+        'rank': 24,
+        'name': 20,
+        'value': 16,
+        'small': 14
+    }
     
     def _load_fonts(self) -> Dict[str, Any]:
-        """加载字体"""
-        font_path = os.path.join(self.plugin_dir, "assets", "LXGWWenKai-Regular.ttf")
-        
-        try:
-            return {
-                'title': ImageFont.truetype(font_path, 32),
-                'subtitle': ImageFont.truetype(font_path, 18),
-                'rank': ImageFont.truetype(font_path, 24),
-                'name': ImageFont.truetype(font_path, 20),
-                'value': ImageFont.truetype(font_path, 16),
-                'small': ImageFont.truetype(font_path, 14)
-            }
-        except OSError:
-            # 使用默认字体
-            default_font = ImageFont.load_default()
-            return {
-                'title': default_font,
-                'subtitle': default_font,
-                'rank': default_font,
-                'name': default_font,
-                'value': default_font,
-                'small': default_font
-            }
+        """加载字体（来自进程级共享字体缓存）"""
+        return get_font_registry().get_fonts(self.FONT_SIZES)
+    
+    def _font_for(self, name: str, text: str) -> Any:
+        """获取能显示用户名等动态文本的字体（子集缺字时回退完整字体）"""
+        return get_font_registry().font_for(self.FONT_SIZES[name], text)
     
     def get_ranking_data(self, ranking_type: str = "money", limit: int = 10) -> Dict[str, Any]:
         """
@@ -95,7 +94,7 @@ class RankingManager:
         Args:
             ranking_type: 排行榜类型
             limit: 返回条数
-            
+        
         Returns:
             排行榜数据
         """
@@ -103,41 +102,15 @@ class RankingManager:
             return {"error": f"不支持的排行榜类型: {ranking_type}"}
         
         config = self.ranking_types[ranking_type]
-        field = config["field"]
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
         
         try:
-            # 根据排行榜类型构建查询
-            if ranking_type == "level":
-                # 等级排行榜需要特殊处理
-                query = f'''
-                    SELECT user_id, username, {field}, money, bank_money, level, total_checkin
-                    FROM users 
-                    WHERE {field} > 0
-                    ORDER BY level DESC, {field} DESC
-                    LIMIT ?
-                '''
-            else:
-                query = f'''
-                    SELECT user_id, username, {field}, money, bank_money, level, total_checkin
-                    FROM users 
-                    WHERE {field} > 0
-                    ORDER BY {field} DESC
-                    LIMIT ?
-                '''
-            
-            cursor.execute(query, (limit,))
-            results = cursor.fetchall()
-            
-            # 获取总用户数
-            cursor.execute('SELECT COUNT(*) FROM users WHERE money > 0 OR total_checkin > 0')
-            total_users = cursor.fetchone()[0]
+            # 排行榜前 limit 名和总用户数
+            results = self.store.top_users(ranking_type, limit)
+            total_users = self.store.active_users()
             
             ranking_data = []
-            for i, row in enumerate(results, 1):
-                user_id, username, value, money, bank_money, level, total_checkin = row
+            for i, user in enumerate(results, 1):
+                value, level = user['value'], user['level']
                 
                 # 根据排行榜类型格式化显示值
                 if ranking_type == "money":
@@ -155,14 +128,14 @@ class RankingManager:
                 
                 ranking_data.append({
                     'rank': i,
-                    'user_id': user_id,
-                    'username': username,
+                    'user_id': user['user_id'],
+                    'username': user['username'],
                     'value': value,
                     'display_value': display_value,
-                    'money': money,
-                    'bank_money': bank_money,
+                    'money': user['money'],
+                    'bank_money': user['bank_money'],
                     'level': level,
-                    'total_checkin': total_checkin
+                    'total_checkin': user['total_checkin']
                 })
             
             return {
@@ -172,11 +145,9 @@ class RankingManager:
                 'total_users': total_users,
                 'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
-            
+        
         except Exception as e:
             return {"error": f"获取排行榜数据失败：{str(e)}"}
-        finally:
-            conn.close()
     
     def _get_avatar_placeholder(self, username: str, size: int = 50) -> Image.Image:
         """
@@ -185,20 +156,19 @@ class RankingManager:
         Args:
             username: 用户名
             size: 头像尺寸
-            
+        
         Returns:
             头像图片
         """
+        from PIL import Image, ImageDraw
+        
         # 创建圆形头像背景
         avatar = Image.new('RGB', (size, size), self._get_user_color(username))
         draw = ImageDraw.Draw(avatar)
         
         # 绘制用户名首字符
         char = username[0].upper() if username else '?'
-        try:
-            font = ImageFont.truetype(os.path.join(self.plugin_dir, "assets", "LXGWWenKai-Regular.ttf"), size//2)
-        except:
-            font = ImageFont.load_default()
+        font = get_font_registry().font_for(size // 2, char)
         
         # 计算文字位置
         bbox = draw.textbbox((0, 0), char, font=font)
@@ -224,7 +194,7 @@ class RankingManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             颜色hex值
         """
@@ -244,58 +214,68 @@ class RankingManager:
         
         return f'#{r:02x}{g:02x}{b:02x}'
     
-    def generate_ranking_image(self, ranking_data: Dict[str, Any]) -> Optional[str]:
+    def generate_ranking_image(self, ranking_data: Dict[str, Any]) -> Optional[bytes]:
         """
         生成排行榜图片
         
         Args:
             ranking_data: 排行榜数据
-            
+        
         Returns:
-            图片文件路径
+            编码后的图片字节
         """
         if 'error' in ranking_data:
             return None
         
         try:
-            data = ranking_data['data']
-            config = ranking_data['config']
-            
-            # 计算图片高度
-            image_height = (self.layout['header_height'] + 
-                           len(data) * self.layout['item_height'] + 
-                           self.layout['margin'] * 3 + 60)  # 额外空间
-            
-            # 创建图片
-            image = Image.new('RGB', (self.layout['image_width'], image_height), self.colors['background'])
-            draw = ImageDraw.Draw(image)
-            
-            # 绘制头部
-            self._draw_ranking_header(draw, config['name'], ranking_data['update_time'])
-            
-            # 绘制排行榜条目
-            y_offset = self.layout['header_height'] + self.layout['margin']
-            
-            for item in data:
-                self._draw_ranking_item(draw, image, item, y_offset)
-                y_offset += self.layout['item_height']
-            
-            # 绘制底部信息
-            self._draw_ranking_footer(draw, ranking_data['total_users'], 
-                                    len(data), y_offset)
-            
-            # 保存图片
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"ranking_{ranking_data['ranking_type']}_{timestamp}.png"
-            image_path = os.path.join(self.data_dir, filename)
-            image.save(image_path, "PNG", quality=95)
-            
-            return image_path
-            
+            with measure_render():
+                image = self.render_ranking_image(ranking_data)
+                return get_encoder().encode(image, "ranking", flat=True)
+        
         except Exception as e:
             print(f"生成排行榜图片失败: {e}")
             return None
     
+    def render_ranking_image(self, ranking_data: Dict[str, Any]) -> Image.Image:
+        """
+        绘制排行榜图片
+        
+        Args:
+            ranking_data: 排行榜数据
+        
+        Returns:
+            PIL Image 对象
+        """
+        from PIL import Image, ImageDraw
+        
+        data = ranking_data['data']
+        config = ranking_data['config']
+        
+        # 计算图片高度
+        image_height = (self.layout['header_height'] + 
+                       len(data) * self.layout['item_height'] + 
+                       self.layout['margin'] * 3 + 60)  # 额外空间
+        
+        # 创建图片
+        image = Image.new('RGB', (self.layout['image_width'], image_height), self.colors['background'])
+        draw = ImageDraw.Draw(image)
+        
+        # 绘制头部
+        self._draw_ranking_header(draw, config['name'], ranking_data['update_time'])
+        
+        # 绘制排行榜条目
+        y_offset = self.layout['header_height'] + self.layout['margin']
+        
+        for item in data:
+            self._draw_ranking_item(draw, image, item, y_offset)
+            y_offset += self.layout['item_height']
+        
+        # 绘制底部信息
+        self._draw_ranking_footer(draw, ranking_data['total_users'], 
+                                len(data), y_offset)
+        
+        return image
+    
     def _draw_ranking_header(self, draw: ImageDraw.Draw, title: str, update_time: str):
         """绘制排行榜头部"""
         # 绘制头部背景
@@ -322,6 +302,8 @@ class RankingManager:
     def _draw_ranking_item(self, draw: ImageDraw.Draw, image: Image.Image, 
                           item: Dict[str, Any], y_offset: int):
         """绘制排行榜条目"""
+        from PIL import Image
+        
         rank = item['rank']
         username = item['username']
         display_value = item['display_value']
@@ -390,7 +372,7 @@ class RankingManager:
         
         # 添加奖牌emoji
         display_name = f"{medal} {username}" if medal else username
-        draw.text((name_x, name_y), display_name, fill=self.colors['text'], font=self.fonts['name'])
+        draw.text((name_x, name_y), display_name, fill=self.colors['text'], font=self._font_for('name', username))
         
         # 绘制数值
         value_y = y_offset + 45
@@ -421,7 +403,7 @@ class RankingManager:
         Args:
             user_id: 用户ID
             ranking_type: 排行榜类型
-            
+        
         Returns:
             用户排名信息
         """
@@ -429,54 +411,27 @@ class RankingManager:
             return {"error": f"不支持的排行榜类型: {ranking_type}"}
         
         config = self.ranking_types[ranking_type]
-        field = config["field"]
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
         
         try:
             # 获取用户信息
-            cursor.execute(f'''
-                SELECT username, {field}, money, bank_money, level, total_checkin
-                FROM users WHERE user_id = ?
-            ''', (user_id,))
+            with self.store.read(user_id) as session:
+                user = session.get_user(user_id)
             
-            user_data = cursor.fetchone()
-            if not user_data:
+            if not user:
                 return {"error": "用户不存在"}
             
-            username, value, money, bank_money, level, total_checkin = user_data
-            
-            # 计算排名
-            if ranking_type == "level":
-                cursor.execute(f'''
-                    SELECT COUNT(*) + 1 FROM users 
-                    WHERE (level > (SELECT level FROM users WHERE user_id = ?))
-                    OR (level = (SELECT level FROM users WHERE user_id = ?) 
-                        AND {field} > (SELECT {field} FROM users WHERE user_id = ?))
-                ''', (user_id, user_id, user_id))
-            else:
-                cursor.execute(f'''
-                    SELECT COUNT(*) + 1 FROM users 
-                    WHERE {field} > (SELECT {field} FROM users WHERE user_id = ?)
-                ''', (user_id,))
-            
-            rank = cursor.fetchone()[0]
-            
-            # 获取总用户数
-            cursor.execute('SELECT COUNT(*) FROM users WHERE money > 0 OR total_checkin > 0')
-            total_users = cursor.fetchone()[0]
+            # 计算排名（排在前面的人数 + 1）
+            rank = self.store.count_above(ranking_type, user) + 1
+            total_users = self.store.active_users()
             
             return {
                 'rank': rank,
-                'username': username,
-                'value': value,
+                'username': user['username'],
+                'value': ranking_value(user, RANKINGS[ranking_type][0]),
                 'total_users': total_users,
                 'ranking_type': ranking_type,
                 'config': config
             }
-            
+        
         except Exception as e:
             return {"error": f"获取用户排名失败：{str(e)}"}
-        finally:
-            conn.close()
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+可抢劫目标索引 - 现金不低于保护金额的用户按连续编号（1..N）存放在 rob_targets 表中
+用户现金跨过保护金额时由触发器加入或移除（移除时用最后一个编号填补空位），
+随机抽取 k 个目标只需按编号查找 k 次，与用户总数无关
+"""
+
+import random
+from typing import List, Optional, Tuple
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rob_targets (
+    slot INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS rob_target_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    threshold INTEGER NOT NULL
+);
+'''
+
+_TRIGGER_NAMES = ("rob_targets_insert", "rob_targets_enter", "rob_targets_leave", "rob_targets_delete")
+
+_ADD = '''
+    INSERT OR IGNORE INTO rob_targets (slot, user_id)
+    VALUES ((SELECT COALESCE(MAX(slot), 0) + 1 FROM rob_targets), NEW.user_id);
+'''
+
+# 先把要移除的编号取负，再把最后一个编号移到空位上，最后删除
+_REMOVE = '''
+    UPDATE rob_targets SET slot = -slot WHERE user_id = OLD.user_id;
+    UPDATE rob_targets SET slot = (SELECT -slot FROM rob_targets WHERE user_id = OLD.user_id)
+    WHERE slot = (SELECT MAX(slot) FROM rob_targets)
+      AND slot > (SELECT -slot FROM rob_targets WHERE user_id = OLD.user_id);
+    DELETE FROM rob_targets WHERE user_id = OLD.user_id;
+'''
+
+
+def _triggers(threshold: int) -> str:
+    return f'''
+    CREATE TRIGGER rob_targets_insert AFTER INSERT ON users
+    WHEN NEW.money >= {threshold} BEGIN {_ADD} END;
+    
+    CREATE TRIGGER rob_targets_enter AFTER UPDATE OF money ON users
+    WHEN OLD.money < {threshold} AND NEW.money >= {threshold} BEGIN {_ADD} END;
+    
+    CREATE TRIGGER rob_targets_leave AFTER UPDATE OF money ON users
+    WHEN OLD.money >= {threshold} AND NEW.money < {threshold} BEGIN {_REMOVE} END;
+    
+    CREATE TRIGGER rob_targets_delete AFTER DELETE ON users
+    WHEN OLD.money >= {threshold} BEGIN {_REMOVE} END;
+    '''
+
+
+def ensure_rob_targets(conn, threshold: int) -> bool:
+    """
+    创建目标表和触发器；保护金额与上次不同时按新金额重建
+    
+    Args:
+        conn: 数据库连接
+        threshold: 保护金额（现金不低于该值的用户可被抢劫）
+    
+    Returns:
+        是否进行了重建
+    """
+    threshold = int(threshold)
+    conn.executescript(_SCHEMA)
+    row = conn.execute("SELECT threshold FROM rob_target_meta WHERE id = 1").fetchone()
+    if row is not None and row[0] == threshold:
+        return False
+    
+    # 触发器中的保护金额为常量，金额变化时与目标表一起在同一事务中重建
+    script = "BEGIN IMMEDIATE;\n"
+    script += "".join(f"DROP TRIGGER IF EXISTS {name};\n" for name in _TRIGGER_NAMES)
+    script += _triggers(threshold)
+    script += f'''
+    DELETE FROM rob_targets;
+    INSERT INTO rob_targets (slot, user_id)
+    SELECT ROW_NUMBER() OVER (ORDER BY money DESC, user_id), user_id FROM users WHERE money >= {threshold};
+    INSERT OR REPLACE INTO rob_target_meta (id, threshold) VALUES (1, {threshold});
+    COMMIT;
+    '''
+    try:
+        conn.executescript(script)
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def target_count(conn) -> int:
+    """可抢劫目标数（最大编号）"""
+    return conn.execute("SELECT MAX(slot) FROM rob_targets").fetchone()[0] or 0
+
+
+def read_targets(conn, slots: List[int], exclude_user_id: str) -> List[Tuple[str, str, int, int, int]]:
+    """
+    按编号读取目标 [(user_id, username, money, level, 总资产)]，排除抢劫者自己
+    再次按保护金额检查现金，目标表与用户表不一致时也不会返回受保护的用户
+    """
+    if not slots:
+        return []
+    placeholders = ", ".join("?" * len(slots))
+    return conn.execute(f'''
+        SELECT u.user_id, u.username, u.money, u.level, u.money + u.bank_money
+        FROM rob_targets t
+        JOIN users u ON u.user_id = t.user_id
+        JOIN rob_target_meta m ON m.id = 1
+        WHERE t.slot IN ({placeholders}) AND u.user_id != ? AND u.money >= m.threshold
+    ''', (*slots, exclude_user_id)).fetchall()
+
+
+def scan_targets(conn, threshold: int, exclude_user_id: str, count: int) -> List[Tuple[str, str, int, int, int]]:
+    """目标表建立前使用：直接从用户表随机读取至多 count 个现金不低于保护金额的用户（扫描全表）"""
+    return conn.execute('''
+        SELECT user_id, username, money, level, money + bank_money FROM users
+        WHERE money >= ? AND user_id != ?
+        ORDER BY RANDOM()
+        LIMIT ?
+    ''', (int(threshold), exclude_user_id, count)).fetchall()
+
+
+def sample_slots(totals: List[int], count: int, rng: Optional[random.Random] = None) -> List[List[int]]:
+    """
+    在多个目标表（分片）中等概率抽取编号
+    
+    Args:
+        totals: 每个目标表的目标数
+        count: 目标数量（多抽一个，抽到自己时仍有 count 个）
+        rng: 随机数生成器
+    
+    Returns:
+        每个目标表中抽中的编号列表
+    """
+    rng = rng or random
+    total = sum(totals)
+    picked: List[List[int]] = [[] for _ in totals]
+    if total == 0 or count <= 0:
+        return picked
+    
+    # 所有目标表的编号首尾相连，抽取后再换算回各表的编号
+    positions = range(total) if total <= count + 1 else rng.sample(range(total), count + 1)
+    for position in positions:
+        for index, size in enumerate(totals):
+            if position < size:
+                picked[index].append(position + 1)
+                break
+            position -= size
+    return picked
+
+
+def sample_targets(conn, exclude_user_id: str, count: int,
+                   rng: Optional[random.Random] = None) -> List[Tuple[str, str, int, int, int]]:
+    """
+    随机抽取可抢劫目标
+    
+    Args:
+        conn: 数据库连接
+        exclude_user_id: 排除的用户（抢劫者自己）
+        count: 目标数量
+        rng: 随机数生成器
+    
+    Returns:
+        [(user_id, username, money, level, 总资产)]，按现金降序
+    """
+    slots = sample_slots([target_count(conn)], count, rng)[0]
+    rows = read_targets(conn, slots, exclude_user_id)[:count]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
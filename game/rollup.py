@@ -0,0 +1,275 @@
+"""
+历史记录汇总与保留 - 把超过保留期的打工、银行、签到、抢劫记录按用户按天汇总后删除
+数据库体积不再随历史无限增长，累计统计由 stats 模块的统计表维护
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+from typing import Dict, Any, Optional
+
+from .db import connect
+from .shards import get_shard_router
+
+
+logger = logging.getLogger("astrbot")
+
+DEFAULT_RETENTION_DAYS = 90
+
+# 冷却时间、今日次数和取款额度依赖近期原始记录，保留期不能太短
+MIN_RETENTION_DAYS = 7
+
+# 每个事务处理的原始记录 id 范围，避免长时间持有写锁
+CHUNK_ROWS = 20000
+
+# 插件启动后首次汇总的延迟和之后的间隔（秒）
+FIRST_RUN_DELAY = 60
+RUN_INTERVAL = 24 * 3600
+
+ROLLUP_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS work_daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    work_type TEXT NOT NULL,
+    works INTEGER NOT NULL DEFAULT 0,
+    income INTEGER NOT NULL DEFAULT 0,
+    max_income INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, work_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS bank_daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    transaction_type TEXT NOT NULL,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    amount INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, transaction_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS checkin_daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    reward_money INTEGER NOT NULL DEFAULT 0,
+    consecutive_days INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS robbery_daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    role TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    amount INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, role)
+) WITHOUT ROWID;
+'''
+
+# 原始表 -> (时间列, 汇总语句列表)
+# 汇总语句参数均为 (起始id, 结束id, 截止时间)
+_SOURCES = {
+    "work_records": ("work_time", [
+        '''
+        INSERT INTO work_daily (user_id, day, work_type, works, income, max_income)
+        SELECT user_id, substr(work_time, 1, 10), work_type, COUNT(*), SUM(total_earned), MAX(total_earned)
+        FROM work_records
+        WHERE id BETWEEN ? AND ? AND work_time < ?
+        GROUP BY user_id, substr(work_time, 1, 10), work_type
+        ON CONFLICT (user_id, day, work_type) DO UPDATE SET
+            works = works + excluded.works,
+            income = income + excluded.income,
+            max_income = MAX(max_income, excluded.max_income)
+        '''
+    ]),
+    "bank_transactions": ("created_at", [
+        '''
+        INSERT INTO bank_daily (user_id, day, transaction_type, transactions, amount)
+        SELECT user_id, substr(created_at, 1, 10), transaction_type, COUNT(*), SUM(amount)
+        FROM bank_transactions
+        WHERE id BETWEEN ? AND ? AND created_at < ?
+        GROUP BY user_id, substr(created_at, 1, 10), transaction_type
+        ON CONFLICT (user_id, day, transaction_type) DO UPDATE SET
+            transactions = transactions + excluded.transactions,
+            amount = amount + excluded.amount
+        '''
+    ]),
+    "checkin_records": ("created_at", [
+        '''
+        INSERT OR REPLACE INTO checkin_daily (user_id, day, reward_money, consecutive_days)
+        SELECT user_id, checkin_date, reward_money, consecutive_days
+        FROM checkin_records
+        WHERE id BETWEEN ? AND ? AND created_at < ?
+        '''
+    ]),
+    "robbery_records": ("created_at", [
+        '''
+        INSERT INTO robbery_daily (user_id, day, role, attempts, successes, amount)
+        SELECT robber_id, substr(created_at, 1, 10), 'robber', COUNT(*),
+               SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN success = 1 THEN amount ELSE 0 END)
+        FROM robbery_records
+        WHERE id BETWEEN ? AND ? AND created_at < ?
+        GROUP BY robber_id, substr(created_at, 1, 10)
+        ON CONFLICT (user_id, day, role) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            successes = successes + excluded.successes,
+            amount = amount + excluded.amount
+        ''',
+        '''
+        INSERT INTO robbery_daily (user_id, day, role, attempts, successes, amount)
+        SELECT victim_id, substr(created_at, 1, 10), 'victim', COUNT(*),
+               SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN success = 1 THEN amount ELSE 0 END)
+        FROM robbery_records
+        WHERE id BETWEEN ? AND ? AND created_at < ?
+        GROUP BY victim_id, substr(created_at, 1, 10)
+        ON CONFLICT (user_id, day, role) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            successes = successes + excluded.successes,
+            amount = amount + excluded.amount
+        '''
+    ])
+}
+
+ROLLUP_TABLES = ("work_daily", "bank_daily", "checkin_daily", "robbery_daily")
+
+
+def ensure_rollup_tables(conn) -> None:
+    """创建汇总表（已存在时跳过）"""
+    conn.executescript(ROLLUP_SCHEMA)
+
+
+class HistoryRollup:
+    """历史记录汇总器"""
+    
+    def __init__(self, db_path: str, retention_days: int = DEFAULT_RETENTION_DAYS):
+        self.db_path = db_path
+        self.router = get_shard_router(db_path)
+        self.retention_days = retention_days
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        self.router.gather(ensure_rollup_tables)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+    
+    def cutoff(self) -> str:
+        """早于该日期的原始记录会被汇总"""
+        return (date.today() - timedelta(days=self.retention_days)).isoformat()
+    
+    def compact(self) -> Dict[str, Any]:
+        """
+        汇总并删除超过保留期的原始记录
+        
+        Returns:
+            各表汇总的行数和耗时
+        """
+        if not self.enabled:
+            return {"skipped": True, "message": "未启用历史记录保留期"}
+        
+        start = time.perf_counter()
+        cutoff = self.cutoff()
+        moved = {table: 0 for table in _SOURCES}
+        
+        # 每个分片分别汇总
+        for path in self.router.paths:
+            conn = connect(path)
+            try:
+                self._compact_shard(conn, cutoff, moved)
+            finally:
+                conn.close()
+        
+        self.last_result = {
+            "cutoff": cutoff,
+            "moved": moved,
+            "seconds": round(time.perf_counter() - start, 2),
+            "finished_at": time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        return self.last_result
+    
+    @staticmethod
+    def _compact_shard(conn, cutoff: str, moved: Dict[str, int]) -> None:
+        """汇总一个分片中早于 cutoff 的原始记录，删除的行数累加到 moved"""
+        for table, (ts_column, statements) in _SOURCES.items():
+            low, high = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+            if low is None:
+                continue
+            # 按 id 分段，每段在一个事务中完成汇总和删除
+            for chunk_start in range(low, high + 1, CHUNK_ROWS):
+                params = (chunk_start, chunk_start + CHUNK_ROWS - 1, cutoff)
+                try:
+                    for sql in statements:
+                        conn.execute(sql, params)
+                    deleted = conn.execute(
+                        f"DELETE FROM {table} WHERE id BETWEEN ? AND ? AND {ts_column} < ?", params
+                    ).rowcount
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                moved[table] += deleted
+    
+    def status(self) -> Dict[str, Any]:
+        """原始表和汇总表的行数"""
+        def counts(conn):
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in (*_SOURCES, *ROLLUP_TABLES)}
+        
+        # 抢劫记录在双方分片各有一份，跨分片的记录会计入两次
+        shards = self.router.gather(counts)
+        raw = {table: sum(shard[table] for shard in shards) for table in _SOURCES}
+        rollup = {table: sum(shard[table] for shard in shards) for table in ROLLUP_TABLES}
+        return {
+            "retention_days": self.retention_days,
+            "cutoff": self.cutoff() if self.enabled else None,
+            "raw": raw,
+            "rollup": rollup,
+            "last_result": self.last_result
+        }
+    
+    # ---- 定时汇总 ----
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def ensure_started(self) -> None:
+        """在当前事件循环中启动定时汇总（已启动或没有运行中的事件循环时忽略）"""
+        if self.running:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        try:
+            await asyncio.sleep(FIRST_RUN_DELAY)
+            while True:
+                if self.enabled:
+                    try:
+                        result = await asyncio.to_thread(self.compact)
+                        logger.info(f"历史记录汇总完成: {result['moved']}，耗时 {result['seconds']} 秒")
+                    except Exception as e:
+                        logger.error(f"历史记录汇总失败: {e}")
+                await asyncio.sleep(RUN_INTERVAL)
+        except asyncio.CancelledError:
+            pass
+    
+    def stop(self) -> None:
+        """停止定时汇总"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def retention_days_from(settings: Optional[Dict[str, Any]]) -> int:
+    """从性能设置中读取保留天数（0 为不清理）"""
+    days = (settings or {}).get("history_retention_days", DEFAULT_RETENTION_DAYS)
+    if days <= 0:
+        return 0
+    return max(MIN_RETENTION_DAYS, min(int(days), 3650))
@@ -0,0 +1,417 @@
+"""
+分片存储 - 按 user_id 的哈希把用户数据分散到多个 SQLite 文件，每个文件有各自的写锁
+- 0 号分片就是原来的 user.db，其余分片为同目录下的 user.shard{i}.db，分片数记录在 0 号分片的 shard_meta 表中
+- 用户表和打工、银行、签到、物品记录保存在用户所在的分片；抢劫记录同时保存在抢劫者和被抢者的分片中
+- 排行榜、用户名查找等全局查询在每个分片上执行后归并
+- 涉及两个用户的写入（抢劫、转账）把另一个分片 ATTACH 到同一连接上，在一个事务中提交；
+  分片数据库使用回滚日志（不切换 WAL），由 SQLite 的主日志保证两个文件原子提交
+
+未迁移过的数据库只有一个分片，行为与不分片时相同
+
+示例（在 data/plugins 目录下执行，执行前需要停止机器人）：
+python -m astrbot_plugin_linbot.game.shards --db astrbot_plugin_linbot/game/user.db --status
+python -m astrbot_plugin_linbot.game.shards --db astrbot_plugin_linbot/game/user.db --shards 4
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from .db import connect
+
+
+logger = logging.getLogger("astrbot")
+
+MAX_SHARDS = 64
+
+# 附加到连接上的另一个分片的库名
+PEER_SCHEMA = "peer"
+
+_META_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS shard_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    shards INTEGER NOT NULL
+);
+'''
+
+# 迁移时按所属用户拆分的表 {表: 用户列}（汇总表不存在时跳过）
+OWNED_TABLES = {
+    "users": "user_id",
+    "work_records": "user_id",
+    "bank_transactions": "user_id",
+    "checkin_records": "user_id",
+    "user_items": "user_id",
+    "work_daily": "user_id",
+    "bank_daily": "user_id",
+    "checkin_daily": "user_id",
+    "robbery_daily": "user_id",
+}
+
+# 由其他表派生、迁移后重新生成的表（导入进度只对原来的分片有效，迁移时丢弃）
+_DERIVED_TABLES = ("user_stats", "user_work_stats", "rob_targets", "rob_target_meta", "shard_meta",
+                   "import_progress")
+
+# 迁移时每批读取和写入的行数
+COPY_BATCH_ROWS = 5000
+
+
+def shard_index(user_id: str, count: int) -> int:
+    """用户所在的分片序号"""
+    if count <= 1:
+        return 0
+    return zlib.crc32(str(user_id).encode("utf-8")) % count
+
+
+def shard_paths(base_path: str, count: int) -> List[str]:
+    """各分片的文件路径（0 号分片为 base_path）"""
+    root, ext = os.path.splitext(base_path)
+    return [base_path] + [f"{root}.shard{i}{ext}" for i in range(1, count)]
+
+
+def read_shard_count(base_path: str) -> int:
+    """读取分片数（没有分片记录时为 1）"""
+    if not os.path.exists(base_path):
+        return 1
+    conn = sqlite3.connect(base_path)
+    try:
+        row = conn.execute("SELECT shards FROM shard_meta WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else 1
+
+
+class ShardRouter:
+    """按 user_id 选择分片"""
+    
+    def __init__(self, base_path: str, count: Optional[int] = None):
+        self.base_path = base_path
+        self.count = count or read_shard_count(base_path)
+        self.paths = shard_paths(base_path, self.count)
+    
+    @property
+    def sharded(self) -> bool:
+        return self.count > 1
+    
+    def index_of(self, user_id: str) -> int:
+        return shard_index(user_id, self.count)
+    
+    def path_for(self, user_id: str) -> str:
+        return self.paths[self.index_of(user_id)]
+    
+    def connect(self, user_id: Optional[str] = None) -> sqlite3.Connection:
+        """
+        打开用户所在分片的连接
+        
+        Args:
+            user_id: 用户ID，为空时打开 0 号分片
+        """
+        return connect(self.base_path if user_id is None else self.path_for(user_id))
+    
+    def connect_pair(self, user_id: str, peer_id: str) -> Tuple[sqlite3.Connection, str, str]:
+        """
+        打开能同时写入两个用户的连接
+        两人在不同分片时，序号小的分片为 main，另一个分片附加为 peer；
+        写事务总是按分片序号加锁，交叉方向的两笔写入不会互相等待到超时
+        
+        Returns:
+            (连接, user_id 所在的库名, peer_id 所在的库名)
+        """
+        first, second = self.index_of(user_id), self.index_of(peer_id)
+        if first == second:
+            return connect(self.paths[first]), "main", "main"
+        
+        low, high = min(first, second), max(first, second)
+        conn = connect(self.paths[low])
+        try:
+            conn.execute(f"ATTACH DATABASE ? AS {PEER_SCHEMA}", (self.paths[high],))
+        except Exception:
+            conn.close()
+            raise
+        schema = {low: "main", high: PEER_SCHEMA}
+        return conn, schema[first], schema[second]
+    
+    def gather(self, func: Callable[[sqlite3.Connection], Any]) -> List[Any]:
+        """在每个分片上执行 func(连接)，按分片序号返回结果列表"""
+        results = []
+        for path in self.paths:
+            conn = connect(path)
+            try:
+                results.append(func(conn))
+            finally:
+                conn.close()
+        return results
+    
+    def usernames(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        """按用户ID批量查找用户名（到各自所在的分片查找）"""
+        groups: Dict[int, List[str]] = {}
+        for user_id in set(user_ids):
+            groups.setdefault(self.index_of(user_id), []).append(user_id)
+        
+        names = {}
+        for index, ids in groups.items():
+            conn = connect(self.paths[index])
+            try:
+                placeholders = ", ".join("?" * len(ids))
+                names.update(conn.execute(
+                    f"SELECT user_id, username FROM users WHERE user_id IN ({placeholders})", ids
+                ).fetchall())
+            finally:
+                conn.close()
+        return names
+
+
+_routers: Dict[str, ShardRouter] = {}
+
+
+def get_shard_router(base_path: str) -> ShardRouter:
+    """获取数据库对应的分片路由（按路径缓存，分片数在首次获取时读取）"""
+    router = _routers.get(base_path)
+    if router is None:
+        router = _routers[base_path] = ShardRouter(base_path)
+    return router
+
+
+# ---- 迁移 ----
+
+def _source_schema(conn) -> List[str]:
+    """需要复制到新分片的建表和索引语句（不含派生表、全文索引和触发器）"""
+    rows = conn.execute('''
+        SELECT sql FROM sqlite_master
+        WHERE type IN ('table', 'index') AND sql IS NOT NULL
+          AND name NOT LIKE 'sqlite_%' AND tbl_name NOT LIKE 'users_fts%'
+        ORDER BY type DESC, name
+    ''').fetchall()
+    derived = set(_DERIVED_TABLES)
+    statements = []
+    for (sql,) in rows:
+        table = _statement_table(sql)
+        if table not in derived:
+            statements.append(sql)
+    return statements
+
+
+def _statement_table(sql: str) -> str:
+    """建表或建索引语句所作用的表名"""
+    words = sql.replace("(", " ( ").split()
+    upper = [word.upper() for word in words]
+    if upper[1] == "TABLE" or upper[2] == "TABLE":
+        index = upper.index("TABLE") + 1
+        if upper[index:index + 3] == ["IF", "NOT", "EXISTS"]:
+            index += 3
+        return words[index].strip('"')
+    return words[upper.index("ON") + 1].strip('"')
+
+
+def _table_columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _copy_columns(conn, table: str) -> List[str]:
+    """复制时写入的列（自增 id 由新分片重新分配）"""
+    return [column for column in _table_columns(conn, table) if column != "id"]
+
+
+def _has_table(conn, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _copy_rows(sources: List[sqlite3.Connection], targets: List[sqlite3.Connection], table: str,
+               route: Callable[[tuple, int], Iterable[int]]) -> int:
+    """
+    把所有旧分片中的一张表按 route(行, 旧分片序号) 分发到新分片（按 id 顺序，分批读取和写入）
+    
+    Returns:
+        写入的行数
+    """
+    columns = _copy_columns(sources[0], table)
+    column_list = ", ".join(columns)
+    insert = f"INSERT INTO {table} ({column_list}) VALUES ({', '.join('?' * len(columns))})"
+    # 有自增 id 的记录按原顺序写入，同一用户记录的先后不变
+    order = " ORDER BY id" if "id" in _table_columns(sources[0], table) else ""
+    
+    written = 0
+    for old_index, source in enumerate(sources):
+        cursor = source.execute(f"SELECT {column_list} FROM {table}{order}")
+        while True:
+            rows = cursor.fetchmany(COPY_BATCH_ROWS)
+            if not rows:
+                break
+            batches: Dict[int, List[tuple]] = {}
+            for row in rows:
+                for new_index in route(row, old_index):
+                    batches.setdefault(new_index, []).append(row)
+            for new_index, batch in batches.items():
+                targets[new_index].executemany(insert, batch)
+                written += len(batch)
+    return written
+
+
+def _prepare_shard(path: str, rob_threshold: Optional[int]) -> None:
+    """在新分片上建立插件启动时维护的统计表、索引、全文索引和可抢劫目标索引"""
+    from .activity import ensure_activity_indexes
+    from .qiangjie.targets import ensure_rob_targets
+    from .rollup import ensure_rollup_tables
+    from .stats import ensure_user_stats
+    from .user_search import ensure_user_search
+    
+    conn = connect(path)
+    try:
+        ensure_rollup_tables(conn)
+    finally:
+        conn.close()
+    ensure_user_stats(path)
+    
+    conn = connect(path)
+    try:
+        ensure_activity_indexes(conn)
+        ensure_user_search(conn)
+        if rob_threshold is not None:
+            ensure_rob_targets(conn, rob_threshold)
+    finally:
+        conn.close()
+
+
+def migrate_shards(base_path: str, count: int) -> Dict[str, Any]:
+    """
+    把数据库重新分成 count 个分片（也可以合并回 1 个），执行时机器人必须已停止
+    新分片先写入临时文件，全部完成后再替换；原有的分片文件保留为 .bak 备份
+    
+    Args:
+        base_path: 0 号分片（user.db）路径
+        count: 新的分片数
+    
+    Returns:
+        各表写入的行数、备份文件和耗时
+    """
+    if not (1 <= count <= MAX_SHARDS):
+        raise ValueError(f"分片数必须在 1-{MAX_SHARDS} 之间")
+    
+    start = time.perf_counter()
+    old_paths = shard_paths(base_path, read_shard_count(base_path))
+    new_paths = shard_paths(base_path, count)
+    temp_paths = [f"{path}.migrating" for path in new_paths]
+    for path in temp_paths:
+        if os.path.exists(path):
+            os.remove(path)
+    
+    # 开启读连接池时单个数据库为 WAL 模式：先合并 WAL 并改回普通日志模式（分片数据库不使用 WAL），
+    # 旧文件换成备份后不会留下属于旧文件的 -wal 文件
+    for path in old_paths:
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+    
+    sources = [sqlite3.connect(path) for path in old_paths]
+    targets = [sqlite3.connect(path) for path in temp_paths]
+    old_count = len(old_paths)
+    copied: Dict[str, int] = {}
+    try:
+        rob_threshold = None
+        if _has_table(sources[0], "rob_target_meta"):
+            row = sources[0].execute("SELECT threshold FROM rob_target_meta WHERE id = 1").fetchone()
+            rob_threshold = row[0] if row else None
+        
+        schema = _source_schema(sources[0])
+        for target in targets:
+            # 临时文件出错时直接丢弃，写入时不需要日志
+            target.execute("PRAGMA journal_mode = OFF")
+            target.execute("PRAGMA synchronous = OFF")
+            for sql in schema:
+                target.execute(sql)
+        
+        for table, column in OWNED_TABLES.items():
+            if not _has_table(sources[0], table):
+                continue
+            position = _copy_columns(sources[0], table).index(column)
+            
+            def owned(row, old_index, position=position):
+                # 旧分片中不属于本分片的用户行（抢劫的另一方留下的汇总行）不复制
+                user_id = row[position]
+                if shard_index(user_id, old_count) != old_index:
+                    return ()
+                return (shard_index(user_id, count),)
+            
+            copied[table] = _copy_rows(sources, targets, table, owned)
+        
+        # 抢劫记录以抢劫者分片中的一份为准，写入双方的新分片
+        columns = _copy_columns(sources[0], "robbery_records")
+        robber, victim = columns.index("robber_id"), columns.index("victim_id")
+        
+        def both_sides(row, old_index):
+            if shard_index(row[robber], old_count) != old_index:
+                return ()
+            return sorted({shard_index(row[robber], count), shard_index(row[victim], count)})
+        
+        copied["robbery_records"] = _copy_rows(sources, targets, "robbery_records", both_sides)
+        
+        targets[0].executescript(_META_SCHEMA)
+        targets[0].execute("INSERT OR REPLACE INTO shard_meta (id, shards) VALUES (1, ?)", (count,))
+        for target in targets:
+            target.commit()
+    finally:
+        for conn in sources + targets:
+            conn.close()
+    
+    for path in temp_paths:
+        _prepare_shard(path, rob_threshold)
+    
+    # 先备份全部旧文件，再把新文件换上
+    backups = []
+    suffix = time.strftime("%Y%m%d%H%M%S")
+    for path in old_paths:
+        backup = f"{path}.{suffix}.bak"
+        os.replace(path, backup)
+        backups.append(backup)
+    for temp, path in zip(temp_paths, new_paths):
+        os.replace(temp, path)
+    _routers.pop(base_path, None)
+    
+    return {
+        "from": old_count,
+        "to": count,
+        "copied": copied,
+        "backups": backups,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+def shard_status(base_path: str) -> List[Dict[str, Any]]:
+    """各分片的文件大小和用户数"""
+    router = ShardRouter(base_path)
+    counts = router.gather(lambda conn: conn.execute("SELECT COUNT(*) FROM users").fetchone()[0])
+    return [
+        {"path": path, "users": users, "size_mb": round(os.path.getsize(path) / 1048576, 2)}
+        for path, users in zip(router.paths, counts)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinBot 数据库分片迁移")
+    parser.add_argument("--db", required=True, help="user.db 路径")
+    parser.add_argument("--shards", type=int, help="新的分片数（1 为合并回单个文件）")
+    parser.add_argument("--status", action="store_true", help="只显示各分片的用户数")
+    args = parser.parse_args()
+    
+    if args.shards and not args.status:
+        result = migrate_shards(args.db, args.shards)
+        rows = "，".join(f"{table} {rows}" for table, rows in result['copied'].items())
+        print(f"✅ 已从 {result['from']} 个分片迁移到 {result['to']} 个分片，耗时 {result['seconds']} 秒")
+        print(f"   写入行数：{rows}")
+        print(f"   旧文件备份：{', '.join(result['backups'])}")
+    
+    for index, shard in enumerate(shard_status(args.db)):
+        print(f"#{index} {shard['path']}：{shard['users']} 个用户，{shard['size_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+用户统计 - 按用户累计的银行、打工、抢劫、物品统计
+由触发器在写入原始记录的同一事务中增量维护，个人统计只需读取一行；
+统计表可随时从历史记录（汇总表 + 原始记录）重建
+
+示例（在 data/plugins 目录下执行，检查或修复统计表）：
+python -m astrbot_plugin_linbot.game.stats --db astrbot_plugin_linbot/game/user.db --check
+python -m astrbot_plugin_linbot.game.stats --db astrbot_plugin_linbot/game/user.db --rebuild
+"""
+
+import argparse
+import logging
+import time
+from typing import Dict, Any, List
+
+from .db import connect
+from .rollup import ensure_rollup_tables
+
+
+logger = logging.getLogger("astrbot")
+
+STATS_COLUMNS = (
+    "bank_transactions", "bank_deposits", "bank_withdraws",
+    "works", "work_income",
+    "robberies", "rob_successes", "rob_amount",
+    "times_robbed", "robbed_successes", "robbed_amount",
+    "items", "item_quantity", "item_value"
+)
+
+_STATS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {stats} (
+    user_id TEXT PRIMARY KEY,
+    {columns}
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS {work_stats} (
+    user_id TEXT NOT NULL,
+    work_type TEXT NOT NULL,
+    works INTEGER NOT NULL DEFAULT 0,
+    income INTEGER NOT NULL DEFAULT 0,
+    max_income INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, work_type)
+) WITHOUT ROWID;
+'''
+
+
+def _schema(stats: str, work_stats: str) -> str:
+    columns = ",\n    ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in STATS_COLUMNS)
+    return _STATS_SCHEMA.format(stats=stats, work_stats=work_stats, columns=columns)
+
+
+def _upsert(table: str, values: Dict[str, str], source: str = "") -> str:
+    """
+    生成累加式 upsert 语句
+    
+    Args:
+        table: 统计表
+        values: {列名: 表达式}，第一列为 user_id
+        source: 为空时使用 VALUES，否则为 SELECT 的 FROM/WHERE/GROUP BY 部分
+            （INSERT ... SELECT 与 ON CONFLICT 连用时必须带 WHERE 子句以消除语法歧义）
+    """
+    columns = ", ".join(values)
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in values if column != "user_id")
+    if source:
+        body = f"SELECT {', '.join(values.values())} {source}"
+    else:
+        body = f"VALUES ({', '.join(values.values())})"
+    return f"INSERT INTO {table} ({columns}) {body} ON CONFLICT (user_id) DO UPDATE SET {updates}"
+
+
+def _work_upsert(table: str, select: str = "") -> str:
+    """打工分类统计的 upsert（最高收入取较大值）"""
+    body = select or "VALUES (NEW.user_id, NEW.work_type, 1, NEW.total_earned, NEW.total_earned)"
+    return f'''INSERT INTO {table} (user_id, work_type, works, income, max_income) {body}
+            ON CONFLICT (user_id, work_type) DO UPDATE SET
+                works = works + excluded.works,
+                income = income + excluded.income,
+                max_income = MAX(max_income, excluded.max_income)'''
+
+
+_DEPOSIT = "CASE WHEN {t} = 'deposit' THEN {a} ELSE 0 END"
+_WITHDRAW = "CASE WHEN {t} = 'withdraw' THEN {a} ELSE 0 END"
+_SUCCESS = "CASE WHEN {s} = 1 THEN 1 ELSE 0 END"
+_SUCCESS_AMOUNT = "CASE WHEN {s} = 1 THEN {a} ELSE 0 END"
+
+
+def _triggers() -> str:
+    """原始表写入时同步累加统计的触发器（汇总删除原始记录时统计不变，因此只监听插入）"""
+    bank = _upsert("user_stats", {
+        "user_id": "NEW.user_id",
+        "bank_transactions": "1",
+        "bank_deposits": _DEPOSIT.format(t="NEW.transaction_type", a="NEW.amount"),
+        "bank_withdraws": _WITHDRAW.format(t="NEW.transaction_type", a="NEW.amount")
+    })
+    work = _upsert("user_stats", {"user_id": "NEW.user_id", "works": "1", "work_income": "NEW.total_earned"})
+    robber = _upsert("user_stats", {
+        "user_id": "NEW.robber_id",
+        "robberies": "1",
+        "rob_successes": _SUCCESS.format(s="NEW.success"),
+        "rob_amount": _SUCCESS_AMOUNT.format(s="NEW.success", a="NEW.amount")
+    })
+    victim = _upsert("user_stats", {
+        "user_id": "NEW.victim_id",
+        "times_robbed": "1",
+        "robbed_successes": _SUCCESS.format(s="NEW.success"),
+        "robbed_amount": _SUCCESS_AMOUNT.format(s="NEW.success", a="NEW.amount")
+    })
+    
+    def items(row: str, sign: str) -> str:
+        return _upsert("user_stats", {
+            "user_id": f"{row}.user_id",
+            "items": f"{sign}1",
+            "item_quantity": f"{sign}{row}.quantity",
+            "item_value": f"{sign}({row}.value * {row}.quantity)"
+        })
+    
+    return f'''
+    CREATE TRIGGER IF NOT EXISTS user_stats_bank AFTER INSERT ON bank_transactions BEGIN
+        {bank};
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS user_stats_work AFTER INSERT ON work_records BEGIN
+        {work};
+        {_work_upsert("user_work_stats")};
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS user_stats_robbery AFTER INSERT ON robbery_records BEGIN
+        {robber};
+        {victim};
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS user_stats_item_insert AFTER INSERT ON user_items BEGIN
+        {items("NEW", "")};
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS user_stats_item_delete AFTER DELETE ON user_items BEGIN
+        {items("OLD", "-")};
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS user_stats_item_update
+    AFTER UPDATE OF user_id, quantity, value ON user_items BEGIN
+        {items("OLD", "-")};
+        {items("NEW", "")};
+    END;
+    '''
+
+
+def _aggregate(conn, stats: str, work_stats: str) -> None:
+    """从汇总表和原始记录累计统计，写入给定的（空）统计表"""
+    conn.execute(_work_upsert(work_stats, '''
+        SELECT user_id, work_type, SUM(works), SUM(income), MAX(max_income) FROM (
+            SELECT user_id, work_type, works, income, max_income FROM work_daily
+            UNION ALL
+            SELECT user_id, work_type, 1, total_earned, total_earned FROM work_records
+        )
+        WHERE true
+        GROUP BY user_id, work_type
+    '''))
+    
+    statements = [
+        _upsert(stats, {"user_id": "user_id", "works": "SUM(works)", "work_income": "SUM(income)"},
+                f"FROM {work_stats} WHERE true GROUP BY user_id"),
+        _upsert(stats, {
+            "user_id": "user_id",
+            "bank_transactions": "SUM(transactions)",
+            "bank_deposits": f"SUM({_DEPOSIT.format(t='transaction_type', a='amount')})",
+            "bank_withdraws": f"SUM({_WITHDRAW.format(t='transaction_type', a='amount')})"
+        }, '''FROM (
+            SELECT user_id, transaction_type, transactions, amount FROM bank_daily
+            UNION ALL
+            SELECT user_id, transaction_type, 1, amount FROM bank_transactions
+        ) WHERE true GROUP BY user_id'''),
+        _upsert(stats, {
+            "user_id": "user_id",
+            "robberies": "SUM(attempts)", "rob_successes": "SUM(successes)", "rob_amount": "SUM(amount)"
+        }, f'''FROM (
+            SELECT user_id, attempts, successes, amount FROM robbery_daily WHERE role = 'robber'
+            UNION ALL
+            SELECT robber_id, 1, {_SUCCESS.format(s='success')}, {_SUCCESS_AMOUNT.format(s='success', a='amount')}
+            FROM robbery_records
+        ) WHERE true GROUP BY user_id'''),
+        _upsert(stats, {
+            "user_id": "user_id",
+            "times_robbed": "SUM(attempts)", "robbed_successes": "SUM(successes)", "robbed_amount": "SUM(amount)"
+        }, f'''FROM (
+            SELECT user_id, attempts, successes, amount FROM robbery_daily WHERE role = 'victim'
+            UNION ALL
+            SELECT victim_id, 1, {_SUCCESS.format(s='success')}, {_SUCCESS_AMOUNT.format(s='success', a='amount')}
+            FROM robbery_records
+        ) WHERE true GROUP BY user_id'''),
+        _upsert(stats, {
+            "user_id": "user_id",
+            "items": "COUNT(*)", "item_quantity": "SUM(quantity)", "item_value": "SUM(value * quantity)"
+        }, "FROM user_items WHERE true GROUP BY user_id")
+    ]
+    for sql in statements:
+        conn.execute(sql)
+
+
+def ensure_stats_tables(conn) -> bool:
+    """
+    创建统计表和触发器
+    
+    Returns:
+        统计表是否为新建（新建时需要从历史记录重建）
+    """
+    created = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+    ).fetchone() is None
+    ensure_rollup_tables(conn)
+    conn.executescript(_schema("user_stats", "user_work_stats") + _triggers())
+    return created
+
+
+def rebuild_user_stats(conn) -> Dict[str, Any]:
+    """
+    从历史记录重建统计表（单个事务内完成，期间阻塞其他写入）
+    
+    Returns:
+        重建后的行数和耗时
+    """
+    start = time.perf_counter()
+    ensure_stats_tables(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM user_stats")
+        conn.execute("DELETE FROM user_work_stats")
+        _aggregate(conn, "user_stats", "user_work_stats")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    users = conn.execute("SELECT COUNT(*) FROM user_stats").fetchone()[0]
+    return {"users": users, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def check_user_stats(conn) -> Dict[str, Any]:
+    """
+    对比统计表与历史记录的重新累计结果
+    
+    Returns:
+        不一致的用户数和耗时
+    """
+    start = time.perf_counter()
+    ensure_stats_tables(conn)
+    conn.executescript(_schema("temp.check_user_stats", "temp.check_work_stats"))
+    try:
+        conn.execute("BEGIN")
+        _aggregate(conn, "check_user_stats", "check_work_stats")
+        
+        # 物品全部移除后统计行会保留为全零，不视为不一致
+        nonzero = "WHERE bank_transactions OR works OR robberies OR times_robbed OR items"
+        mismatched = conn.execute(f'''
+            SELECT COUNT(DISTINCT user_id) FROM (
+                SELECT user_id FROM (SELECT * FROM user_stats {nonzero} EXCEPT SELECT * FROM check_user_stats)
+                UNION ALL
+                SELECT user_id FROM (SELECT * FROM check_user_stats EXCEPT SELECT * FROM user_stats {nonzero})
+                UNION ALL
+                SELECT user_id FROM (SELECT * FROM user_work_stats EXCEPT SELECT * FROM check_work_stats)
+                UNION ALL
+                SELECT user_id FROM (SELECT * FROM check_work_stats EXCEPT SELECT * FROM user_work_stats)
+            )
+        ''').fetchone()[0]
+        users = conn.execute("SELECT COUNT(*) FROM check_user_stats").fetchone()[0]
+        conn.rollback()
+    finally:
+        conn.executescript("DROP TABLE IF EXISTS temp.check_user_stats; DROP TABLE IF EXISTS temp.check_work_stats;")
+    
+    return {"users": users, "mismatched": mismatched, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def ensure_user_stats(db_path: str) -> None:
+    """创建统计表和触发器，统计表新建时从历史记录重建（插件启动时改为后台重建，见 main）"""
+    conn = connect(db_path)
+    try:
+        if ensure_stats_tables(conn):
+            result = rebuild_user_stats(conn)
+            logger.info(f"用户统计表已从历史记录重建: {result['users']} 个用户，耗时 {result['seconds']} 秒")
+    finally:
+        conn.close()
+
+
+# ---- 统计查询 ----
+
+def read_user_stats(cursor, user_id: str) -> Dict[str, int]:
+    """读取用户的全部累计统计（没有记录时各项为 0）"""
+    cursor.execute(f"SELECT {', '.join(STATS_COLUMNS)} FROM user_stats WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    return dict(zip(STATS_COLUMNS, row or (0,) * len(STATS_COLUMNS)))
+
+
+# 统计表重建完成前（插件启动后在后台重建）从汇总表和原始记录直接累计单个用户
+_USER_AGGREGATES = (
+    (("bank_transactions", "bank_deposits", "bank_withdraws"), f'''
+        SELECT SUM(transactions), SUM({_DEPOSIT.format(t='transaction_type', a='amount')}),
+               SUM({_WITHDRAW.format(t='transaction_type', a='amount')})
+        FROM (
+            SELECT transaction_type, transactions, amount FROM bank_daily WHERE user_id = ?
+            UNION ALL
+            SELECT transaction_type, 1, amount FROM bank_transactions WHERE user_id = ?
+        )'''),
+    (("works", "work_income"), '''
+        SELECT SUM(works), SUM(income) FROM (
+            SELECT works, income FROM work_daily WHERE user_id = ?
+            UNION ALL
+            SELECT 1, total_earned FROM work_records WHERE user_id = ?
+        )'''),
+    (("robberies", "rob_successes", "rob_amount"), f'''
+        SELECT SUM(attempts), SUM(successes), SUM(amount) FROM (
+            SELECT attempts, successes, amount FROM robbery_daily WHERE user_id = ? AND role = 'robber'
+            UNION ALL
+            SELECT 1, {_SUCCESS.format(s='success')}, {_SUCCESS_AMOUNT.format(s='success', a='amount')}
+            FROM robbery_records WHERE robber_id = ?
+        )'''),
+    (("times_robbed", "robbed_successes", "robbed_amount"), f'''
+        SELECT SUM(attempts), SUM(successes), SUM(amount) FROM (
+            SELECT attempts, successes, amount FROM robbery_daily WHERE user_id = ? AND role = 'victim'
+            UNION ALL
+            SELECT 1, {_SUCCESS.format(s='success')}, {_SUCCESS_AMOUNT.format(s='success', a='amount')}
+            FROM robbery_records WHERE victim_id = ?
+        )'''),
+    (("items", "item_quantity", "item_value"),
+     "SELECT COUNT(*), SUM(quantity), SUM(value * quantity) FROM user_items WHERE user_id = ?")
+)
+
+
+def aggregate_user_stats(cursor, user_id: str) -> Dict[str, int]:
+    """从历史记录累计用户的统计（统计表重建完成前代替 read_user_stats，需要扫描该用户的全部记录）"""
+    stats: Dict[str, int] = {}
+    for columns, sql in _USER_AGGREGATES:
+        cursor.execute(sql, (user_id,) * sql.count("?"))
+        stats.update(zip(columns, (value or 0 for value in cursor.fetchone())))
+    return stats
+
+
+def work_by_type(cursor, user_id: str, order_by: str = "income") -> List[tuple]:
+    """
+    按工作类型统计
+    
+    Args:
+        order_by: income 按总收入降序，count 按次数降序
+    
+    Returns:
+        [(工作类型, 次数, 总收入, 平均收入, 最高收入)]
+    """
+    order = "income DESC" if order_by == "income" else "works DESC"
+    cursor.execute(f'''
+        SELECT work_type, works, income, income * 1.0 / works, max_income
+        FROM user_work_stats
+        WHERE user_id = ? AND works > 0
+        ORDER BY {order}
+    ''', (user_id,))
+    return cursor.fetchall()
+
+
+def aggregate_work_by_type(cursor, user_id: str, order_by: str = "income") -> List[tuple]:
+    """从历史记录按工作类型统计（统计表重建完成前代替 work_by_type），返回格式相同"""
+    order = "3 DESC" if order_by == "income" else "2 DESC"
+    cursor.execute(f'''
+        SELECT work_type, SUM(works), SUM(income), SUM(income) * 1.0 / SUM(works), MAX(max_income)
+        FROM (
+            SELECT work_type, works, income, max_income FROM work_daily WHERE user_id = ?
+            UNION ALL
+            SELECT work_type, 1, total_earned, total_earned FROM work_records WHERE user_id = ?
+        )
+        GROUP BY work_type
+        HAVING SUM(works) > 0
+        ORDER BY {order}
+    ''', (user_id, user_id))
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinBot 用户统计表检查与重建")
+    parser.add_argument("--db", required=True, help="user.db 路径")
+    parser.add_argument("--check", action="store_true", help="只检查不一致的用户数")
+    parser.add_argument("--rebuild", action="store_true", help="从历史记录重建统计表")
+    args = parser.parse_args()
+    
+    conn = connect(args.db)
+    try:
+        if args.rebuild:
+            result = rebuild_user_stats(conn)
+            print(f"✅ 已重建 {result['users']} 个用户的统计，耗时 {result['seconds']} 秒")
+        else:
+            result = check_user_stats(conn)
+            print(f"🔍 共 {result['users']} 个用户，不一致 {result['mismatched']} 个，耗时 {result['seconds']} 秒")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+游戏数据存储模块
+"""
+
+import logging
+import os
+from typing import Dict, Any, Optional
+
+from .base import GameStore, StoreSession, NOW, RANKINGS, ranking_value
+from .memory import MemoryStore
+from .sqlite import SqliteStore
+
+logger = logging.getLogger("astrbot")
+
+# 可选的存储引擎
+BACKENDS = ("sqlite", "memory")
+
+# 默认的每分片读连接池大小
+DEFAULT_READ_POOL_SIZE = 4
+
+# {数据库路径: SQLite 存储}
+_sqlite_stores: Dict[str, SqliteStore] = {}
+
+
+def get_store(db_path: str, readers: Optional[int] = None) -> SqliteStore:
+    """
+    获取数据库文件对应的 SQLite 存储（同一路径共享）
+    
+    Args:
+        db_path: user.db 路径
+        readers: 每个分片的读连接池大小，为空时不修改（新建的存储默认不使用连接池）
+    """
+    store = _sqlite_stores.get(db_path)
+    if store is None:
+        store = _sqlite_stores[db_path] = SqliteStore(db_path)
+    if readers is not None:
+        store.configure_pool(readers)
+    return store
+
+
+def open_store(db_path: str, settings: Optional[Dict[str, Any]] = None) -> GameStore:
+    """
+    按性能设置选择存储引擎
+    
+    Args:
+        db_path: user.db 路径
+        settings: performance_settings 配置，storage_backend 为 sqlite 或 memory
+            （memory 从 user.db 载入现有数据，之后的修改只保存在内存中）；
+            read_pool_size 为 sqlite 每个分片的读连接池大小，0 为不使用连接池
+    
+    Returns:
+        存储
+    """
+    settings = settings or {}
+    backend = settings.get("storage_backend", "sqlite")
+    if backend == "memory":
+        return MemoryStore.load(db_path) if os.path.exists(db_path) else MemoryStore()
+    if backend != "sqlite":
+        logger.warning(f"未知的存储引擎 {backend}，使用 sqlite（可选: {'/'.join(BACKENDS)}）")
+    return get_store(db_path, read_pool_size_from(settings))
+
+
+def read_pool_size_from(settings: Optional[Dict[str, Any]]) -> int:
+    """从 performance_settings 读取读连接池大小（0-64，默认 DEFAULT_READ_POOL_SIZE）"""
+    try:
+        size = int((settings or {}).get("read_pool_size", DEFAULT_READ_POOL_SIZE))
+    except (TypeError, ValueError):
+        size = DEFAULT_READ_POOL_SIZE
+    return min(max(size, 0), 64)
+
+
+__all__ = ['GameStore', 'StoreSession', 'NOW', 'RANKINGS', 'ranking_value', 'MemoryStore', 'SqliteStore',
+           'BACKENDS', 'DEFAULT_READ_POOL_SIZE', 'get_store', 'open_store', 'read_pool_size_from']
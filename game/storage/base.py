@@ -0,0 +1,255 @@
+"""
+存储接口 - 管理器只通过 GameStore 和 StoreSession 读写游戏数据，不直接拼写 SQL
+- GameStore: 跨用户的查询（排行榜、用户查找、可抢劫目标、活动记录）和会话的入口
+- StoreSession: 一次读取或一个写事务内对用户、银行流水、打工/签到/抢劫记录、累计统计的操作
+
+写会话正常退出时提交，抛出异常时回滚；同一写会话中的修改对后续读取可见
+"""
+
+from typing import Dict, Any, Optional, List, Tuple, ContextManager
+
+
+# users 表的全部列
+USER_COLUMNS = (
+    "user_id", "username", "money", "bank_money", "total_earned", "level", "exp",
+    "last_checkin", "checkin_streak", "total_checkin", "last_work_time",
+    "work_count_today", "rob_count_today", "robbed_count_today", "created_at", "updated_at"
+)
+
+# 新用户的默认值（created_at、updated_at 为当前时间）
+USER_DEFAULTS = {
+    "money": 0, "bank_money": 0, "total_earned": 0, "level": 1, "exp": 0,
+    "last_checkin": None, "checkin_streak": 0, "total_checkin": 0, "last_work_time": None,
+    "work_count_today": 0, "rob_count_today": 0, "robbed_count_today": 0
+}
+
+# 排行榜: 名称 -> (数值字段, 排序字段)，数值大于 0 的用户参与排名，按排序字段降序
+# assets 为 money + bank_money
+RANKINGS = {
+    "money": ("money", ("money",)),
+    "assets": ("assets", ("assets",)),
+    "earned": ("total_earned", ("total_earned",)),
+    "level": ("exp", ("level", "exp")),
+    "checkin": ("total_checkin", ("total_checkin",)),
+    "streak": ("total_checkin", ("checkin_streak", "total_checkin")),
+}
+
+# 排行榜结果中每个用户包含的字段
+RANKING_FIELDS = ("user_id", "username", "money", "bank_money", "total_earned",
+                  "level", "exp", "checkin_streak", "total_checkin")
+
+
+class _Now:
+    """update_user 的取值：写入当前时间（UTC，与 SQLite CURRENT_TIMESTAMP 相同）"""
+    
+    def __repr__(self) -> str:
+        return "NOW"
+
+
+NOW = _Now()
+
+
+def ranking_value(user: Dict[str, Any], field: str) -> Any:
+    """用户在排行榜字段上的值"""
+    if field == "assets":
+        return user["money"] + user["bank_money"]
+    return user[field]
+
+
+def ranking_key(user: Dict[str, Any], ranking: str) -> Tuple:
+    """用户在排行榜中的排序键（越大越靠前）"""
+    return tuple(ranking_value(user, field) for field in RANKINGS[ranking][1])
+
+
+class StoreSession:
+    """一次读取或一个写事务"""
+    
+    # ---- 用户 ----
+    
+    def ensure_user(self, user_id: str, username: str, rename: bool = False) -> None:
+        """用户不存在时创建；rename 为真时同时更新变化了的用户名"""
+        raise NotImplementedError
+    
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """读取用户的全部列，不存在时为 None"""
+        raise NotImplementedError
+    
+    def update_user(self, user_id: str, values: Optional[Dict[str, Any]] = None,
+                    increments: Optional[Dict[str, int]] = None) -> None:
+        """
+        更新用户（同时更新 updated_at）
+        
+        Args:
+            values: {列名: 新值}，值为 NOW 时写入当前时间
+            increments: {列名: 增量}
+        """
+        raise NotImplementedError
+    
+    # ---- 银行流水 ----
+    
+    def add_transaction(self, user_id: str, transaction_type: str, amount: int,
+                        balance_before: int, balance_after: int) -> None:
+        raise NotImplementedError
+    
+    def transaction_sum(self, user_id: str, transaction_type: str, day) -> int:
+        """某天某类交易的总金额"""
+        raise NotImplementedError
+    
+    def recent_transactions(self, user_id: str, limit: int) -> List[Tuple[str, int, str]]:
+        """最近的交易 [(类型, 金额, 时间)]"""
+        raise NotImplementedError
+    
+    def bank_balances(self) -> List[Tuple[str, int]]:
+        """本会话所在分区中有存款的用户 [(user_id, 存款)]"""
+        raise NotImplementedError
+    
+    # ---- 打工记录 ----
+    
+    def add_work(self, user_id: str, work_type: str, base_salary: int, bonus: int, total_earned: int) -> None:
+        raise NotImplementedError
+    
+    def work_today(self, user_id: str, day) -> Tuple[int, int]:
+        """某天的打工次数和收入"""
+        raise NotImplementedError
+    
+    def last_work_time(self, user_id: str, work_type: str) -> Optional[str]:
+        """某类工作最后一次的时间"""
+        raise NotImplementedError
+    
+    def recent_works(self, user_id: str, limit: int) -> List[Tuple[str, int, str]]:
+        """最近的打工记录 [(工作类型, 收入, 时间)]"""
+        raise NotImplementedError
+    
+    # ---- 签到记录 ----
+    
+    def add_checkin(self, user_id: str, day, reward_money: int, consecutive_days: int) -> None:
+        raise NotImplementedError
+    
+    def checkin_reward(self, user_id: str, day) -> Optional[int]:
+        """某天的签到奖励，未签到时为 None"""
+        raise NotImplementedError
+    
+    def recent_checkins(self, user_id: str, limit: int) -> List[Tuple[str, int, int]]:
+        """最近的签到 [(日期, 奖励, 连续天数)]"""
+        raise NotImplementedError
+    
+    # ---- 抢劫记录 ----
+    
+    def add_robbery(self, robber_id: str, victim_id: str, amount: int, success: bool, message: str) -> None:
+        raise NotImplementedError
+    
+    def last_robbery_time(self, robber_id: str) -> Optional[str]:
+        raise NotImplementedError
+    
+    def recent_robberies(self, user_id: str, role: str, limit: int) -> List[Tuple[str, Optional[str], int, int, str]]:
+        """
+        最近的抢劫记录
+        
+        Args:
+            role: robber 作为抢劫者，victim 作为被抢者
+        
+        Returns:
+            [(对方ID, 对方用户名, 金额, 是否成功, 时间)]
+        """
+        raise NotImplementedError
+    
+    # ---- 累计统计 ----
+    
+    def user_stats(self, user_id: str) -> Dict[str, int]:
+        """用户的全部累计统计（见 stats.STATS_COLUMNS，没有记录时各项为 0）"""
+        raise NotImplementedError
+    
+    def work_by_type(self, user_id: str, order_by: str = "income") -> List[tuple]:
+        """
+        按工作类型统计
+        
+        Args:
+            order_by: income 按总收入降序，count 按次数降序
+        
+        Returns:
+            [(工作类型, 次数, 总收入, 平均收入, 最高收入)]
+        """
+        raise NotImplementedError
+
+
+class GameStore:
+    """游戏数据存储"""
+    
+    # 存储引擎名称
+    name = ""
+    
+    # 累计统计表是否可用；为 False 时（统计表在后台重建中）个人统计从历史记录直接累计
+    stats_ready = True
+    
+    def read(self, user_id: Optional[str] = None) -> ContextManager[StoreSession]:
+        """打开读取 user_id 数据的会话"""
+        raise NotImplementedError
+    
+    def write(self, user_id: str, peer_id: Optional[str] = None) -> ContextManager[StoreSession]:
+        """打开能同时写入 user_id 和 peer_id 的写事务"""
+        raise NotImplementedError
+    
+    def partitions(self) -> List[Any]:
+        """数据分区（SQLite 为分片文件），用于逐个分区处理全部用户的批量操作"""
+        raise NotImplementedError
+    
+    def write_partition(self, partition: Any) -> ContextManager[StoreSession]:
+        """打开一个分区的写事务"""
+        raise NotImplementedError
+    
+    def ensure_user(self, user_id: str, username: str) -> None:
+        """确保用户存在（单独提交）；用户已存在时只读取，只读指令不占用写事务"""
+        with self.read(user_id) as session:
+            if session.get_user(user_id) is not None:
+                return
+        with self.write(user_id) as session:
+            session.ensure_user(user_id, username)
+    
+    # ---- 排行榜 ----
+    
+    def top_users(self, ranking: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        排行榜前 limit 名
+        
+        Returns:
+            [{RANKING_FIELDS..., 'value': 排行榜数值}]，按排名先后（排序键相同的用户先后不确定）
+        """
+        raise NotImplementedError
+    
+    def count_above(self, ranking: str, user: Optional[Dict[str, Any]]) -> int:
+        """排序键大于该用户的人数（用户不存在时为 0）"""
+        raise NotImplementedError
+    
+    def active_users(self) -> int:
+        """有现金或签到过的用户数"""
+        raise NotImplementedError
+    
+    # ---- 用户查找 ----
+    
+    def find_users(self, name: str, limit: int = 6) -> List[Tuple[str, str]]:
+        """按用户名查找 [(user_id, username)]，精确匹配在前，其次是前缀（按用户名）和包含匹配"""
+        raise NotImplementedError
+    
+    def usernames(self, user_ids: List[str]) -> Dict[str, str]:
+        """按用户ID批量查找用户名"""
+        raise NotImplementedError
+    
+    # ---- 可抢劫目标 ----
+    
+    def ensure_targets(self, threshold: int) -> None:
+        """按保护金额准备可抢劫目标（现金不低于该值的用户）"""
+        raise NotImplementedError
+    
+    def defer_targets(self, threshold: int) -> None:
+        """登记保护金额，目标稍后由 ensure_targets 准备；准备完成前 sample_targets 直接按保护金额查找用户"""
+        raise NotImplementedError
+    
+    def sample_targets(self, exclude_user_id: str, count: int, rng=None) -> List[Tuple[str, str, int, int, int]]:
+        """随机抽取可抢劫目标 [(user_id, username, money, level, 总资产)]，按现金降序"""
+        raise NotImplementedError
+    
+    # ---- 活动记录 ----
+    
+    def activity_page(self, user_id: str, limit: int = 10, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """读取一页活动记录，格式见 activity.activity_page"""
+        raise NotImplementedError
@@ -0,0 +1,575 @@
+"""
+内存存储 - 全部数据保存在进程内的字典和有序列表中，进程退出后丢失
+适用于测试、基准和不需要持久化的临时部署；可以从现有的 SQLite 数据库载入初始数据
+
+- 用户: {user_id: 用户字典}
+- 排行榜: 每个排行榜一个按 (排序键..., user_id) 升序的列表，用 bisect 维护，
+  前 N 名从末尾读取，名次为 bisect 得到的位置；可抢劫目标为现金列表中不低于保护金额的一段
+- 用户名: 按 (username, user_id) 升序的列表，精确和前缀匹配用 bisect 定位
+- 记录: 每个用户每类记录一个按时间追加的列表，最近的记录从末尾读取
+- 累计统计: 写入记录时同步累加（与 SQLite 的统计表触发器相同）
+
+所有读写在一把进程内的锁中进行；写会话记录涉及用户的原始状态，异常时恢复
+"""
+
+import itertools
+import random
+import threading
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple, Iterator
+
+from ..activity import ACTIVITY_TYPES, build_page, parse_cursor
+from ..stats import STATS_COLUMNS
+from .base import GameStore, StoreSession, NOW, RANKINGS, RANKING_FIELDS, USER_COLUMNS, USER_DEFAULTS, ranking_key
+
+
+# 比任何 user_id 和用户名都大的字符串，用于 bisect 定位同一排序键的末尾
+_MAX_TEXT = "\U0010ffff"
+
+# 包含匹配的大小写不敏感比较与 SQLite LIKE 一致（只忽略 ASCII 大小写）
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# 记录元组中的字段位置
+# 银行: (id, 类型, 金额, 交易前余额, 交易后余额, 时间)
+# 打工: (id, 工作类型, 基础工资, 奖金, 收入, 时间)
+# 签到: (id, 日期, 奖励, 连续天数, 时间)
+# 抢劫: (id, 抢劫者, 被抢者, 金额, 是否成功, 结果, 时间)
+_RECORD_KINDS = ("bank", "work", "checkin", "robbery", "robbed")
+
+
+def _now() -> str:
+    """当前 UTC 时间（与 SQLite CURRENT_TIMESTAMP 格式相同）"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _text(value: Any) -> Any:
+    """日期按 SQLite 默认适配器的格式保存为文本"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat(" ") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def _is_active(user: Optional[Dict[str, Any]]) -> bool:
+    return user is not None and (user["money"] > 0 or user["total_checkin"] > 0)
+
+
+class MemorySession(StoreSession):
+    """内存存储上的会话（在存储的锁内使用）"""
+    
+    def __init__(self, store: "MemoryStore", writable: bool):
+        self.store = store
+        self.writable = writable
+        # 写会话中涉及用户的原始状态 {user_id: 快照}，回滚时恢复
+        self._snapshots: Dict[str, tuple] = {}
+    
+    def _touch(self, user_id: str) -> None:
+        """首次修改用户前记录快照"""
+        if not self.writable:
+            raise RuntimeError("只读会话不能写入")
+        if user_id not in self._snapshots:
+            self._snapshots[user_id] = self.store._snapshot(user_id)
+    
+    def rollback(self) -> None:
+        for user_id, snapshot in self._snapshots.items():
+            self.store._restore(user_id, snapshot)
+        self._snapshots.clear()
+    
+    # ---- 用户 ----
+    
+    def ensure_user(self, user_id: str, username: str, rename: bool = False) -> None:
+        user = self.store._users.get(user_id)
+        if user is None:
+            self._touch(user_id)
+            now = _now()
+            self.store._put_user(None, dict(USER_DEFAULTS, user_id=user_id, username=username,
+                                            created_at=now, updated_at=now))
+        elif rename and user["username"] != username:
+            self.update_user(user_id, {"username": username})
+    
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user = self.store._users.get(user_id)
+        return dict(user) if user else None
+    
+    def update_user(self, user_id: str, values: Optional[Dict[str, Any]] = None,
+                    increments: Optional[Dict[str, int]] = None) -> None:
+        old = self.store._users.get(user_id)
+        if old is None:
+            return
+        self._touch(user_id)
+        new = dict(old)
+        for column, value in (values or {}).items():
+            new[self.store._column(column)] = _now() if value is NOW else _text(value)
+        for column, amount in (increments or {}).items():
+            new[self.store._column(column)] += amount
+        new["updated_at"] = _now()
+        self.store._put_user(old, new)
+    
+    # ---- 银行流水 ----
+    
+    def add_transaction(self, user_id: str, transaction_type: str, amount: int,
+                        balance_before: int, balance_after: int) -> None:
+        self._touch(user_id)
+        self.store._add_transaction(user_id, transaction_type, amount, balance_before, balance_after, _now())
+    
+    def transaction_sum(self, user_id: str, transaction_type: str, day) -> int:
+        day = _text(day)
+        total = 0
+        for record in reversed(self.store._records["bank"].get(user_id, ())):
+            record_day = record[5][:10]
+            if record_day < day:
+                break
+            if record_day == day and record[1] == transaction_type:
+                total += record[2]
+        return total
+    
+    def recent_transactions(self, user_id: str, limit: int) -> List[Tuple[str, int, str]]:
+        records = self.store._records["bank"].get(user_id, [])
+        return [(record[1], record[2], record[5]) for record in reversed(records[-limit:])]
+    
+    def bank_balances(self) -> List[Tuple[str, int]]:
+        return [(user_id, user["bank_money"]) for user_id, user in self.store._users.items() if user["bank_money"] > 0]
+    
+    # ---- 打工记录 ----
+    
+    def add_work(self, user_id: str, work_type: str, base_salary: int, bonus: int, total_earned: int) -> None:
+        self._touch(user_id)
+        self.store._add_work(user_id, work_type, base_salary, bonus, total_earned, _now())
+    
+    def work_today(self, user_id: str, day) -> Tuple[int, int]:
+        day = _text(day)
+        count = income = 0
+        for record in reversed(self.store._records["work"].get(user_id, ())):
+            record_day = record[5][:10]
+            if record_day < day:
+                break
+            if record_day == day:
+                count += 1
+                income += record[4]
+        return count, income
+    
+    def last_work_time(self, user_id: str, work_type: str) -> Optional[str]:
+        return self.store._last_work.get(user_id, {}).get(work_type)
+    
+    def recent_works(self, user_id: str, limit: int) -> List[Tuple[str, int, str]]:
+        records = self.store._records["work"].get(user_id, [])
+        return [(record[1], record[4], record[5]) for record in reversed(records[-limit:])]
+    
+    # ---- 签到记录 ----
+    
+    def add_checkin(self, user_id: str, day, reward_money: int, consecutive_days: int) -> None:
+        day = _text(day)
+        if self.checkin_reward(user_id, day) is not None:
+            # 与 checkin_records 的 UNIQUE(user_id, checkin_date) 约束相同
+            raise ValueError("UNIQUE constraint failed: checkin_records.user_id, checkin_records.checkin_date")
+        self._touch(user_id)
+        self.store._add_checkin(user_id, day, reward_money, consecutive_days, _now())
+    
+    def checkin_reward(self, user_id: str, day) -> Optional[int]:
+        day = _text(day)
+        for record in reversed(self.store._records["checkin"].get(user_id, ())):
+            if record[1] == day:
+                return record[2]
+            if record[1] < day:
+                break
+        return None
+    
+    def recent_checkins(self, user_id: str, limit: int) -> List[Tuple[str, int, int]]:
+        records = self.store._records["checkin"].get(user_id, [])
+        return [(record[1], record[2], record[3]) for record in reversed(records[-limit:])]
+    
+    # ---- 抢劫记录 ----
+    
+    def add_robbery(self, robber_id: str, victim_id: str, amount: int, success: bool, message: str) -> None:
+        self._touch(robber_id)
+        self._touch(victim_id)
+        self.store._add_robbery(robber_id, victim_id, amount, int(bool(success)), message, _now())
+    
+    def last_robbery_time(self, robber_id: str) -> Optional[str]:
+        records = self.store._records["robbery"].get(robber_id)
+        return records[-1][6] if records else None
+    
+    def recent_robberies(self, user_id: str, role: str, limit: int) -> List[Tuple[str, Optional[str], int, int, str]]:
+        kind, peer = ("robbery", 2) if role == "robber" else ("robbed", 1)
+        records = self.store._records[kind].get(user_id, [])
+        users = self.store._users
+        rows = []
+        for record in reversed(records[-limit:]):
+            peer_user = users.get(record[peer])
+            rows.append((record[peer], peer_user["username"] if peer_user else None, record[3], record[4], record[6]))
+        return rows
+    
+    # ---- 累计统计 ----
+    
+    def user_stats(self, user_id: str) -> Dict[str, int]:
+        stats = self.store._stats.get(user_id)
+        return dict(stats) if stats else dict.fromkeys(STATS_COLUMNS, 0)
+    
+    def work_by_type(self, user_id: str, order_by: str = "income") -> List[tuple]:
+        rows = [(work_type, works, income, income * 1.0 / works, max_income)
+                for work_type, (works, income, max_income) in sorted(self.store._work_stats.get(user_id, {}).items())
+                if works > 0]
+        position = 2 if order_by == "income" else 1
+        rows.sort(key=lambda row: row[position], reverse=True)
+        return rows
+
+
+class MemoryStore(GameStore):
+    """内存存储"""
+    
+    name = "memory"
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users: Dict[str, Dict[str, Any]] = {}
+        
+        # 排行榜和用户名的有序索引
+        self._rankings: Dict[str, List[tuple]] = {ranking: [] for ranking in RANKINGS}
+        self._names: List[Tuple[str, str]] = []
+        self._active = 0
+        
+        # {记录类型: {user_id: [记录]}}，抢劫记录同时出现在抢劫者的 robbery 和被抢者的 robbed 中
+        self._records: Dict[str, Dict[str, List[tuple]]] = {kind: {} for kind in _RECORD_KINDS}
+        self._ids = {kind: itertools.count(1) for kind in ("bank", "work", "checkin", "robbery")}
+        
+        # 累计统计和每类工作最后一次的时间
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._work_stats: Dict[str, Dict[str, List[int]]] = {}
+        self._last_work: Dict[str, Dict[str, str]] = {}
+        
+        self.target_threshold = 0
+    
+    # ---- 会话 ----
+    
+    @contextmanager
+    def read(self, user_id: Optional[str] = None) -> Iterator[MemorySession]:
+        with self._lock:
+            yield MemorySession(self, writable=False)
+    
+    @contextmanager
+    def write(self, user_id: str, peer_id: Optional[str] = None) -> Iterator[MemorySession]:
+        with self._lock:
+            session = MemorySession(self, writable=True)
+            try:
+                yield session
+            except BaseException:
+                session.rollback()
+                raise
+    
+    def partitions(self) -> List[None]:
+        return [None]
+    
+    def write_partition(self, partition: None):
+        return self.write(None)
+    
+    # ---- 用户和索引 ----
+    
+    @staticmethod
+    def _column(column: str) -> str:
+        if column not in USER_DEFAULTS and column not in ("username", "created_at", "updated_at"):
+            raise ValueError(f"未知的用户字段: {column}")
+        return column
+    
+    def _put_user(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """替换用户行并更新有序索引（old 为空时新增，new 为空时删除）"""
+        user_id = (new or old)["user_id"]
+        for ranking, index in self._rankings.items():
+            old_key = ranking_key(old, ranking) + (user_id,) if old else None
+            new_key = ranking_key(new, ranking) + (user_id,) if new else None
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                del index[bisect_left(index, old_key)]
+            if new_key is not None:
+                insort(index, new_key)
+        
+        old_name = (old["username"], user_id) if old else None
+        new_name = (new["username"], user_id) if new else None
+        if old_name != new_name:
+            if old_name is not None:
+                del self._names[bisect_left(self._names, old_name)]
+            if new_name is not None:
+                insort(self._names, new_name)
+        
+        self._active += _is_active(new) - _is_active(old)
+        if new is None:
+            del self._users[user_id]
+        else:
+            self._users[user_id] = new
+    
+    def _snapshot(self, user_id: str) -> tuple:
+        user = self._users.get(user_id)
+        stats = self._stats.get(user_id)
+        work_stats = self._work_stats.get(user_id)
+        last_work = self._last_work.get(user_id)
+        lengths = {kind: len(records[user_id]) for kind, records in self._records.items() if user_id in records}
+        return (
+            dict(user) if user else None,
+            dict(stats) if stats else None,
+            {work_type: list(values) for work_type, values in work_stats.items()} if work_stats else None,
+            dict(last_work) if last_work else None,
+            lengths
+        )
+    
+    def _restore(self, user_id: str, snapshot: tuple) -> None:
+        user, stats, work_stats, last_work, lengths = snapshot
+        current = self._users.get(user_id)
+        if current != user:
+            self._put_user(current, user)
+        
+        for table, value in ((self._stats, stats), (self._work_stats, work_stats), (self._last_work, last_work)):
+            if value is None:
+                table.pop(user_id, None)
+            else:
+                table[user_id] = value
+        
+        for kind, records in self._records.items():
+            if user_id not in records:
+                continue
+            length = lengths.get(kind, 0)
+            if length:
+                del records[user_id][length:]
+            else:
+                del records[user_id]
+    
+    # ---- 记录和统计 ----
+    
+    def _add_stats(self, user_id: str, **amounts: int) -> None:
+        stats = self._stats.get(user_id)
+        if stats is None:
+            stats = self._stats[user_id] = dict.fromkeys(STATS_COLUMNS, 0)
+        for column, amount in amounts.items():
+            stats[column] += amount
+    
+    def _add_transaction(self, user_id, transaction_type, amount, balance_before, balance_after, created_at,
+                         record_id=None, stats=True) -> None:
+        record_id = record_id or next(self._ids["bank"])
+        self._records["bank"].setdefault(user_id, []).append(
+            (record_id, transaction_type, amount, balance_before, balance_after, created_at))
+        if stats:
+            self._add_stats(user_id, bank_transactions=1,
+                            bank_deposits=amount if transaction_type == "deposit" else 0,
+                            bank_withdraws=amount if transaction_type == "withdraw" else 0)
+    
+    def _add_work(self, user_id, work_type, base_salary, bonus, total_earned, work_time,
+                  record_id=None, stats=True) -> None:
+        record_id = record_id or next(self._ids["work"])
+        self._records["work"].setdefault(user_id, []).append(
+            (record_id, work_type, base_salary, bonus, total_earned, work_time))
+        self._last_work.setdefault(user_id, {})[work_type] = work_time
+        if stats:
+            self._add_stats(user_id, works=1, work_income=total_earned)
+            values = self._work_stats.setdefault(user_id, {}).setdefault(work_type, [0, 0, 0])
+            values[0] += 1
+            values[1] += total_earned
+            values[2] = max(values[2], total_earned)
+    
+    def _add_checkin(self, user_id, day, reward_money, consecutive_days, created_at, record_id=None) -> None:
+        record_id = record_id or next(self._ids["checkin"])
+        self._records["checkin"].setdefault(user_id, []).append(
+            (record_id, day, reward_money, consecutive_days, created_at))
+    
+    def _add_robbery(self, robber_id, victim_id, amount, success, message, created_at,
+                     record_id=None, stats=True) -> None:
+        record_id = record_id or next(self._ids["robbery"])
+        record = (record_id, robber_id, victim_id, amount, success, message, created_at)
+        self._records["robbery"].setdefault(robber_id, []).append(record)
+        self._records["robbed"].setdefault(victim_id, []).append(record)
+        if stats:
+            won = amount if success else 0
+            self._add_stats(robber_id, robberies=1, rob_successes=success, rob_amount=won)
+            self._add_stats(victim_id, times_robbed=1, robbed_successes=success, robbed_amount=won)
+    
+    # ---- 排行榜 ----
+    
+    def top_users(self, ranking: str, limit: int) -> List[Dict[str, Any]]:
+        value_field = RANKINGS[ranking][0]
+        with self._lock:
+            users = []
+            for key in reversed(self._rankings[ranking]):
+                if len(users) >= limit:
+                    break
+                user = self._users[key[-1]]
+                value = user["money"] + user["bank_money"] if value_field == "assets" else user[value_field]
+                if value > 0:
+                    users.append(dict({field: user[field] for field in RANKING_FIELDS}, value=value))
+            return users
+    
+    def count_above(self, ranking: str, user: Optional[Dict[str, Any]]) -> int:
+        if user is None:
+            return 0
+        with self._lock:
+            index = self._rankings[ranking]
+            return len(index) - bisect_right(index, ranking_key(user, ranking) + (_MAX_TEXT,))
+    
+    def active_users(self) -> int:
+        return self._active
+    
+    # ---- 用户查找 ----
+    
+    def find_users(self, name: str, limit: int = 6) -> List[Tuple[str, str]]:
+        name = name.strip()
+        if not name or limit <= 0:
+            return []
+        
+        with self._lock:
+            names = self._names
+            results = []
+            
+            # 精确匹配和前缀匹配（按用户名）都是有序列表中的连续一段
+            start = bisect_left(names, (name,))
+            for username, user_id in itertools.islice(names, start, None):
+                if len(results) >= limit or not username.startswith(name):
+                    break
+                results.append((user_id, username))
+            if len(results) >= limit:
+                return results
+            
+            # 包含匹配
+            seen = {user_id for user_id, _ in results}
+            needle = name.translate(_ASCII_LOWER)
+            for user_id, user in self._users.items():
+                if user_id not in seen and needle in user["username"].translate(_ASCII_LOWER):
+                    results.append((user_id, user["username"]))
+                    if len(results) >= limit:
+                        break
+            return results
+    
+    def usernames(self, user_ids: List[str]) -> Dict[str, str]:
+        with self._lock:
+            return {user_id: self._users[user_id]["username"] for user_id in user_ids if user_id in self._users}
+    
+    # ---- 可抢劫目标 ----
+    
+    def ensure_targets(self, threshold: int) -> None:
+        self.target_threshold = int(threshold)
+    
+    def defer_targets(self, threshold: int) -> None:
+        # 目标是现金排行索引的一段，不需要准备
+        self.ensure_targets(threshold)
+    
+    def sample_targets(self, exclude_user_id: str, count: int, rng=None) -> List[Tuple[str, str, int, int, int]]:
+        rng = rng or random
+        with self._lock:
+            # 现金不低于保护金额的用户是现金排行索引末尾的一段
+            index = self._rankings["money"]
+            start = bisect_left(index, (self.target_threshold,))
+            total = len(index) - start
+            if total == 0 or count <= 0:
+                return []
+            positions = range(total) if total <= count + 1 else rng.sample(range(total), count + 1)
+            
+            rows = []
+            for position in positions:
+                user = self._users[index[start + position][-1]]
+                if user["user_id"] != exclude_user_id:
+                    rows.append((user["user_id"], user["username"], user["money"], user["level"],
+                                 user["money"] + user["bank_money"]))
+            rows = rows[:count]
+            rows.sort(key=lambda row: row[2], reverse=True)
+            return rows
+    
+    # ---- 活动记录 ----
+    
+    def _timeline(self, user_id: str, rank: int, after: Optional[Tuple[str, int, int]], limit: int) -> List[tuple]:
+        """一类记录中位于翻页位置之后的至多 limit 条，格式与 activity 模块的时间线相同"""
+        users = self._users
+        rows = []
+        kind = ACTIVITY_TYPES[rank]
+        for record in reversed(self._records[kind].get(user_id, ())):
+            if kind == "work":
+                row = (record[5], rank, record[0], record[1], record[4], None, None)
+            elif kind == "bank":
+                row = (record[5], rank, record[0], record[1], record[2], None, None)
+            elif kind == "checkin":
+                row = (record[4], rank, record[0], record[1], record[2], record[3], None)
+            else:
+                peer = record[2] if kind == "robbery" else record[1]
+                peer_user = users.get(peer)
+                row = (record[6], rank, record[0], record[4], record[3],
+                       peer_user["username"] if peer_user else None, peer)
+            if after is not None and row[:3] >= after:
+                continue
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows
+    
+    def activity_page(self, user_id: str, limit: int = 10, cursor: Optional[str] = None) -> Dict[str, Any]:
+        after = parse_cursor(cursor)
+        with self._lock:
+            rows = [row for rank in range(len(ACTIVITY_TYPES)) for row in self._timeline(user_id, rank, after, limit + 1)]
+        rows.sort(key=lambda row: row[:3], reverse=True)
+        return build_page(rows, limit)
+    
+    # ---- 载入 ----
+    
+    @classmethod
+    def load(cls, db_path: str) -> "MemoryStore":
+        """
+        从 SQLite 数据库（含全部分片）载入用户、记录和累计统计
+        
+        Args:
+            db_path: user.db 路径（0 号分片）
+        
+        Returns:
+            内存存储
+        """
+        from ..db import connect
+        from ..shards import get_shard_router
+        
+        store = cls()
+        router = get_shard_router(db_path)
+        robberies = []
+        for index, path in enumerate(router.paths):
+            conn = connect(path)
+            try:
+                for row in conn.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM users"):
+                    store._put_user(None, dict(zip(USER_COLUMNS, row)))
+                
+                # 历史记录已汇总删除的部分只保留在统计表中，有统计表时直接载入
+                # （抢劫记录的副本会在对方分片中留下对方的统计行，只载入本分片用户的统计）
+                has_stats = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+                ).fetchone() is not None
+                if has_stats:
+                    for row in conn.execute(f"SELECT user_id, {', '.join(STATS_COLUMNS)} FROM user_stats"):
+                        if router.index_of(row[0]) == index:
+                            store._stats[row[0]] = dict(zip(STATS_COLUMNS, row[1:]))
+                    for user_id, work_type, works, income, max_income in conn.execute(
+                            "SELECT user_id, work_type, works, income, max_income FROM user_work_stats"):
+                        if router.index_of(user_id) == index:
+                            store._work_stats.setdefault(user_id, {})[work_type] = [works, income, max_income]
+                
+                for row in conn.execute('''
+                    SELECT user_id, transaction_type, amount, balance_before, balance_after, created_at
+                    FROM bank_transactions ORDER BY created_at, id
+                '''):
+                    store._add_transaction(*row, stats=not has_stats)
+                for row in conn.execute('''
+                    SELECT user_id, work_type, base_salary, bonus, total_earned, work_time
+                    FROM work_records ORDER BY work_time, id
+                '''):
+                    store._add_work(*row, stats=not has_stats)
+                for row in conn.execute('''
+                    SELECT user_id, checkin_date, reward_money, consecutive_days, created_at
+                    FROM checkin_records ORDER BY checkin_date, id
+                '''):
+                    store._add_checkin(*row)
+                
+                # 跨分片的抢劫记录在双方分片中各有一份，只载入抢劫者分片中的一份
+                for row in conn.execute('''
+                    SELECT robber_id, victim_id, amount, success, result_message, created_at, id
+                    FROM robbery_records
+                '''):
+                    if router.index_of(row[0]) == index:
+                        robberies.append((row, has_stats))
+            finally:
+                conn.close()
+        
+        robberies.sort(key=lambda item: (item[0][5], item[0][6]))
+        for (robber_id, victim_id, amount, success, message, created_at, _), has_stats in robberies:
+            store._add_robbery(robber_id, victim_id, amount, int(bool(success)), message, created_at,
+                               stats=not has_stats)
+        return store
@@ -0,0 +1,615 @@
+"""
+SQLite 存储 - 用户数据按 user_id 分片存放在一个或多个 SQLite 文件中（见 shards 模块）
+写事务以 BEGIN IMMEDIATE 开始，涉及两个用户且两人在不同分片时，另一方的分片附加到同一连接上，
+在一个事务中提交；累计统计、可抢劫目标、用户名全文索引由各分片上的触发器维护
+
+开启读连接池（readers > 0）时只读会话和跨分片查询使用池中的只读连接，写事务使用分片唯一的写连接，
+涉及两个分片时按分片序号持有两个分片的写锁。只有一个分片时数据库切换为 WAL 模式，读取不等待写事务；
+分片数据库始终使用回滚日志：SQLite 在 WAL 模式下不保证附加数据库的事务跨文件原子提交，
+崩溃时可能只有一方的扣款或入账落盘
+
+恢复快照期间用 pause() 暂停全部读写，其他线程不会看到一部分分片已恢复、一部分仍是旧数据
+"""
+
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional, List, Tuple, Iterator
+
+from ..activity import activity_page
+from ..db import ConnectionPool, connect, use_rollback_journal
+from ..shards import PEER_SCHEMA, ShardRouter, get_shard_router
+from ..stats import aggregate_user_stats, aggregate_work_by_type, read_user_stats, work_by_type
+from ..user_search import find_users
+from .base import GameStore, StoreSession, NOW, RANKINGS, RANKING_FIELDS, USER_COLUMNS, ranking_key
+
+
+# 排行榜字段对应的 SQL 表达式
+_EXPRESSIONS = {"assets": "(money + bank_money)"}
+
+_USER_COLUMN_SET = frozenset(USER_COLUMNS)
+
+# 抢劫记录按角色: (本人列, 对方列)
+_ROLES = {"robber": ("robber_id", "victim_id"), "victim": ("victim_id", "robber_id")}
+
+
+def _expression(field: str) -> str:
+    return _EXPRESSIONS.get(field, field)
+
+
+def _check_column(column: str) -> str:
+    """列名拼入 SQL 前检查是否为 users 表的列"""
+    if column not in _USER_COLUMN_SET:
+        raise ValueError(f"未知的用户字段: {column}")
+    return column
+
+
+class SqliteSession(StoreSession):
+    """一个 SQLite 连接上的会话"""
+    
+    def __init__(self, conn: sqlite3.Connection, store: "SqliteStore", schemas: Optional[Dict[str, str]] = None):
+        self.conn = conn
+        self.store = store
+        # {user_id: 所在的库名}，只有附加了另一个分片的写事务中才会出现 main 以外的库名
+        self.schemas = schemas or {}
+    
+    def _db(self, user_id: str) -> str:
+        return self.schemas.get(user_id, "main")
+    
+    def ensure_user(self, user_id: str, username: str, rename: bool = False) -> None:
+        db = self._db(user_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {db}.users (user_id, username)
+            VALUES (?, ?)
+        ''', (user_id, username))
+        if rename:
+            cursor.execute(f'''
+                UPDATE {db}.users SET username = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND username != ?
+            ''', (username, user_id, username))
+    
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            f"SELECT {', '.join(USER_COLUMNS)} FROM {self._db(user_id)}.users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return dict(zip(USER_COLUMNS, row)) if row else None
+    
+    def update_user(self, user_id: str, values: Optional[Dict[str, Any]] = None,
+                    increments: Optional[Dict[str, int]] = None) -> None:
+        assignments, params = [], []
+        for column, value in (values or {}).items():
+            if value is NOW:
+                assignments.append(f"{_check_column(column)} = CURRENT_TIMESTAMP")
+            else:
+                assignments.append(f"{_check_column(column)} = ?")
+                params.append(value)
+        for column, amount in (increments or {}).items():
+            assignments.append(f"{_check_column(column)} = {column} + ?")
+            params.append(amount)
+        assignments.append("updated_at = CURRENT_TIMESTAMP")
+        
+        self.conn.execute(f'''
+            UPDATE {self._db(user_id)}.users
+            SET {', '.join(assignments)}
+            WHERE user_id = ?
+        ''', (*params, user_id))
+    
+    # ---- 银行流水 ----
+    
+    def add_transaction(self, user_id: str, transaction_type: str, amount: int,
+                        balance_before: int, balance_after: int) -> None:
+        self.conn.execute(f'''
+            INSERT INTO {self._db(user_id)}.bank_transactions
+            (user_id, transaction_type, amount, balance_before, balance_after)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, transaction_type, amount, balance_before, balance_after))
+    
+    def transaction_sum(self, user_id: str, transaction_type: str, day) -> int:
+        row = self.conn.execute(f'''
+            SELECT SUM(amount) FROM {self._db(user_id)}.bank_transactions
+            WHERE user_id = ? AND transaction_type = ?
+            AND date(created_at) = ?
+        ''', (user_id, transaction_type, day)).fetchone()
+        return row[0] or 0
+    
+    def recent_transactions(self, user_id: str, limit: int) -> List[Tuple[str, int, str]]:
+        return self.conn.execute(f'''
+            SELECT transaction_type, amount, created_at
+            FROM {self._db(user_id)}.bank_transactions
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (user_id, limit)).fetchall()
+    
+    def bank_balances(self) -> List[Tuple[str, int]]:
+        return self.conn.execute("SELECT user_id, bank_money FROM users WHERE bank_money > 0").fetchall()
+    
+    # ---- 打工记录 ----
+    
+    def add_work(self, user_id: str, work_type: str, base_salary: int, bonus: int, total_earned: int) -> None:
+        self.conn.execute(f'''
+            INSERT INTO {self._db(user_id)}.work_records
+            (user_id, work_type, base_salary, bonus, total_earned)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, work_type, base_salary, bonus, total_earned))
+    
+    def work_today(self, user_id: str, day) -> Tuple[int, int]:
+        row = self.conn.execute(f'''
+            SELECT COUNT(*), SUM(total_earned) FROM {self._db(user_id)}.work_records
+            WHERE user_id = ? AND date(work_time) = ?
+        ''', (user_id, day)).fetchone()
+        return row[0], row[1] or 0
+    
+    def last_work_time(self, user_id: str, work_type: str) -> Optional[str]:
+        row = self.conn.execute(f'''
+            SELECT work_time FROM {self._db(user_id)}.work_records
+            WHERE user_id = ? AND work_type = ?
+            ORDER BY work_time DESC
+            LIMIT 1
+        ''', (user_id, work_type)).fetchone()
+        return row[0] if row else None
+    
+    def recent_works(self, user_id: str, limit: int) -> List[Tuple[str, int, str]]:
+        return self.conn.execute(f'''
+            SELECT work_type, total_earned, work_time
+            FROM {self._db(user_id)}.work_records
+            WHERE user_id = ?
+            ORDER BY work_time DESC
+            LIMIT ?
+        ''', (user_id, limit)).fetchall()
+    
+    # ---- 签到记录 ----
+    
+    def add_checkin(self, user_id: str, day, reward_money: int, consecutive_days: int) -> None:
+        self.conn.execute(f'''
+            INSERT INTO {self._db(user_id)}.checkin_records
+            (user_id, checkin_date, reward_money, consecutive_days)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, day, reward_money, consecutive_days))
+    
+    def checkin_reward(self, user_id: str, day) -> Optional[int]:
+        row = self.conn.execute(f'''
+            SELECT reward_money FROM {self._db(user_id)}.checkin_records
+            WHERE user_id = ? AND checkin_date = ?
+        ''', (user_id, day)).fetchone()
+        return row[0] if row else None
+    
+    def recent_checkins(self, user_id: str, limit: int) -> List[Tuple[str, int, int]]:
+        return self.conn.execute(f'''
+            SELECT checkin_date, reward_money, consecutive_days
+            FROM {self._db(user_id)}.checkin_records
+            WHERE user_id = ?
+            ORDER BY checkin_date DESC
+            LIMIT ?
+        ''', (user_id, limit)).fetchall()
+    
+    # ---- 抢劫记录 ----
+    
+    def add_robbery(self, robber_id: str, victim_id: str, amount: int, success: bool, message: str) -> None:
+        robber_db, victim_db = self._db(robber_id), self._db(victim_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            INSERT INTO {robber_db}.robbery_records
+            (robber_id, victim_id, amount, success, result_message)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (robber_id, victim_id, amount, success, message))
+        
+        # 抢劫记录在被抢者的分片中保存一份，被抢者的统计和记录只读取自己的分片
+        if victim_db != robber_db:
+            cursor.execute(f'''
+                INSERT INTO {victim_db}.robbery_records
+                (robber_id, victim_id, amount, success, result_message, created_at)
+                SELECT robber_id, victim_id, amount, success, result_message, created_at
+                FROM {robber_db}.robbery_records WHERE id = ?
+            ''', (cursor.lastrowid,))
+    
+    def last_robbery_time(self, robber_id: str) -> Optional[str]:
+        row = self.conn.execute(f'''
+            SELECT created_at FROM {self._db(robber_id)}.robbery_records
+            WHERE robber_id = ?
+            ORDER BY created_at DESC
+            LIMIT 1
+        ''', (robber_id,)).fetchone()
+        return row[0] if row else None
+    
+    def recent_robberies(self, user_id: str, role: str, limit: int) -> List[Tuple[str, Optional[str], int, int, str]]:
+        own, peer = _ROLES[role]
+        db = self._db(user_id)
+        rows = self.conn.execute(f'''
+            SELECT r.{peer}, u.username, r.amount, r.success, r.created_at
+            FROM {db}.robbery_records r
+            LEFT JOIN {db}.users u ON r.{peer} = u.user_id
+            WHERE r.{own} = ?
+            ORDER BY r.created_at DESC
+            LIMIT ?
+        ''', (user_id, limit)).fetchall()
+        
+        # 对方在其他分片时关联不到用户名，到对方所在的分片查找
+        missing = [row[0] for row in rows if row[1] is None]
+        if missing:
+            names = self.store.usernames(missing)
+            rows = [(row[0], row[1] or names.get(row[0]), *row[2:]) for row in rows]
+        return rows
+    
+    # ---- 累计统计 ----
+    
+    def user_stats(self, user_id: str) -> Dict[str, int]:
+        if not self.store.stats_ready:
+            return aggregate_user_stats(self.conn.cursor(), user_id)
+        return read_user_stats(self.conn.cursor(), user_id)
+    
+    def work_by_type(self, user_id: str, order_by: str = "income") -> List[tuple]:
+        if not self.store.stats_ready:
+            return aggregate_work_by_type(self.conn.cursor(), user_id, order_by)
+        return work_by_type(self.conn.cursor(), user_id, order_by)
+
+
+class SqliteStore(GameStore):
+    """SQLite 存储（按 user_id 分片）"""
+    
+    name = "sqlite"
+    
+    def __init__(self, db_path: str, readers: int = 0):
+        self.db_path = db_path
+        # 每个分片的读连接池大小，0 为不使用连接池（每次操作打开新连接）
+        self.readers = max(0, int(readers))
+        self._pools: Dict[str, ConnectionPool] = {}
+        self._pool_router: Optional[ShardRouter] = None
+        self._pools_lock = threading.Lock()
+        # 已确认使用回滚日志的分片路由
+        self._journal_router: Optional[ShardRouter] = None
+        # 登记的保护金额和目标表已按其建立的保护金额，两者不同时直接从用户表抽取目标
+        self.target_threshold: Optional[int] = None
+        self._targets_built: Optional[int] = None
+        # 进行中的读写操作数和是否暂停（恢复快照时）；同一线程内嵌套的操作只登记最外层一次
+        self._access_cond = threading.Condition()
+        self._active = 0
+        self._paused = False
+        self._depth = threading.local()
+    
+    @property
+    def router(self) -> ShardRouter:
+        # 迁移分片后路由缓存会被替换，每次使用时重新获取
+        return get_shard_router(self.db_path)
+    
+    def configure_pool(self, readers: int) -> None:
+        """修改读连接池大小（关闭现有的连接池，下次使用时按新大小打开）"""
+        readers = max(0, int(readers))
+        if readers != self.readers:
+            self.close()
+            self.readers = readers
+    
+    def close(self) -> None:
+        """关闭全部连接池"""
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+    
+    @contextmanager
+    def _access(self) -> Iterator[None]:
+        """登记一次读写操作，暂停期间等待恢复后再开始"""
+        depth = getattr(self._depth, "value", 0)
+        if not depth:
+            with self._access_cond:
+                while self._paused:
+                    self._access_cond.wait()
+                self._active += 1
+        self._depth.value = depth + 1
+        try:
+            yield
+        finally:
+            self._depth.value = depth
+            if not depth:
+                with self._access_cond:
+                    self._active -= 1
+                    if not self._active:
+                        self._access_cond.notify_all()
+    
+    @contextmanager
+    def pause(self) -> Iterator[None]:
+        """
+        暂停全部分片的读写：等待进行中的操作结束，期间新的操作等待，退出时恢复
+        用于恢复快照时逐个替换分片文件，其他线程不会读到或写入一部分已恢复的分片
+        （不能在持有读写会话的线程中调用）
+        """
+        with self._access_cond:
+            while self._paused:
+                self._access_cond.wait()
+            self._paused = True
+            while self._active:
+                self._access_cond.wait()
+        try:
+            yield
+        finally:
+            with self._access_cond:
+                self._paused = False
+                self._access_cond.notify_all()
+    
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """各分片连接池的使用情况 {分片路径: 统计}"""
+        with self._pools_lock:
+            pools = dict(self._pools)
+        return {path: pool.stats() for path, pool in pools.items()}
+    
+    def _pool(self, router: ShardRouter, index: int) -> Optional[ConnectionPool]:
+        """分片的连接池，未开启时为 None"""
+        if not self.readers:
+            return None
+        with self._pools_lock:
+            if self._pool_router is not router:
+                # 迁移分片后路由被替换，旧文件上的连接不再使用
+                stale, self._pools = self._pools, {}
+                self._pool_router = router
+                for pool in stale.values():
+                    pool.close()
+            path = router.paths[index]
+            pool = self._pools.get(path)
+            if pool is None:
+                pool = self._pools[path] = ConnectionPool(path, self.readers, wal=not router.sharded)
+            return pool
+    
+    def _check_journal(self, router: ShardRouter) -> None:
+        """不使用连接池时，确认分片没有留在 WAL 模式（曾以旧版本开启连接池运行过），跨分片事务才能原子提交"""
+        if self._journal_router is router:
+            return
+        if all([use_rollback_journal(path) for path in router.paths]):
+            self._journal_router = router
+    
+    @contextmanager
+    def _reader(self, router: ShardRouter, index: int) -> Iterator[sqlite3.Connection]:
+        """分片的只读连接"""
+        with self._access():
+            pool = self._pool(router, index)
+            if pool is not None:
+                with pool.reader() as conn:
+                    yield conn
+                return
+            conn = connect(router.paths[index])
+            try:
+                yield conn
+            finally:
+                conn.close()
+    
+    def _gather(self, func: Callable[[sqlite3.Connection], Any], router: Optional[ShardRouter] = None) -> List[Any]:
+        """在每个分片的只读连接上执行 func(连接)，按分片序号返回结果列表"""
+        router = router or self.router
+        results = []
+        with self._access():
+            for index in range(router.count):
+                with self._reader(router, index) as conn:
+                    results.append(func(conn))
+        return results
+    
+    @contextmanager
+    def read(self, user_id: Optional[str] = None) -> Iterator[SqliteSession]:
+        router = self.router
+        with self._reader(router, 0 if user_id is None else router.index_of(user_id)) as conn:
+            yield SqliteSession(conn, self)
+    
+    def write(self, user_id: str, peer_id: Optional[str] = None):
+        router = self.router
+        if peer_id is None or peer_id == user_id:
+            if not self.readers:
+                return self._transaction(router.connect(user_id), {})
+            index = router.index_of(user_id)
+            return self._pooled_write(router, index, index, {})
+        
+        # 写事务总是按分片序号加锁，交叉方向的两笔写入不会互相等待到超时
+        if not self.readers:
+            self._check_journal(router)
+            conn, user_db, peer_db = router.connect_pair(user_id, peer_id)
+            return self._transaction(conn, {user_id: user_db, peer_id: peer_db})
+        
+        first, second = router.index_of(user_id), router.index_of(peer_id)
+        if first == second:
+            return self._pooled_write(router, first, second, {})
+        schema = {min(first, second): "main", max(first, second): PEER_SCHEMA}
+        return self._pooled_write(router, first, second, {user_id: schema[first], peer_id: schema[second]})
+    
+    def partitions(self) -> List[str]:
+        return list(self.router.paths)
+    
+    @contextmanager
+    def read_partition(self, partition: str) -> Iterator[SqliteSession]:
+        """打开一个分片的只读连接，用于逐个分片读取全部用户的批量操作"""
+        router = self.router
+        if partition in router.paths:
+            with self._reader(router, router.paths.index(partition)) as conn:
+                yield SqliteSession(conn, self)
+            return
+        conn = connect(partition)
+        try:
+            yield SqliteSession(conn, self)
+        finally:
+            conn.close()
+    
+    def write_partition(self, partition: str):
+        router = self.router
+        if not self.readers or partition not in router.paths:
+            return self._transaction(connect(partition), {})
+        index = router.paths.index(partition)
+        return self._pooled_write(router, index, index, {})
+    
+    @contextmanager
+    def _transaction(self, conn: sqlite3.Connection, schemas: Dict[str, str],
+                     close: bool = True) -> Iterator[SqliteSession]:
+        """以 BEGIN IMMEDIATE 开始的写事务，正常退出时提交，异常时回滚"""
+        try:
+            with self._access():
+                conn.execute("BEGIN IMMEDIATE")
+                yield SqliteSession(conn, self, schemas)
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if close:
+                conn.close()
+    
+    @contextmanager
+    def _pooled_write(self, router: ShardRouter, first: int, second: int,
+                      schemas: Dict[str, str]) -> Iterator[SqliteSession]:
+        """
+        在分片写连接上的写事务
+        两个分片不同时使用序号小的分片的写连接，同时持有另一个分片的写锁，并把它附加为 peer
+        """
+        low, high = min(first, second), max(first, second)
+        with self._pool(router, low).writer() as conn:
+            if low == high:
+                with self._transaction(conn, schemas, close=False) as session:
+                    yield session
+                return
+            
+            with self._pool(router, high).write_lock:
+                conn.execute(f"ATTACH DATABASE ? AS {PEER_SCHEMA}", (router.paths[high],))
+                try:
+                    with self._transaction(conn, schemas, close=False) as session:
+                        yield session
+                finally:
+                    conn.execute(f"DETACH DATABASE {PEER_SCHEMA}")
+    
+    # ---- 排行榜 ----
+    
+    def top_users(self, ranking: str, limit: int) -> List[Dict[str, Any]]:
+        value_field, order = RANKINGS[ranking]
+        value = _expression(value_field)
+        query = f'''
+            SELECT {', '.join(RANKING_FIELDS)}, {value}
+            FROM users
+            WHERE {value} > 0
+            ORDER BY {', '.join(f"{_expression(field)} DESC" for field in order)}
+            LIMIT ?
+        '''
+        
+        # 每个分片取前 limit 名后归并
+        router = self.router
+        shards = self._gather(lambda conn: conn.execute(query, (limit,)).fetchall(), router)
+        users = [dict(zip(RANKING_FIELDS + ("value",), row)) for rows in shards for row in rows]
+        if router.sharded:
+            users.sort(key=lambda user: ranking_key(user, ranking), reverse=True)
+            users = users[:limit]
+        return users
+    
+    def count_above(self, ranking: str, user: Optional[Dict[str, Any]]) -> int:
+        if user is None:
+            return 0
+        
+        # 排序字段 (a, b) 时为 a > ? OR (a = ? AND b > ?)
+        order = RANKINGS[ranking][1]
+        key = ranking_key(user, ranking)
+        clauses, params = [], []
+        for i, field in enumerate(order):
+            conditions = [f"{_expression(previous)} = ?" for previous in order[:i]]
+            conditions.append(f"{_expression(field)} > ?")
+            clauses.append(" AND ".join(conditions))
+            params.extend(key[:i + 1])
+        query = f"SELECT COUNT(*) FROM users WHERE {' OR '.join(f'({clause})' for clause in clauses)}"
+        
+        # 排名 = 各分片中排在前面的人数之和 + 1
+        return sum(self._gather(lambda conn: conn.execute(query, params).fetchone()[0]))
+    
+    def active_users(self) -> int:
+        return sum(self._gather(
+            lambda conn: conn.execute('SELECT COUNT(*) FROM users WHERE money > 0 OR total_checkin > 0').fetchone()[0]
+        ))
+    
+    # ---- 用户查找 ----
+    
+    def find_users(self, name: str, limit: int = 6) -> List[Tuple[str, str]]:
+        # 在每个分片中查找后按 精确 > 前缀（按用户名） > 包含 归并
+        shard_matches = self._gather(lambda conn: find_users(conn, name, limit=limit))
+        if len(shard_matches) == 1:
+            return shard_matches[0]
+        
+        name = name.strip()
+        
+        def order(item):
+            position, (_, username) = item
+            if username == name:
+                return (0, "", position)
+            if username.startswith(name):
+                return (1, username, position)
+            return (2, "", position)
+        
+        merged = [item for matches in shard_matches for item in enumerate(matches)]
+        merged.sort(key=order)
+        return [match for _, match in merged[:limit]]
+    
+    def usernames(self, user_ids: List[str]) -> Dict[str, str]:
+        # 到各自所在的分片查找
+        router = self.router
+        groups: Dict[int, List[str]] = {}
+        for user_id in set(user_ids):
+            groups.setdefault(router.index_of(user_id), []).append(user_id)
+        
+        names = {}
+        for index, ids in groups.items():
+            with self._reader(router, index) as conn:
+                placeholders = ", ".join("?" * len(ids))
+                names.update(conn.execute(
+                    f"SELECT user_id, username FROM users WHERE user_id IN ({placeholders})", ids
+                ).fetchall())
+        return names
+    
+    # ---- 可抢劫目标 ----
+    
+    def ensure_targets(self, threshold: int) -> None:
+        from ..qiangjie.targets import ensure_rob_targets
+        
+        threshold = self.target_threshold = int(threshold)
+        router = self.router
+        with self._access():
+            if not self.readers:
+                router.gather(lambda conn: ensure_rob_targets(conn, threshold))
+            else:
+                for index in range(router.count):
+                    with self._pool(router, index).writer() as conn:
+                        ensure_rob_targets(conn, threshold)
+        self._targets_built = threshold
+    
+    def defer_targets(self, threshold: int) -> None:
+        self.target_threshold = int(threshold)
+    
+    def sample_targets(self, exclude_user_id: str, count: int, rng=None) -> List[Tuple[str, str, int, int, int]]:
+        from ..qiangjie.targets import read_targets, sample_slots, sample_targets, scan_targets, target_count
+        
+        router = self.router
+        threshold = self.target_threshold
+        if threshold is not None and threshold != self._targets_built:
+            # 目标表尚未按保护金额建立（后台准备中），从各分片的用户表抽取后合并
+            shards = self._gather(lambda conn: scan_targets(conn, threshold, exclude_user_id, count), router)
+            rows = [row for shard in shards for row in shard]
+            if len(rows) > count:
+                rows = (rng or random).sample(rows, count)
+            rows.sort(key=lambda row: row[2], reverse=True)
+            return rows
+        
+        # 按各分片的目标数等概率抽取
+        if not router.sharded:
+            with self._reader(router, 0) as conn:
+                return sample_targets(conn, exclude_user_id, count, rng)
+        
+        # 计数和读取之间不会遇到恢复快照
+        with self._access():
+            totals = self._gather(target_count, router)
+            picked = sample_slots(totals, count, rng)
+            
+            rows = []
+            for index, slots in enumerate(picked):
+                if not slots:
+                    continue
+                with self._reader(router, index) as conn:
+                    rows.extend(read_targets(conn, slots, exclude_user_id))
+        
+        rows = rows[:count]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+    
+    # ---- 活动记录 ----
+    
+    def activity_page(self, user_id: str, limit: int = 10, cursor: Optional[str] = None) -> Dict[str, Any]:
+        with self.read(user_id) as session:
+            return activity_page(session.conn, user_id, limit, cursor, self.usernames)
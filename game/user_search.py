@@ -0,0 +1,158 @@
+"""
+用户名查找 - 用户名索引 + FTS5 trigram 全文索引
+精确匹配和前缀匹配走 users.username 索引，包含匹配（3个字符及以上）走 trigram 索引，
+结果按 精确 > 前缀 > 包含 排列，包含匹配按 bm25 相关度排序
+
+users_fts 以 users 表为外部内容表，由触发器随用户名的插入、修改、删除同步；
+users 表没有 INTEGER PRIMARY KEY，执行 VACUUM 后 rowid 可能变化，需要调用 rebuild_user_search 重建
+"""
+
+import logging
+from typing import List, Tuple
+
+
+logger = logging.getLogger("astrbot")
+
+# trigram 分词器只能匹配不少于3个字符的子串
+TRIGRAM_MIN_CHARS = 3
+
+# 前缀匹配的上界（大于任何以该前缀开头的字符串）
+_PREFIX_END = "\U0010ffff"
+
+_USERNAME_INDEX = "CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)"
+
+_FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE users_fts USING fts5(
+    username, content = 'users', content_rowid = 'rowid', tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+    INSERT INTO users_fts (rowid, username) VALUES (NEW.rowid, NEW.username);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+    INSERT INTO users_fts (users_fts, rowid, username) VALUES ('delete', OLD.rowid, OLD.username);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF username ON users
+WHEN OLD.username IS NOT NEW.username BEGIN
+    INSERT INTO users_fts (users_fts, rowid, username) VALUES ('delete', OLD.rowid, OLD.username);
+    INSERT INTO users_fts (rowid, username) VALUES (NEW.rowid, NEW.username);
+END;
+'''
+
+
+def fts_available(conn) -> bool:
+    """当前 SQLite 是否支持 FTS5 trigram 分词器（3.34 及以上）"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize = 'trigram')")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return True
+    except Exception:
+        return False
+
+
+def _has_fts(conn) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+    ).fetchone() is not None
+
+
+def ensure_user_search(conn) -> bool:
+    """
+    创建用户名索引和全文索引（已存在时跳过，新建全文索引时从 users 表填充）
+    
+    Returns:
+        是否可以使用全文索引
+    """
+    conn.execute(_USERNAME_INDEX)
+    if _has_fts(conn):
+        return True
+    if not fts_available(conn):
+        logger.warning("当前 SQLite 不支持 FTS5 trigram，用户名模糊查找将使用全表扫描")
+        return False
+    
+    # 建表与填充在同一事务中提交，填充完成前查找不会用到空的全文索引（仍按全表扫描匹配）
+    try:
+        conn.executescript("BEGIN IMMEDIATE;\n" + _FTS_SCHEMA + "INSERT INTO users_fts (users_fts) VALUES ('rebuild');\nCOMMIT;")
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def rebuild_user_search(conn) -> None:
+    """从 users 表重建全文索引"""
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def _quote(text: str) -> str:
+    """转为 FTS5 短语（双引号内的双引号需要重复）"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def find_users(conn, name: str, limit: int = 6) -> List[Tuple[str, str]]:
+    """
+    按用户名查找用户
+    
+    Args:
+        conn: 数据库连接
+        name: 用户名或其中一部分
+        limit: 最多返回的用户数
+    
+    Returns:
+        [(user_id, username)]，精确匹配在前，其次是前缀匹配和包含匹配
+    """
+    name = name.strip()
+    if not name or limit <= 0:
+        return []
+    
+    results: List[Tuple[str, str]] = []
+    seen = set()
+    
+    def collect(rows) -> bool:
+        for user_id, username in rows:
+            if user_id not in seen:
+                seen.add(user_id)
+                results.append((user_id, username))
+        return len(results) >= limit
+    
+    # 精确匹配
+    if collect(conn.execute(
+        "SELECT user_id, username FROM users WHERE username = ? LIMIT ?", (name, limit)
+    ).fetchall()):
+        return results
+    
+    # 前缀匹配（按索引顺序读取，不排序全部匹配）
+    if collect(conn.execute('''
+        SELECT user_id, username FROM users
+        WHERE username > ? AND username < ?
+        ORDER BY username
+        LIMIT ?
+    ''', (name, name + _PREFIX_END, limit + len(results))).fetchall()):
+        return results[:limit]
+    
+    # 包含匹配
+    remaining = limit + len(results)
+    if len(name) >= TRIGRAM_MIN_CHARS and _has_fts(conn):
+        rows = conn.execute('''
+            SELECT u.user_id, u.username FROM users_fts f
+            JOIN users u ON u.rowid = f.rowid
+            WHERE users_fts MATCH ?
+            ORDER BY f.rank
+            LIMIT ?
+        ''', (f"username : {_quote(name)}", remaining)).fetchall()
+    else:
+        # 短于3个字符时无法使用 trigram 索引，扫描到足够数量即停止
+        rows = conn.execute('''
+            SELECT user_id, username FROM users
+            WHERE username LIKE ? ESCAPE '\\'
+            LIMIT ?
+        ''', (f"%{_escape_like(name)}%", remaining)).fetchall()
+    collect(rows)
+    return results[:limit]
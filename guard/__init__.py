@@ -0,0 +1,12 @@
+"""
+LinBot 并发控制模块
+"""
+
+from .admission import AdmissionController, configure_admission, get_admission
+from .idempotency import CommandCache, configure_command_cache, get_command_cache, idempotent
+from .locks import UserLocks, get_user_locks
+from .ratelimit import RateLimiter, configure_rate_limiter, get_rate_limiter, rate_limited
+
+__all__ = ['AdmissionController', 'configure_admission', 'get_admission',
+           'CommandCache', 'configure_command_cache', 'get_command_cache', 'idempotent', 'UserLocks', 'get_user_locks',
+           'RateLimiter', 'configure_rate_limiter', 'get_rate_limiter', 'rate_limited']
@@ -0,0 +1,184 @@
+"""
+负载感知降级 - 图片指令在渲染队列过长或事件循环延迟过高时不再渲染新图片，
+改为发送最近一次渲染的同类图片（未过期时）或文字版本，保证高峰期的尾延迟
+
+图片的绘制和编码在线程池中执行，同一时间只有一个渲染任务（PIL 字体对象和 matplotlib 不是线程安全的），
+其余在渲染队列中排队；队列深度 = 排队数 + 执行中的数量
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from ..perf import get_loop_probe, offload, record_wait
+
+
+# 渲染队列深度达到此值时降级
+DEFAULT_MAX_RENDER_QUEUE = 3
+
+# 事件循环延迟超过此值（毫秒）时降级
+DEFAULT_MAX_LOOP_LAG_MS = 250
+
+# 最多缓存的图片数
+MAX_CACHED_IMAGES = 32
+
+
+class AdmissionController:
+    """图片渲染的准入控制"""
+    
+    def __init__(self, max_render_queue: int = DEFAULT_MAX_RENDER_QUEUE,
+                 max_loop_lag_ms: float = DEFAULT_MAX_LOOP_LAG_MS, enabled: bool = True):
+        self.max_render_queue = max_render_queue
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.enabled = enabled
+        
+        self._lane: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.depth = 0
+        
+        # {缓存键: (渲染完成时间, 图片字节)}
+        self._images: Dict[str, Tuple[float, bytes]] = {}
+        
+        self.max_depth = 0
+        self.rendered = 0
+        self.degraded_cached = 0
+        self.degraded_text = 0
+        self.reasons = {"queue": 0, "lag": 0}
+    
+    def overloaded(self) -> Optional[str]:
+        """
+        判断当前是否需要降级
+        
+        Returns:
+            降级原因的说明，不需要降级时为 None
+        """
+        if not self.enabled:
+            return None
+        if self.depth >= self.max_render_queue:
+            self.reasons["queue"] += 1
+            return f"渲染队列 {self.depth}"
+        lag_ms = get_loop_probe().current_ms()
+        if lag_ms >= self.max_loop_lag_ms:
+            self.reasons["lag"] += 1
+            return f"事件循环延迟 {lag_ms:.0f}ms"
+        return None
+    
+    def _render_lane(self) -> asyncio.Semaphore:
+        # 信号量绑定首次使用时的事件循环，事件循环变化（插件重载、基准测试）时重新创建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._lane = asyncio.Semaphore(1)
+            self._loop = loop
+        return self._lane
+    
+    async def render(self, key: str, func: Callable[..., Optional[bytes]], *args: Any) -> Optional[bytes]:
+        """
+        在渲染队列中执行绘制和编码，成功时缓存结果
+        
+        Args:
+            key: 缓存键（同一种图片使用相同的键）
+            func: 返回图片字节的同步函数，在线程池中执行
+        
+        Returns:
+            图片字节，失败时为 None
+        """
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        start = time.perf_counter()
+        try:
+            async with self._render_lane():
+                # 排队等待的时间不计入指令的阻塞耗时
+                record_wait(time.perf_counter() - start)
+                data = await offload(func, *args)
+        finally:
+            self.depth -= 1
+        
+        self.rendered += 1
+        if data:
+            self._images.pop(key, None)
+            self._images[key] = (time.monotonic(), data)
+            while len(self._images) > MAX_CACHED_IMAGES:
+                del self._images[next(iter(self._images))]
+        return data
+    
+    def cached(self, key: str, max_age: float) -> Optional[Tuple[bytes, float]]:
+        """
+        最近一次渲染的图片
+        
+        Args:
+            key: 缓存键
+            max_age: 最长可接受的时间（秒）
+        
+        Returns:
+            (图片字节, 已过去的秒数)，没有或已过期时为 None
+        """
+        item = self._images.get(key)
+        if item is None:
+            return None
+        age = time.monotonic() - item[0]
+        return (item[1], age) if age <= max_age else None
+    
+    def record_degraded(self, cached: bool) -> None:
+        """记录一次降级（发送缓存图片或文字版本）"""
+        if cached:
+            self.degraded_cached += 1
+        else:
+            self.degraded_text += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出降级指标"""
+        degraded = self.degraded_cached + self.degraded_text
+        total = self.rendered + degraded
+        return {
+            "enabled": self.enabled,
+            "max_render_queue": self.max_render_queue,
+            "max_loop_lag_ms": self.max_loop_lag_ms,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "rendered": self.rendered,
+            "degraded_cached": self.degraded_cached,
+            "degraded_text": self.degraded_text,
+            "degraded_rate": round(degraded / total * 100, 2) if total else 0.0,
+            "reasons": dict(self.reasons),
+            "cached_images": len(self._images)
+        }
+    
+    def clear(self) -> None:
+        """清空指标（保留缓存的图片）"""
+        self.max_depth = self.depth
+        self.rendered = 0
+        self.degraded_cached = 0
+        self.degraded_text = 0
+        self.reasons = {"queue": 0, "lag": 0}
+
+
+_admission = AdmissionController()
+
+
+def get_admission() -> AdmissionController:
+    """获取进程级共享的准入控制器"""
+    return _admission
+
+
+def configure_admission(settings: Optional[Dict[str, Any]] = None) -> AdmissionController:
+    """
+    按性能设置更新共享准入控制器（保留已缓存的图片和指标）
+    
+    Args:
+        settings: performance_settings 配置
+    
+    Returns:
+        共享准入控制器
+    """
+    settings = settings or {}
+    max_render_queue = settings.get("max_render_queue", DEFAULT_MAX_RENDER_QUEUE)
+    if not (1 <= max_render_queue <= 100):
+        max_render_queue = DEFAULT_MAX_RENDER_QUEUE
+    max_loop_lag_ms = settings.get("max_loop_lag_ms", DEFAULT_MAX_LOOP_LAG_MS)
+    if not (10 <= max_loop_lag_ms <= 10000):
+        max_loop_lag_ms = DEFAULT_MAX_LOOP_LAG_MS
+    
+    _admission.max_render_queue = max_render_queue
+    _admission.max_loop_lag_ms = max_loop_lag_ms
+    _admission.enabled = settings.get("degrade_enabled", True)
+    return _admission
@@ -0,0 +1,263 @@
+"""
+重复消息去重 - 会修改数据的指令在短时间内收到重复消息时，直接重放第一次执行的结果
+两种重复按不同的键识别：
+- 适配器重发的同一条消息：平台 + 消息ID，保留时间较长
+- 用户连续发送相同的指令：平台 + 发送者 + 指令 + 消息文本，在去重窗口内有效
+两者分别开关：去重窗口为 0 时只关闭相同指令的去重，适配器重发的消息仍然只执行一次
+第一次执行尚未结束时收到的重复消息会等待其结果，不会再次访问数据库
+只读的子指令（列表、信息页）不去重，重复发送时总是返回最新的内容
+会被重放的重复消息不占用限流令牌（见 is_replay，由 rate_limited 在取令牌前检查）
+"""
+
+import asyncio
+import copy
+import functools
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable
+
+
+logger = logging.getLogger("astrbot")
+
+# 相同指令的去重窗口（秒）
+DEFAULT_WINDOW_SECONDS = 5
+
+# 同一消息ID的保留时间（秒），覆盖适配器重连后的重发
+REDELIVERY_SECONDS = 120
+
+# 每类键最多保留的记录数
+MAX_ENTRIES = 4096
+
+
+@dataclass
+class _Entry:
+    """一次指令执行；results 为 None 表示仍在执行"""
+    done: asyncio.Future
+    results: Optional[List[Any]] = None
+    keys: List[tuple] = field(default_factory=list)
+
+
+def _snapshot(result: Any) -> Any:
+    """复制消息结果，框架发送前对消息链的修改不影响之后的重放"""
+    try:
+        duplicate = copy.copy(result)
+        if isinstance(getattr(result, "chain", None), list):
+            duplicate.chain = list(result.chain)
+        return duplicate
+    except Exception:
+        return result
+
+
+class CommandCache:
+    """指令结果缓存"""
+    
+    def __init__(self, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 redelivery_seconds: float = REDELIVERY_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.window_seconds = window_seconds
+        self.redelivery_seconds = redelivery_seconds
+        self.max_entries = max_entries
+        
+        # {键: (过期时间, 记录)}，按写入顺序排列
+        self._by_message: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._by_content: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0 or self.redelivery_seconds > 0
+    
+    def keys(self, event: Any, command: str) -> List[tuple]:
+        """
+        消息对应的 [消息ID键, 内容键]
+        没有消息ID或不保留消息ID时没有消息ID键，去重窗口为 0 时没有内容键
+        """
+        platform = str(event.get_platform_name())
+        keys = []
+        message_id = getattr(getattr(event, "message_obj", None), "message_id", None)
+        if message_id and self.redelivery_seconds > 0:
+            keys.append(("message", platform, str(message_id)))
+        if self.window_seconds > 0:
+            sender = str(event.get_sender_id())
+            text = " ".join(str(getattr(event, "message_str", "") or "").split())
+            keys.append(("content", platform, sender, command, text))
+        return keys
+    
+    def _tables(self, key: tuple):
+        if key[0] == "message":
+            return self._by_message, self.redelivery_seconds
+        return self._by_content, self.window_seconds
+    
+    def _purge(self, now: float) -> None:
+        """删除过期记录（按写入顺序，遇到未过期的即停止），超出数量上限时删除最早的记录"""
+        for table in (self._by_message, self._by_content):
+            while table:
+                expires, _ = next(iter(table.values()))
+                if expires > now and len(table) <= self.max_entries:
+                    break
+                table.popitem(last=False)
+    
+    def lookup(self, keys: List[tuple]) -> Optional[_Entry]:
+        """查找任一键对应的未过期记录"""
+        now = time.monotonic()
+        self._purge(now)
+        for key in keys:
+            table, _ = self._tables(key)
+            item = table.get(key)
+            if item is not None and item[0] > now:
+                return item[1]
+        return None
+    
+    def begin(self, keys: List[tuple]) -> _Entry:
+        """登记一次新的执行"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环变化（插件重载、基准测试）时旧记录的 Future 已不可用
+            self._by_message.clear()
+            self._by_content.clear()
+            self._loop = loop
+        
+        entry = _Entry(done=loop.create_future(), keys=keys)
+        now = time.monotonic()
+        for key in keys:
+            table, ttl = self._tables(key)
+            table.pop(key, None)
+            table[key] = (now + ttl, entry)
+        self.executed += 1
+        return entry
+    
+    def finish(self, entry: _Entry, results: Optional[List[Any]]) -> None:
+        """
+        结束一次执行
+        results 为 None 表示执行未完成（出错或被取消），删除记录，等待中的重复消息将自行执行
+        """
+        if results is None:
+            for key in entry.keys:
+                table, _ = self._tables(key)
+                item = table.get(key)
+                if item is not None and item[1] is entry:
+                    del table[key]
+        else:
+            entry.results = results
+        if not entry.done.done():
+            entry.done.set_result(results)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出去重指标"""
+        total = self.executed + self.replayed
+        return {
+            "window_seconds": self.window_seconds,
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "replay_rate": round(self.replayed / total * 100, 2) if total else 0.0,
+            "entries": len(self._by_message) + len(self._by_content)
+        }
+    
+    def clear(self) -> None:
+        """清空指标（保留缓存的结果）"""
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+    
+    def forget(self) -> None:
+        """丢弃缓存的结果（恢复或导入数据后缓存的是修改前的结果），执行中的指令照常完成"""
+        self._by_message.clear()
+        self._by_content.clear()
+
+
+_command_cache = CommandCache()
+
+
+def get_command_cache() -> CommandCache:
+    """获取进程级共享的指令结果缓存"""
+    return _command_cache
+
+
+def configure_command_cache(settings: Optional[Dict[str, Any]] = None) -> CommandCache:
+    """
+    按性能设置更新共享缓存（保留已有记录）
+    
+    Args:
+        settings: performance_settings 配置
+    
+    Returns:
+        共享缓存
+    """
+    settings = settings or {}
+    window_seconds = settings.get("duplicate_window_seconds", DEFAULT_WINDOW_SECONDS)
+    if not (0 <= window_seconds <= 60):
+        window_seconds = DEFAULT_WINDOW_SECONDS
+    
+    _command_cache.window_seconds = window_seconds
+    return _command_cache
+
+
+def idempotent(command: Optional[str] = None, when: Optional[Callable[[Any], bool]] = None) -> Callable:
+    """
+    重复消息去重装饰器，用于 async generator 形式的指令处理函数
+    放在 @track_command 之下，重放的结果同样计入指令耗时
+    
+    Args:
+        command: 指令名称，默认使用函数名
+        when: 按消息事件判断是否去重的函数（只对会修改数据的子指令返回真），默认全部去重
+    """
+    def decorator(func: Callable) -> Callable:
+        name = command or func.__name__
+        
+        def event_keys(event) -> List[tuple]:
+            cache = _command_cache
+            return cache.keys(event, name) if cache.enabled and (when is None or when(event)) else []
+        
+        @functools.wraps(func)
+        async def wrapper(self, event, *args: Any, **kwargs: Any):
+            cache = _command_cache
+            keys = event_keys(event)
+            if not keys:
+                async for result in func(self, event, *args, **kwargs):
+                    yield result
+                return
+            
+            entry = cache.lookup(keys)
+            if entry is not None:
+                results = entry.results
+                if results is None:
+                    cache.waited += 1
+                    results = await asyncio.shield(entry.done)
+                if results is not None:
+                    cache.replayed += 1
+                    logger.info(f"指令 {name} 收到重复消息，重放上次结果")
+                    for result in results:
+                        yield _snapshot(result)
+                    return
+            
+            entry = cache.begin(keys)
+            results: Optional[List[Any]] = []
+            try:
+                async for result in func(self, event, *args, **kwargs):
+                    results.append(_snapshot(result))
+                    yield result
+            except BaseException:
+                results = None
+                raise
+            finally:
+                cache.finish(entry, results)
+        
+        # functools.wraps 会把该属性复制到外层装饰器的包装函数上
+        wrapper.idempotent_keys = event_keys
+        return wrapper
+    return decorator
+
+
+def is_replay(func: Callable, event: Any) -> bool:
+    """消息是否为 @idempotent 将重放（或正在等待）的重复消息"""
+    event_keys = getattr(func, "idempotent_keys", None)
+    if event_keys is None:
+        return False
+    keys = event_keys(event)
+    return bool(keys) and _command_cache.lookup(keys) is not None
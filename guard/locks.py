@@ -0,0 +1,106 @@
+"""
+按用户加锁 - 同一用户的写操作串行执行，不同用户的操作互不等待
+锁按用户ID哈希到固定数量的分段上，涉及多个用户的操作按分段序号升序加锁，避免死锁
+"""
+
+import asyncio
+import time
+import zlib
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+from ..perf import Histogram, record_wait
+
+
+DEFAULT_STRIPES = 256
+
+
+class UserLocks:
+    """分段的用户锁"""
+    
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self.stripes = max(1, int(stripes))
+        self._locks: List[asyncio.Lock] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # 争用指标（只在事件循环线程中修改）
+        self.acquisitions = 0
+        self.contended = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait = Histogram()
+    
+    def stripe(self, user_id: str) -> int:
+        """用户ID对应的分段序号（与进程无关的稳定哈希）"""
+        return zlib.crc32(str(user_id).encode("utf-8")) % self.stripes
+    
+    def _stripe_locks(self) -> List[asyncio.Lock]:
+        # asyncio.Lock 绑定首次使用时的事件循环，事件循环变化（插件重载、基准测试）时重新创建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._locks = [asyncio.Lock() for _ in range(self.stripes)]
+            self._loop = loop
+        return self._locks
+    
+    @asynccontextmanager
+    async def hold(self, *user_ids: str):
+        """
+        持有一个或多个用户的锁
+        
+        用法：
+            async with get_user_locks().hold(robber_id, victim_id):
+                ...
+        """
+        locks = self._stripe_locks()
+        held = []
+        try:
+            for index in sorted({self.stripe(user_id) for user_id in user_ids}):
+                lock = locks[index]
+                self.acquisitions += 1
+                if lock.locked():
+                    self.contended += 1
+                    self.waiting += 1
+                    self.max_waiting = max(self.max_waiting, self.waiting)
+                    start = time.perf_counter()
+                    try:
+                        await lock.acquire()
+                    finally:
+                        self.waiting -= 1
+                        waited = time.perf_counter() - start
+                        self.wait.record(waited * 1000)
+                        record_wait(waited)
+                else:
+                    await lock.acquire()
+                held.append(lock)
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出争用指标（等待耗时只统计发生争用的加锁）"""
+        return {
+            "stripes": self.stripes,
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "contention_rate": round(self.contended / self.acquisitions * 100, 2) if self.acquisitions else 0.0,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "held": sum(1 for lock in self._locks if lock.locked()),
+            "wait": self.wait.snapshot()
+        }
+    
+    def clear(self) -> None:
+        """清空争用指标"""
+        self.acquisitions = 0
+        self.contended = 0
+        self.max_waiting = self.waiting
+        self.wait.clear()
+
+
+_user_locks = UserLocks()
+
+
+def get_user_locks() -> UserLocks:
+    """获取进程级共享的用户锁"""
+    return _user_locks
@@ -0,0 +1,237 @@
+"""
+指令限流 - 按用户和群的令牌桶限制指令频率，在执行指令之前判断
+指令按开销分为三类，各自独立计数：
+- text: 文字回复的指令
+- image: 需要渲染图片的指令（帮助、排行榜、服务器）
+- chart: 需要采样生成图表的指令（服务器 图表）
+
+令牌按每分钟次数匀速补充，桶容量为 BURST_SECONDS 秒的补充量（至少1个），
+群的补充速度为用户的若干倍；用户和群按 (消息平台, ID) 区分，不同平台上相同的群号互不影响；
+每人每天一次的指令（签到）不占用群的令牌，避免群里集中签到时耗尽全群的配额；
+被限流的请求在每个空桶期间只回复一次提示，之后静默丢弃；
+@idempotent 将重放结果的重复消息（适配器重发、去重窗口内的相同指令）不取令牌
+"""
+
+import functools
+import logging
+import math
+import time
+from typing import Dict, Any, Optional, Callable, Tuple, Union
+
+from .idempotency import is_replay
+
+
+logger = logging.getLogger("astrbot")
+
+COMMAND_CLASSES = ("text", "image", "chart")
+
+# 每个用户每类指令每分钟的次数
+DEFAULT_PER_MINUTE = {"text": 30, "image": 6, "chart": 2}
+
+# 群的补充速度是用户的几倍（0 为不限制群）
+DEFAULT_GROUP_MULTIPLIER = 3
+
+# 桶容量对应的补充时长（秒）
+BURST_SECONDS = 20
+
+# 闲置超过此时长（秒）的桶已补满，清理时删除
+IDLE_SECONDS = 600
+
+
+class TokenBucket:
+    """令牌桶"""
+    
+    __slots__ = ("tokens", "updated", "notified")
+    
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+        self.notified = False
+    
+    def refill(self, now: float, rate: float, capacity: float) -> None:
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+    
+    def retry_after(self, rate: float) -> float:
+        """距离下一个令牌的秒数"""
+        return max(0.0, (1 - self.tokens) / rate)
+
+
+class RateLimiter:
+    """按用户和群的令牌桶限流器"""
+    
+    def __init__(self, per_minute: Optional[Dict[str, int]] = None,
+                 group_multiplier: float = DEFAULT_GROUP_MULTIPLIER, enabled: bool = True):
+        self.per_minute = dict(DEFAULT_PER_MINUTE, **(per_minute or {}))
+        self.group_multiplier = group_multiplier
+        self.enabled = enabled
+        
+        # {(范围, 消息平台, ID, 指令类别): 令牌桶}
+        self._buckets: Dict[Tuple[str, str, str, str], TokenBucket] = {}
+        self._last_sweep = time.monotonic()
+        
+        self.stats = {name: self._empty_stats() for name in COMMAND_CLASSES}
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {"allowed": 0, "limited_user": 0, "limited_group": 0, "silenced": 0}
+    
+    def _limits(self, scope: str, command_class: str) -> Tuple[float, float]:
+        """(每秒补充的令牌数, 桶容量)"""
+        rate = self.per_minute[command_class] / 60
+        if scope == "group":
+            rate *= self.group_multiplier
+        return rate, max(1.0, rate * BURST_SECONDS)
+    
+    def _bucket(self, scope: str, platform: str, owner: str, command_class: str,
+                now: float) -> Tuple[TokenBucket, float]:
+        rate, capacity = self._limits(scope, command_class)
+        key = (scope, platform, owner, command_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(capacity, now)
+        else:
+            bucket.refill(now, rate, capacity)
+        return bucket, rate
+    
+    def _sweep(self, now: float) -> None:
+        """删除长时间闲置的桶（已补满，与新建的桶等价）"""
+        if now - self._last_sweep < IDLE_SECONDS:
+            return
+        self._last_sweep = now
+        idle = [key for key, bucket in self._buckets.items() if now - bucket.updated > IDLE_SECONDS]
+        for key in idle:
+            del self._buckets[key]
+    
+    def acquire(self, user_id: str, group_id: Optional[str], command_class: str,
+                platform: str = "") -> Dict[str, Any]:
+        """
+        为一次指令取令牌（用户和群都有令牌时才扣除）
+        
+        Args:
+            user_id: 发送者ID
+            group_id: 群ID，私聊或不计入群限流的指令为空
+            command_class: 指令类别
+            platform: 消息平台
+        
+        Returns:
+            {'allowed': 是否放行, 'scope': 限流范围, 'retry_after': 秒数, 'notify': 是否需要回复提示}
+        """
+        stats = self.stats[command_class]
+        if not self.enabled:
+            stats["allowed"] += 1
+            return {'allowed': True}
+        
+        now = time.monotonic()
+        self._sweep(now)
+        
+        buckets = [("user",) + self._bucket("user", platform, user_id, command_class, now)]
+        if group_id and self.group_multiplier > 0:
+            buckets.append(("group",) + self._bucket("group", platform, group_id, command_class, now))
+        
+        for scope, bucket, rate in buckets:
+            if bucket.tokens < 1:
+                stats[f"limited_{scope}"] += 1
+                notify = not bucket.notified
+                bucket.notified = True
+                if not notify:
+                    stats["silenced"] += 1
+                return {'allowed': False, 'scope': scope, 'retry_after': bucket.retry_after(rate), 'notify': notify}
+        
+        for _, bucket, _ in buckets:
+            bucket.tokens -= 1
+            bucket.notified = False
+        stats["allowed"] += 1
+        return {'allowed': True}
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出限流指标"""
+        classes = {}
+        for name, stats in self.stats.items():
+            limited = stats["limited_user"] + stats["limited_group"]
+            total = stats["allowed"] + limited
+            classes[name] = dict(stats, limited=limited,
+                                 shed_rate=round(limited / total * 100, 2) if total else 0.0,
+                                 per_minute=self.per_minute[name])
+        return {
+            "enabled": self.enabled,
+            "group_multiplier": self.group_multiplier,
+            "buckets": len(self._buckets),
+            "classes": classes
+        }
+    
+    def clear(self) -> None:
+        """清空指标（保留令牌桶）"""
+        self.stats = {name: self._empty_stats() for name in COMMAND_CLASSES}
+
+
+_rate_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取进程级共享的限流器"""
+    return _rate_limiter
+
+
+def configure_rate_limiter(settings: Optional[Dict[str, Any]] = None) -> RateLimiter:
+    """
+    按性能设置更新共享限流器（保留已有的令牌桶和指标）
+    
+    Args:
+        settings: performance_settings 配置
+    
+    Returns:
+        共享限流器
+    """
+    settings = settings or {}
+    for name in COMMAND_CLASSES:
+        per_minute = settings.get(f"{name}_commands_per_minute", DEFAULT_PER_MINUTE[name])
+        if not (1 <= per_minute <= 600):
+            per_minute = DEFAULT_PER_MINUTE[name]
+        _rate_limiter.per_minute[name] = per_minute
+    
+    group_multiplier = settings.get("group_rate_multiplier", DEFAULT_GROUP_MULTIPLIER)
+    if not (0 <= group_multiplier <= 100):
+        group_multiplier = DEFAULT_GROUP_MULTIPLIER
+    _rate_limiter.group_multiplier = group_multiplier
+    _rate_limiter.enabled = settings.get("rate_limit_enabled", True)
+    return _rate_limiter
+
+
+def rate_limited(command_class: Union[str, Callable[[Any], str]], group: bool = True) -> Callable:
+    """
+    限流装饰器，用于 async generator 形式的指令处理函数
+    放在 @filter.command 和 @track_command 之间，被限流的请求不计入指令耗时
+    
+    Args:
+        command_class: 指令类别，或按消息事件返回类别的函数（同一指令的子命令开销不同时）
+        group: 是否计入群限流（每人每天一次的指令为 False，只按用户限流）
+    """
+    def decorator(func: Callable) -> Callable:
+        
+        @functools.wraps(func)
+        async def wrapper(self, event, *args: Any, **kwargs: Any):
+            if is_replay(func, event):
+                # 重放上次结果，不重复计数
+                async for result in func(self, event, *args, **kwargs):
+                    yield result
+                return
+            
+            name = command_class(event) if callable(command_class) else command_class
+            user_id = str(event.get_sender_id())
+            group_id = event.get_group_id() if group else None
+            platform = str(event.get_platform_name())
+            
+            decision = _rate_limiter.acquire(user_id, str(group_id) if group_id else None, name, platform)
+            if not decision['allowed']:
+                if decision['notify']:
+                    logger.info(f"指令限流：{decision['scope']} {group_id if decision['scope'] == 'group' else user_id} 的 {name} 类指令")
+                    who = "本群" if decision['scope'] == "group" else "你"
+                    yield event.plain_result(f"⏳ {who}的操作太频繁了，请 {math.ceil(decision['retry_after'])} 秒后再试")
+                return
+            
+            async for result in func(self, event, *args, **kwargs):
+                yield result
+        
+        return wrapper
+    return decorator
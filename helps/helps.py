@@ -1,9 +1,18 @@
+from __future__ import annotations
+
 import os
 import re
-from typing import List, Dict, Any, Optional
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from astrbot.api import logger
 
+from ..perf import measure_render
+from ..render.encoder import get_encoder
+from ..render.fonts import get_font_registry
+
+if TYPE_CHECKING:
+    # PIL 仅在真正生成图片时导入，避免拖慢插件加载
+    from PIL import Image, ImageDraw
+
 
 class PluginHelpGenerator:
     """插件帮助信息生成器"""
@@ -15,10 +24,6 @@ class PluginHelpGenerator:
         self.max_commands_per_row = max_commands_per_row
         self.show_plugin_logos = show_plugin_logos
         
-        # 数据目录
-        self.data_dir = os.path.join("data", "plugins_data", "linbot")
-        os.makedirs(self.data_dir, exist_ok=True)
-        
         # 主题色配置 - 白色和淡蓝色
         self.colors = {
             'background': '#FFFFFF',           # 白色背景
@@ -46,33 +51,33 @@ class PluginHelpGenerator:
             'commands_per_row': self.max_commands_per_row
         }
         
-        # 字体配置
-        self.fonts = self._load_fonts()
-
+        # 字体配置（首次绘制时再加载）
+        self._fonts = None
+    
+    @property
+    def fonts(self) -> Dict[str, Any]:
+        """字体配置（懒加载）"""
+        if self._fonts is None:
+            self._fonts = self._load_fonts()
+        return self._fonts
+    
+    # 字体名称 -> 字号
+    FONT_SIZES = {
+        'title': 28,
+        'subtitle': 20,
+        'text': 16,
+        'command': 14,
+        'header': 32
+    }
+    
     def _load_fonts(self) -> Dict[str, Any]:
-        """加载字体"""
-        font_path = os.path.join(self.plugin_dir, "assets", "LXGWWenKai-Regular.ttf")
-        
-        try:
-            return {
-                'title': ImageFont.truetype(font_path, 28),
-                'subtitle': ImageFont.truetype(font_path, 20),
-                'text': ImageFont.truetype(font_path, 16),
-                'command': ImageFont.truetype(font_path, 14),
-                'header': ImageFont.truetype(font_path, 32)
-            }
-        except OSError:
-            logger.warning(f"字体文件加载失败: {font_path}")
-            # 使用默认字体
-            default_font = ImageFont.load_default()
-            return {
-                'title': default_font,
-                'subtitle': default_font,
-                'text': default_font,
-                'command': default_font,
-                'header': default_font
-            }
-
+        """加载字体（来自进程级共享字体缓存）"""
+        return get_font_registry().get_fonts(self.FONT_SIZES)
+    
+    def _font_for(self, name: str, text: str) -> Any:
+        """获取能显示插件名称、描述等动态文本的字体（子集缺字时回退完整字体）"""
+        return get_font_registry().font_for(self.FONT_SIZES[name], text)
+    
     def get_external_plugins(self) -> List[Dict[str, Any]]:
         """获取外部插件信息"""
         try:
@@ -116,7 +121,7 @@ class PluginHelpGenerator:
                     # 内置插件在 astrbot.core, packages. 等路径下
                     if any(keyword in plugin_module for keyword in ['astrbot.core', 'packages.', 'builtin']):
                         continue
-                        
+                    
                     # 只保留外部插件（通常在 data/plugins/ 目录下或模块名包含 astrbot_plugin_）
                     if not ('astrbot_plugin_' in plugin_module or 'data.plugins.' in plugin_module):
                         continue
@@ -142,7 +147,7 @@ class PluginHelpGenerator:
                     }
                     
                     external_plugins.append(plugin_info)
-                    
+                
                 except Exception as e:
                     continue
             
@@ -150,11 +155,11 @@ class PluginHelpGenerator:
             external_plugins.sort(key=lambda x: x['name'])
             
             return external_plugins
-            
+        
         except Exception as e:
             logger.error(f"获取外部插件信息失败: {e}")
             return []
-
+    
     def _extract_commands(self, star, plugin_name: str) -> List[str]:
         """提取插件指令（从实例）"""
         commands = []
@@ -197,7 +202,7 @@ class PluginHelpGenerator:
                 for method_name in dir(star):
                     if method_name.startswith('_'):
                         continue
-                        
+                    
                     method = getattr(star, method_name)
                     if callable(method):
                         # 检查多种装饰器模式
@@ -224,13 +229,13 @@ class PluginHelpGenerator:
             # 如果还是没有找到指令，尝试推断
             if not commands:
                 commands = self._infer_commands(plugin_name)
-                
+        
         except Exception as e:
             commands = self._infer_commands(plugin_name)
         
         # 确保返回的所有指令都是字符串类型
         return [str(cmd) if not isinstance(cmd, str) else cmd for cmd in commands]
-
+    
     def _extract_commands_from_class(self, star_class, plugin_name: str) -> List[str]:
         """提取插件指令（从类）"""
         commands = []
@@ -240,7 +245,7 @@ class PluginHelpGenerator:
             for method_name in dir(star_class):
                 if method_name.startswith('_'):
                     continue
-                    
+                
                 method = getattr(star_class, method_name)
                 if callable(method):
                     # 检查装饰器属性
@@ -270,13 +275,13 @@ class PluginHelpGenerator:
             # 如果没有找到指令，尝试推断
             if not commands:
                 commands = self._infer_commands(plugin_name)
-                
+        
         except Exception as e:
             commands = self._infer_commands(plugin_name)
         
         # 确保返回的所有指令都是字符串类型
         return [str(cmd) if not isinstance(cmd, str) else cmd for cmd in commands]
-
+    
     def _infer_commands(self, plugin_name: str) -> List[str]:
         """根据插件名称推断指令"""
         name_lower = plugin_name.lower()
@@ -303,7 +308,7 @@ class PluginHelpGenerator:
                 return [f"{self.prefix}{cmd}" for cmd in cmds]
         
         return [f"{self.prefix}{plugin_name}"]
-
+    
     def _calculate_card_height(self, commands: List[str]) -> int:
         """计算卡片高度（自适应）"""
         base_height = 80  # 基础高度（插件名和描述）
@@ -316,7 +321,7 @@ class PluginHelpGenerator:
         command_area_height = commands_rows * (self.layout['command_item_height'] + self.layout['command_margin'])
         
         return base_height + command_area_height + 20  # 额外间距
-
+    
     def _calculate_image_height(self, plugins: List[Dict[str, Any]]) -> int:
         """计算图片总高度"""
         if not plugins:
@@ -329,45 +334,55 @@ class PluginHelpGenerator:
             total_height += card_height + self.layout['card_margin']
         
         return total_height + 50  # 底部额外空间
-
-    async def generate_help_image(self, plugins: List[Dict[str, Any]]) -> Optional[str]:
-        """生成帮助图片"""
+    
+    async def generate_help_image(self, plugins: List[Dict[str, Any]]) -> Optional[bytes]:
+        """生成帮助图片，返回编码后的图片字节"""
+        return self.encode_help_image(plugins)
+    
+    def encode_help_image(self, plugins: List[Dict[str, Any]]) -> Optional[bytes]:
+        """绘制并编码帮助图片（同步执行，可在线程池中调用），失败时返回 None"""
         if not plugins:
             return None
-
+        
         try:
-            # 计算图片尺寸
-            image_height = self._calculate_image_height(plugins)
-            
-            # 创建图片
-            image = Image.new('RGB', (self.layout['image_width'], image_height), self.colors['background'])
-            draw = ImageDraw.Draw(image)
-            
-            # 绘制头部
-            self._draw_header(draw, image)
-            
-            # 加载头像
-            avatar = self._load_avatar()
-            
-            # 绘制插件卡片
-            y_offset = self.layout['header_height'] + self.layout['margin']
-            
-            for plugin in plugins:
-                card_height = self._calculate_card_height(plugin['commands'])
-                self._draw_plugin_card(draw, image, plugin, y_offset, card_height, avatar)
-                y_offset += card_height + self.layout['card_margin']
-            
-            # 保存图片
-            image_path = os.path.join(self.data_dir, "help.png")
-            image.save(image_path, "PNG", quality=95)
-            
-            logger.info(f"帮助图片已生成: {image_path}")
-            return image_path
+            with measure_render():
+                image = self.render_help_image(plugins)
+                data = get_encoder().encode(image, "help")
             
+            logger.info(f"帮助图片已生成: {len(data)} 字节")
+            return data
+        
         except Exception as e:
             logger.error(f"生成帮助图片失败: {e}")
             return None
-
+    
+    def render_help_image(self, plugins: List[Dict[str, Any]]) -> Image.Image:
+        """绘制帮助图片，返回 PIL Image 对象"""
+        from PIL import Image, ImageDraw
+        
+        # 计算图片尺寸
+        image_height = self._calculate_image_height(plugins)
+        
+        # 创建图片
+        image = Image.new('RGB', (self.layout['image_width'], image_height), self.colors['background'])
+        draw = ImageDraw.Draw(image)
+        
+        # 绘制头部
+        self._draw_header(draw, image)
+        
+        # 加载头像
+        avatar = self._load_avatar()
+        
+        # 绘制插件卡片
+        y_offset = self.layout['header_height'] + self.layout['margin']
+        
+        for plugin in plugins:
+            card_height = self._calculate_card_height(plugin['commands'])
+            self._draw_plugin_card(draw, image, plugin, y_offset, card_height, avatar)
+            y_offset += card_height + self.layout['card_margin']
+        
+        return image
+    
     def _draw_header(self, draw: ImageDraw.Draw, image: Image.Image):
         """绘制头部"""
         # 绘制头部背景
@@ -382,9 +397,11 @@ class PluginHelpGenerator:
         title_y = (self.layout['header_height'] - (bbox[3] - bbox[1])) // 2
         
         draw.text((title_x, title_y), title, fill=self.colors['title'], font=self.fonts['header'])
-
+    
     def _load_avatar(self) -> Optional[Image.Image]:
         """加载头像图片"""
+        from PIL import Image, ImageDraw
+        
         avatar_path = os.path.join(self.plugin_dir, "assets", "logo.png")
         
         try:
@@ -406,10 +423,12 @@ class PluginHelpGenerator:
                 return None
         except Exception as e:
             return None
-
+    
     def _draw_plugin_card(self, draw: ImageDraw.Draw, image: Image.Image, plugin: Dict[str, Any], 
                          y_offset: int, card_height: int, avatar: Optional[Image.Image]):
         """绘制插件卡片"""
+        from PIL import Image
+        
         # 卡片边界
         card_left = self.layout['margin']
         card_right = self.layout['image_width'] - self.layout['margin']
@@ -450,7 +469,7 @@ class PluginHelpGenerator:
                     
                     # 直接粘贴到主图片上
                     image.paste(avatar, (paste_x, paste_y))
-                    
+                
                 except Exception as e:
                     # 绘制占位符圆形
                     draw.ellipse([content_left, current_y, 
@@ -471,19 +490,19 @@ class PluginHelpGenerator:
         
         # 插件名称
         name_text = plugin['name']
-        draw.text((text_left, current_y), name_text, fill=self.colors['title'], font=self.fonts['title'])
+        draw.text((text_left, current_y), name_text, fill=self.colors['title'], font=self._font_for('title', name_text))
         
         # 插件描述（在名称下方）
         desc_y = current_y + 35
         desc_text = plugin['description']
-        draw.text((text_left, desc_y), desc_text, fill=self.colors['text'], font=self.fonts['text'])
+        draw.text((text_left, desc_y), desc_text, fill=self.colors['text'], font=self._font_for('text', desc_text))
         
         # 第二行：指令列表（圆角矩形，一行4个）
         commands = plugin['commands']
         if commands:
             commands_start_y = content_top + 80
             self._draw_commands(draw, commands, content_left, commands_start_y, content_right)
-
+    
     def _draw_commands(self, draw: ImageDraw.Draw, commands: List[str], 
                       left: int, top: int, right: int):
         """绘制指令列表（圆角矩形，一行4个）"""
@@ -522,14 +541,15 @@ class PluginHelpGenerator:
                                        radius=8, width=1)
             
             # 绘制指令文本（居中）
-            bbox = draw.textbbox((0, 0), command, font=self.fonts['command'])
+            command_font = self._font_for('command', command)
+            bbox = draw.textbbox((0, 0), command, font=command_font)
             text_width = bbox[2] - bbox[0]
             text_height = bbox[3] - bbox[1]
             
             text_x = current_x + (item_width - text_width) // 2
             text_y = current_y + (item_height - text_height) // 2
             
-            draw.text((text_x, text_y), command, fill=self.colors['command_text'], font=self.fonts['command'])
+            draw.text((text_x, text_y), command, fill=self.colors['command_text'], font=command_font)
             
             # 更新位置
             items_in_row += 1
@@ -540,7 +560,7 @@ class PluginHelpGenerator:
                 items_in_row = 0
             else:
                 current_x += item_width + margin
-
+    
     def _draw_rounded_rectangle(self, draw: ImageDraw.Draw, coords: List[int], 
                               fill: str, outline: str, radius: int = 5, width: int = 1):
         """绘制圆角矩形"""
@@ -548,7 +568,7 @@ class PluginHelpGenerator:
         
         # 绘制圆角矩形
         draw.rounded_rectangle([x1, y1, x2, y2], radius=radius, fill=fill, outline=outline, width=width)
-
+    
     def generate_text_help(self, plugins: List[Dict[str, Any]]) -> str:
         """生成文本版帮助信息"""
         if not plugins:
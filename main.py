@@ -1,14 +1,15 @@
+import asyncio
 import os
 import shutil
+import threading
+import time
 from typing import Dict, Any
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger, AstrBotConfig
 
-# 导入帮助功能模块
-from .helps.helps import PluginHelpGenerator
-# 导入服务器监控模块
-from .server.monitor import ServerMonitor
+# 帮助功能模块与服务器监控模块依赖 PIL / matplotlib / psutil，
+# 改为首次使用时再导入和构造，见 help_generator / server_monitor 属性
 # 导入游戏模块
 from .game.qiandao import CheckinManager
 from .game.mybag import UserInfoManager
@@ -16,15 +17,63 @@ from .game.gzrw import WorkManager
 from .game.bank import BankManager
 from .game.phb import RankingManager
 from .game.qiangjie import RobberyManager
+from .game.activity import ensure_activity_indexes
+from .game.backup import DatabaseBackup, backup_settings_from
+from .game.db import connect
+from .game.rollup import HistoryRollup, retention_days_from
+from .game.shards import get_shard_router
+from .game.stats import ensure_stats_tables, rebuild_user_stats
+from .game.storage import open_store
+from .game.user_search import ensure_user_search
+from .guard import (configure_admission, configure_command_cache, configure_rate_limiter, get_admission,
+                    get_command_cache, get_rate_limiter, get_user_locks, idempotent, rate_limited)
+from .perf import configure_sql_profiler, get_loop_probe, get_metrics, get_sql_profiler, offload, track_command
+from .render.delivery import ImageDelivery
+from .render.encoder import configure_encoder, get_encoder
+
+# 我的记录 每页条数和最多保留翻页位置的用户数
+ACTIVITY_PAGE_SIZE = 10
+ACTIVITY_CURSOR_LIMIT = 1000
+
+# 负载过高时可以代替新图片发送的缓存图片的最长时间（秒）
+CACHED_IMAGE_MAX_AGE = {"help": 3600, "ranking": 60, "monitor": 30, "chart": 300}
+
+
+def _server_command_class(event: AstrMessageEvent) -> str:
+    """服务器 指令的限流类别：图表需要持续采样，单独限流"""
+    args = event.message_str.split()
+    return "chart" if len(args) > 1 and args[1] == "图表" else "image"
+
+
+def _work_mutates(event: AstrMessageEvent) -> bool:
+    """打工 [工作名称] 会修改数据（不带参数时为工作列表）"""
+    return len(event.message_str.split()) > 1
+
+
+def _bank_mutates(event: AstrMessageEvent) -> bool:
+    """银行 存款/取款/转账 会修改数据（其余为银行信息和用法提示）"""
+    args = event.message_str.split()
+    return len(args) > 1 and args[1] in ("存款", "取款", "转账")
+
+
+def _robbery_mutates(event: AstrMessageEvent) -> bool:
+    """抢劫 [用户名] 会修改数据（不带参数时为抢劫信息，抢劫目标 为目标列表）"""
+    args = event.message_str.split()
+    return len(args) > 1 and args[1] != "目标"
+
 
 @register("linbot", "YourName", "LinBot - AstrBot 外部插件帮助中心和服务器监控工具", "1.4.0", "https://github.com/yourusername/astrbot_plugin_linbot")
 class LinBotPlugin(Star):
     """LinBot - AstrBot 外部插件帮助中心和服务器监控工具"""
-
+    
+    # 插件数据目录（相对工作目录）和游戏数据库（相对插件目录），负载模拟器在子类中改为测试副本
+    DATA_DIR = os.path.join("data", "plugins_data", "astrbot_plugin_linbot")
+    GAME_DB = os.path.join("game", "user.db")
+    
     def __init__(self, context: Context, config: AstrBotConfig = None):
         super().__init__(context)
         self.plugin_dir = os.path.dirname(__file__)
-        self.data_dir = os.path.join("data", "plugins_data", "astrbot_plugin_linbot")
+        self.data_dir = self.DATA_DIR
         self.plugin_config = config or {}
         
         # 获取系统前缀配置
@@ -52,33 +101,145 @@ class LinBotPlugin(Star):
         if not (10 <= self.chart_duration <= 120):
             self.chart_duration = 30
         
-        # 初始化帮助生成器，传递配置参数
-        self.help_generator = PluginHelpGenerator(
-            context=self.context,
-            plugin_dir=self.plugin_dir,
-            prefix=self.prefix,
-            max_commands_per_row=self.max_commands_per_row,
-            show_plugin_logos=self.show_plugin_logos
+        # 图片编码和发送设置
+        render_settings = self.plugin_config.get("render_settings", {})
+        configure_encoder(render_settings)
+        self.image_delivery = ImageDelivery(
+            mode=render_settings.get("delivery_mode", "bytes"),
+            temp_dir=os.path.join(self.data_dir, "tmp")
         )
         
-        # 初始化服务器监控
-        if self.enable_monitor:
-            self.server_monitor = ServerMonitor()
-        else:
-            self.server_monitor = None
+        # 性能设置
+        configure_sql_profiler(self.plugin_config.get("performance_settings", {}))
+        configure_command_cache(self.plugin_config.get("performance_settings", {}))
+        configure_rate_limiter(self.plugin_config.get("performance_settings", {}))
+        configure_admission(self.plugin_config.get("performance_settings", {}))
+        
+        # 帮助生成器和服务器监控在首次使用时构造
+        self._help_generator = None
+        self._server_monitor = None
+        
+        # 我的记录 的翻页位置 {user_id: 下一页位置}
+        self._activity_cursors: Dict[str, str] = {}
         
         # 初始化游戏模块
-        game_db_path = os.path.join(self.plugin_dir, "game", "user.db")
-        self.checkin_manager = CheckinManager(game_db_path)
-        self.user_info_manager = UserInfoManager(game_db_path)
-        self.work_manager = WorkManager(game_db_path, self.plugin_config)
-        self.bank_manager = BankManager(game_db_path, self.plugin_config)
-        self.ranking_manager = RankingManager(game_db_path, self.plugin_dir)
-        self.robbery_manager = RobberyManager(game_db_path, self.plugin_config)
+        self.game_db_path = game_db_path = os.path.join(self.plugin_dir, self.GAME_DB)
+        
+        # 历史记录汇总：超过保留期的原始记录按用户按天汇总后删除，每天执行一次
+        self.history_rollup = HistoryRollup(
+            game_db_path, retention_days_from(self.plugin_config.get("performance_settings", {}))
+        )
+        self.history_rollup.ensure_started()
+        
+        # 定时在线备份：快照保存在插件数据目录中，插件更新或重装时不会被覆盖
+        backup_interval, backup_keep = backup_settings_from(self.plugin_config.get("performance_settings", {}))
+        self.database_backup = DatabaseBackup(
+            game_db_path, os.path.join(self.data_dir, "backups"), backup_interval, backup_keep
+        )
+        self.database_backup.ensure_started()
+        
+        # 用户数据按 user_id 分片存放（未迁移时只有 user.db 一个分片），以下结构在每个分片上维护
+        self.shard_router = get_shard_router(game_db_path)
+        
+        # 用户累计统计表和触发器（只建表，不读取数据）；需要从历史记录重建统计的分片
+        self._stats_pending = []
+        for path in self.shard_router.paths:
+            conn = connect(path)
+            try:
+                if ensure_stats_tables(conn):
+                    self._stats_pending.append(path)
+            finally:
+                conn.close()
+        
+        # 统计重建、索引、全文索引和可抢劫目标在大数据库上首次建立需要数秒，启动后在后台准备；
+        # 准备完成前个人统计从历史记录累计，用户名查找和抢劫目标直接扫描用户表
+        # memory 存储启动时从 user.db 载入统计，需要先准备好
+        performance_settings = self.plugin_config.get("performance_settings", {})
+        if performance_settings.get("storage_backend", "sqlite") == "memory":
+            self._prepare_database()
+        
+        # 存储引擎（修改后需重启）：sqlite 读写 user.db，memory 启动时从 user.db 载入，之后的修改不写回
+        self.store = store = open_store(game_db_path, performance_settings)
+        self.checkin_manager = CheckinManager(game_db_path, store=store)
+        self.user_info_manager = UserInfoManager(game_db_path, store=store)
+        self.work_manager = WorkManager(game_db_path, self.plugin_config, store=store)
+        self.bank_manager = BankManager(game_db_path, self.plugin_config, store=store)
+        self.ranking_manager = RankingManager(game_db_path, self.plugin_dir, store=store)
+        self.robbery_manager = RobberyManager(game_db_path, self.plugin_config, store=store)
+        
+        # 后台准备完成时设置
+        self.database_ready = threading.Event()
+        self._prepare_task = None
+        store.stats_ready = not self._stats_pending
+        self.robbery_manager.defer_target_index()
+        try:
+            self._prepare_task = asyncio.get_running_loop().create_task(self._prepare_in_background())
+        except RuntimeError:
+            # 没有运行中的事件循环（命令行工具等）时直接准备
+            self._prepare_all()
         
         logger.info(f"LinBot 插件加载完成 - 每行指令数: {self.max_commands_per_row}, 显示头像: {self.show_plugin_logos}, 使用系统前缀: {self.prefix}")
-
+    
+    def _prepare_database(self) -> None:
+        """重建统计表（新建时），建立活动记录索引、用户名索引和全文索引"""
+        for path in self.shard_router.paths:
+            conn = connect(path)
+            try:
+                ensure_activity_indexes(conn)
+                if path in self._stats_pending:
+                    result = rebuild_user_stats(conn)
+                    logger.info(f"用户统计表已从历史记录重建: {result['users']} 个用户，耗时 {result['seconds']} 秒")
+                ensure_user_search(conn)
+            finally:
+                conn.close()
+        self._stats_pending = []
+    
+    def _prepare_all(self) -> None:
+        """准备数据库和可抢劫目标索引，完成后切换到统计表和目标表"""
+        start = time.perf_counter()
+        self._prepare_database()
+        self.store.stats_ready = True
+        self.robbery_manager.ensure_target_index()
+        self.database_ready.set()
+        logger.info(f"LinBot 数据库准备完成，耗时 {time.perf_counter() - start:.2f} 秒")
+    
+    async def _prepare_in_background(self) -> None:
+        try:
+            await asyncio.to_thread(self._prepare_all)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"LinBot 数据库准备失败（统计和查找继续使用直接查询）: {e}")
+    
+    @property
+    def help_generator(self):
+        """帮助生成器（懒加载，首次调用时导入PIL并构造）"""
+        if self._help_generator is None:
+            from .helps.helps import PluginHelpGenerator
+            
+            self._help_generator = PluginHelpGenerator(
+                context=self.context,
+                plugin_dir=self.plugin_dir,
+                prefix=self.prefix,
+                max_commands_per_row=self.max_commands_per_row,
+                show_plugin_logos=self.show_plugin_logos
+            )
+        return self._help_generator
+    
+    @property
+    def server_monitor(self):
+        """服务器监控（懒加载，监控功能禁用时为 None）"""
+        if not self.enable_monitor:
+            return None
+        if self._server_monitor is None:
+            from .server.monitor import ServerMonitor
+            
+            self._server_monitor = ServerMonitor()
+        return self._server_monitor
+    
     @filter.command("帮助")
+    @rate_limited("image")
+    @track_command("帮助")
     async def help_command(self, event: AstrMessageEvent):
         """生成AstrBot外部插件帮助中心图片"""
         try:
@@ -89,21 +250,33 @@ class LinBotPlugin(Star):
                 yield event.plain_result("暂无外部插件信息")
                 return
             
-            # 生成帮助图片
-            image_path = await self.help_generator.generate_help_image(plugins)
+            # 负载过高时发送缓存的帮助图片或文字帮助
+            admission = get_admission()
+            if admission.overloaded():
+                cached = admission.cached("help", CACHED_IMAGE_MAX_AGE["help"])
+                admission.record_degraded(cached is not None)
+                if cached:
+                    yield self.image_delivery.result(event, cached[0])
+                else:
+                    yield event.plain_result(self.help_generator.generate_text_help(plugins))
+                return
+            
+            # 生成帮助图片（在渲染队列中执行）
+            image_data = await admission.render("help", self.help_generator.encode_help_image, plugins)
             
-            if image_path and os.path.exists(image_path):
-                yield event.image_result(image_path)
+            if image_data:
+                yield self.image_delivery.result(event, image_data)
             else:
                 # 降级到文本帮助
                 text_help = self.help_generator.generate_text_help(plugins)
                 yield event.plain_result(text_help)
-                
+        
         except Exception as e:
             logger.error(f"LinBot帮助功能出错: {e}")
             yield event.plain_result("帮助功能暂时不可用，请稍后再试")
-
+    
     @filter.command("linbot_config")
+    @track_command("linbot_config")
     async def config_command(self, event: AstrMessageEvent):
         """LinBot配置管理指令"""
         try:
@@ -122,6 +295,17 @@ class LinBotPlugin(Star):
 • 监控间隔：{self.monitor_interval}秒 (1-10)
 • 图表时长：{self.chart_duration}秒 (10-120)
 
+🖼️ 渲染设置：
+• 图片发送方式：{self.image_delivery.mode} (bytes/file)
+• 图片体积上限：{get_encoder().max_bytes // 1024}KB (0为不限制)
+• 调色板PNG：{'开启' if get_encoder().palette else '关闭'}
+• 允许WebP/JPEG：{'是' if get_encoder().allow_webp else '否'}/{'是' if get_encoder().allow_jpeg else '否'}
+
+📈 性能设置：
+• SQL分析：{'开启' if get_sql_profiler().enabled else '关闭'}
+• 慢查询阈值：{get_sql_profiler().slow_query_ms}ms (0为不记录)
+• 历史记录保留：{self.history_rollup.retention_days}天 (0为不清理)
+
 ℹ️ 系统信息：
 • 当前指令前缀：{self.prefix} (来自系统配置)
 
@@ -130,17 +314,20 @@ class LinBotPlugin(Star):
 • 修改指令前缀请前往 AstrBot 系统设置
 • 配置修改后需要重载插件才能生效"""
                 yield event.plain_result(config_info)
-                
+            
             elif len(args) == 2 and args[1] == "reload":
                 # 重新加载配置
                 display_settings = self.plugin_config.get("display_settings", {})
                 monitor_settings = self.plugin_config.get("server_monitor_settings", {})
+                render_settings = self.plugin_config.get("render_settings", {})
                 
                 old_commands_per_row = self.max_commands_per_row
                 old_show_logos = self.show_plugin_logos
                 old_enable_monitor = self.enable_monitor
                 old_monitor_interval = self.monitor_interval
                 old_chart_duration = self.chart_duration
+                old_delivery_mode = self.image_delivery.mode
+                old_retention_days = self.history_rollup.retention_days
                 
                 # 更新显示配置
                 self.max_commands_per_row = display_settings.get("max_commands_per_row", 4)
@@ -161,24 +348,28 @@ class LinBotPlugin(Star):
                 if not (10 <= self.chart_duration <= 120):
                     self.chart_duration = 30
                 
+                # 更新图片编码和发送方式、性能设置
+                configure_encoder(render_settings)
+                configure_sql_profiler(self.plugin_config.get("performance_settings", {}))
+                configure_command_cache(self.plugin_config.get("performance_settings", {}))
+                configure_rate_limiter(self.plugin_config.get("performance_settings", {}))
+                configure_admission(self.plugin_config.get("performance_settings", {}))
+                self.history_rollup.retention_days = retention_days_from(self.plugin_config.get("performance_settings", {}))
+                self.history_rollup.ensure_started()
+                self.database_backup.configure(self.plugin_config.get("performance_settings", {}))
+                self.database_backup.ensure_started()
+                self.image_delivery = ImageDelivery(
+                    mode=render_settings.get("delivery_mode", "bytes"),
+                    temp_dir=os.path.join(self.data_dir, "tmp")
+                )
+                
                 # 重新获取系统前缀配置
                 system_config = self.context.get_config()
                 self.prefix = system_config.get("wake_prefix", ["/"])[0] if system_config.get("wake_prefix") else "/"
                 
-                # 重新初始化帮助生成器
-                self.help_generator = PluginHelpGenerator(
-                    context=self.context,
-                    plugin_dir=self.plugin_dir,
-                    prefix=self.prefix,
-                    max_commands_per_row=self.max_commands_per_row,
-                    show_plugin_logos=self.show_plugin_logos
-                )
-                
-                # 重新初始化服务器监控
-                if self.enable_monitor:
-                    self.server_monitor = ServerMonitor()
-                else:
-                    self.server_monitor = None
+                # 重置帮助生成器和服务器监控，下次使用时按新配置重新构造
+                self._help_generator = None
+                self._server_monitor = None
                 
                 changes = []
                 if old_commands_per_row != self.max_commands_per_row:
@@ -191,34 +382,409 @@ class LinBotPlugin(Star):
                     changes.append(f"监控间隔: {old_monitor_interval}秒 → {self.monitor_interval}秒")
                 if old_chart_duration != self.chart_duration:
                     changes.append(f"图表时长: {old_chart_duration}秒 → {self.chart_duration}秒")
+                if old_delivery_mode != self.image_delivery.mode:
+                    changes.append(f"图片发送方式: {old_delivery_mode} → {self.image_delivery.mode}")
+                if old_retention_days != self.history_rollup.retention_days:
+                    changes.append(f"历史记录保留: {old_retention_days}天 → {self.history_rollup.retention_days}天")
                 
                 if changes:
                     yield event.plain_result(f"✅ 配置已重载\n\n变更内容：\n" + "\n".join(f"• {change}" for change in changes))
                 else:
                     yield event.plain_result("✅ 配置已重载，无变更")
-                    
+            
+            elif len(args) == 2 and args[1] == "encode":
+                # 各类图片的编码统计
+                stats = get_encoder().stats()
+                if not stats:
+                    yield event.plain_result("📊 暂无图片编码记录")
+                    return
+                
+                lines = ["📊 图片编码统计：", ""]
+                for kind, s in stats.items():
+                    formats = ", ".join(f"{fmt}×{count}" for fmt, count in s['formats'].items())
+                    lines.append(f"• {kind}：{s['count']}次 | 平均 {s['avg_ms']}ms / 最慢 {s['max_ms']}ms | "
+                                 f"平均 {s['avg_kb']}KB / 最近 {s['last_kb']}KB | {formats}")
+                yield event.plain_result("\n".join(lines))
+            
             else:
                 yield event.plain_result("""📖 LinBot 配置指令使用说明：
 
 /linbot_config - 查看当前配置
 /linbot_config reload - 重新加载配置
+/linbot_config encode - 查看图片编码统计
 
 💡 要修改配置，请前往：
 AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
-                
+
         except Exception as e:
             logger.error(f"LinBot配置管理出错: {e}")
             yield event.plain_result("配置管理功能出现错误，请检查日志")
-
+    
+    @filter.command("linbot_perf")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_perf")
+    async def perf_command(self, event: AstrMessageEvent):
+        """查看各指令耗时分位数和事件循环延迟（管理员）"""
+        try:
+            args = event.message_str.split()
+            metrics = get_metrics()
+            
+            if len(args) > 1 and args[1] == "reset":
+                metrics.clear()
+                get_user_locks().clear()
+                get_command_cache().clear()
+                get_rate_limiter().clear()
+                get_admission().clear()
+                yield event.plain_result("✅ 性能统计已清空")
+                return
+            
+            snapshot = metrics.snapshot()
+            commands = snapshot['commands']
+            if not commands:
+                yield event.plain_result("📈 暂无指令性能记录")
+                return
+            
+            lines = ["📈 LinBot 指令性能（毫秒）", ""]
+            for command, stats in sorted(commands.items(), key=lambda item: item[1]['wall']['p95_ms'], reverse=True):
+                wall = stats['wall']
+                lines.append(f"• {command} ×{wall['count']}（失败{stats['errors']}）")
+                lines.append(f"  总耗时 p50 {wall['p50_ms']:.1f} / p95 {wall['p95_ms']:.1f} / p99 {wall['p99_ms']:.1f}")
+                lines.append(f"  阻塞 p95 {stats['blocking']['p95_ms']:.1f} | "
+                             f"数据库 p95 {stats['db']['p95_ms']:.1f} | "
+                             f"渲染 p95 {stats['render']['p95_ms']:.1f}")
+            
+            lag = snapshot['loop_lag']
+            lines.append("")
+            lines.append(f"⏱️ 事件循环延迟：p50 {lag['p50_ms']:.1f} / p95 {lag['p95_ms']:.1f} / "
+                         f"p99 {lag['p99_ms']:.1f} / 最大 {lag['max_ms']:.1f}（{lag['count']}次采样）")
+            
+            locks = get_user_locks().snapshot()
+            wait = locks['wait']
+            lines.append(f"🔒 用户锁：{locks['acquisitions']}次加锁，争用 {locks['contended']}次（{locks['contention_rate']:.1f}%），"
+                         f"等待 p95 {wait['p95_ms']:.1f} / 最大 {wait['max_ms']:.1f}，最多同时等待 {locks['max_waiting']}")
+            
+            dedup = get_command_cache().snapshot()
+            window = f"去重窗口 {dedup['window_seconds']} 秒" if dedup['window_seconds'] > 0 else "相同指令去重已关闭，只识别平台重发"
+            lines.append(f"🔁 重复消息：执行 {dedup['executed']}次，重放 {dedup['replayed']}次（{dedup['replay_rate']:.1f}%），"
+                         f"其中等待首次执行 {dedup['waited']}次，{window}")
+            
+            limiter = get_rate_limiter().snapshot()
+            if limiter['enabled']:
+                shed = "，".join(f"{name} {stats['limited']}/{stats['allowed'] + stats['limited']}（{stats['shed_rate']:.1f}%）"
+                                for name, stats in limiter['classes'].items())
+                lines.append(f"🚦 限流：{shed}，令牌桶 {limiter['buckets']}个")
+            else:
+                lines.append("🚦 限流：已关闭")
+            
+            admission = get_admission().snapshot()
+            if admission['enabled']:
+                reasons = admission['reasons']
+                lines.append(f"🎚️ 图片降级：渲染 {admission['rendered']}次，降级 {admission['degraded_cached'] + admission['degraded_text']}次"
+                             f"（缓存图片 {admission['degraded_cached']} / 文字 {admission['degraded_text']}，"
+                             f"队列过长 {reasons['queue']} / 延迟过高 {reasons['lag']}），"
+                             f"渲染队列最大 {admission['max_depth']}（上限 {admission['max_render_queue']}）")
+            else:
+                lines.append("🎚️ 图片降级：已关闭")
+            lines.append(f"\n💡 {self.prefix}linbot_perf reset - 清空统计")
+            
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"查看性能统计出错: {e}")
+            yield event.plain_result("获取性能统计失败，请稍后再试")
+    
+    @filter.command("linbot_sql")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_sql")
+    async def sql_command(self, event: AstrMessageEvent):
+        """查看耗时最多的SQL语句（管理员）"""
+        try:
+            args = event.message_str.split()
+            profiler = get_sql_profiler()
+            
+            if len(args) > 1 and args[1] == "reset":
+                profiler.clear()
+                yield event.plain_result("✅ SQL统计已清空")
+                return
+            
+            # /linbot_sql [条数] [排序字段]
+            order_map = {"总耗时": "total_ms", "最慢": "max_ms", "平均": "avg_ms", "次数": "count", "行数": "rows", "慢查询": "slow",
+                         "锁等待": "lock_waits"}
+            limit = 10
+            order_by = "total_ms"
+            for arg in args[1:]:
+                if arg.isdigit():
+                    limit = max(1, min(int(arg), 30))
+                elif arg in order_map:
+                    order_by = order_map[arg]
+            
+            top = profiler.top(limit, order_by)
+            if not top:
+                yield event.plain_result("🗄️ 暂无SQL统计" + ("" if profiler.enabled else "（SQL分析已关闭）"))
+                return
+            
+            lines = [f"🗄️ SQL语句 Top {len(top)}（按{next(k for k, v in order_map.items() if v == order_by)}排序，毫秒）", ""]
+            for i, item in enumerate(top, 1):
+                statement = item['statement']
+                if len(statement) > 120:
+                    statement = statement[:117] + "..."
+                lines.append(f"{i}. {statement}")
+                lines.append(f"   {item['count']}次 | 总 {item['total_ms']:.1f} | 平均 {item['avg_ms']:.2f} | "
+                             f"最慢 {item['max_ms']:.1f} | {item['rows']}行 | " +
+                             (f"锁等待 {item['lock_waits']}次" if item['lock_waits'] else f"慢查询 {item['slow']}次"))
+                if item['plan']:
+                    lines.extend(f"   📋 {line.strip()}" for line in item['plan'].splitlines())
+            
+            lines.append(f"\n💡 {self.prefix}linbot_sql [条数] [总耗时/最慢/平均/次数/行数/慢查询/锁等待]")
+            lines.append(f"💡 {self.prefix}linbot_sql reset - 清空统计")
+            
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"查看SQL统计出错: {e}")
+            yield event.plain_result("获取SQL统计失败，请稍后再试")
+    
+    @filter.command("linbot_rollup")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_rollup")
+    async def rollup_command(self, event: AstrMessageEvent):
+        """查看或立即执行历史记录汇总（管理员）"""
+        try:
+            args = event.message_str.split()
+            rollup = self.history_rollup
+            rollup.ensure_started()
+            
+            if len(args) > 1 and args[1] == "run":
+                if not rollup.enabled:
+                    yield event.plain_result("❌ 未启用历史记录保留期（性能设置 -> 历史记录保留天数）")
+                    return
+                result = await asyncio.to_thread(rollup.compact)
+                moved = "\n".join(f"• {table}：{count} 条" for table, count in result['moved'].items())
+                yield event.plain_result(f"✅ 已汇总 {result['cutoff']} 之前的记录，耗时 {result['seconds']} 秒\n\n{moved}")
+                return
+            
+            status = await asyncio.to_thread(rollup.status)
+            lines = [
+                "🗃️ 历史记录汇总",
+                "",
+                f"• 保留天数：{status['retention_days']}天" + ("" if rollup.enabled else "（不清理）"),
+            ]
+            if status['cutoff']:
+                lines.append(f"• 汇总范围：{status['cutoff']} 之前")
+            
+            lines.append("\n📄 原始记录：")
+            lines.extend(f"• {table}：{count} 条" for table, count in status['raw'].items())
+            lines.append("\n📦 汇总记录：")
+            lines.extend(f"• {table}：{count} 条" for table, count in status['rollup'].items())
+            
+            last = status['last_result']
+            if last:
+                lines.append(f"\n🕒 上次汇总：{last['finished_at']}，共 {sum(last['moved'].values())} 条，耗时 {last['seconds']} 秒")
+            
+            lines.append(f"\n💡 {self.prefix}linbot_rollup run - 立即汇总")
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"历史记录汇总出错: {e}")
+            yield event.plain_result("历史记录汇总失败，请检查日志")
+    
+    @filter.command("linbot_backup")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_backup")
+    async def backup_command(self, event: AstrMessageEvent):
+        """查看、立即执行或恢复数据库备份（管理员）"""
+        try:
+            args = event.message_str.split()
+            backup = self.database_backup
+            backup.ensure_started()
+            
+            if len(args) > 1 and args[1] == "run":
+                result = await asyncio.to_thread(backup.backup)
+                message = (f"✅ 已备份 {result['files']} 个数据库文件到 {result['name']}\n\n"
+                           f"• 大小：{result['size'] / 1024 / 1024:.2f} MB（{result['pages']} 页）\n"
+                           f"• 耗时：{result['seconds']} 秒\n"
+                           f"• 写入最长阻塞：{result['max_step_ms']} 毫秒")
+                if result['restarts']:
+                    message += f"\n• 因写入重新复制：{result['restarts']} 次"
+                if result['removed']:
+                    message += f"\n• 轮换删除：{len(result['removed'])} 个旧快照"
+                yield event.plain_result(message)
+                return
+            
+            if len(args) > 1 and args[1] == "restore":
+                if len(args) < 3:
+                    yield event.plain_result(f"❌ 请指定快照名称，如 {self.prefix}linbot_backup restore linbot-20250101-030000")
+                    return
+                if self.store.name != "sqlite":
+                    yield event.plain_result(f"❌ 当前存储引擎为 {self.store.name}，恢复后需要重启才能载入，请改用 sqlite 后再恢复")
+                    return
+                try:
+                    # 恢复期间暂停存储的读写，指令等待恢复完成后再执行
+                    result = await asyncio.to_thread(backup.restore, args[2], self.store)
+                except ValueError as e:
+                    yield event.plain_result(f"❌ {e}")
+                    return
+                # 重复消息缓存的是恢复前的结果
+                get_command_cache().forget()
+                yield event.plain_result(f"✅ 已从 {result['name']} 恢复 {result['files']} 个数据库文件，耗时 {result['seconds']} 秒\n"
+                                         f"💾 恢复前的数据已备份为 {result['before']}")
+                return
+            
+            snapshots = backup.snapshots()
+            lines = [
+                "💾 数据库备份",
+                "",
+                f"• 备份间隔：{backup.interval_hours} 小时" if backup.enabled else "• 定时备份：未开启",
+                f"• 保留份数：{backup.keep}",
+                f"• 备份目录：{backup.backup_dir}",
+            ]
+            if snapshots:
+                lines.append(f"\n📦 快照（{len(snapshots)} 个）：")
+                lines.extend(f"• {item['name']}  {item['size'] / 1024 / 1024:.2f} MB  {item['created']}"
+                             for item in snapshots[:10])
+            else:
+                lines.append("\n📦 暂无快照")
+            
+            last = backup.last_result
+            if last:
+                lines.append(f"\n🕒 上次备份：{last['finished_at']}，耗时 {last['seconds']} 秒，写入最长阻塞 {last['max_step_ms']} 毫秒")
+            
+            lines.append(f"\n💡 {self.prefix}linbot_backup run - 立即备份")
+            lines.append(f"💡 {self.prefix}linbot_backup restore <快照名称> - 恢复（会先备份当前数据）")
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"数据库备份出错: {e}")
+            yield event.plain_result("数据库备份失败，请检查日志")
+    
+    @filter.command("linbot_export")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_export")
+    async def export_command(self, event: AstrMessageEvent):
+        """把用户和全部记录导出为 JSONL 或 CSV（管理员）"""
+        from .game.export import FORMATS, export_data
+        
+        try:
+            args = event.message_str.split()
+            fmt = args[1] if len(args) > 1 else "jsonl"
+            if fmt not in FORMATS:
+                yield event.plain_result(f"❌ 未知格式 {fmt}，可选：{'/'.join(FORMATS)}")
+                return
+            if self.store.name != "sqlite":
+                yield event.plain_result(f"❌ 当前存储引擎为 {self.store.name}，只支持导出 sqlite 数据库")
+                return
+            
+            directory = os.path.join(self.data_dir, "exports", time.strftime("%Y%m%d-%H%M%S"))
+            result = await asyncio.to_thread(export_data, self.store, directory, fmt)
+            lines = [f"✅ 已导出到 {directory}，耗时 {result['seconds']} 秒", ""]
+            lines.extend(f"• {table}：{count} 行" for table, count in result['rows'].items())
+            lines.append(f"\n💡 {self.prefix}linbot_import {os.path.basename(directory)} - 从这次导出导入")
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"数据导出出错: {e}")
+            yield event.plain_result("数据导出失败，请检查日志")
+    
+    @filter.command("linbot_import")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_import")
+    async def import_command(self, event: AstrMessageEvent):
+        """从导出目录导入用户和记录，中断后重新执行可继续（管理员）"""
+        from .game.export import import_data
+        
+        try:
+            args = event.message_str.split()
+            exports_dir = os.path.join(self.data_dir, "exports")
+            if len(args) < 2:
+                names = sorted(os.listdir(exports_dir), reverse=True) if os.path.isdir(exports_dir) else []
+                lines = [f"❌ 请指定导出目录，如 {self.prefix}linbot_import 20250101-030000"]
+                if names:
+                    lines.append(f"\n📦 可导入（{len(names)} 个）：")
+                    lines.extend(f"• {name}" for name in names[:10])
+                yield event.plain_result("\n".join(lines))
+                return
+            if self.store.name != "sqlite":
+                yield event.plain_result(f"❌ 当前存储引擎为 {self.store.name}，只支持导入到 sqlite 数据库")
+                return
+            
+            # 只能导入导出目录下的子目录
+            directory = os.path.join(exports_dir, os.path.basename(args[1]))
+            if not os.path.isdir(directory):
+                yield event.plain_result(f"❌ 导出目录 {os.path.basename(args[1])} 不存在")
+                return
+            try:
+                result = await asyncio.to_thread(import_data, self.store, directory)
+            except ValueError as e:
+                yield event.plain_result(f"❌ {e}")
+                return
+            # 重复消息缓存的是导入前的结果
+            get_command_cache().forget()
+            
+            lines = [f"✅ 导入完成，耗时 {result['seconds']} 秒，{result['rows_per_second']} 行/秒", ""]
+            for table, count in result['rows'].items():
+                line = f"• {table}：{count} 行"
+                if result['skipped'][table]:
+                    line += f"（跳过已导入的 {result['skipped'][table]} 行）"
+                lines.append(line)
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"数据导入出错: {e}")
+            yield event.plain_result("数据导入失败，请检查日志")
+    
+    @filter.command("linbot_stats")
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @track_command("linbot_stats")
+    async def user_stats_command(self, event: AstrMessageEvent):
+        """检查或重建用户统计表（管理员）"""
+        from .game.stats import check_user_stats, rebuild_user_stats
+        
+        args = event.message_str.split()
+        rebuild = len(args) > 1 and args[1] == "rebuild"
+        
+        if self.store.name != "sqlite":
+            yield event.plain_result(f"当前存储引擎为 {self.store.name}，统计随写入在内存中维护，无需检查")
+            return
+        
+        def run():
+            # 每个分片分别检查或重建，结果累加
+            results = self.shard_router.gather(rebuild_user_stats if rebuild else check_user_stats)
+            return {key: sum(result[key] for result in results) for key in results[0]}
+        
+        try:
+            result = await asyncio.to_thread(run)
+            if rebuild:
+                yield event.plain_result(f"✅ 已从历史记录重建 {result['users']} 个用户的统计，耗时 {result['seconds']} 秒")
+                return
+            
+            lines = [
+                "📊 用户统计表检查",
+                "",
+                f"• 有记录的用户：{result['users']} 个",
+                f"• 不一致的用户：{result['mismatched']} 个",
+                f"• 耗时：{result['seconds']} 秒"
+            ]
+            if result['mismatched']:
+                lines.append(f"\n💡 {self.prefix}linbot_stats rebuild - 从历史记录重建")
+            yield event.plain_result("\n".join(lines))
+        
+        except Exception as e:
+            logger.error(f"用户统计表检查出错: {e}")
+            yield event.plain_result("用户统计表检查失败，请检查日志")
+    
     @filter.command("签到")
+    @rate_limited("text", group=False)
+    @track_command("签到")
+    @idempotent("签到")
     async def checkin_command(self, event: AstrMessageEvent):
         """用户签到指令"""
         try:
             user_id = str(event.get_sender_id())
             username = event.get_sender_name() or f"用户{user_id}"
             
-            # 执行签到
-            result = self.checkin_manager.daily_checkin(user_id, username)
+            # 执行签到（同一用户的写操作串行执行，数据库操作在线程池中进行）
+            async with get_user_locks().hold(user_id):
+                result = await offload(self.checkin_manager.daily_checkin, user_id, username)
             
             if result['success']:
                 # 签到成功
@@ -228,7 +794,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 💰 获得奖励：
 • 基础奖励：{reward_info['base']} 金币
 • 随机奖励：{reward_info['random']} 金币"""
-                
+
                 if reward_info['consecutive'] > 0:
                     message += f"\n• 连续奖励：{reward_info['consecutive']} 金币"
                 
@@ -241,7 +807,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • 累计签到：{result['total_checkin']} 次
 
 💡 明天记得继续签到哦！"""
-                
+
             else:
                 # 签到失败
                 if result.get('already_checked'):
@@ -257,12 +823,14 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                     message = f"❌ {result['message']}"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"签到功能出错: {e}")
             yield event.plain_result("签到功能暂时不可用，请稍后再试")
-
+    
     @filter.command("签到信息")
+    @rate_limited("text")
+    @track_command("签到信息")
     async def checkin_info_command(self, event: AstrMessageEvent):
         """查看签到信息"""
         try:
@@ -270,7 +838,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             username = event.get_sender_name() or f"用户{user_id}"
             
             # 获取签到信息
-            info = self.checkin_manager.get_checkin_info(user_id, username)
+            info = await offload(self.checkin_manager.get_checkin_info, user_id, username)
             
             if 'error' in info:
                 yield event.plain_result(f"❌ {info['error']}")
@@ -285,7 +853,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 ⏰ 最后签到：{info['last_checkin'] or '从未签到'}
 
 🎯 今日状态：{'✅ 已签到' if info['has_checked_today'] else '❌ 未签到'}"""
-            
+
             if info['has_checked_today']:
                 message += f"\n💰 今日奖励：{info['today_reward']} 金币"
             else:
@@ -309,16 +877,18 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             message += f"\n\n💡 发送 \"{self.prefix}签到\" 进行签到"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"获取签到信息出错: {e}")
             yield event.plain_result("获取签到信息失败，请稍后再试")
-
+    
     @filter.command("签到排行")
+    @rate_limited("text")
+    @track_command("签到排行")
     async def checkin_ranking_command(self, event: AstrMessageEvent):
         """签到排行榜"""
         try:
-            ranking = self.checkin_manager.get_checkin_ranking(10)
+            ranking = await offload(self.checkin_manager.get_checkin_ranking, 10)
             
             if not ranking:
                 yield event.plain_result("暂无签到排行数据")
@@ -334,12 +904,14 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             message += f"💡 发送 \"{self.prefix}签到\" 开始签到"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"获取签到排行出错: {e}")
             yield event.plain_result("获取排行榜失败，请稍后再试")
-
+    
     @filter.command("我的信息")
+    @rate_limited("text")
+    @track_command("我的信息")
     async def user_info_command(self, event: AstrMessageEvent):
         """查看用户详细信息"""
         try:
@@ -347,7 +919,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             username = event.get_sender_name() or f"用户{user_id}"
             
             # 获取用户完整信息
-            info = self.user_info_manager.get_comprehensive_info(user_id, username)
+            info = await offload(self.user_info_manager.get_comprehensive_info, user_id, username)
             
             if 'error' in info:
                 yield event.plain_result(f"❌ {info['error']}")
@@ -368,7 +940,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 
 📊 等级信息：
 • 等级：{basic['level']} 级"""
-            
+
             # 获取等级信息
             level_info = self.user_info_manager._get_level_info(basic['exp'])
             message += f"""
@@ -407,12 +979,14 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             message += f"\n\n💡 发送 \"{self.prefix}我的详情\" 查看更多详细统计"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"获取用户信息出错: {e}")
             yield event.plain_result("获取用户信息失败，请稍后再试")
-
+    
     @filter.command("我的详情")
+    @rate_limited("text")
+    @track_command("我的详情")
     async def user_details_command(self, event: AstrMessageEvent):
         """查看用户详细统计"""
         try:
@@ -420,7 +994,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             username = event.get_sender_name() or f"用户{user_id}"
             
             # 获取用户统计信息
-            stats = self.user_info_manager.get_user_statistics(user_id)
+            stats = await offload(self.user_info_manager.get_user_statistics, user_id)
             
             if 'error' in stats:
                 yield event.plain_result(f"❌ {stats['error']}")
@@ -441,7 +1015,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 💼 打工统计：
 • 总打工次数：{work_stats.get('total_works', 0)} 次
 • 总打工收入：{work_stats.get('total_income', 0)} 金币"""
-            
+
             # 打工类型统计
             work_types = work_stats.get('work_types', [])
             if work_types:
@@ -463,47 +1037,86 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • 物品种类：{item_stats.get('total_items', 0)} 种
 • 物品总数：{item_stats.get('total_quantity', 0)} 个
 • 物品总值：{item_stats.get('total_value', 0)} 金币"""
-            
+
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"获取用户详情出错: {e}")
             yield event.plain_result("获取用户详情失败，请稍后再试")
-
+    
     @filter.command("我的记录")
+    @rate_limited("text")
+    @track_command("我的记录")
     async def user_activities_command(self, event: AstrMessageEvent):
-        """查看用户最近活动记录"""
+        """查看用户最近活动记录，加“更多”继续查看上一次之后的记录"""
         try:
             user_id = str(event.get_sender_id())
             username = event.get_sender_name() or f"用户{user_id}"
             
-            # 获取最近活动记录
-            activities = self.user_info_manager.get_recent_activities(user_id, 10)
+            args = event.message_str.split()
+            more = len(args) > 1 and args[1] == "更多"
+            cursor = self._activity_cursors.get(user_id) if more else None
+            if more and not cursor:
+                yield event.plain_result(f"没有更多记录了，使用 {self.prefix}我的记录 从最新记录开始查看")
+                return
+            
+            # 获取一页活动记录
+            page = await offload(self.user_info_manager.get_activity_page, user_id, ACTIVITY_PAGE_SIZE, cursor)
+            activities = page['activities']
             
             if not activities:
                 yield event.plain_result("暂无活动记录")
                 return
             
-            message = f"📝 {username} 的最近活动记录\n\n"
+            # 记住翻页位置，只保留最近查看过的用户
+            self._activity_cursors.pop(user_id, None)
+            if page['next_cursor']:
+                self._activity_cursors[user_id] = page['next_cursor']
+                if len(self._activity_cursors) > ACTIVITY_CURSOR_LIMIT:
+                    self._activity_cursors.pop(next(iter(self._activity_cursors)))
+            
+            title = "更早的活动记录" if more else "最近活动记录"
+            message = f"📝 {username} 的{title}\n\n"
             
+            bank_actions = {
+                'deposit': "存款", 'withdraw': "取款", 'transfer_in': "转入",
+                'transfer_out': "转出", 'interest': "利息"
+            }
             for activity in activities:
                 timestamp = activity['timestamp'][:16]  # 截取到分钟
                 
                 if activity['type'] == 'checkin':
                     message += f"✅ {timestamp} 签到获得 {activity['amount']} 金币 ({activity['extra']})\n"
                 elif activity['type'] == 'bank':
-                    action_text = "存款" if activity['action'] == 'deposit' else "取款"
+                    action_text = bank_actions.get(activity['action'], activity['action'])
                     message += f"🏦 {timestamp} {action_text} {activity['amount']} 金币\n"
+                elif activity['type'] == 'work':
+                    message += f"💼 {timestamp} {activity['action']} 收入 {activity['amount']} 金币\n"
+                elif activity['type'] == 'robbery':
+                    if activity['action']:
+                        message += f"🦹 {timestamp} 抢劫 {activity['extra']} 成功，获得 {activity['amount']} 金币\n"
+                    else:
+                        message += f"🦹 {timestamp} 抢劫 {activity['extra']} 失败，被罚 {activity['amount']} 金币\n"
+                elif activity['type'] == 'robbed':
+                    if activity['action']:
+                        message += f"💸 {timestamp} 被 {activity['extra']} 抢走 {activity['amount']} 金币\n"
+                    else:
+                        message += f"🛡️ {timestamp} {activity['extra']} 抢劫你失败\n"
             
+            if page['next_cursor']:
+                message += f"\n📜 \"{self.prefix}我的记录 更多\" - 查看更早的记录"
             message += f"\n💡 更多功能：\n• \"{self.prefix}我的信息\" - 查看基本信息\n• \"{self.prefix}我的详情\" - 查看详细统计"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"获取活动记录出错: {e}")
             yield event.plain_result("获取活动记录失败，请稍后再试")
-
+    
     @filter.command("打工")
+    @rate_limited("text")
+    @track_command("打工")
+    @idempotent("打工", when=_work_mutates)
     async def work_command(self, event: AstrMessageEvent):
         """打工指令"""
         try:
@@ -514,7 +1127,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             
             if len(args) == 1:
                 # 显示工作列表
-                jobs_info = self.work_manager.get_available_jobs(user_id, username)
+                jobs_info = await offload(self.work_manager.get_available_jobs, user_id, username)
                 
                 if 'error' in jobs_info:
                     yield event.plain_result(f"❌ {jobs_info['error']}")
@@ -526,7 +1139,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 {'✅ 还可以工作' if jobs_info['can_work_today'] else '❌ 今日工作次数已满'}
 
 🔧 可用工作："""
-                
+
                 for job in jobs_info['jobs']:
                     name = job['name']
                     config = job['config']
@@ -552,11 +1165,12 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                 message += f"\n📊 查看统计：{self.prefix}打工统计"
                 
                 yield event.plain_result(message)
-                
+            
             else:
                 # 执行指定工作
                 job_name = " ".join(args[1:])
-                result = self.work_manager.work(user_id, username, job_name)
+                async with get_user_locks().hold(user_id):
+                    result = await offload(self.work_manager.work, user_id, username, job_name)
                 
                 if result['success']:
                     salary = result['salary_result']
@@ -566,7 +1180,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 💰 收入详情：
 • 基础工资：{salary['base_salary']} 金币
 • 等级加成：{salary['level_bonus']} 金币"""
-                    
+
                     if salary['luck_triggered']:
                         message += f"\n• 🍀 幸运加成：{salary['luck_bonus']} 金币"
                     
@@ -577,7 +1191,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 📊 更新后：
 • 金币：{result['new_money']}
 • 等级：{result['new_level']}"""
-                    
+
                     # 获取等级信息
                     level_info = self.work_manager._get_level_info(result['new_exp'])
                     message += f"\n• 经验：{level_info['current_exp']} EXP ({level_info['level_progress']}/{level_info['exp_for_current_level']})"
@@ -593,19 +1207,21 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                     message = f"❌ {result['message']}"
                 
                 yield event.plain_result(message)
-                
+        
         except Exception as e:
             logger.error(f"打工功能出错: {e}")
             yield event.plain_result("打工功能暂时不可用，请稍后再试")
-
+    
     @filter.command("打工统计")
+    @rate_limited("text")
+    @track_command("打工统计")
     async def work_stats_command(self, event: AstrMessageEvent):
         """打工统计"""
         try:
             user_id = str(event.get_sender_id())
             username = event.get_sender_name() or f"用户{user_id}"
             
-            stats = self.work_manager.get_work_statistics(user_id)
+            stats = await offload(self.work_manager.get_work_statistics, user_id)
             
             if 'error' in stats:
                 yield event.plain_result(f"❌ {stats['error']}")
@@ -627,7 +1243,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • 剩余次数：{today['remaining']} 次
 
 💼 工作类型统计："""
-            
+
             job_stats = stats['job_stats']
             if job_stats:
                 for work_type, count, total_income, avg_income, max_income in job_stats[:5]:
@@ -648,12 +1264,15 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             message += f"\n\n💡 继续努力：{self.prefix}打工"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"获取打工统计出错: {e}")
             yield event.plain_result("获取打工统计失败，请稍后再试")
-
+    
     @filter.command("银行")
+    @rate_limited("text")
+    @track_command("银行")
+    @idempotent("银行", when=_bank_mutates)
     async def bank_command(self, event: AstrMessageEvent):
         """银行指令"""
         try:
@@ -664,7 +1283,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             
             if len(args) == 1:
                 # 显示银行信息
-                info = self.bank_manager.get_bank_info(user_id, username)
+                info = await offload(self.bank_manager.get_bank_info, user_id, username)
                 
                 if 'error' in info:
                     yield event.plain_result(f"❌ {info['error']}")
@@ -697,7 +1316,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • {self.prefix}银行 存款 [金额] - 存入现金
 • {self.prefix}银行 取款 [金额] - 取出现金
 • {self.prefix}银行 转账 [用户名] [金额] - 转账给他人"""
-                
+
                 # 显示最近交易
                 if info['recent_transactions']:
                     message += "\n\n📝 最近交易："
@@ -715,12 +1334,13 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                         message += f"\n• {time_str} {type_text} {sign}{amount}金币"
                 
                 yield event.plain_result(message)
-                
+            
             elif len(args) >= 3 and args[1] == "存款":
                 # 执行存款
                 try:
                     amount = int(args[2])
-                    result = self.bank_manager.deposit(user_id, username, amount)
+                    async with get_user_locks().hold(user_id):
+                        result = await offload(self.bank_manager.deposit, user_id, username, amount)
                     
                     if result['success']:
                         message = f"""✅ 存款成功！
@@ -737,15 +1357,16 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                         message = f"❌ {result['message']}"
                     
                     yield event.plain_result(message)
-                    
+                
                 except ValueError:
                     yield event.plain_result("❌ 请输入有效的金额数字")
-                    
+            
             elif len(args) >= 3 and args[1] == "取款":
                 # 执行取款
                 try:
                     amount = int(args[2])
-                    result = self.bank_manager.withdraw(user_id, username, amount)
+                    async with get_user_locks().hold(user_id):
+                        result = await offload(self.bank_manager.withdraw, user_id, username, amount)
                     
                     if result['success']:
                         message = f"""✅ 取款成功！
@@ -764,10 +1385,10 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                         message = f"❌ {result['message']}"
                     
                     yield event.plain_result(message)
-                    
+                
                 except ValueError:
                     yield event.plain_result("❌ 请输入有效的金额数字")
-                    
+            
             elif len(args) >= 4 and args[1] == "转账":
                 # 执行转账
                 try:
@@ -777,10 +1398,10 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                     # 这里简化处理，实际应该通过用户名查找用户ID
                     # 暂时提示功能开发中
                     yield event.plain_result("🚧 转账功能开发中，敬请期待！")
-                    
+                
                 except ValueError:
                     yield event.plain_result("❌ 请输入有效的金额数字")
-                    
+            
             else:
                 # 显示帮助信息
                 limits = self.bank_manager
@@ -807,14 +1428,16 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • 银行存款安全可靠，不会被抢劫
 • 每日自动计算利息，存款越多收益越高
 • 建议将大额资金存入银行获得利息"""
-                
+
                 yield event.plain_result(message)
-                
+        
         except Exception as e:
             logger.error(f"银行功能出错: {e}")
             yield event.plain_result("银行功能暂时不可用，请稍后再试")
-
+    
     @filter.command("排行榜")
+    @rate_limited("image")
+    @track_command("排行榜")
     async def ranking_command(self, event: AstrMessageEvent):
         """排行榜指令"""
         try:
@@ -838,21 +1461,34 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                 }
                 ranking_type = type_map.get(args[1], "money")
             
-            # 获取排行榜数据
-            ranking_data = self.ranking_manager.get_ranking_data(ranking_type, limit=10)
+            # 获取排行榜数据（数据库操作在线程池中进行，等待写锁时不阻塞事件循环）
+            ranking_data = await offload(self.ranking_manager.get_ranking_data, ranking_type, limit=10)
             
             if 'error' in ranking_data:
                 yield event.plain_result(f"❌ {ranking_data['error']}")
                 return
             
-            # 生成排行榜图片
-            image_path = self.ranking_manager.generate_ranking_image(ranking_data)
+            # 负载过高时发送缓存的排行榜图片或文字排行榜
+            admission = get_admission()
+            cache_key = f"ranking:{ranking_type}"
+            if admission.overloaded():
+                cached = admission.cached(cache_key, CACHED_IMAGE_MAX_AGE["ranking"])
+                admission.record_degraded(cached is not None)
+                if cached:
+                    yield self.image_delivery.result(event, cached[0])
+                    yield event.plain_result(f"⏳ 当前使用人数较多，显示的是 {int(cached[1])} 秒前的排行榜")
+                else:
+                    yield event.plain_result(self._format_ranking_text(ranking_data))
+                return
             
-            if image_path and os.path.exists(image_path):
-                yield event.image_result(image_path)
+            # 生成排行榜图片（在渲染队列中执行）
+            image_data = await admission.render(cache_key, self.ranking_manager.generate_ranking_image, ranking_data)
+            
+            if image_data:
+                yield self.image_delivery.result(event, image_data)
                 
                 # 获取用户在此排行榜中的排名
-                user_rank_info = self.ranking_manager.get_user_ranking_info(user_id, ranking_type)
+                user_rank_info = await offload(self.ranking_manager.get_user_ranking_info, user_id, ranking_type)
                 
                 if 'error' not in user_rank_info:
                     summary = f"""📊 {ranking_data['config']['name']} 
@@ -874,17 +1510,17 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • {self.prefix}排行榜 等级 - ⭐ 等级排行榜
 • {self.prefix}排行榜 签到 - 📅 签到排行榜
 • {self.prefix}排行榜 收入 - 💼 累计收入排行榜"""
-                
+
                 yield event.plain_result(summary)
             else:
                 # 降级到文本输出
                 text_ranking = self._format_ranking_text(ranking_data)
                 yield event.plain_result(text_ranking)
-                
+        
         except Exception as e:
             logger.error(f"排行榜功能出错: {e}")
             yield event.plain_result("排行榜功能暂时不可用，请稍后再试")
-
+    
     def _format_ranking_text(self, ranking_data: Dict[str, Any]) -> str:
         """格式化排行榜为文本"""
         if 'error' in ranking_data:
@@ -916,8 +1552,10 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
         text += f"\n🕐 更新时间: {ranking_data['update_time']}"
         
         return text
-
+    
     @filter.command("我的排名")
+    @rate_limited("text")
+    @track_command("我的排名")
     async def my_ranking_command(self, event: AstrMessageEvent):
         """查看我的排名"""
         try:
@@ -927,7 +1565,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             # 获取用户在各个排行榜中的排名
             rankings = {}
             for rank_type in ["money", "assets", "level", "checkin", "earned"]:
-                rank_info = self.ranking_manager.get_user_ranking_info(user_id, rank_type)
+                rank_info = await offload(self.ranking_manager.get_user_ranking_info, user_id, rank_type)
                 if 'error' not in rank_info:
                     rankings[rank_type] = rank_info
             
@@ -952,12 +1590,14 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             message += f"\n💡 查看详细排行榜：{self.prefix}排行榜 [类型]"
             
             yield event.plain_result(message)
-            
+        
         except Exception as e:
             logger.error(f"查看排名出错: {e}")
             yield event.plain_result("获取排名信息失败，请稍后再试")
-
+    
     @filter.command("服务器")
+    @rate_limited(_server_command_class)
+    @track_command("服务器")
     async def server_monitor_command(self, event: AstrMessageEvent):
         """服务器监控指令"""
         try:
@@ -968,16 +1608,33 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             
             args = event.message_str.split()
             
+            admission = get_admission()
+            
             # 如果有参数且参数是"图表"，生成CPU图表
             if len(args) > 1 and args[1] == "图表":
+                cache_key = f"chart:{self.chart_duration}"
+                if admission.overloaded():
+                    # 图表没有文字版本，负载过高时只发送缓存的图表
+                    cached = admission.cached(cache_key, CACHED_IMAGE_MAX_AGE["chart"])
+                    admission.record_degraded(cached is not None)
+                    if cached:
+                        yield self.image_delivery.result(event, cached[0])
+                        yield event.plain_result(f"⏳ 当前使用人数较多，显示的是 {int(cached[1])} 秒前生成的图表")
+                    else:
+                        yield event.plain_result("⏳ 当前使用人数较多，暂不生成图表，请稍后再试")
+                    return
+                
                 yield event.plain_result(f"🔄 正在生成CPU使用率图表（{self.chart_duration}秒数据），请稍候...")
                 try:
-                    chart_path = self.server_monitor.generate_cpu_chart(
-                        duration=self.chart_duration,
-                        interval=self.monitor_interval
+                    # 采样在线程池中进行，不阻塞事件循环；绘制在渲染队列中执行
+                    cpu_data, timestamps = await offload(
+                        self.server_monitor.sample_cpu, self.chart_duration, self.monitor_interval
+                    )
+                    chart_data = await admission.render(
+                        cache_key, self.server_monitor.encode_cpu_chart, cpu_data, timestamps, self.chart_duration
                     )
-                    if chart_path and os.path.exists(chart_path):
-                        yield event.image_result(chart_path)
+                    if chart_data:
+                        yield self.image_delivery.result(event, chart_data)
                     else:
                         yield event.plain_result("❌ CPU图表生成失败")
                 except Exception as e:
@@ -985,17 +1642,29 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                     yield event.plain_result(f"❌ CPU图表生成失败: {str(e)}")
                 return
             
+            # 负载过高时发送缓存的监控图片或文字信息
+            if admission.overloaded():
+                cached = admission.cached("monitor", CACHED_IMAGE_MAX_AGE["monitor"])
+                admission.record_degraded(cached is not None)
+                if cached:
+                    yield self.image_delivery.result(event, cached[0])
+                    yield event.plain_result(f"⏳ 当前使用人数较多，显示的是 {int(cached[1])} 秒前的服务器状态")
+                else:
+                    system_info = await offload(self.server_monitor.get_system_info)
+                    yield event.plain_result(self._format_system_info_text(system_info))
+                return
+            
             # 默认生成服务器监控图片
             yield event.plain_result("🔄 正在获取服务器信息，请稍候...")
             
-            # 获取系统信息
-            system_info = self.server_monitor.get_system_info()
+            # 获取系统信息（CPU使用率需要采样1秒，在线程池中进行）
+            system_info = await offload(self.server_monitor.get_system_info)
             
-            # 生成监控图片
-            image_path = self.server_monitor.generate_monitor_image(system_info)
+            # 生成监控图片（在渲染队列中执行）
+            image_data = await admission.render("monitor", self.server_monitor.generate_monitor_image, system_info)
             
-            if image_path and os.path.exists(image_path):
-                yield event.image_result(image_path)
+            if image_data:
+                yield self.image_delivery.result(event, image_data)
                 
                 # 补充一些关键信息的文本
                 summary = f"""📊 服务器状态摘要：
@@ -1012,11 +1681,11 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                 # 降级到文本信息
                 text_info = self._format_system_info_text(system_info)
                 yield event.plain_result(text_info)
-                
+        
         except Exception as e:
             logger.error(f"服务器监控功能出错: {e}")
             yield event.plain_result(f"❌ 服务器监控功能出现错误：{str(e)}")
-
+    
     def _format_system_info_text(self, info):
         """格式化系统信息为文本格式"""
         try:
@@ -1048,16 +1717,19 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
 • 接收：{info['network']['接收字节']}
 
 💿 磁盘信息："""
-            
+
             for i, disk in enumerate(info['disk'][:3]):
                 text += f"\n• {disk['设备']}: {disk['已用']}/{disk['总量']} ({disk['使用率']})"
             
             return text
-            
+        
         except Exception as e:
             return f"格式化系统信息失败: {str(e)}"
-
+    
     @filter.command("抢劫")
+    @rate_limited("text")
+    @track_command("抢劫")
+    @idempotent("抢劫", when=_robbery_mutates)
     async def robbery_command(self, event: AstrMessageEvent):
         """抢劫指令"""
         try:
@@ -1074,7 +1746,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
             
             if len(args) == 1:
                 # 显示抢劫统计和目标列表
-                stats = self.robbery_manager.get_robbery_stats(user_id)
+                stats = await offload(self.robbery_manager.get_robbery_stats, user_id)
                 
                 if 'error' in stats:
                     yield event.plain_result(f"❌ {stats['error']}")
@@ -1092,7 +1764,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                         message += f"\n• 原因：等级不足"
                     elif stats['cooldown_remaining'] > 0:
                         message += f"\n• 原因：冷却中（还需 {stats['cooldown_remaining']:.1f} 小时）"
-
+                
                 message += f"""
 
 📊 今日统计：
@@ -1128,12 +1800,12 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                         time_str = created_at[:16]
                         result = f"✅ +{amount}金币" if success else "❌ 失败"
                         message += f"\n• {time_str} {victim_name} {result}"
-
-                yield event.plain_result(message)
                 
+                yield event.plain_result(message)
+            
             elif len(args) >= 2 and args[1] == "目标":
                 # 显示抢劫目标列表
-                targets = self.robbery_manager.get_robbery_targets(user_id, 10)
+                targets = await offload(self.robbery_manager.get_robbery_targets, user_id, 10)
                 
                 if 'error' in targets:
                     yield event.plain_result(f"❌ {targets['error']}")
@@ -1143,23 +1815,23 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                     yield event.plain_result("❌ 暂无可抢劫的目标")
                     return
                 
-                message = f"""🎯 可抢劫目标 (前10名)
+                message = f"""🎯 可抢劫目标 (随机10名)
 
 💰 成功率：{targets['config']['success_rate']:.1f}%
 🛡️ 保护金额：{targets['config']['protection_amount']} 金币
 
-🏆 富豪榜："""
+🎲 本次目标："""
 
                 for i, target in enumerate(targets['targets'][:10], 1):
                     message += f"""
 {i}. {target['username']} (Lv.{target['level']})
    💰 现金：{target['money']} | 总资产：{target['total_assets']}
    🎯 可抢：{target['rob_range']} 金币"""
-
-                message += f"\n\n💡 抢劫指令：{self.prefix}抢劫 [用户名]"
-
-                yield event.plain_result(message)
                 
+                message += f"\n\n💡 抢劫指令：{self.prefix}抢劫 [用户名]\n🔄 再次发送 {self.prefix}抢劫目标 换一批"
+                
+                yield event.plain_result(message)
+            
             else:
                 # 执行抢劫
                 target_name = " ".join(args[1:])
@@ -1190,7 +1862,7 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                                 if at_user_id:
                                     at_user_id = str(at_user_id)
                                     # 根据At的用户ID查找用户信息
-                                    result = self._find_user_by_id(at_user_id)
+                                    result = await offload(self._find_user_by_id, at_user_id)
                                     if result['success']:
                                         victim_id = result['user_id']
                                         victim_name = result['username']
@@ -1211,116 +1883,77 @@ AstrBot 管理页面 → 插件管理 → LinBot → 配置""")
                     if '(' in clean_target_name:
                         clean_target_name = clean_target_name.split('(')[0].rstrip('.')
                     
-                    result = self._find_user_by_name(clean_target_name)
+                    result = await offload(self._find_user_by_name, clean_target_name)
                     if not result['success']:
                         yield event.plain_result(result['message'])
                         return
                     victim_id = result['user_id']
                     victim_name = result['username']
                 
-                # 执行抢劫
-                rob_result = self.robbery_manager.rob_user(user_id, username, victim_id, victim_name)
+                # 执行抢劫（同时持有抢劫者和被抢者的锁，按分段序号顺序加锁）
+                async with get_user_locks().hold(user_id, victim_id):
+                    rob_result = await offload(self.robbery_manager.rob_user, user_id, username, victim_id, victim_name)
                 
                 if rob_result['success']:
                     yield event.plain_result(rob_result['message'])
                 else:
                     yield event.plain_result(rob_result['message'])
-                    
+        
         except Exception as e:
             logger.error(f"抢劫指令出错: {e}")
             yield event.plain_result("抢劫功能暂时不可用，请稍后再试")
-
+    
     def _find_user_by_id(self, user_id: str) -> Dict[str, Any]:
         """根据用户ID查找用户信息"""
         try:
-            import sqlite3
-            
-            game_db_path = os.path.join(self.plugin_dir, "game", "user.db")
-            conn = sqlite3.connect(game_db_path)
-            cursor = conn.cursor()
-            
             # 根据用户ID查找
-            cursor.execute('SELECT user_id, username FROM users WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
-            
-            conn.close()
+            with self.store.read(user_id) as session:
+                user = session.get_user(user_id)
             
-            if result:
+            if user:
                 return {
                     "success": True,
-                    "user_id": result[0],
-                    "username": result[1]
+                    "user_id": user['user_id'],
+                    "username": user['username']
                 }
             else:
                 return {
                     "success": False,
                     "message": f"❌ 用户不存在（ID: {user_id}）"
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
                 "message": f"❌ 查找用户失败：{str(e)}"
             }
-
+    
     def _find_user_by_name(self, target_name: str) -> Dict[str, Any]:
         """根据用户名查找用户ID"""
-        try:
-            import sqlite3
-            
-            game_db_path = os.path.join(self.plugin_dir, "game", "user.db")
-            conn = sqlite3.connect(game_db_path)
-            cursor = conn.cursor()
-            
-            # 精确匹配用户名
-            cursor.execute('SELECT user_id, username FROM users WHERE username = ?', (target_name,))
-            result = cursor.fetchone()
-            
-            if result:
-                conn.close()
-                return {
-                    "success": True,
-                    "user_id": result[0],
-                    "username": result[1]
-                }
-            
-            # 模糊匹配用户名
-            cursor.execute('SELECT user_id, username FROM users WHERE username LIKE ?', (f'%{target_name}%',))
-            results = cursor.fetchall()
-            
-            conn.close()
-            
-            if not results:
-                return {
-                    "success": False,
-                    "message": f"❌ 未找到用户：{target_name}"
-                }
-            elif len(results) == 1:
-                return {
-                    "success": True,
-                    "user_id": results[0][0],
-                    "username": results[0][1]
-                }
-            else:
-                usernames = [r[1] for r in results[:5]]
-                return {
-                    "success": False,
-                    "message": f"❌ 找到多个匹配用户，请输入更精确的用户名：\n" + "\n".join([f"• {name}" for name in usernames])
-                }
-                
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"❌ 查找用户失败：{str(e)}"
-            }
-
+        return self.user_info_manager.find_user_by_name(target_name)
+    
     async def terminate(self):
         """插件卸载时的清理方法"""
         try:
-            # 清除插件数据目录
-            if os.path.exists(self.data_dir):
-                shutil.rmtree(self.data_dir)
-                logger.info(f"已清除LinBot插件数据目录: {self.data_dir}")
+            # 停止事件循环延迟探针
+            get_loop_probe().stop()
+            
+            # 停止后台准备（已在线程中执行的建立过程会继续到完成）、定时汇总和定时备份
+            if self._prepare_task is not None:
+                self._prepare_task.cancel()
+            self.history_rollup.stop()
+            self.database_backup.stop()
+            
+            # 关闭数据库连接池（WAL 模式下最后一个连接关闭时合并回数据库文件）
+            close_store = getattr(self.store, "close", None)
+            if close_store:
+                close_store()
+            
+            # 只清除临时图片目录，数据库备份保留（插件重载、停用时也会调用 terminate）
+            temp_dir = os.path.join(self.data_dir, "tmp")
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+                logger.info(f"已清除LinBot临时文件目录: {temp_dir}")
             
             logger.info("LinBot 插件卸载完成")
         except Exception as e:
@@ -0,0 +1,14 @@
+"""
+LinBot 性能观测模块
+"""
+
+from .histogram import Histogram
+from .metrics import CommandMetrics, get_metrics, measure_render, record_db, record_render, record_wait
+from .sql import SqlProfiler, configure_sql_profiler, get_sql_profiler, normalize_sql
+from .tracking import LoopLagProbe, get_loop_probe, offload, track_command
+
+__all__ = [
+    'Histogram', 'CommandMetrics', 'get_metrics', 'measure_render', 'record_db', 'record_render', 'record_wait',
+    'SqlProfiler', 'configure_sql_profiler', 'get_sql_profiler', 'normalize_sql',
+    'LoopLagProbe', 'get_loop_probe', 'offload', 'track_command'
+]
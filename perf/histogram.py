@@ -0,0 +1,101 @@
+"""
+延迟直方图 - HDR 风格的对数线性分桶
+每个 2 的幂区间再细分为 64 个子桶，相对误差约 1.6%，内存占用与记录次数无关
+"""
+
+import threading
+from typing import Dict, Any, Iterable
+
+
+# 小于该值（微秒）的记录逐个计数，之后每个 2 的幂区间 64 个子桶
+SUB_BUCKETS = 128
+HALF_SUB_BUCKETS = SUB_BUCKETS // 2
+SUB_BUCKET_BITS = SUB_BUCKETS.bit_length() - 1
+
+
+def _bucket_index(value: int) -> int:
+    """记录值（微秒）所在的桶编号"""
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF_SUB_BUCKETS + (value >> shift) - HALF_SUB_BUCKETS
+
+
+def _bucket_range(index: int):
+    """桶编号对应的取值范围 [low, high)（微秒）"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = (index - SUB_BUCKETS) // HALF_SUB_BUCKETS + 1
+    mantissa = (index - SUB_BUCKETS) % HALF_SUB_BUCKETS + HALF_SUB_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """延迟直方图（单位：毫秒，内部以微秒分桶）"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, ms: float) -> None:
+        """记录一次耗时（毫秒）"""
+        index = _bucket_index(max(0, int(ms * 1000)))
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+    
+    def percentile(self, pct: float) -> float:
+        """
+        获取百分位数
+        
+        Args:
+            pct: 百分位（0-100）
+        
+        Returns:
+            耗时（毫秒），取所在桶的中点，无记录时为 0
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = max(1, round(pct / 100 * self.count))
+            seen = 0
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= target:
+                    low, high = _bucket_range(index)
+                    return min((low + high) / 2 / 1000, self.max_ms)
+        return self.max_ms
+    
+    def percentiles(self, pcts: Iterable[float] = (50, 95, 99)) -> Dict[float, float]:
+        """批量获取百分位数"""
+        return {pct: self.percentile(pct) for pct in pcts}
+    
+    def mean(self) -> float:
+        """平均耗时（毫秒）"""
+        return self.total_ms / self.count if self.count else 0.0
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出统计摘要"""
+        p = self.percentiles()
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean(), 3),
+            "p50_ms": round(p[50], 3),
+            "p95_ms": round(p[95], 3),
+            "p99_ms": round(p[99], 3),
+            "max_ms": round(self.max_ms, 3)
+        }
+    
+    def clear(self) -> None:
+        """清空记录"""
+        with self._lock:
+            self._counts.clear()
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
@@ -0,0 +1,137 @@
+"""
+指令性能指标 - 按指令记录总耗时、阻塞事件循环耗时、数据库耗时和渲染耗时
+数据库层和渲染器通过 contextvar 把耗时累加到当前正在执行的指令上
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from .histogram import Histogram
+
+
+# 指标维度：总耗时、阻塞事件循环耗时、数据库耗时、渲染耗时
+PHASES = ("wall", "blocking", "db", "render")
+
+
+class Span:
+    """单次指令执行中累计的数据库、渲染耗时和让出事件循环等待的时间（秒）"""
+    
+    __slots__ = ("db", "render", "waited")
+    
+    def __init__(self):
+        self.db = 0.0
+        self.render = 0.0
+        self.waited = 0.0
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("linbot_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """当前指令的耗时累加器，不在指令上下文中时为 None"""
+    return _current_span.get()
+
+
+def record_db(seconds: float) -> None:
+    """累加数据库耗时到当前指令"""
+    span = _current_span.get()
+    if span is not None:
+        span.db += seconds
+
+
+def record_render(seconds: float) -> None:
+    """累加渲染耗时到当前指令"""
+    span = _current_span.get()
+    if span is not None:
+        span.render += seconds
+
+
+def record_wait(seconds: float) -> None:
+    """累加等待时间（线程池执行、等待锁）到当前指令，这段时间不计入阻塞耗时"""
+    span = _current_span.get()
+    if span is not None:
+        span.waited += seconds
+
+
+@contextmanager
+def measure_render():
+    """统计代码块的渲染耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_render(time.perf_counter() - start)
+
+
+class CommandMetrics:
+    """指令性能指标注册表"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}
+        self._errors = {}
+        self.loop_lag = Histogram()
+    
+    def _histograms(self, command: str) -> Dict[str, Histogram]:
+        histograms = self._commands.get(command)
+        if histograms is None:
+            with self._lock:
+                histograms = self._commands.setdefault(command, {phase: Histogram() for phase in PHASES})
+        return histograms
+    
+    def record(self, command: str, wall: float, blocking: float, span: Span, error: bool = False) -> None:
+        """
+        记录一次指令执行
+        
+        Args:
+            command: 指令名称
+            wall: 总耗时（秒）
+            blocking: 阻塞事件循环的耗时（秒）
+            span: 数据库和渲染耗时累加器
+            error: 是否以异常结束
+        """
+        histograms = self._histograms(command)
+        histograms["wall"].record(wall * 1000)
+        histograms["blocking"].record(blocking * 1000)
+        histograms["db"].record(span.db * 1000)
+        histograms["render"].record(span.render * 1000)
+        if error:
+            with self._lock:
+                self._errors[command] = self._errors.get(command, 0) + 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        导出全部指标
+        
+        Returns:
+            {"commands": {指令: {维度: 统计摘要, "errors": 次数}}, "loop_lag": 统计摘要}
+        """
+        with self._lock:
+            commands = dict(self._commands)
+            errors = dict(self._errors)
+        return {
+            "commands": {
+                command: dict({phase: h.snapshot() for phase, h in histograms.items()},
+                              errors=errors.get(command, 0))
+                for command, histograms in commands.items()
+            },
+            "loop_lag": self.loop_lag.snapshot()
+        }
+    
+    def clear(self) -> None:
+        """清空全部指标"""
+        with self._lock:
+            self._commands.clear()
+            self._errors.clear()
+        self.loop_lag.clear()
+
+
+_metrics = CommandMetrics()
+
+
+def get_metrics() -> CommandMetrics:
+    """获取进程级共享的指令性能指标"""
+    return _metrics
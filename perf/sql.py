@@ -0,0 +1,219 @@
+"""
+SQL 语句分析器 - 按归一化语句统计执行次数、耗时和行数
+超过阈值的慢查询连同 EXPLAIN QUERY PLAN 一起写入日志；事务控制和附加数据库语句的耗时是等待其他连接的锁
+（或提交落盘），超过阈值时单独记录为锁等待，不计入慢查询也不获取执行计划
+"""
+
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+
+logger = logging.getLogger("astrbot")
+
+DEFAULT_SLOW_QUERY_MS = 50
+
+# 同一语句的执行计划在该时间内只记录一次（秒）
+PLAN_LOG_INTERVAL = 60
+
+# 归一化语句数上限，超出后合并统计，避免拼接 SQL 导致内存无限增长
+MAX_STATEMENTS = 500
+OVERFLOW_STATEMENT = "(其他语句)"
+
+# 耗时为锁等待的语句（BEGIN IMMEDIATE 等待写锁、COMMIT 等待读连接释放、ATTACH 等待附加数据库的锁）
+_LOCK_STATEMENTS = ("BEGIN", "COMMIT", "END", "ROLLBACK", "SAVEPOINT", "RELEASE", "ATTACH", "DETACH")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    归一化 SQL：字面量替换为 ?，IN 列表合并，压缩空白
+    
+    Args:
+        sql: 原始语句
+    
+    Returns:
+        归一化后的语句
+    """
+    normalized = _STRING.sub("?", sql)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?)", normalized)
+    return _SPACES.sub(" ", normalized).strip()
+
+
+def is_lock_statement(sql: str) -> bool:
+    """是否为事务控制或附加数据库语句"""
+    return sql.lstrip().upper().startswith(_LOCK_STATEMENTS)
+
+
+class SqlProfiler:
+    """SQL 语句分析器"""
+    
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS, enabled: bool = True):
+        self.slow_query_ms = slow_query_ms
+        self.enabled = enabled
+        
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._plans = {}
+    
+    def record(self, sql: str, seconds: float, rows: int = 0, executions: int = 1,
+               elapsed: Optional[float] = None) -> None:
+        """
+        累计一条语句的耗时
+        
+        Args:
+            sql: 原始语句
+            seconds: 本次耗时（执行或读取结果）
+            rows: 返回或影响的行数
+            executions: 执行次数（读取结果时为 0）
+            elapsed: 本次执行至今的累计耗时（含读取结果），用于统计最大耗时
+        """
+        statement = normalize_sql(sql)
+        ms = seconds * 1000
+        elapsed_ms = (seconds if elapsed is None else elapsed) * 1000
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    statement = OVERFLOW_STATEMENT
+                stats = self._stats.setdefault(statement, {
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "slow": 0, "lock_waits": 0
+                })
+            stats["count"] += executions
+            stats["total_ms"] += ms
+            stats["rows"] += rows
+            if elapsed_ms > stats["max_ms"]:
+                stats["max_ms"] = elapsed_ms
+    
+    def is_slow(self, seconds: float) -> bool:
+        """耗时是否超过慢查询阈值"""
+        return self.slow_query_ms > 0 and seconds * 1000 >= self.slow_query_ms
+    
+    def log_slow(self, conn: Any, sql: str, params: Any, seconds: float) -> None:
+        """
+        记录慢查询，附带执行计划（事务控制语句记录为锁等待）
+        
+        Args:
+            conn: 执行该语句的连接（用于 EXPLAIN QUERY PLAN）
+            sql: 原始语句
+            params: 语句参数
+            seconds: 累计耗时
+        """
+        statement = normalize_sql(sql)
+        if is_lock_statement(sql):
+            with self._lock:
+                stats = self._stats.get(statement)
+                if stats is not None:
+                    stats["lock_waits"] += 1
+            logger.warning(f"锁等待 {seconds * 1000:.1f}ms: {statement}")
+            return
+        
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is not None:
+                stats["slow"] += 1
+            last_plan_at = self._plans.get(statement, (0.0, ""))[0]
+        
+        plan = ""
+        now = time.monotonic()
+        if now - last_plan_at >= PLAN_LOG_INTERVAL:
+            plan = self._explain(conn, sql, params)
+            with self._lock:
+                self._plans[statement] = (now, plan)
+        
+        message = f"慢查询 {seconds * 1000:.1f}ms: {statement}"
+        if plan:
+            message += f"\n执行计划:\n{plan}"
+        logger.warning(message)
+    
+    @staticmethod
+    def _explain(conn: Any, sql: str, params: Any) -> str:
+        """获取语句的执行计划文本"""
+        import sqlite3
+        
+        if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH", "REPLACE")):
+            return ""
+        try:
+            # 使用普通游标，避免执行计划查询本身被统计
+            cursor = conn.cursor(sqlite3.Cursor)
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            cursor.close()
+        except sqlite3.Error as e:
+            return f"(获取失败: {e})"
+        
+        # 行格式: (id, parent, notused, detail)，按 parent 缩进
+        depth = {0: 0}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, 0) + 1
+            lines.append("  " * depth[node_id] + detail)
+        return "\n".join(lines)
+    
+    def plan(self, sql: str) -> Optional[str]:
+        """最近一次记录的执行计划"""
+        with self._lock:
+            return self._plans.get(normalize_sql(sql), (0.0, None))[1]
+    
+    def top(self, n: int = 10, order_by: str = "total_ms") -> List[Dict[str, Any]]:
+        """
+        获取排名靠前的语句
+        
+        Args:
+            n: 条数
+            order_by: 排序字段（total_ms / max_ms / count / rows / slow / lock_waits / avg_ms）
+        
+        Returns:
+            语句统计列表
+        """
+        with self._lock:
+            items = [
+                dict(stats, statement=statement,
+                     avg_ms=stats["total_ms"] / stats["count"] if stats["count"] else 0.0,
+                     plan=self._plans.get(statement, (0.0, ""))[1])
+                for statement, stats in self._stats.items()
+            ]
+        items.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+        return items[:n]
+    
+    def clear(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+
+
+_profiler = SqlProfiler()
+
+
+def get_sql_profiler() -> SqlProfiler:
+    """获取进程级共享的 SQL 语句分析器"""
+    return _profiler
+
+
+def configure_sql_profiler(settings: Optional[Dict[str, Any]] = None) -> SqlProfiler:
+    """
+    按性能设置更新共享分析器（保留已有统计）
+    
+    Args:
+        settings: performance_settings 配置
+    
+    Returns:
+        共享分析器
+    """
+    settings = settings or {}
+    slow_query_ms = settings.get("slow_query_ms", DEFAULT_SLOW_QUERY_MS)
+    if not (0 <= slow_query_ms <= 60000):
+        slow_query_ms = DEFAULT_SLOW_QUERY_MS
+    
+    _profiler.slow_query_ms = slow_query_ms
+    _profiler.enabled = settings.get("sql_profiling", True)
+    return _profiler
@@ -0,0 +1,145 @@
+"""
+指令耗时追踪装饰器和事件循环延迟探针
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from .metrics import Span, _current_span, get_metrics, record_wait
+
+
+logger = logging.getLogger("astrbot")
+
+
+class LoopLagProbe:
+    """
+    事件循环延迟探针
+    定期 sleep 固定间隔，实际唤醒时间与预期的差值即事件循环被阻塞的时长
+    """
+    
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        
+        # 最近一次采样的延迟（毫秒）和下一次预期唤醒的时间
+        self.last_ms = 0.0
+        self._expected: Optional[float] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def ensure_started(self) -> None:
+        """在当前事件循环中启动探针（已启动或没有运行中的事件循环时忽略）"""
+        if self.running:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        lag = get_metrics().loop_lag
+        try:
+            while True:
+                self._expected = expected = loop.time() + self.interval
+                await asyncio.sleep(self.interval)
+                self.last_ms = max(0.0, loop.time() - expected) * 1000
+                lag.record(self.last_ms)
+        except asyncio.CancelledError:
+            pass
+    
+    def current_ms(self) -> float:
+        """
+        当前的事件循环延迟（毫秒）
+        取最近一次采样与本次已超时未唤醒的时长中的较大值，事件循环正被阻塞时也能反映出来
+        """
+        if not self.running or self._expected is None:
+            return 0.0
+        overdue = (self._task.get_loop().time() - self._expected) * 1000
+        return max(self.last_ms, overdue)
+    
+    def stop(self) -> None:
+        """停止探针"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+_probe = LoopLagProbe()
+
+
+def get_loop_probe() -> LoopLagProbe:
+    """获取进程级共享的事件循环延迟探针"""
+    return _probe
+
+
+def track_command(name: Optional[str] = None) -> Callable:
+    """
+    指令耗时追踪装饰器，用于 async generator 形式的指令处理函数
+    需放在 @filter.command 之下，保证注册到框架的是包装后的函数
+    
+    记录的维度：
+    - wall: 从开始执行到生成器结束的总耗时
+    - blocking: 各次推进生成器的耗时之和（处理函数中的同步代码会阻塞事件循环）
+    - db / render: 由数据库层和渲染器累加到当前指令上
+    
+    Args:
+        name: 指令名称，默认使用函数名
+    """
+    def decorator(func: Callable) -> Callable:
+        command = name or func.__name__
+        
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any):
+            _probe.ensure_started()
+            
+            span = Span()
+            blocking = 0.0
+            error = False
+            start = time.perf_counter()
+            agen = func(*args, **kwargs)
+            try:
+                while True:
+                    # 只在推进生成器期间设置上下文，结果交给框架发送的时间不计入本指令
+                    token = _current_span.set(span)
+                    step_start = time.perf_counter()
+                    try:
+                        result = await agen.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        blocking += time.perf_counter() - step_start
+                        _current_span.reset(token)
+                    yield result
+            except BaseException as e:
+                error = not isinstance(e, GeneratorExit)
+                raise
+            finally:
+                await agen.aclose()
+                try:
+                    # 等待线程池和锁时事件循环可以处理其他任务，从阻塞耗时中扣除
+                    blocking = max(0.0, blocking - span.waited)
+                    get_metrics().record(command, time.perf_counter() - start, blocking, span, error)
+                except Exception as e:
+                    logger.warning(f"记录指令耗时失败: {e}")
+        
+        return wrapper
+    return decorator
+
+
+async def offload(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    在线程池中执行同步函数（数据库操作等），不阻塞事件循环
+    数据库耗时照常累加到当前指令，等待时间不计入阻塞耗时
+    """
+    start = time.perf_counter()
+    try:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    finally:
+        record_wait(time.perf_counter() - start)
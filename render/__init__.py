@@ -0,0 +1,7 @@
+"""
+LinBot 渲染公共模块
+"""
+
+from .fonts import FontRegistry, font_for, get_font, get_font_registry
+
+__all__ = ['FontRegistry', 'font_for', 'get_font', 'get_font_registry']
@@ -0,0 +1,77 @@
+"""
+图片发送 - 将渲染器输出的图片字节交给消息平台
+默认直接以字节发送，不经过磁盘；适配器只接受文件路径时写入唯一临时文件
+"""
+
+import logging
+import os
+import tempfile
+import time
+from typing import Any
+
+
+logger = logging.getLogger("astrbot")
+
+DELIVERY_MODES = ("bytes", "file")
+
+# 临时图片保留时间（秒），需覆盖适配器上传耗时
+TEMP_FILE_TTL = 600
+
+
+def guess_suffix(data: bytes) -> str:
+    """根据文件头判断图片扩展名"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    return ".png"
+
+
+class ImageDelivery:
+    """图片发送器"""
+    
+    def __init__(self, mode: str = "bytes", temp_dir: str = ""):
+        self.mode = mode if mode in DELIVERY_MODES else "bytes"
+        self.temp_dir = temp_dir or os.path.join(tempfile.gettempdir(), "astrbot_plugin_linbot")
+    
+    def result(self, event: Any, data: bytes) -> Any:
+        """
+        构造图片消息结果
+        
+        Args:
+            event: 消息事件
+            data: 图片字节
+        
+        Returns:
+            可直接 yield 的消息结果
+        """
+        if self.mode == "file":
+            return event.image_result(self._write_temp_file(data, guess_suffix(data)))
+        
+        from astrbot.api.message_components import Image
+        
+        return event.chain_result([Image.fromBytes(data)])
+    
+    def _write_temp_file(self, data: bytes, suffix: str) -> str:
+        """写入唯一命名的临时文件，并顺带清理过期文件"""
+        os.makedirs(self.temp_dir, exist_ok=True)
+        self._sweep()
+        
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix="linbot_", dir=self.temp_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path
+    
+    def _sweep(self) -> None:
+        """删除超过保留时间的临时图片"""
+        deadline = time.time() - TEMP_FILE_TTL
+        try:
+            with os.scandir(self.temp_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith("linbot_") and entry.stat().st_mtime < deadline:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+        except OSError as e:
+            logger.warning(f"清理临时图片失败: {e}")
@@ -0,0 +1,161 @@
+"""
+图片编码器 - 所有渲染器共用的编码阶段
+排行榜等纯色文字界面图片（调用时标记 flat）在开启调色板时量化为 256 色 PNG，
+其余图片（含插件头像的帮助图、监控图表的渐变和抗锯齿）保持全彩 PNG，避免量化产生色带；
+超出体积预算且消息平台允许时依次尝试 WebP、JPEG，并按图片类型记录编码耗时和体积
+"""
+
+import io
+import logging
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+
+logger = logging.getLogger("astrbot")
+
+# 默认体积预算（字节），0 表示不限制
+DEFAULT_MAX_BYTES = 512 * 1024
+
+WEBP_QUALITIES = (90, 80, 70)
+JPEG_QUALITIES = (90, 80, 70, 60)
+
+
+class ImageEncoder:
+    """图片编码器"""
+    
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, palette: bool = False,
+                 allow_webp: bool = False, allow_jpeg: bool = False):
+        self.max_bytes = max(0, int(max_bytes))
+        # 是否允许纯色界面图片使用调色板 PNG
+        self.palette = palette
+        self.allow_webp = allow_webp
+        self.allow_jpeg = allow_jpeg
+        
+        self._lock = threading.Lock()
+        self._stats = {}
+    
+    def encode(self, image: Any, kind: str = "image", flat: bool = False) -> bytes:
+        """
+        编码图片，返回第一个满足体积预算的结果，全部超出时返回最小的结果
+        
+        Args:
+            image: PIL Image 对象
+            kind: 图片类型（help / ranking / monitor / chart），用于统计
+            flat: 是否为纯色界面图片（开启调色板时量化为 256 色）
+        
+        Returns:
+            编码后的图片字节
+        """
+        start = time.perf_counter()
+        
+        best_format, best_data = None, None
+        for fmt, data in self._candidates(image, self.palette and flat):
+            if best_data is None or len(data) < len(best_data):
+                best_format, best_data = fmt, data
+            if not self.max_bytes or len(data) <= self.max_bytes:
+                best_format, best_data = fmt, data
+                break
+        else:
+            logger.warning(f"{kind} 图片超出体积预算: {len(best_data)} > {self.max_bytes} 字节")
+        
+        self._record(kind, best_format, len(best_data), time.perf_counter() - start)
+        return best_data
+    
+    def _candidates(self, image: Any, palette: bool) -> Iterator[Tuple[str, bytes]]:
+        """按优先级生成候选编码结果（惰性，满足预算后不再继续）"""
+        rgb = image if image.mode == "RGB" else image.convert("RGB")
+        
+        if palette:
+            yield "png-palette", self._save(self._to_palette(rgb), "PNG")
+        else:
+            yield "png", self._save(rgb, "PNG")
+        
+        if self.allow_webp:
+            # 界面图片的无损 WebP 通常比有损更小
+            yield "webp-lossless", self._save(rgb, "WEBP", lossless=True)
+            for quality in WEBP_QUALITIES:
+                yield f"webp-q{quality}", self._save(rgb, "WEBP", quality=quality, method=4)
+        
+        if self.allow_jpeg:
+            for quality in JPEG_QUALITIES:
+                yield f"jpeg-q{quality}", self._save(rgb, "JPEG", quality=quality, optimize=True)
+    
+    @staticmethod
+    def _to_palette(image: Any) -> Any:
+        """转换为 256 色调色板图片，颜色不超过 256 种时无损"""
+        from PIL import Image
+        
+        return image.quantize(colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    
+    @staticmethod
+    def _save(image: Any, fmt: str, **params) -> bytes:
+        """编码到内存"""
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **params)
+        return buffer.getvalue()
+    
+    def _record(self, kind: str, fmt: str, size: int, seconds: float) -> None:
+        """记录编码统计"""
+        with self._lock:
+            stats = self._stats.setdefault(kind, {
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "total_bytes": 0, "last_bytes": 0, "formats": {}
+            })
+            ms = seconds * 1000
+            stats["count"] += 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            stats["total_bytes"] += size
+            stats["last_bytes"] = size
+            stats["formats"][fmt] = stats["formats"].get(fmt, 0) + 1
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取按图片类型统计的编码耗时和体积
+        
+        Returns:
+            图片类型 -> 统计信息
+        """
+        with self._lock:
+            return {
+                kind: {
+                    "count": s["count"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 2),
+                    "max_ms": round(s["max_ms"], 2),
+                    "avg_kb": round(s["total_bytes"] / s["count"] / 1024, 1),
+                    "last_kb": round(s["last_bytes"] / 1024, 1),
+                    "formats": dict(s["formats"])
+                }
+                for kind, s in self._stats.items()
+            }
+
+
+_encoder = ImageEncoder()
+
+
+def get_encoder() -> ImageEncoder:
+    """获取进程级共享的图片编码器"""
+    return _encoder
+
+
+def configure_encoder(settings: Optional[Dict[str, Any]] = None) -> ImageEncoder:
+    """
+    按渲染设置更新共享编码器（保留已有统计）
+    
+    Args:
+        settings: render_settings 配置
+    
+    Returns:
+        共享编码器
+    """
+    settings = settings or {}
+    max_kb = settings.get("max_image_kb", DEFAULT_MAX_BYTES // 1024)
+    if not (0 <= max_kb <= 10240):
+        max_kb = DEFAULT_MAX_BYTES // 1024
+    
+    _encoder.max_bytes = int(max_kb) * 1024
+    _encoder.palette = settings.get("palette_png", True)
+    _encoder.allow_webp = settings.get("allow_webp", False)
+    _encoder.allow_jpeg = settings.get("allow_jpeg", False)
+    return _encoder
@@ -0,0 +1,246 @@
+"""
+字体注册表 - 进程级共享字体缓存
+字体文件只解析一次，FreeTypeFont 按字号缓存，帮助、排行榜、服务器监控共用同一份字体对象
+已构建子集字体（见 render/subset.py）时优先使用子集，文本含子集外字符时回退完整字体
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+
+logger = logging.getLogger("astrbot")
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+
+# 字体查找顺序：插件自带字体 -> Windows 系统字体 -> Linux 系统字体 -> PIL 默认字体
+DEFAULT_FONT_CANDIDATES = [
+    os.path.join(ASSETS_DIR, "LXGWWenKai-Regular.ttf"),
+    "msyh.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+]
+
+# 由 render/subset.py 生成的子集字体及其字符表
+DEFAULT_SUBSET_PATH = os.path.join(ASSETS_DIR, "LXGWWenKai-Subset.ttf")
+CHARSET_SUFFIX = ".chars.txt"
+
+
+def charset_path_for(font_path: str) -> str:
+    """子集字体对应的字符表路径"""
+    return os.path.splitext(font_path)[0] + CHARSET_SUFFIX
+
+
+class FontRegistry:
+    """字体注册表"""
+    
+    def __init__(self, candidates: Optional[List[str]] = None, subset_path: Optional[str] = None):
+        self.candidates = list(candidates or DEFAULT_FONT_CANDIDATES)
+        self.subset_path = DEFAULT_SUBSET_PATH if subset_path is None else subset_path
+        
+        self._lock = threading.Lock()
+        self._resolved = False
+        self._font_path = None
+        self._fonts = {}
+        self._subset_chars = None
+        self._subset_fonts = {}
+        self._matplotlib_family = None
+        
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._fallbacks = 0
+        self._load_seconds = 0.0
+    
+    @property
+    def font_path(self) -> Optional[str]:
+        """解析后的字体文件路径，全部候选不可用时为 None"""
+        if not self._resolved:
+            with self._lock:
+                self._resolve()
+        return self._font_path
+    
+    def _resolve(self) -> None:
+        """按候选顺序查找第一个可加载的字体文件（需持有锁）"""
+        if self._resolved:
+            return
+        
+        from PIL import ImageFont
+        
+        for path in self.candidates:
+            try:
+                ImageFont.truetype(path, 12)
+                self._font_path = path
+                break
+            except OSError:
+                continue
+        
+        if self._font_path is None:
+            logger.warning(f"字体文件加载失败，使用默认字体: {self.candidates}")
+        elif self._font_path != self.candidates[0]:
+            logger.warning(f"字体文件加载失败: {self.candidates[0]}，改用 {self._font_path}")
+        
+        self._resolved = True
+    
+    @property
+    def subset_chars(self) -> frozenset:
+        """子集字体覆盖的字符，未构建子集时为空集"""
+        if self._subset_chars is None:
+            with self._lock:
+                self._resolve_subset()
+        return self._subset_chars
+    
+    def _resolve_subset(self) -> None:
+        """读取子集字符表（需持有锁）"""
+        if self._subset_chars is not None:
+            return
+        
+        chars = frozenset()
+        charset_path = charset_path_for(self.subset_path) if self.subset_path else ""
+        if charset_path and os.path.exists(self.subset_path) and os.path.exists(charset_path):
+            try:
+                with open(charset_path, encoding='utf-8') as f:
+                    chars = frozenset(f.read())
+            except OSError as e:
+                logger.warning(f"子集字符表读取失败，使用完整字体: {e}")
+        self._subset_chars = chars
+    
+    def _load(self, cache: Dict[int, Any], size: int, subset: bool) -> Any:
+        """从缓存取字体，未命中时加载子集或完整字体"""
+        font = cache.get(size)
+        if font is not None:
+            self._hits += 1
+            return font
+        
+        with self._lock:
+            font = cache.get(size)
+            if font is not None:
+                self._hits += 1
+                return font
+            
+            from PIL import ImageFont
+            
+            if subset:
+                path = self.subset_path
+            else:
+                self._resolve()
+                path = self._font_path
+            
+            start = time.perf_counter()
+            if path:
+                font = ImageFont.truetype(path, size)
+            else:
+                font = ImageFont.load_default()
+            self._load_seconds += time.perf_counter() - start
+            
+            self._misses += 1
+            cache[size] = font
+            return font
+    
+    def get_font(self, size: int) -> Any:
+        """
+        获取指定字号的界面字体（有子集时为子集字体）
+        仅用于插件固定文字，用户名等动态文本请使用 font_for
+        
+        Args:
+            size: 字号
+            
+        Returns:
+            FreeTypeFont 对象（无可用字体时为 PIL 默认字体）
+        """
+        if self.subset_chars:
+            return self._load(self._subset_fonts, size, subset=True)
+        return self._load(self._fonts, size, subset=False)
+    
+    def get_full_font(self, size: int) -> Any:
+        """获取指定字号的完整字体"""
+        return self._load(self._fonts, size, subset=False)
+    
+    def font_for(self, size: int, text: str) -> Any:
+        """
+        获取能完整显示指定文本的字体
+        文本字符全部在子集内时使用子集字体，否则回退完整字体
+        
+        Args:
+            size: 字号
+            text: 要绘制的文本
+            
+        Returns:
+            FreeTypeFont 对象
+        """
+        chars = self.subset_chars
+        if not chars:
+            return self._load(self._fonts, size, subset=False)
+        if chars.issuperset(text):
+            return self._load(self._subset_fonts, size, subset=True)
+        
+        self._fallbacks += 1
+        return self._load(self._fonts, size, subset=False)
+    
+    def get_fonts(self, sizes: Dict[str, int]) -> Dict[str, Any]:
+        """
+        按名称批量获取字体
+        
+        Args:
+            sizes: 名称 -> 字号
+            
+        Returns:
+            名称 -> 字体对象
+        """
+        return {name: self.get_font(size) for name, size in sizes.items()}
+    
+    def matplotlib_family(self) -> Optional[str]:
+        """
+        将字体注册到 matplotlib 并返回字体族名称（仅注册一次）
+        
+        Returns:
+            字体族名称，无可用字体文件时为 None
+        """
+        if self._matplotlib_family is None and self.font_path:
+            from matplotlib import font_manager
+            
+            font_manager.fontManager.addfont(self.font_path)
+            self._matplotlib_family = font_manager.FontProperties(fname=self.font_path).get_name()
+        return self._matplotlib_family
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            "font_path": self._font_path,
+            "subset_path": self.subset_path if self._subset_chars else None,
+            "cached_sizes": sorted(self._fonts),
+            "subset_sizes": sorted(self._subset_fonts),
+            "hits": self._hits,
+            "misses": self._misses,
+            "fallbacks": self._fallbacks,
+            "load_ms": round(self._load_seconds * 1000, 2)
+        }
+    
+    def clear(self) -> None:
+        """清空缓存（字体文件变更后使用）"""
+        with self._lock:
+            self._fonts.clear()
+            self._subset_fonts.clear()
+            self._subset_chars = None
+            self._resolved = False
+            self._font_path = None
+            self._matplotlib_family = None
+
+
+_registry = FontRegistry()
+
+
+def get_font_registry() -> FontRegistry:
+    """获取进程级共享的字体注册表"""
+    return _registry
+
+
+def get_font(size: int) -> Any:
+    """从共享字体注册表获取指定字号的字体"""
+    return _registry.get_font(size)
+
+
+def font_for(size: int, text: str) -> Any:
+    """从共享字体注册表获取能完整显示文本的字体"""
+    return _registry.font_for(size, text)
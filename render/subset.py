@@ -0,0 +1,128 @@
+"""
+字体子集构建 - 生成只包含常用字形的精简字体
+收录插件源码中的固定界面文字、GB2312 一级常用汉字、中文标点、数字和 ASCII，
+渲染时若文本含子集外的字符（如生僻字用户名）会自动回退到完整字体
+
+用法（在 data/plugins 目录下）:
+python -m astrbot_plugin_linbot.render.subset [--src 完整字体] [--dst 子集字体]
+"""
+
+import argparse
+import ast
+import os
+import time
+from typing import Set, Dict, Any
+
+from .fonts import ASSETS_DIR, DEFAULT_FONT_CANDIDATES, DEFAULT_SUBSET_PATH, charset_path_for
+
+
+PLUGIN_DIR = os.path.dirname(ASSETS_DIR)
+
+
+def collect_ui_chars(plugin_dir: str = PLUGIN_DIR) -> Set[str]:
+    """
+    收集插件源码中所有字符串常量用到的字符
+    
+    Args:
+        plugin_dir: 插件目录
+        
+    Returns:
+        字符集合
+    """
+    chars = set()
+    for root, dirs, files in os.walk(plugin_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+        for name in files:
+            if not name.endswith('.py'):
+                continue
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                try:
+                    tree = ast.parse(f.read())
+                except SyntaxError:
+                    continue
+            # f-string 的常量部分同样是 ast.Constant
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                    chars.update(node.value)
+    return chars
+
+
+def common_chars() -> Set[str]:
+    """GB2312 一级常用汉字、中文标点、全角符号、数字和 ASCII"""
+    chars = {chr(c) for c in range(0x20, 0x7F)}
+    
+    # GB2312 一级汉字位于 0xB0A1 - 0xD7F9（共 3755 字）
+    for high in range(0xB0, 0xD8):
+        for low in range(0xA1, 0xFF):
+            try:
+                chars.add(bytes([high, low]).decode('gb2312'))
+            except UnicodeDecodeError:
+                continue
+    
+    # CJK 标点、全角字符、常用符号
+    for start, end in ((0x3000, 0x303F), (0xFF00, 0xFFEF), (0x2000, 0x206F), (0x2190, 0x21FF), (0x2500, 0x257F)):
+        chars.update(chr(c) for c in range(start, end + 1))
+    return chars
+
+
+def build_subset(src: str, dst: str, chars: Set[str]) -> Dict[str, Any]:
+    """
+    生成子集字体和字符表
+    
+    Args:
+        src: 完整字体路径
+        dst: 子集字体输出路径
+        chars: 需要保留的字符
+        
+    Returns:
+        构建结果统计
+    """
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    
+    start = time.perf_counter()
+    
+    options = subset.Options()
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    options.layout_features = ['*']
+    
+    font = TTFont(src)
+    cmap = font.getBestCmap()
+    # 只保留源字体中确实存在的字符，字符表必须与子集实际覆盖范围一致
+    covered = {c for c in chars if ord(c) in cmap}
+    
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(unicodes={ord(c) for c in covered})
+    subsetter.subset(font)
+    font.save(dst)
+    
+    with open(charset_path_for(dst), 'w', encoding='utf-8') as f:
+        f.write(''.join(sorted(covered)))
+    
+    return {
+        "src_bytes": os.path.getsize(src),
+        "dst_bytes": os.path.getsize(dst),
+        "chars": len(covered),
+        "missing": len(chars) - len(covered),
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 LinBot 子集字体")
+    parser.add_argument("--src", default=DEFAULT_FONT_CANDIDATES[0], help="完整字体路径")
+    parser.add_argument("--dst", default=DEFAULT_SUBSET_PATH, help="子集字体输出路径")
+    args = parser.parse_args()
+    
+    chars = collect_ui_chars() | common_chars()
+    result = build_subset(args.src, args.dst, chars)
+    
+    print(f"✅ 子集字体已生成: {args.dst}")
+    print(f"• 字符数：{result['chars']}（源字体缺少 {result['missing']} 个）")
+    print(f"• 文件大小：{result['src_bytes'] / 1024:.0f}KB → {result['dst_bytes'] / 1024:.0f}KB")
+    print(f"• 耗时：{result['seconds']}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,27 +3,51 @@
 用于获取系统信息并生成美观的监控图片
 """
 
-import os
-import platform
-import psutil
-import time
-from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
 import io
-import json
+import platform
+from datetime import datetime
+
+from ..perf import measure_render
+from ..render.encoder import get_encoder
+from ..render.fonts import get_font_registry
+
+# psutil / PIL / matplotlib 均为重量级依赖，改为在首次使用时导入，
+# 避免插件加载（以及重载）时的额外启动开销
 
 
 class ServerMonitor:
     """服务器监控类"""
     
+    # 字体名称 -> 字号
+    FONT_SIZES = {'large': 24, 'medium': 16, 'small': 12}
+    
+    IMAGE_SIZE = (800, 1000)
+    
+    COLORS = {
+        'background': '#1a1a1a',
+        'heading': '#00d4aa',
+        'muted': '#888',
+        'value': '#fff',
+        'secondary': '#ccc'
+    }
+    
+    # 监控图片中的段落（数据键, 标题），磁盘信息单独绘制
+    SECTIONS = [
+        ('system', "📋 系统信息"),
+        ('cpu', "🔥 CPU信息"),
+        ('memory', "💾 内存信息"),
+        ('process', "⚡ 进程信息"),
+        ('network', "🌐 网络信息"),
+    ]
+    
     def __init__(self):
-        self.data_dir = "data/plugins_data/astrbot_plugin_linbot"
-        os.makedirs(self.data_dir, exist_ok=True)
-        
+        # 静态层模板缓存：缓存键 -> (模板图片, 数值位置)
+        self._templates = {}
+    
     def get_system_info(self):
         """获取系统信息"""
+        import psutil
+        
         try:
             # 基本系统信息
             system_info = {
@@ -107,7 +131,7 @@ class ServerMonitor:
                 "process": process_info,
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
-            
+        
         except Exception as e:
             raise Exception(f"获取系统信息失败: {str(e)}")
     
@@ -120,160 +144,211 @@ class ServerMonitor:
         return f"{bytes_value:.1f}PB"
     
     def generate_monitor_image(self, info):
-        """生成监控图片"""
+        """生成监控图片，返回编码后的图片字节"""
         try:
-            # 创建图片
-            width, height = 800, 1000
-            img = Image.new('RGB', (width, height), color='#1a1a1a')
-            draw = ImageDraw.Draw(img)
-            
-            # 加载指定字体
-            font_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "LXGWWenKai-Regular.ttf")
-            try:
-                font_large = ImageFont.truetype(font_path, 24)
-                font_medium = ImageFont.truetype(font_path, 16)
-                font_small = ImageFont.truetype(font_path, 12)
-            except Exception as font_error:
-                print(f"字体加载失败: {font_error}")
-                # 备用字体方案
-                try:
-                    # Windows系统字体
-                    font_large = ImageFont.truetype("msyh.ttc", 24)
-                    font_medium = ImageFont.truetype("msyh.ttc", 16)
-                    font_small = ImageFont.truetype("msyh.ttc", 12)
-                except:
-                    try:
-                        # Linux系统字体
-                        font_large = ImageFont.truetype("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 24)
-                        font_medium = ImageFont.truetype("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 16)
-                        font_small = ImageFont.truetype("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 12)
-                    except:
-                        # 默认字体
-                        font_large = ImageFont.load_default()
-                        font_medium = ImageFont.load_default()
-                        font_small = ImageFont.load_default()
-            
-            y_offset = 20
-            
-            # 标题
-            title = "🖥️ 服务器监控报告"
-            draw.text((width//2 - 100, y_offset), title, fill='#00d4aa', font=font_large)
-            y_offset += 50
-            
-            # 时间戳
-            draw.text((width//2 - 80, y_offset), f"更新时间: {info['timestamp']}", fill='#888', font=font_small)
-            y_offset += 40
-            
-            # 系统信息
-            self._draw_section(draw, "📋 系统信息", info['system'], y_offset, font_medium, font_small, width)
-            y_offset += len(info['system']) * 25 + 60
-            
-            # CPU信息
-            self._draw_section(draw, "🔥 CPU信息", info['cpu'], y_offset, font_medium, font_small, width)
-            y_offset += len(info['cpu']) * 25 + 60
-            
-            # 内存信息
-            self._draw_section(draw, "💾 内存信息", info['memory'], y_offset, font_medium, font_small, width)
-            y_offset += len(info['memory']) * 25 + 60
-            
-            # 进程信息
-            self._draw_section(draw, "⚡ 进程信息", info['process'], y_offset, font_medium, font_small, width)
-            y_offset += len(info['process']) * 25 + 60
-            
-            # 网络信息
-            self._draw_section(draw, "🌐 网络信息", info['network'], y_offset, font_medium, font_small, width)
-            y_offset += len(info['network']) * 25 + 60
-            
-            # 磁盘信息（只显示前3个）
-            disk_title = "💿 磁盘信息"
-            draw.text((20, y_offset), disk_title, fill='#00d4aa', font=font_medium)
-            y_offset += 35
-            
-            for i, disk in enumerate(info['disk'][:3]):  # 只显示前3个磁盘
-                disk_text = f"{disk['设备']} ({disk['文件系统']})"
-                draw.text((40, y_offset), disk_text, fill='#fff', font=font_small)
-                y_offset += 20
-                
-                usage_text = f"  {disk['已用']} / {disk['总量']} ({disk['使用率']})"
-                draw.text((40, y_offset), usage_text, fill='#ccc', font=font_small)
-                y_offset += 25
-            
-            # 保存图片
-            image_path = os.path.join(self.data_dir, "server_monitor.png")
-            img.save(image_path, "PNG")
-            
-            return image_path
-            
+            with measure_render():
+                img = self.render_monitor_image(info)
+                return get_encoder().encode(img, "monitor")
+        
         except Exception as e:
             raise Exception(f"生成监控图片失败: {str(e)}")
     
-    def _draw_section(self, draw, title, data, y_offset, font_medium, font_small, width):
-        """绘制信息段落"""
+    def render_monitor_image(self, info):
+        """
+        绘制监控图片
+        静态层（背景、标题、段落标题、指标名称）按布局缓存，每次只绘制数值
+        
+        Returns:
+            PIL Image 对象
+        """
+        from PIL import ImageDraw
+        
+        fonts = get_font_registry()
+        small = self.FONT_SIZES['small']
+        
+        template, slots = self._get_template(info)
+        img = template.copy()
+        draw = ImageDraw.Draw(img)
+        
+        # 时间戳和各段落数值
+        x, y = slots['timestamp']
+        draw.text((x, y), info['timestamp'], fill=self.COLORS['muted'], font=fonts.get_font(small))
+        
+        for section, key, x, y in slots['values']:
+            # 主机名、处理器型号等动态内容可能超出子集字体范围
+            value = str(info[section][key])
+            draw.text((x, y), value, fill=self.COLORS['value'], font=fonts.font_for(small, value))
+        
+        # 磁盘信息（只显示前3个）
+        y_offset = slots['disk']
+        for disk in info['disk'][:3]:
+            disk_text = f"{disk['设备']} ({disk['文件系统']})"
+            draw.text((40, y_offset), disk_text, fill=self.COLORS['value'],
+                      font=fonts.font_for(small, disk_text))
+            y_offset += 20
+            
+            usage_text = f"  {disk['已用']} / {disk['总量']} ({disk['使用率']})"
+            draw.text((40, y_offset), usage_text, fill=self.COLORS['secondary'], font=fonts.get_font(small))
+            y_offset += 25
+        
+        return img
+    
+    def _get_template(self, info):
+        """
+        获取静态层模板
+        以字体对象和各段落的指标名称作为缓存键，字体或指标变化时重新绘制
+        
+        Returns:
+            (模板图片, 数值绘制位置)
+        """
+        fonts = get_font_registry()
+        font_large = fonts.get_font(self.FONT_SIZES['large'])
+        font_medium = fonts.get_font(self.FONT_SIZES['medium'])
+        font_small = fonts.get_font(self.FONT_SIZES['small'])
+        
+        key = (id(font_large), id(font_medium), id(font_small),
+               tuple(tuple(info[section]) for section, _ in self.SECTIONS))
+        template = self._templates.get(key)
+        if template is None:
+            # 字体变更后旧模板不会再命中，直接丢弃
+            self._templates.clear()
+            template = self._build_template(info, font_large, font_medium, font_small)
+            self._templates[key] = template
+        return template
+    
+    def _build_template(self, info, font_large, font_medium, font_small):
+        """绘制静态层并记录数值位置"""
+        from PIL import Image, ImageDraw
+        
+        width, height = self.IMAGE_SIZE
+        img = Image.new('RGB', (width, height), color=self.COLORS['background'])
+        draw = ImageDraw.Draw(img)
+        slots = {'values': []}
+        
+        y_offset = 20
+        
+        # 标题
+        title = "🖥️ 服务器监控报告"
+        draw.text((width//2 - 100, y_offset), title, fill=self.COLORS['heading'], font=font_large)
+        y_offset += 50
+        
+        # 时间戳标签
+        label = "更新时间: "
+        draw.text((width//2 - 80, y_offset), label, fill=self.COLORS['muted'], font=font_small)
+        slots['timestamp'] = (width//2 - 80 + draw.textlength(label, font=font_small), y_offset)
+        y_offset += 40
+        
+        # 系统、CPU、内存、进程、网络信息
+        for section, title in self.SECTIONS:
+            self._draw_section_labels(draw, section, title, info[section], y_offset,
+                                      font_medium, font_small, slots['values'])
+            y_offset += len(info[section]) * 25 + 60
+        
+        # 磁盘信息标题，磁盘列表随设备变化，每次绘制
+        disk_title = "💿 磁盘信息"
+        draw.text((20, y_offset), disk_title, fill=self.COLORS['heading'], font=font_medium)
+        slots['disk'] = y_offset + 35
+        
+        return img, slots
+    
+    def _draw_section_labels(self, draw, section, title, data, y_offset, font_medium, font_small, slots):
+        """绘制信息段落的标题和指标名称，记录数值位置"""
         # 段落标题
-        draw.text((20, y_offset), title, fill='#00d4aa', font=font_medium)
+        draw.text((20, y_offset), title, fill=self.COLORS['heading'], font=font_medium)
         y_offset += 35
         
-        # 段落内容
-        for key, value in data.items():
-            text = f"{key}: {value}"
-            draw.text((40, y_offset), text, fill='#fff', font=font_small)
+        # 指标名称
+        for key in data:
+            label = f"{key}: "
+            draw.text((40, y_offset), label, fill=self.COLORS['value'], font=font_small)
+            slots.append((section, key, 40 + draw.textlength(label, font=font_small), y_offset))
             y_offset += 25
     
     def generate_cpu_chart(self, duration=30, interval=1):
-        """生成CPU使用率图表"""
+        """生成CPU使用率图表，返回编码后的图片字节"""
         try:
-            # 收集CPU数据
-            cpu_data = []
-            timestamps = []
-            
-            for i in range(duration):  # 根据配置收集数据
-                cpu_percent = psutil.cpu_percent(interval=interval)
-                cpu_data.append(cpu_percent)
-                timestamps.append(datetime.now().strftime("%H:%M:%S"))
-            
-            # 设置字体路径
-            font_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "LXGWWenKai-Regular.ttf")
-            
-            # 设置中文字体
-            try:
-                # 使用指定字体
-                plt.rcParams['font.family'] = ['LXGWWenKai']
-                from matplotlib.font_manager import FontProperties
-                font_prop = FontProperties(fname=font_path)
-                plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-            except Exception as font_error:
-                print(f"matplotlib字体设置失败: {font_error}")
-                # 备用字体设置
-                plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans', 'Liberation Sans']
-            
-            plt.rcParams['axes.unicode_minus'] = False
-            
-            # 创建图表
-            plt.figure(figsize=(12, 6))
-            plt.plot(timestamps[::max(1, duration//10)], cpu_data[::max(1, duration//10)], 'b-', linewidth=2, marker='o', markersize=4)
-            plt.title(f'CPU使用率趋势 (最近{duration}秒)', fontsize=16, fontweight='bold')
-            plt.xlabel('时间', fontsize=12)
-            plt.ylabel('CPU使用率 (%)', fontsize=12)
-            plt.grid(True, alpha=0.3)
-            plt.xticks(rotation=45)
-            plt.ylim(0, 100)
-            
-            # 添加统计信息
-            avg_cpu = sum(cpu_data) / len(cpu_data)
-            max_cpu = max(cpu_data)
-            min_cpu = min(cpu_data)
-            plt.text(0.02, 0.98, f'平均: {avg_cpu:.1f}%\n最高: {max_cpu:.1f}%\n最低: {min_cpu:.1f}%', 
-                    transform=plt.gca().transAxes, verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-            
-            plt.tight_layout()
-            
-            # 保存图表
-            chart_path = os.path.join(self.data_dir, "cpu_chart.png")
-            plt.savefig(chart_path, dpi=150, bbox_inches='tight')
-            plt.close()
-            
-            return chart_path
-            
+            cpu_data, timestamps = self.sample_cpu(duration, interval)
+            return self.encode_cpu_chart(cpu_data, timestamps, duration)
+        
         except Exception as e:
-            raise Exception(f"生成CPU图表失败: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"生成CPU图表失败: {str(e)}")
+    
+    def encode_cpu_chart(self, cpu_data, timestamps, duration):
+        """用已采集的数据绘制并编码CPU使用率图表"""
+        with measure_render():
+            chart = self.render_cpu_chart(cpu_data, timestamps, duration)
+            return get_encoder().encode(chart, "chart")
+    
+    def sample_cpu(self, duration=30, interval=1):
+        """
+        采集CPU使用率
+        
+        Returns:
+            (使用率列表, 时间戳列表)
+        """
+        import psutil
+        
+        cpu_data = []
+        timestamps = []
+        
+        for i in range(duration):  # 根据配置收集数据
+            cpu_percent = psutil.cpu_percent(interval=interval)
+            cpu_data.append(cpu_percent)
+            timestamps.append(datetime.now().strftime("%H:%M:%S"))
+        
+        return cpu_data, timestamps
+    
+    def render_cpu_chart(self, cpu_data, timestamps, duration):
+        """
+        绘制CPU使用率图表
+        
+        Returns:
+            PIL Image 对象
+        """
+        import matplotlib.pyplot as plt
+        from PIL import Image
+        
+        # 设置中文字体（字体只注册到 matplotlib 一次）
+        try:
+            font_family = get_font_registry().matplotlib_family()
+        except Exception as font_error:
+            print(f"matplotlib字体设置失败: {font_error}")
+            font_family = None
+        
+        if font_family:
+            plt.rcParams['font.family'] = [font_family]
+        else:
+            # 备用字体设置
+            plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans', 'Liberation Sans']
+        
+        plt.rcParams['axes.unicode_minus'] = False
+        
+        # 创建图表
+        plt.figure(figsize=(12, 6))
+        plt.plot(timestamps[::max(1, duration//10)], cpu_data[::max(1, duration//10)], 'b-', linewidth=2, marker='o', markersize=4)
+        plt.title(f'CPU使用率趋势 (最近{duration}秒)', fontsize=16, fontweight='bold')
+        plt.xlabel('时间', fontsize=12)
+        plt.ylabel('CPU使用率 (%)', fontsize=12)
+        plt.grid(True, alpha=0.3)
+        plt.xticks(rotation=45)
+        plt.ylim(0, 100)
+        
+        # 添加统计信息
+        avg_cpu = sum(cpu_data) / len(cpu_data)
+        max_cpu = max(cpu_data)
+        min_cpu = min(cpu_data)
+        plt.text(0.02, 0.98, f'平均: {avg_cpu:.1f}%\n最高: {max_cpu:.1f}%\n最低: {min_cpu:.1f}%', 
+                transform=plt.gca().transAxes, verticalalignment='top',
+                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+        
+        plt.tight_layout()
+        
+        # 先由 matplotlib 输出 PNG 再解码，交给共享编码器按体积预算重新编码
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+        plt.close()
+        
+        buffer.seek(0)
+        chart = Image.open(buffer)
+        chart.load()
+        return chart
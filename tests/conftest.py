@@ -0,0 +1,17 @@
+"""
+测试公共设置
+插件以 astrbot_plugin_linbot 包的形式被 AstrBot 加载（模块内使用相对导入），
+仓库目录名不一定相同，这里把仓库根目录注册为该包
+"""
+
+import os
+import sys
+import types
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "astrbot_plugin_linbot" not in sys.modules:
+    package = types.ModuleType("astrbot_plugin_linbot")
+    package.__path__ = [ROOT]
+    sys.modules["astrbot_plugin_linbot"] = package
@@ -0,0 +1,78 @@
+"""
+备份恢复测试 - 恢复快照时暂停存储的读写：等待进行中的会话结束，恢复期间新的读写等待，
+恢复后全部分片一起回到快照时的数据
+"""
+
+import threading
+
+import pytest
+
+from astrbot_plugin_linbot.game.backup import DatabaseBackup
+
+from test_storage import _add_user, _sqlite_store, _two_users
+
+
+@pytest.fixture(params=[(2, 0), (2, 4)], ids=["sqlite-shards", "sqlite-shards-pool"])
+def store(request, tmp_path):
+    shards, readers = request.param
+    store = _sqlite_store(tmp_path, shards=shards, readers=readers)
+    yield store
+    store.close()
+
+
+def _money(store, user_id: str) -> int:
+    with store.read(user_id) as session:
+        return session.get_user(user_id)["money"]
+
+
+def test_pause_waits_for_sessions_and_blocks_new_ones(store):
+    robber, victim = _two_users(store)
+    reading, release, paused, resume = (threading.Event() for _ in range(4))
+    
+    def read():
+        with store.read(robber):
+            reading.set()
+            release.wait(5)
+    
+    def pause():
+        with store.pause():
+            paused.set()
+            resume.wait(5)
+    
+    reader = threading.Thread(target=read)
+    reader.start()
+    assert reading.wait(5)
+    pauser = threading.Thread(target=pause)
+    pauser.start()
+    # 进行中的读取结束前不会开始暂停
+    assert not paused.wait(0.1)
+    release.set()
+    assert paused.wait(5)
+    
+    writer = threading.Thread(target=_add_user, args=(store, victim, "bob"), kwargs={"money": 77})
+    writer.start()
+    writer.join(0.1)
+    assert writer.is_alive()
+    resume.set()
+    for thread in (reader, pauser, writer):
+        thread.join(5)
+    assert _money(store, victim) == 77
+
+
+def test_restore_with_store(store, tmp_path):
+    robber, victim = _two_users(store)
+    assert store.router.index_of(robber) != store.router.index_of(victim)
+    _add_user(store, robber, "alice", money=100)
+    _add_user(store, victim, "bob", money=200)
+    
+    backup = DatabaseBackup(store.db_path, str(tmp_path / "backups"))
+    snapshot = backup.backup()["name"]
+    _add_user(store, robber, "alice", money=1)
+    _add_user(store, victim, "bob", money=2)
+    
+    result = backup.restore(snapshot, store)
+    assert result["files"] == 2
+    assert (_money(store, robber), _money(store, victim)) == (100, 200)
+    # 恢复后存储可以继续写入
+    _add_user(store, robber, "alice", money=5)
+    assert _money(store, robber) == 5
@@ -0,0 +1,145 @@
+"""
+数据导出与导入测试 - 在 SQLite（单文件、读连接池、两个分片）上验证导出后导入的数据一致、
+中断后继续导入不重复写入，以及导入用户表后可抢劫目标、用户名查找和统计保持正确
+（导出与导入只支持 sqlite 存储）
+"""
+
+import json
+
+import pytest
+
+from astrbot_plugin_linbot.game import export
+from astrbot_plugin_linbot.game.export import export_data, import_data
+
+from test_storage import _add_user, _sqlite_store, _two_users
+
+
+@pytest.fixture(params=[(1, 0), (1, 4), (2, 4)], ids=["sqlite", "sqlite-pool", "sqlite-shards"])
+def layout(request):
+    return request.param
+
+
+def _store(tmp_path, name: str, layout):
+    directory = tmp_path / name
+    directory.mkdir()
+    shards, readers = layout
+    return _sqlite_store(directory, shards=shards, readers=readers)
+
+
+def _populate(store):
+    """几个用户和每类记录，抢劫在两个分片之间"""
+    robber, victim = _two_users(store)
+    _add_user(store, robber, "alicewonder", money=500, bank_money=20)
+    _add_user(store, victim, "bob", money=3000)
+    # 空用户名和空的可为 NULL 的列（last_checkin）要能经过 CSV 往返
+    _add_user(store, "u9", "", money=50)
+    with store.write(robber, victim) as session:
+        session.add_robbery(robber, victim, 200, True, "成功抢劫200金币")
+        session.add_robbery(robber, victim, 30, False, "抢劫失败")
+    with store.write(robber) as session:
+        for i in range(3):
+            session.add_work(robber, "送外卖", 90, i, 90 + i)
+        session.add_transaction(robber, "deposit", 70, 0, 70)
+    return robber, victim
+
+
+def _state(store, user_ids):
+    """与导入顺序无关的用户状态"""
+    state = {}
+    for user_id in user_ids:
+        with store.read(user_id) as session:
+            user = session.get_user(user_id)
+            state[user_id] = (
+                {key: user[key] for key in ("username", "money", "bank_money", "last_checkin")},
+                session.user_stats(user_id),
+                session.work_by_type(user_id),
+                sorted(row[1:4] for row in session.recent_robberies(user_id, "robber", 10))
+            )
+    return state
+
+
+def _targets(store, exclude: str):
+    return sorted(row[0] for row in store.sample_targets(exclude, 10))
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_import_round_trip(tmp_path, layout, fmt):
+    source = _store(tmp_path, "source", layout)
+    target = _store(tmp_path, "target", layout)
+    try:
+        robber, victim = _populate(source)
+        users = [robber, victim, "u9"]
+        
+        result = export_data(source, str(tmp_path / "export"), fmt)
+        assert result["rows"]["users"] == 3 and result["rows"]["robbery_records"] == 2
+        
+        imported = import_data(target, str(tmp_path / "export"))
+        assert imported["rows"]["robbery_records"] == (4 if target.router.sharded else 2)
+        assert _state(target, users) == _state(source, users)
+        
+        source.ensure_targets(100)
+        target.ensure_targets(100)
+        assert _targets(target, "u9") == _targets(source, "u9") == sorted([robber, victim])
+        assert target.find_users("wonder") == [(robber, "alicewonder")]
+    finally:
+        source.close()
+        target.close()
+
+
+def test_interrupted_import_resumes(tmp_path, layout, monkeypatch):
+    source = _store(tmp_path, "source", layout)
+    target = _store(tmp_path, "target", layout)
+    try:
+        robber, victim = _populate(source)
+        export_data(source, str(tmp_path / "export"))
+        
+        # 每批 1 行，第 4 次分片写事务时中断
+        monkeypatch.setattr(export, "BATCH_ROWS", 1)
+        write_partition = target.write_partition
+        calls = []
+        
+        def failing(partition):
+            calls.append(partition)
+            if len(calls) == target.router.count + 4:
+                raise RuntimeError("模拟中断")
+            return write_partition(partition)
+        
+        monkeypatch.setattr(target, "write_partition", failing)
+        with pytest.raises(RuntimeError):
+            import_data(target, str(tmp_path / "export"))
+        monkeypatch.setattr(target, "write_partition", write_partition)
+        
+        resumed = import_data(target, str(tmp_path / "export"))
+        assert sum(resumed["skipped"].values()) > 0
+        assert _state(target, [robber, victim, "u9"]) == _state(source, [robber, victim, "u9"])
+    finally:
+        source.close()
+        target.close()
+
+
+def test_import_users_over_existing_rows(tmp_path, layout):
+    store = _store(tmp_path, "store", layout)
+    try:
+        robber, victim = _populate(store)
+        store.ensure_targets(100)
+        stats = _state(store, [robber])[robber][1]
+        
+        directory = tmp_path / "users"
+        directory.mkdir()
+        (directory / "users.jsonl").write_text(
+            json.dumps({"user_id": robber, "username": "zzzzzz", "money": 5}) + "\n", encoding="utf-8"
+        )
+        import_data(store, str(directory))
+        
+        with store.read(robber) as session:
+            user = session.get_user(robber)
+        # 文件中没有的列保持不变
+        assert (user["username"], user["money"], user["bank_money"]) == ("zzzzzz", 5, 20)
+        # 现金低于保护金额后不再是可抢劫目标
+        assert _targets(store, "u9") == [victim]
+        # 全文索引随用户名更新，没有残留的旧用户名
+        assert store.find_users("cewon") == []
+        assert store.find_users("zzzz") == [(robber, "zzzzzz")]
+        assert _state(store, [robber])[robber][1] == stats
+    finally:
+        store.close()
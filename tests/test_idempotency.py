@@ -0,0 +1,86 @@
+"""重复消息去重测试：只读子指令不去重，平台重发的消息与去重窗口分别开关"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from astrbot_plugin_linbot.guard.idempotency import CommandCache, idempotent
+from astrbot_plugin_linbot.guard import idempotency
+
+
+class _Event:
+    def __init__(self, text: str, message_id: str = "", sender: str = "u1"):
+        self.message_str = text
+        self.message_obj = SimpleNamespace(message_id=message_id)
+        self._sender = sender
+    
+    def get_platform_name(self) -> str:
+        return "test"
+    
+    def get_sender_id(self) -> str:
+        return self._sender
+
+
+class _Handler:
+    def __init__(self):
+        self.calls = 0
+    
+    @idempotent("抢劫", when=lambda event: event.message_str.split()[1:2] not in ([], ["目标"]))
+    async def robbery(self, event):
+        self.calls += 1
+        yield self.calls
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CommandCache()
+    monkeypatch.setattr(idempotency, "_command_cache", cache)
+    return cache
+
+
+def _send(handler, *events):
+    async def run():
+        return [[result async for result in handler.robbery(event)] for event in events]
+    return asyncio.run(run())
+
+
+def test_mutating_subcommand_is_replayed(cache):
+    handler = _Handler()
+    assert _send(handler, _Event("抢劫 张三"), _Event("抢劫 张三")) == [[1], [1]]
+    assert handler.calls == 1
+    assert cache.replayed == 1
+
+
+def test_read_only_subcommands_always_run(cache):
+    handler = _Handler()
+    assert _send(handler, _Event("抢劫 目标"), _Event("抢劫 目标"), _Event("抢劫"), _Event("抢劫")) == [[1], [2], [3], [4]]
+    assert cache.replayed == 0
+
+
+def test_redelivery_dedupe_without_window(cache):
+    cache.window_seconds = 0
+    handler = _Handler()
+    results = _send(handler, _Event("抢劫 张三", "m1"), _Event("抢劫 张三", "m1"), _Event("抢劫 张三", "m2"))
+    # 同一消息ID只执行一次，不同消息ID的相同内容在去重窗口为 0 时分别执行
+    assert results == [[1], [1], [2]]
+
+
+def test_all_dedupe_disabled(cache):
+    cache.window_seconds = 0
+    cache.redelivery_seconds = 0
+    handler = _Handler()
+    assert _send(handler, _Event("抢劫 张三", "m1"), _Event("抢劫 张三", "m1")) == [[1], [2]]
+
+
+def test_forget_drops_cached_results(cache):
+    handler = _Handler()
+    
+    async def run():
+        first = [result async for result in handler.robbery(_Event("抢劫 张三"))]
+        cache.forget()
+        second = [result async for result in handler.robbery(_Event("抢劫 张三"))]
+        return first, second
+    
+    assert asyncio.run(run()) == ([1], [2])
+    assert cache.replayed == 0
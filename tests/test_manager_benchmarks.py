@@ -0,0 +1,64 @@
+"""
+游戏管理器基准（pytest-benchmark）- 在合成用户数据库上逐个调用六个管理器的全部公开方法
+用例与 benchmarks.managers 相同；未安装 pytest-benchmark 时跳过
+
+运行（在仓库根目录，LINBOT_BENCH_USERS 为临时生成的用户数，LINBOT_BENCH_DB 指定已生成的数据库）：
+python -m pytest tests/test_manager_benchmarks.py --benchmark-autosave
+python -m pytest tests/test_manager_benchmarks.py --benchmark-compare --benchmark-compare-fail=median:10%
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from astrbot_plugin_linbot.benchmarks.managers import _Users, build_cases
+from astrbot_plugin_linbot.benchmarks.populate import populate
+
+
+# 不限迭代次数的用例每轮的调用次数
+DEFAULT_ROUNDS = 50
+
+SEED = 42
+
+# 用例在收集时构造一次：{用例名: (无参调用, 迭代次数上限)}
+_cases = {}
+_work_dir = None
+
+
+def _build_cases():
+    global _work_dir
+    if _work_dir is None:
+        _work_dir = tempfile.mkdtemp(prefix="linbot_bench_")
+        db_path = os.path.join(_work_dir, "user.db")
+        source = os.environ.get("LINBOT_BENCH_DB")
+        if source:
+            shutil.copyfile(source, db_path)
+        else:
+            populate(db_path, int(os.environ.get("LINBOT_BENCH_USERS", "2000")), seed=SEED)
+        plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for name, call, limit in build_cases(db_path, plugin_dir, _Users(db_path, SEED)):
+            _cases[name] = (call, limit)
+    return _cases
+
+
+def pytest_generate_tests(metafunc):
+    if "case" in metafunc.fixturenames:
+        # 按 build_cases 的顺序执行（全表更新在最后）
+        metafunc.parametrize("case", list(_build_cases()), ids=str)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _cleanup():
+    yield
+    if _work_dir is not None:
+        shutil.rmtree(_work_dir, ignore_errors=True)
+
+
+def test_manager(benchmark, case):
+    call, limit = _cases[case]
+    benchmark.group = case.split(".")[0]
+    benchmark.pedantic(call, rounds=limit or DEFAULT_ROUNDS, iterations=1, warmup_rounds=1 if not limit else 0)
@@ -0,0 +1,100 @@
+"""指令限流测试：群按 (消息平台, 群号) 计数，签到不占用群的令牌，重放的重复消息不取令牌"""
+
+import asyncio
+from types import SimpleNamespace
+
+from astrbot_plugin_linbot.guard import idempotency, ratelimit
+from astrbot_plugin_linbot.guard.idempotency import CommandCache, idempotent
+from astrbot_plugin_linbot.guard.ratelimit import RateLimiter, rate_limited
+
+
+def _drain_group(limiter: RateLimiter, platform: str, group_id: str) -> int:
+    """不同用户在同一个群里连续发送，返回放行的次数"""
+    allowed = 0
+    for i in range(100):
+        if limiter.acquire(f"u{i}", group_id, "image", platform)["allowed"]:
+            allowed += 1
+    return allowed
+
+
+def test_group_buckets_are_per_platform():
+    limiter = RateLimiter(per_minute={"image": 6}, group_multiplier=1)
+    capacity = _drain_group(limiter, "qq", "1001")
+    assert 0 < capacity < 100
+    assert not limiter.acquire("u200", "1001", "image", "qq")["allowed"]
+    # 另一个平台上的同号群不受影响
+    assert _drain_group(limiter, "telegram", "1001") == capacity
+
+
+class _Event:
+    def __init__(self, sender: str, text: str = "", message_id: str = ""):
+        self._sender = sender
+        self.message_str = text
+        self.message_obj = SimpleNamespace(message_id=message_id)
+    
+    def get_sender_id(self) -> str:
+        return self._sender
+    
+    def get_group_id(self) -> str:
+        return "1001"
+    
+    def get_platform_name(self) -> str:
+        return "qq"
+    
+    def plain_result(self, text: str) -> str:
+        return text
+
+
+class _Handler:
+    @rate_limited("image", group=False)
+    async def checkin(self, event):
+        yield "ok"
+    
+    @rate_limited("image")
+    async def ranking(self, event):
+        yield "ok"
+    
+    @rate_limited("image", group=False)
+    @idempotent("抢劫")
+    async def robbery(self, event):
+        yield event.message_obj.message_id
+
+
+def test_group_exempt_commands(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_rate_limiter", RateLimiter(per_minute={"image": 6}, group_multiplier=1))
+    handler = _Handler()
+    
+    async def replies(method, sender: str):
+        return [reply async for reply in method(_Event(sender))]
+    
+    async def run():
+        ranking = [await replies(handler.ranking, f"u{i}") for i in range(20)]
+        checkin = [await replies(handler.checkin, f"v{i}") for i in range(20)]
+        return ranking, checkin
+    
+    ranking, checkin = asyncio.run(run())
+    assert ["ok"] in ranking and any(reply != ["ok"] for reply in ranking)
+    assert checkin == [["ok"]] * 20
+
+
+def test_replay_does_not_spend_tokens(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_rate_limiter", RateLimiter(per_minute={"image": 6}, group_multiplier=1))
+    monkeypatch.setattr(idempotency, "_command_cache", CommandCache(window_seconds=0))
+    handler = _Handler()
+    
+    async def replies(message_id: str):
+        return [reply async for reply in handler.robbery(_Event("u1", "抢劫 张三", message_id))]
+    
+    async def run():
+        first = []
+        for i in range(100):
+            first.append(await replies(f"m{i}"))
+            if first[-1] != [f"m{i}"]:
+                break
+        # 令牌已用完，之前的消息重发时仍重放结果
+        return first, await replies("m0"), await replies(f"m{i + 1}")
+    
+    first, replay, fresh = asyncio.run(run())
+    assert first[0] == ["m0"] and first[-1] != [f"m{len(first) - 1}"]
+    assert replay == ["m0"]
+    assert fresh != [f"m{len(first)}"]
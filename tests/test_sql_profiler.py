@@ -0,0 +1,33 @@
+"""SQL 语句分析器测试：事务控制语句的耗时记录为锁等待，不作为慢查询获取执行计划"""
+
+import logging
+import sqlite3
+
+from astrbot_plugin_linbot.perf.sql import SqlProfiler, is_lock_statement
+
+
+def test_lock_statements():
+    for sql in ("BEGIN IMMEDIATE", "  commit", "ROLLBACK", "ATTACH DATABASE ? AS peer", "DETACH DATABASE peer"):
+        assert is_lock_statement(sql)
+    assert not is_lock_statement("SELECT * FROM users")
+
+
+def test_lock_wait_logged_without_plan(caplog):
+    profiler = SqlProfiler(slow_query_ms=10)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users (user_id TEXT)")
+    profiler.record("BEGIN IMMEDIATE", 0.5)
+    profiler.record("SELECT * FROM users WHERE user_id = 'a'", 0.5)
+    
+    with caplog.at_level(logging.WARNING, logger="astrbot"):
+        profiler.log_slow(conn, "BEGIN IMMEDIATE", None, 0.5)
+        profiler.log_slow(conn, "SELECT * FROM users WHERE user_id = ?", ("a",), 0.5)
+    
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[0].startswith("锁等待 500.0ms: BEGIN IMMEDIATE")
+    assert messages[1].startswith("慢查询") and "执行计划" in messages[1]
+    
+    stats = {item["statement"]: item for item in profiler.top()}
+    assert (stats["BEGIN IMMEDIATE"]["lock_waits"], stats["BEGIN IMMEDIATE"]["slow"]) == (1, 0)
+    assert stats["SELECT * FROM users WHERE user_id = ?"]["slow"] == 1
+    assert profiler.plan("BEGIN IMMEDIATE") is None
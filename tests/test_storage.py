@@ -0,0 +1,328 @@
+"""
+存储引擎一致性测试 - 同一组用例分别在 SQLite（单文件、读连接池、两个分片）和内存存储上运行
+
+运行（在仓库根目录）：
+python -m pytest tests
+"""
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from astrbot_plugin_linbot.game.activity import ensure_activity_indexes
+from astrbot_plugin_linbot.game.db import connect
+from astrbot_plugin_linbot.game.init_db import init_database
+from astrbot_plugin_linbot.game.shards import get_shard_router, migrate_shards
+from astrbot_plugin_linbot.game.stats import ensure_user_stats
+from astrbot_plugin_linbot.game.storage import NOW, MemoryStore, SqliteStore
+from astrbot_plugin_linbot.game.user_search import ensure_user_search
+
+
+def _sqlite_store(tmp_path, shards: int = 1, readers: int = 0) -> SqliteStore:
+    """新建数据库并与插件启动时一样建立统计表、索引和全文索引"""
+    db_path = str(tmp_path / "user.db")
+    init_database(db_path, verbose=False)
+    if shards > 1:
+        migrate_shards(db_path, shards)
+    for path in get_shard_router(db_path).paths:
+        ensure_user_stats(path)
+        conn = connect(path)
+        try:
+            ensure_activity_indexes(conn)
+            ensure_user_search(conn)
+        finally:
+            conn.close()
+    return SqliteStore(db_path, readers)
+
+
+@pytest.fixture(params=["sqlite", "sqlite-pool", "sqlite-shards", "memory"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStore()
+        return
+    store = _sqlite_store(tmp_path, shards=2 if request.param == "sqlite-shards" else 1,
+                          readers=4 if request.param != "sqlite" else 0)
+    yield store
+    store.close()
+
+
+def _add_user(store, user_id: str, username: str, **values) -> None:
+    with store.write(user_id) as session:
+        session.ensure_user(user_id, username)
+        if values:
+            session.update_user(user_id, values)
+
+
+def _today() -> date:
+    # 记录时间为 UTC
+    return datetime.now(timezone.utc).date()
+
+
+# ---- 用户 ----
+
+def test_ensure_user_creates_defaults(store):
+    with store.read("u1") as session:
+        assert session.get_user("u1") is None
+    
+    store.ensure_user("u1", "张三")
+    store.ensure_user("u1", "改名不生效")
+    with store.read("u1") as session:
+        user = session.get_user("u1")
+    assert user["username"] == "张三"
+    assert (user["money"], user["bank_money"], user["level"], user["checkin_streak"]) == (0, 0, 1, 0)
+    assert user["created_at"] is not None
+
+
+def test_ensure_user_rename(store):
+    _add_user(store, "u1", "张三")
+    with store.write("u1") as session:
+        session.ensure_user("u1", "李四", rename=True)
+    assert store.usernames(["u1", "missing"]) == {"u1": "李四"}
+
+
+def test_update_user_values_and_increments(store):
+    _add_user(store, "u1", "张三", money=100)
+    with store.write("u1") as session:
+        session.update_user("u1", {"last_work_time": NOW}, {"money": 50, "exp": 3})
+        # 同一写会话中的修改对后续读取可见
+        assert session.get_user("u1")["money"] == 150
+    with store.read("u1") as session:
+        user = session.get_user("u1")
+    assert (user["money"], user["exp"]) == (150, 3)
+    assert user["last_work_time"][:10] == _today().isoformat()
+
+
+def test_write_rolls_back_on_exception(store):
+    _add_user(store, "u1", "张三", money=100)
+    with pytest.raises(RuntimeError):
+        with store.write("u1") as session:
+            session.update_user("u1", increments={"money": -100})
+            session.add_transaction("u1", "deposit", 100, 0, 100)
+            raise RuntimeError("中途失败")
+    with store.read("u1") as session:
+        assert session.get_user("u1")["money"] == 100
+        assert session.recent_transactions("u1", 10) == []
+        assert session.user_stats("u1")["bank_transactions"] == 0
+
+
+# ---- 记录 ----
+
+def test_bank_transactions(store):
+    _add_user(store, "u1", "张三", money=500)
+    with store.write("u1") as session:
+        session.add_transaction("u1", "deposit", 100, 0, 100)
+        session.add_transaction("u1", "deposit", 50, 100, 150)
+        session.add_transaction("u1", "withdraw", 30, 150, 120)
+    with store.read("u1") as session:
+        assert session.transaction_sum("u1", "deposit", _today()) == 150
+        assert session.transaction_sum("u1", "withdraw", _today()) == 30
+        assert session.transaction_sum("u1", "deposit", date(2000, 1, 1)) == 0
+        assert [row[:2] for row in session.recent_transactions("u1", 2)] == [("withdraw", 30), ("deposit", 50)]
+        stats = session.user_stats("u1")
+    assert (stats["bank_transactions"], stats["bank_deposits"], stats["bank_withdraws"]) == (3, 150, 30)
+
+
+def test_work_records(store):
+    _add_user(store, "u1", "张三")
+    with store.write("u1") as session:
+        session.add_work("u1", "送外卖", 90, 10, 100)
+        session.add_work("u1", "送外卖", 80, 0, 80)
+        session.add_work("u1", "搬砖", 150, 50, 200)
+    with store.read("u1") as session:
+        assert session.work_today("u1", _today()) == (3, 380)
+        assert session.work_today("u1", date(2000, 1, 1)) == (0, 0)
+        assert session.last_work_time("u1", "搬砖")[:10] == _today().isoformat()
+        assert session.last_work_time("u1", "保安") is None
+        assert [row[:2] for row in session.recent_works("u1", 2)] == [("搬砖", 200), ("送外卖", 80)]
+        by_income = session.work_by_type("u1")
+        by_count = session.work_by_type("u1", order_by="count")
+        stats = session.user_stats("u1")
+    assert [row[0] for row in by_income] == ["搬砖", "送外卖"]
+    assert by_count[0][:3] == ("送外卖", 2, 180) and by_count[0][4] == 100
+    assert (stats["works"], stats["work_income"]) == (3, 380)
+
+
+def test_checkin_records(store):
+    _add_user(store, "u1", "张三")
+    with store.write("u1") as session:
+        session.add_checkin("u1", date(2025, 1, 1), 100, 1)
+        session.add_checkin("u1", date(2025, 1, 2), 120, 2)
+    with store.read("u1") as session:
+        assert session.checkin_reward("u1", date(2025, 1, 2)) == 120
+        assert session.checkin_reward("u1", date(2025, 1, 3)) is None
+        assert session.recent_checkins("u1", 5) == [("2025-01-02", 120, 2), ("2025-01-01", 100, 1)]
+    
+    # 同一天只能签到一次
+    with pytest.raises(Exception):
+        with store.write("u1") as session:
+            session.add_checkin("u1", date(2025, 1, 2), 120, 2)
+    with store.read("u1") as session:
+        assert len(session.recent_checkins("u1", 5)) == 2
+
+
+def _two_users(store):
+    """两个用户，分片存储时分别位于不同分片"""
+    users = [f"u{i}" for i in range(50)]
+    first = users[0]
+    if isinstance(store, SqliteStore) and store.router.sharded:
+        second = next(u for u in users if store.router.index_of(u) != store.router.index_of(first))
+    else:
+        second = users[1]
+    return first, second
+
+
+def test_robbery_between_users(store):
+    robber, victim = _two_users(store)
+    _add_user(store, robber, "劫匪", money=100)
+    _add_user(store, victim, "路人", money=1000)
+    
+    with store.write(robber, victim) as session:
+        session.update_user(victim, increments={"money": -200})
+        session.update_user(robber, increments={"money": 200})
+        session.add_robbery(robber, victim, 200, True, "成功抢劫200金币")
+    with store.write(robber, victim) as session:
+        session.add_robbery(robber, victim, 50, False, "抢劫失败")
+    
+    with store.read(robber) as session:
+        assert session.get_user(robber)["money"] == 300
+        assert session.last_robbery_time(robber) is not None
+        rows = session.recent_robberies(robber, "robber", 10)
+        stats = session.user_stats(robber)
+    assert [(row[0], row[1], row[2], bool(row[3])) for row in rows] == [(victim, "路人", 50, False),
+                                                                         (victim, "路人", 200, True)]
+    assert (stats["robberies"], stats["rob_successes"], stats["rob_amount"]) == (2, 1, 200)
+    
+    with store.read(victim) as session:
+        assert session.get_user(victim)["money"] == 800
+        rows = session.recent_robberies(victim, "victim", 10)
+        stats = session.user_stats(victim)
+    assert [(row[0], row[1], row[2]) for row in rows] == [(robber, "劫匪", 50), (robber, "劫匪", 200)]
+    assert (stats["times_robbed"], stats["robbed_amount"]) == (2, 200)
+
+
+def test_two_user_write_rolls_back_both_sides(store):
+    robber, victim = _two_users(store)
+    _add_user(store, robber, "劫匪", money=100)
+    _add_user(store, victim, "路人", money=1000)
+    
+    with pytest.raises(RuntimeError):
+        with store.write(robber, victim) as session:
+            session.update_user(victim, increments={"money": -200})
+            session.update_user(robber, increments={"money": 200})
+            session.add_robbery(robber, victim, 200, True, "成功抢劫200金币")
+            raise RuntimeError("中途失败")
+    
+    with store.read(robber) as session:
+        assert session.get_user(robber)["money"] == 100
+        assert session.recent_robberies(robber, "robber", 10) == []
+    with store.read(victim) as session:
+        assert session.get_user(victim)["money"] == 1000
+        assert session.recent_robberies(victim, "victim", 10) == []
+
+
+# ---- 跨用户查询 ----
+
+def test_rankings(store):
+    _add_user(store, "a", "甲", money=300, bank_money=0)
+    _add_user(store, "b", "乙", money=100, bank_money=500)
+    _add_user(store, "c", "丙", money=200)
+    _add_user(store, "d", "丁")
+    
+    assert [user["user_id"] for user in store.top_users("money", 10)] == ["a", "c", "b"]
+    assets = store.top_users("assets", 2)
+    assert [(user["user_id"], user["value"]) for user in assets] == [("b", 600), ("a", 300)]
+    
+    with store.read("c") as session:
+        user = session.get_user("c")
+    assert store.count_above("money", user) == 1
+    assert store.count_above("money", None) == 0
+    assert store.active_users() == 3
+
+
+def test_find_users(store):
+    for user_id, name in [("1", "小明"), ("2", "小明同学"), ("3", "我是小明"), ("4", "Alice"), ("5", "小红")]:
+        _add_user(store, user_id, name)
+    
+    assert store.find_users("小明") == [("1", "小明"), ("2", "小明同学"), ("3", "我是小明")]
+    assert store.find_users("小明", limit=2) == [("1", "小明"), ("2", "小明同学")]
+    assert store.find_users("alice") == [("4", "Alice")]
+    assert store.find_users("  ") == []
+
+
+def test_sample_targets(store):
+    _add_user(store, "rich1", "富一", money=5000, bank_money=100)
+    _add_user(store, "rich2", "富二", money=3000)
+    _add_user(store, "poor", "穷人", money=10)
+    
+    store.ensure_targets(1000)
+    targets = store.sample_targets("rich2", 5)
+    assert targets == [("rich1", "富一", 5000, 1, 5100)]
+    assert [row[0] for row in store.sample_targets("poor", 5)] == ["rich1", "rich2"]
+
+
+def test_activity_page(store):
+    _add_user(store, "u1", "张三")
+    with store.write("u1") as session:
+        for i in range(4):
+            session.add_work("u1", "送外卖", 100 + i, 0, 100 + i)
+        session.add_transaction("u1", "deposit", 50, 0, 50)
+    
+    first = store.activity_page("u1", limit=3)
+    assert len(first["activities"]) == 3 and first["next_cursor"]
+    second = store.activity_page("u1", limit=3, cursor=first["next_cursor"])
+    assert len(second["activities"]) == 2 and second["next_cursor"] is None
+    
+    pages = first["activities"] + second["activities"]
+    assert sorted(activity["amount"] for activity in pages) == [50, 100, 101, 102, 103]
+    assert [activity["timestamp"] for activity in pages] == sorted((a["timestamp"] for a in pages), reverse=True)
+
+
+# ---- 后台准备完成前的直接查询 ----
+
+@pytest.fixture(params=[1, 2], ids=["sqlite", "sqlite-shards"])
+def sqlite_store(request, tmp_path):
+    store = _sqlite_store(tmp_path, shards=request.param)
+    yield store
+    store.close()
+
+
+def test_stats_fallback_matches_stats_table(sqlite_store):
+    robber, victim = _two_users(sqlite_store)
+    _add_user(sqlite_store, robber, "劫匪", money=100)
+    _add_user(sqlite_store, victim, "路人", money=1000)
+    with sqlite_store.write(robber, victim) as session:
+        session.add_robbery(robber, victim, 200, True, "成功抢劫200金币")
+        session.add_robbery(robber, victim, 50, False, "抢劫失败")
+    with sqlite_store.write(robber) as session:
+        session.add_transaction(robber, "deposit", 70, 0, 70)
+        session.add_transaction(robber, "withdraw", 20, 70, 50)
+        session.add_work(robber, "送外卖", 90, 10, 100)
+        session.add_work(robber, "搬砖", 150, 50, 200)
+        session.add_work(robber, "送外卖", 80, 0, 80)
+    
+    def read_all():
+        results = []
+        for user_id in (robber, victim):
+            with sqlite_store.read(user_id) as session:
+                results.append((session.user_stats(user_id), session.work_by_type(user_id),
+                                session.work_by_type(user_id, order_by="count")))
+        return results
+    
+    expected = read_all()
+    sqlite_store.stats_ready = False
+    assert read_all() == expected
+    assert expected[0][0]["bank_deposits"] == 70 and expected[1][0]["robbed_amount"] == 200
+
+
+def test_sample_targets_before_index_is_built(sqlite_store):
+    _add_user(sqlite_store, "rich1", "富一", money=5000, bank_money=100)
+    _add_user(sqlite_store, "rich2", "富二", money=3000)
+    _add_user(sqlite_store, "poor", "穷人", money=10)
+    
+    sqlite_store.defer_targets(1000)
+    assert sqlite_store.sample_targets("rich2", 5) == [("rich1", "富一", 5000, 1, 5100)]
+    assert [row[0] for row in sqlite_store.sample_targets("poor", 5)] == ["rich1", "rich2"]
+    assert len(sqlite_store.sample_targets("poor", 1)) == 1
+    
+    sqlite_store.ensure_targets(1000)
+    assert [row[0] for row in sqlite_store.sample_targets("poor", 5)] == ["rich1", "rich2"]